@@ -1,9 +1,6 @@
 import os
 import secrets
 
-from dotenv import load_dotenv
-from flask import Flask
-
 
 def _get_bool_env(var_name: str, default: bool = False) -> bool:
     """Return a boolean value for the given environment variable."""
@@ -22,6 +19,11 @@ def create_app(
 ):
     """Create and configure the Flask application."""
 
+    # Flask is imported here so Flask-free modules such as ``app.cli`` can
+    # be imported without it.
+    from dotenv import load_dotenv
+    from flask import Flask
+
     # Load environment variables from .env file
     if load_env:
         load_dotenv()
@@ -55,13 +57,85 @@ def create_app(
     app.config.setdefault("RATE_LIMIT_PER_MINUTE", int(os.getenv("RATE_LIMIT_PER_MINUTE", "60")))
     app.config.setdefault("RATE_LIMIT_DISABLED", False)
     app.config["RATE_LIMIT_DISABLED"] = app.config["RATE_LIMIT_DISABLED"] or app.testing
-
-    from .routes import main_bp
+    app.config.setdefault("RATE_LIMIT_MAX_CLIENTS", int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "65536")))
+    app.config.setdefault("RATE_LIMIT_TRUSTED_PROXIES", int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0")))
+    app.config.setdefault("RATE_LIMIT_SHARED_PATH", os.getenv("RATE_LIMIT_SHARED_PATH"))
+    app.config.setdefault("BATCH_MAX_ITEMS", int(os.getenv("BATCH_MAX_ITEMS", "100000")))
+    app.config.setdefault("MAX_CONTENT_LENGTH", int(os.getenv("MAX_CONTENT_LENGTH", str(64 << 20))) or None)
+    app.config.setdefault("PREFIX_INDEX_PATH", os.getenv("PREFIX_INDEX_PATH"))
+    app.config.setdefault("RANGE_DB_PATH", os.getenv("RANGE_DB_PATH"))
+    app.config.setdefault("RANGE_DB_RELOAD_INTERVAL", float(os.getenv("RANGE_DB_RELOAD_INTERVAL", "5")))
+    app.config.setdefault("IPAM_DB_PATH", os.getenv("IPAM_DB_PATH"))
+    app.config.setdefault("UTILIZATION_PATH", os.getenv("UTILIZATION_PATH"))
+    app.config.setdefault("REVERSE_ZONE_MAX_RECORDS", int(os.getenv("REVERSE_ZONE_MAX_RECORDS", str(1 << 20))))
+    app.config.setdefault("RESULT_CACHE_SIZE", int(os.getenv("RESULT_CACHE_SIZE", "4096")))
+    app.config.setdefault("PERMALINK_MAX_AGE", int(os.getenv("PERMALINK_MAX_AGE", str(30 * 24 * 3600))))
+    app.config.setdefault("PRECOMPILE_TEMPLATES", _get_bool_env("PRECOMPILE_TEMPLATES", True))
+    app.config.setdefault("METRICS_ENABLED", _get_bool_env("METRICS_ENABLED", False))
+    app.config.setdefault("METRICS_DIR", os.getenv("METRICS_DIR"))
+    app.config.setdefault("ASGI_BATCH_WORKERS", int(os.getenv("ASGI_BATCH_WORKERS", str(os.cpu_count() or 1))))
+    app.config.setdefault(
+        "ASGI_MAX_PENDING_CHUNKS",
+        int(os.getenv("ASGI_MAX_PENDING_CHUNKS", str(4 * app.config["ASGI_BATCH_WORKERS"]))),
+    )
+
+    if app.config["PREFIX_INDEX_PATH"]:
+        from .prefix_index import load_prefix_index
+
+        app.extensions["prefix_index"] = load_prefix_index(app.config["PREFIX_INDEX_PATH"])
+
+    if app.config["RANGE_DB_PATH"]:
+        from .range_db import ReloadingRangeDatabase
+
+        app.extensions["range_db"] = ReloadingRangeDatabase(
+            app.config["RANGE_DB_PATH"], app.config["RANGE_DB_RELOAD_INTERVAL"]
+        )
+
+    if app.config["UTILIZATION_PATH"]:
+        from .utilization import Utilization
+
+        app.extensions["utilization"] = Utilization.load(app.config["UTILIZATION_PATH"])
+
+    if app.config["IPAM_DB_PATH"]:
+        from .ipam import PoolStore
+
+        app.extensions["ipam"] = PoolStore(app.config["IPAM_DB_PATH"])
+
+    from .api import api_bp
+    from .cache import CalculationCache
+    from .permalinks import init_permalinks
+    from .rate_limit import create_rate_limiter
+    from .routes import RATE_LIMIT_WINDOW_SECONDS, main_bp
+
+    app.extensions["rate_limiter"] = create_rate_limiter(
+        RATE_LIMIT_WINDOW_SECONDS,
+        max_clients=app.config["RATE_LIMIT_MAX_CLIENTS"],
+        shared_path=app.config["RATE_LIMIT_SHARED_PATH"],
+    )
+
+    app.extensions["calculation_cache"] = CalculationCache(app.config["RESULT_CACHE_SIZE"])
 
     app.register_blueprint(main_bp)
+    app.register_blueprint(api_bp)
+    init_permalinks(app)
+
+    if app.config["METRICS_ENABLED"]:
+        from .metrics import init_metrics
+
+        init_metrics(app)
+
+    if app.config["PRECOMPILE_TEMPLATES"]:
+        # Compile now so a preloading gunicorn master shares the compiled
+        # templates with its workers instead of each worker compiling them.
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
 
     return app
 
 
-# Đảm bảo rằng app được đặt tên là 'app'
-app = create_app()
+def __getattr__(name: str):
+    # Đảm bảo rằng app được đặt tên là 'app' (``gunicorn app:app``), built on first access.
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
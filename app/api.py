@@ -0,0 +1,432 @@
+"""JSON API endpoints for automation clients."""
+
+import logging
+import os
+import sqlite3
+import tempfile
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context, url_for
+
+from .acl import ACL, INVALID, iter_rule_lines
+from .batch import READ_CHUNK_SIZE, calculate_batch, iter_json_items, iter_ndjson, lookup_batch
+from .conflicts import find_conflicts, iter_text_items
+from .enumeration import DOWNLOAD_FORMATS, enumerate_network, iter_download
+from .ipam import PoolConflictError, PoolNotFoundError
+from .log_scan import scan_log
+from .prefix_index import PrefixIndex
+from .reverse_zones import DEFAULT_TTL, iter_classless_delegation, iter_reverse_zone
+from .routes import check_rate_limit
+from .validation import validate_raw_input
+from .vlsm import plan_subnets
+
+logger = logging.getLogger(__name__)
+
+api_bp = Blueprint("api", __name__, url_prefix="/api/v1")
+NDJSON_MIMETYPE = "application/x-ndjson"
+ENUMERATION_PAGE_SIZE = 100
+ENUMERATION_MAX_PAGE_SIZE = 1000
+_DOWNLOAD_MIMETYPES = {"csv": "text/csv", "ndjson": NDJSON_MIMETYPE}
+
+
+@api_bp.before_request
+def limit_request_body():
+    """Refuse bodies declared larger than ``MAX_CONTENT_LENGTH``.
+
+    The streaming endpoints read ``request.stream``, which Werkzeug does not
+    limit; items inside a body are capped by ``iter_json_items``.
+    """
+    max_length = current_app.config.get("MAX_CONTENT_LENGTH")
+    if max_length and (request.content_length or 0) > max_length:
+        return jsonify(error="Request body is too large."), 413
+    return None
+
+
+@api_bp.route('/calculate', methods=['POST'])
+def calculate_batch_route():
+    """Stream one JSON result per line for a JSON array or NDJSON body."""
+    if check_rate_limit():
+        return jsonify(error="Too many requests. Please try again later."), 429
+
+    max_items = current_app.config.get("BATCH_MAX_ITEMS")
+    items = iter_json_items(request.stream)
+    results = calculate_batch(items, max_items=max_items)
+    return Response(stream_with_context(iter_ndjson(results)), mimetype=NDJSON_MIMETYPE)
+
+
+@api_bp.route('/lookup', methods=['GET', 'POST'])
+def lookup_route():
+    """Return the longest matching prefix for one address or a batch."""
+    if check_rate_limit():
+        return jsonify(error="Too many requests. Please try again later."), 429
+
+    index = current_app.extensions.get("prefix_index")
+    if index is None:
+        return jsonify(error="No prefix index is configured."), 503
+
+    if request.method == "GET":
+        try:
+            address = validate_raw_input(request.args.get("ip"), "IP address")
+            match = index.lookup(address)
+        except ValueError as exc:
+            return jsonify(error=str(exc)), 400
+        return jsonify(ip=address, match=match)
+
+    max_items = current_app.config.get("BATCH_MAX_ITEMS")
+    results = lookup_batch(index, iter_json_items(request.stream), max_items=max_items)
+    return Response(stream_with_context(iter_ndjson(results)), mimetype=NDJSON_MIMETYPE)
+
+
+@api_bp.route('/conflicts', methods=['POST'])
+def conflicts_route():
+    """Stream overlap, duplicate, nesting and gap findings for a list of networks.
+
+    The body is a JSON array or NDJSON of ``network[,parent]`` strings,
+    ``[network, parent]`` pairs or objects, or ``text/plain`` lines of
+    ``network [parent]``.
+    """
+    if check_rate_limit():
+        return jsonify(error="Too many requests. Please try again later."), 429
+
+    if request.mimetype == "text/plain":
+        items = iter_text_items(request.stream)
+    else:
+        items = iter_json_items(request.stream)
+    findings = find_conflicts(items, max_items=current_app.config.get("BATCH_MAX_ITEMS"))
+    return Response(stream_with_context(iter_ndjson(findings)), mimetype=NDJSON_MIMETYPE)
+
+
+@api_bp.route('/reverse-zone', methods=['GET'])
+def reverse_zone_route():
+    """Stream a BIND reverse zone file for ``network``.
+
+    Query fields are ``network``, ``template``, ``populate``, ``ttl``,
+    repeated ``ns``, ``hostmaster``, ``serial`` and ``origin_bits`` (see
+    ``iter_reverse_zone``). ``delegation=true`` returns the RFC 2317 records
+    for the parent /24 zone instead. Zones with more records than
+    ``REVERSE_ZONE_MAX_RECORDS`` are refused.
+    """
+    if check_rate_limit():
+        return jsonify(error="Too many requests. Please try again later."), 429
+
+    args = request.args
+    nameservers = args.getlist("ns")
+    try:
+        if args.get("delegation", "").lower() in {"1", "true", "yes"}:
+            body, name = iter_classless_delegation(args.get("network"), nameservers), "delegation"
+        else:
+            body = iter_reverse_zone(
+                args.get("network"),
+                args.get("template"),
+                populate=args.get("populate") or None,
+                ttl=_non_negative_int("ttl", DEFAULT_TTL),
+                nameservers=nameservers,
+                hostmaster=args.get("hostmaster") or None,
+                serial=_non_negative_int("serial", None),
+                origin_bits=_non_negative_int("origin_bits", None),
+                max_records=current_app.config.get("REVERSE_ZONE_MAX_RECORDS"),
+            )
+            name = "zone"
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    headers = {"Content-Disposition": f"attachment; filename=ipcal-reverse.{name}"}
+    return Response(stream_with_context(body), mimetype="text/plain", headers=headers)
+
+
+@api_bp.route('/acl', methods=['POST'])
+def acl_route():
+    """Compile an ordered ACL, report shadowed and redundant rules and evaluate addresses.
+
+    The body is a JSON object with ``rules`` (an array, or text with one rule
+    per line), an optional ``default`` action and optional ``addresses``.
+    Both lists are limited to ``BATCH_MAX_ITEMS``.
+    """
+    if check_rate_limit():
+        return jsonify(error="Too many requests. Please try again later."), 429
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="Request body must be a JSON object."), 400
+    rules, addresses = payload.get("rules"), payload.get("addresses") or []
+    if isinstance(rules, str):
+        rules = list(iter_rule_lines(rules.splitlines()))
+    if not isinstance(rules, list) or not isinstance(addresses, list):
+        return jsonify(error="'rules' must be an array or text and 'addresses' an array."), 400
+    if not all(isinstance(address, str) for address in addresses):
+        return jsonify(error="Addresses must be strings."), 400
+    max_items = current_app.config.get("BATCH_MAX_ITEMS")
+    if max_items is not None and len(addresses) > max_items:
+        return jsonify(error=f"ACL evaluation is limited to {max_items} addresses."), 400
+    try:
+        acl = ACL.compile(rules, payload.get("default", "deny"), max_rules=max_items)
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+
+    response = {**acl.stats(), "findings": acl.findings}
+    if addresses:
+        decisions = acl.evaluate_many(addresses)
+        response["results"] = [
+            {"address": address, "error": "Invalid IP address format."}
+            if decision == INVALID
+            else {"address": address, **acl.result(decision)}
+            for address, decision in zip(addresses, decisions.tolist())
+        ]
+        response["hits"] = {str(key): count for key, count in acl.hit_counts(decisions).items()}
+    return jsonify(response)
+
+
+@api_bp.route('/plan', methods=['POST'])
+def plan_route():
+    """Allocate child subnets from a parent network (VLSM)."""
+    if check_rate_limit():
+        return jsonify(error="Too many requests. Please try again later."), 429
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="Request body must be a JSON object."), 400
+    subnets = payload.get("subnets")
+    exclude = payload.get("exclude") or []
+    if not isinstance(subnets, list) or not isinstance(exclude, list):
+        return jsonify(error="'subnets' and 'exclude' must be arrays."), 400
+
+    try:
+        plan = plan_subnets(
+            payload.get("network"),
+            subnets,
+            exclude=exclude,
+            max_subnets=current_app.config.get("BATCH_MAX_ITEMS"),
+        )
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    return jsonify(plan)
+
+
+@api_bp.route('/hosts', defaults={"kind": "hosts"})
+@api_bp.route('/subnets', defaults={"kind": "subnets"})
+@api_bp.route('/supernets', defaults={"kind": "supernets"})
+def enumerate_route(kind):
+    """Page through or download the hosts, subnets or supernets of a network.
+
+    Query parameters are ``network``, ``prefix`` (the subnet prefix length,
+    or the shortest supernet), ``limit`` and either ``cursor`` (a
+    ``next_cursor`` from an earlier page) or ``offset`` to start from. With
+    ``format=csv`` or ``format=ndjson`` up to ``limit`` items are streamed
+    (default and cap ``BATCH_MAX_ITEMS``) instead of returning a JSON page.
+    """
+    if check_rate_limit():
+        return jsonify(error="Too many requests. Please try again later."), 429
+
+    output_format = request.args.get("format", "json")
+    if output_format != "json" and output_format not in DOWNLOAD_FORMATS:
+        return jsonify(error="'format' must be json, csv or ndjson."), 400
+    try:
+        sequence = enumerate_network(kind, request.args.get("network"), request.args.get("prefix"))
+        cursor = request.args.get("cursor")
+        start = sequence.index(cursor) if cursor else _non_negative_int("offset", 0)
+        if output_format == "json":
+            limit = min(_non_negative_int("limit", ENUMERATION_PAGE_SIZE), ENUMERATION_MAX_PAGE_SIZE)
+        else:
+            max_items = current_app.config.get("BATCH_MAX_ITEMS") or sequence.count
+            limit = min(_non_negative_int("limit", max_items), max_items)
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+
+    stop = min(start + limit, sequence.count)
+    next_cursor = sequence[stop] if stop < sequence.count else None
+    headers = {"X-Total-Count": str(sequence.count)}
+    if next_cursor is not None:
+        args = {key: value for key, value in request.args.items() if key not in {"cursor", "offset"}}
+        headers["Link"] = f'<{url_for(request.endpoint, kind=kind, cursor=next_cursor, **args)}>; rel="next"'
+
+    if output_format == "json":
+        page = {
+            "kind": kind,
+            "network": sequence.network.cidr,
+            "total": sequence.count,
+            "offset": start,
+            "items": sequence[start:stop],
+            "next_cursor": next_cursor,
+        }
+        return jsonify(page), 200, headers
+
+    headers["Content-Disposition"] = f"attachment; filename=ipcal-{kind}.{output_format}"
+    body = iter_download(sequence, start, stop, output_format)
+    return Response(stream_with_context(body), mimetype=_DOWNLOAD_MIMETYPES[output_format], headers=headers)
+
+
+def _non_negative_int(name: str, default: int | None) -> int | None:
+    value = request.args.get(name)
+    if value is None or value == "":
+        return default
+    if not value.isascii() or not value.isdigit():
+        raise ValueError(f"'{name}' must be a non-negative integer.")
+    return int(value)
+
+
+@api_bp.route('/scan', methods=['POST'])
+def scan_route():
+    """Stream the lines of an uploaded log that contain addresses in the given networks.
+
+    The log is a multipart ``log`` file or the raw request body. Networks are
+    ``cidr[,label]`` lines in the ``networks`` form or query field; without
+    them the configured prefix index is used.
+    """
+    if check_rate_limit():
+        return jsonify(error="Too many requests. Please try again later."), 429
+
+    max_items = current_app.config.get("BATCH_MAX_ITEMS")
+    networks = request.form.get("networks") or request.args.get("networks")
+    try:
+        if networks:
+            lines = networks.splitlines()
+            if max_items is not None and len(lines) > max_items:
+                raise ValueError(f"Scans are limited to {max_items} networks.")
+            index = PrefixIndex.from_lines(lines)
+        else:
+            index = current_app.extensions.get("prefix_index")
+            if index is None:
+                raise ValueError("Provide 'networks' or configure a prefix index.")
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+
+    upload = request.files.get("log")
+    max_length = current_app.config.get("MAX_CONTENT_LENGTH")
+    # The scanner memory-maps its input, so the upload is spooled to disk
+    # first; chunked bodies have no declared length, so the limit is checked here.
+    with tempfile.NamedTemporaryFile(prefix="ipcal-scan-", delete=False) as handle:
+        try:
+            complete = _spool(upload.stream if upload else request.stream, handle, max_length)
+        except BaseException:
+            handle.close()
+            os.unlink(handle.name)
+            raise
+    if not complete:
+        os.unlink(handle.name)
+        return jsonify(error="Request body is too large."), 413
+
+    emit_lines = request.args.get("lines", "true").lower() not in {"0", "false", "no"}
+    results = scan_log(handle.name, index, emit_lines=emit_lines, max_lines=max_items)
+    response = Response(stream_with_context(_removing(handle.name, iter_ndjson(results))), mimetype=NDJSON_MIMETYPE)
+    # Covers responses closed before streaming started.
+    response.call_on_close(lambda: _remove(handle.name))
+    return response
+
+
+def _spool(source, target, max_length: int | None) -> bool:
+    """Copy ``source`` to ``target``; return False once more than ``max_length`` bytes arrive."""
+    copied = 0
+    while True:
+        chunk = source.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return True
+        copied += len(chunk)
+        if max_length and copied > max_length:
+            return False
+        target.write(chunk)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _removing(path: str, lines):
+    try:
+        yield from lines
+    finally:
+        _remove(path)
+
+
+@api_bp.route('/cache', methods=['GET'])
+def cache_stats_route():
+    """Return hit, miss and eviction counters for the result caches."""
+    return jsonify(current_app.extensions["calculation_cache"].stats())
+
+
+def _ipam_response(operation, status: int = 200):
+    """Run ``operation(store)`` on the pool store and turn its result or error into a response."""
+    if check_rate_limit():
+        return jsonify(error="Too many requests. Please try again later."), 429
+
+    store = current_app.extensions.get("ipam")
+    if store is None:
+        return jsonify(error="No address pool store is configured."), 503
+    try:
+        result = operation(store)
+    except PoolNotFoundError as exc:
+        return jsonify(error=str(exc)), 404
+    except PoolConflictError as exc:
+        return jsonify(error=str(exc)), 409
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    except sqlite3.OperationalError as exc:
+        logger.warning("Address pool store is unavailable: %s", exc)
+        return jsonify(error="The address pool store is busy. Please try again."), 503
+    if result is None:
+        return "", 204
+    return jsonify(result), status
+
+
+def _json_object() -> dict:
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise ValueError("Request body must be a JSON object.")
+    return payload
+
+
+@api_bp.route('/pools', methods=['GET'])
+def list_pools_route():
+    """List the address pools with their utilisation."""
+    return _ipam_response(lambda store: {"pools": store.pools()})
+
+
+@api_bp.route('/pools', methods=['POST'])
+def create_pool_route():
+    """Create a pool from ``{"name": ..., "network": ...}``."""
+
+    def create(store):
+        payload = _json_object()
+        return store.create_pool(payload.get("name"), payload.get("network"))
+
+    return _ipam_response(create, 201)
+
+
+@api_bp.route('/pools/<name>', methods=['GET'])
+def pool_route(name):
+    """Return the utilisation of one pool."""
+    return _ipam_response(lambda store: store.pool(name))
+
+
+@api_bp.route('/pools/<name>', methods=['DELETE'])
+def delete_pool_route(name):
+    """Delete a pool that has no allocations."""
+    return _ipam_response(lambda store: store.delete_pool(name))
+
+
+@api_bp.route('/pools/<name>/allocations', methods=['GET'])
+def allocations_route(name):
+    """Page through the allocations of a pool by address; ``after`` is the last network seen."""
+
+    def page(store):
+        limit = min(_non_negative_int("limit", ENUMERATION_PAGE_SIZE), ENUMERATION_MAX_PAGE_SIZE)
+        return {"allocations": store.allocations(name, request.args.get("after"), limit)}
+
+    return _ipam_response(page)
+
+
+@api_bp.route('/pools/<name>/allocations', methods=['POST'])
+def allocate_route(name):
+    """Allocate the next free block of ``{"prefix": ..., "label": ...}`` from a pool."""
+
+    def allocate(store):
+        payload = _json_object()
+        return store.allocate(name, payload.get("prefix"), payload.get("label"))
+
+    return _ipam_response(allocate, 201)
+
+
+@api_bp.route('/pools/<name>/allocations/<address>/<prefix>', methods=['DELETE'])
+def release_route(name, address, prefix):
+    """Release an allocated network back to its pool."""
+    return _ipam_response(lambda store: store.release(name, f"{address}/{prefix}"))
@@ -0,0 +1,362 @@
+"""ASGI entry point serving the calculator on an asyncio event loop.
+
+Run with ``uvicorn --factory app.asgi:create_asgi_app`` or through gunicorn
+with ``-k uvicorn.workers.UvicornWorker 'app.asgi:create_asgi_app()'``.
+
+``POST /api/v1/calculate`` is handled natively: the body is parsed as it
+arrives, chunks of items are computed in a bounded process pool and results
+are streamed back in input order. A request keeps at most
+``CHUNKS_PER_REQUEST`` chunks in flight and stops reading its body until the
+oldest one has been sent, so a slow or huge upload only costs a coroutine.
+When every executor slot is taken, new batch requests get ``503`` with
+``Retry-After`` while running ones wait for a free slot.
+
+Every other route is served by the Flask app from ``create_app``: the body
+is read on the event loop, then the WSGI call runs in a thread and its
+response is streamed back through a small bounded queue.
+"""
+
+import asyncio
+import io
+import json
+import multiprocessing
+import sys
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+from . import create_app
+from .api import NDJSON_MIMETYPE
+from .batch import BATCH_CHUNK_SIZE, JSONItemParser
+from .cli import process_chunk
+from .rate_limit import client_key
+
+BATCH_PATH = "/api/v1/calculate"
+CHUNKS_PER_REQUEST = 2
+_WSGI_QUEUE_SIZE = 8
+
+
+class _ClientDisconnected(Exception):
+    pass
+
+
+def _header_map(scope: dict) -> dict[str, str]:
+    headers: dict[str, str] = {}
+    for name, value in scope.get("headers", []):
+        name, value = name.decode("latin-1").lower(), value.decode("latin-1")
+        headers[name] = f"{headers[name]},{value}" if name in headers else value
+    return headers
+
+
+def build_environ(scope: dict, body: bytes) -> dict:
+    """Build a WSGI environ for an ASGI HTTP scope and a fully read body."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    root_path = scope.get("root_path", "")
+    path = scope["path"]
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root_path.encode("utf-8").decode("latin-1"),
+        "PATH_INFO": path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name, value = name.decode("latin-1").lower(), value.decode("latin-1")
+        if name == "content-type":
+            key = "CONTENT_TYPE"
+        elif name == "content-length":
+            continue
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        if key in environ:
+            separator = "; " if key == "HTTP_COOKIE" else ","
+            value = environ[key] + separator + value
+        environ[key] = value
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+
+class AsgiApp:
+    """ASGI application wrapping a Flask app and a bounded batch executor."""
+
+    def __init__(
+        self,
+        flask_app,
+        executor: Executor | None,
+        max_pending: int,
+        chunk_size: int = BATCH_CHUNK_SIZE,
+        workers: int = 1,
+    ):
+        self.flask_app = flask_app
+        self.max_pending = max_pending
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self._executor = executor
+        self._slots: asyncio.Semaphore | None = None
+
+    @property
+    def executor(self) -> Executor:
+        """The batch executor, created on first use so a preloading master never starts one."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # Forking a process that already runs an event loop and threads is unsafe.
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        """Executor slots shared by all batch requests on this event loop."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self._slots
+
+    async def __call__(self, scope: dict, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            if scope["path"] == BATCH_PATH and scope["method"] == "POST":
+                await self._batch(scope, receive, send)
+            else:
+                await self._wsgi(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1000})
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _send_json(send, status: int, payload: dict, headers: list | None = None) -> None:
+        body = json.dumps(payload).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                *(headers or []),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def _rate_limited(self, scope: dict, headers: dict[str, str]) -> bool:
+        config = self.flask_app.config
+        if config.get("RATE_LIMIT_DISABLED", False):
+            return False
+        remote_addr = (scope.get("client") or (None,))[0]
+        key = client_key(headers.get("x-forwarded-for"), remote_addr, config.get("RATE_LIMIT_TRUSTED_PROXIES", 0))
+        return self.flask_app.extensions["rate_limiter"].hit(key, config.get("RATE_LIMIT_PER_MINUTE", 60))
+
+    async def _batch(self, scope: dict, receive, send) -> None:
+        headers = _header_map(scope)
+        if self._rate_limited(scope, headers):
+            await self._send_json(send, 429, {"error": "Too many requests. Please try again later."})
+            return
+        max_length = self.flask_app.config.get("MAX_CONTENT_LENGTH")
+        length = headers.get("content-length", "")
+        if max_length and length.isdigit() and int(length) > max_length:
+            await self._send_json(send, 413, {"error": "Request body is too large."})
+            return
+        if self.slots.locked():
+            await self._send_json(
+                send, 503, {"error": "Server is busy. Please try again shortly."}, [(b"retry-after", b"1")]
+            )
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", NDJSON_MIMETYPE.encode())],
+        })
+        max_items = self.flask_app.config.get("BATCH_MAX_ITEMS")
+        in_flight: deque = deque()
+        chunk: list = []
+        start = count = 0
+        try:
+            async for items in self._iter_body_items(receive):
+                for item in items:
+                    if max_items is not None and count >= max_items:
+                        await self._submit(in_flight, start, chunk, send)
+                        while in_flight:
+                            await self._send_next(in_flight, send)
+                        error = {"index": count, "error": f"Batch limit of {max_items} items exceeded."}
+                        await self._send_body(send, json.dumps(error, separators=(",", ":")) + "\n")
+                        await send({"type": "http.response.body", "body": b""})
+                        return
+                    chunk.append(item)
+                    count += 1
+                    if len(chunk) >= self.chunk_size:
+                        await self._submit(in_flight, start, chunk, send)
+                        start, chunk = count, []
+            await self._submit(in_flight, start, chunk, send)
+            while in_flight:
+                await self._send_next(in_flight, send)
+            await send({"type": "http.response.body", "body": b""})
+        except _ClientDisconnected:
+            pass
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    async def _iter_body_items(self, receive):
+        parser = JSONItemParser()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise _ClientDisconnected()
+            items = parser.feed(message.get("body", b""))
+            if not message.get("more_body", False):
+                yield items + parser.close()
+                return
+            if items:
+                yield items
+
+    async def _submit(self, in_flight: deque, start: int, chunk: list, send) -> None:
+        if not chunk:
+            return
+        while len(in_flight) >= CHUNKS_PER_REQUEST:
+            await self._send_next(in_flight, send)
+        await self.slots.acquire()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor, process_chunk, (start, chunk, "ndjson")
+            )
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        in_flight.append(future)
+
+    async def _send_next(self, in_flight: deque, send) -> None:
+        text, _ = await in_flight.popleft()
+        await self._send_body(send, text)
+
+    @staticmethod
+    async def _send_body(send, text: str) -> None:
+        await send({"type": "http.response.body", "body": text.encode(), "more_body": True})
+
+    async def _wsgi(self, scope: dict, receive, send) -> None:
+        body = bytearray()
+        max_length = self.flask_app.config.get("MAX_CONTENT_LENGTH")
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if max_length and len(body) > max_length:
+                await self._send_json(send, 413, {"error": "Request body is too large."})
+                return
+            if not message.get("more_body", False):
+                break
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=_WSGI_QUEUE_SIZE)
+        abandoned = threading.Event()
+        worker = loop.run_in_executor(None, self._run_wsgi, build_environ(scope, bytes(body)), queue, loop, abandoned)
+        error = None
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                if error is None:
+                    try:
+                        await send(message)
+                    except Exception as exc:
+                        # Keep draining so the WSGI thread can finish and close its response.
+                        error = exc
+        except asyncio.CancelledError:
+            abandoned.set()
+            while not queue.empty():
+                queue.get_nowait()
+            raise
+        await worker
+        if error is not None:
+            raise error
+
+    def _run_wsgi(self, environ: dict, queue: asyncio.Queue, loop, abandoned: threading.Event) -> None:
+        """Run the Flask app in a worker thread, passing ASGI messages to ``queue``."""
+        state = {"start": None, "sent": False}
+
+        def put(message) -> None:
+            if abandoned.is_set():
+                raise _ClientDisconnected()
+            asyncio.run_coroutine_threadsafe(queue.put(message), loop).result()
+
+        def write(data: bytes) -> None:
+            if not state["sent"]:
+                put(state["start"])
+                state["sent"] = True
+            if data:
+                put({"type": "http.response.body", "body": data, "more_body": True})
+
+        def start_response(status: str, headers: list, exc_info=None):
+            if exc_info and state["sent"]:
+                raise exc_info[1].with_traceback(exc_info[2])
+            state["start"] = {
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+            }
+            return write
+
+        try:
+            result = self.flask_app(environ, start_response)
+            try:
+                for data in result:
+                    write(data)
+            finally:
+                close = getattr(result, "close", None)
+                if close is not None:
+                    close()
+            write(b"")
+            put({"type": "http.response.body", "body": b""})
+        except _ClientDisconnected:
+            return
+        finally:
+            if not abandoned.is_set():
+                put(None)
+
+
+def create_asgi_app(flask_app=None, executor: Executor | None = None) -> AsgiApp:
+    """Create the ASGI application.
+
+    Args:
+        flask_app: App from ``create_app``; created from the environment if omitted.
+        executor: Executor for batch chunks; defaults to a process pool of
+            ``ASGI_BATCH_WORKERS`` workers started on first use.
+
+    Returns:
+        AsgiApp: The ASGI callable.
+    """
+    flask_app = flask_app or create_app()
+    return AsgiApp(
+        flask_app,
+        executor,
+        max_pending=flask_app.config["ASGI_MAX_PENDING_CHUNKS"],
+        workers=flask_app.config["ASGI_BATCH_WORKERS"],
+    )
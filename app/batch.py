@@ -0,0 +1,359 @@
+"""Batch calculation helpers for JSON array and NDJSON inputs."""
+
+import codecs
+import json
+import sys
+from collections.abc import Iterable, Iterator
+from typing import BinaryIO
+
+from .cache import CalculationCache
+from .results import parse_calculation
+from .validation import validate_raw_input
+from .vectorized import calculate_ipv4_columns, calculate_ipv6_columns
+
+READ_CHUNK_SIZE = 64 * 1024
+BATCH_CHUNK_SIZE = 1024
+# Longest single item (NDJSON line or array element), in characters.
+MAX_ITEM_SIZE = 64 * 1024
+_WHITESPACE = " \t\r\n"
+_NUMBER_CHARS = "0123456789+-.eE"
+
+
+def calculate_entry(
+    ip_address: str | None, network_input: str | None, cache: CalculationCache | None = None
+) -> dict:
+    """Validate one IP/network pair and return its IP and network details.
+
+    Args:
+        ip_address (str | None): IPv4 or IPv6 address.
+        network_input (str | None): CIDR prefix length or netmask.
+        cache (CalculationCache | None): Optional result cache.
+
+    Returns:
+        dict: ``{"ip": ..., "network": ...}`` with the calculation results;
+        the nested dictionaries are read-only.
+
+    Raises:
+        ValueError: If the input is invalid.
+    """
+    if cache is not None:
+        return cache.parse(ip_address, network_input).as_dict()
+    return parse_calculation(ip_address, network_input).as_dict()
+
+
+def normalize_item(item) -> tuple[str | None, str | None]:
+    """Return an ``(ip, network)`` pair from a batch item.
+
+    Items may be objects (``{"ip": ..., "network": ...}``), two-element
+    arrays, or ``"address/network"`` strings.
+    """
+    if isinstance(item, dict):
+        ip_address = item.get("ip", item.get("ip-address"))
+        network_input = item.get("network")
+    elif isinstance(item, (list, tuple)) and len(item) == 2:
+        ip_address, network_input = item
+    elif isinstance(item, str) and "/" in item:
+        ip_address, _, network_input = item.partition("/")
+    else:
+        raise ValueError("Each item must be an object, an [ip, network] pair or an 'ip/network' string.")
+
+    if not isinstance(ip_address, (str, type(None))) or not isinstance(network_input, (str, int, type(None))):
+        raise ValueError("IP address and network input must be strings.")
+    if isinstance(network_input, int) and not isinstance(network_input, bool):
+        network_input = str(network_input)
+    return ip_address, network_input
+
+
+def iter_fields(paths: Iterable[str], field: int) -> Iterator[str]:
+    """Yield field ``field`` of each line of text files (``-`` for stdin).
+
+    Fields are split on commas and whitespace, like flow logs and CSV
+    exports. Lines starting with ``#`` and lines with too few fields are
+    skipped.
+    """
+    for path in paths:
+        handle = sys.stdin.buffer if path == "-" else open(path, "rb")
+        try:
+            for line in handle:
+                fields = line.decode("utf-8", errors="replace").replace(",", " ").split()
+                if len(fields) > field and not fields[0].startswith("#"):
+                    yield fields[field]
+        finally:
+            if handle is not sys.stdin.buffer:
+                handle.close()
+
+
+def iter_json_items(
+    stream: BinaryIO, chunk_size: int = READ_CHUNK_SIZE, max_item_size: int = MAX_ITEM_SIZE
+) -> Iterator:
+    """Yield decoded items from a JSON array or NDJSON byte stream.
+
+    The stream is read incrementally so memory use does not grow with the
+    number of items, and items longer than ``max_item_size`` characters are
+    rejected so it does not grow with one item either. Undecodable or
+    oversized NDJSON lines are yielded as ``ValueError`` instances so the
+    caller can report them inline; a malformed JSON array yields one
+    ``ValueError`` and stops, since it cannot be resynchronised.
+    """
+    parser = JSONItemParser(max_item_size)
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+class JSONItemParser:
+    """Push parser for JSON array or NDJSON bodies that arrive in pieces.
+
+    ``feed`` accepts the next bytes and returns the items completed so far;
+    ``close`` signals the end of the body. Errors are returned as
+    ``ValueError`` items, as described in ``iter_json_items``.
+    """
+
+    def __init__(self, max_item_size: int = MAX_ITEM_SIZE):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._json = json.JSONDecoder()
+        self._max_item_size = max_item_size
+        self._text = ""
+        self._pos = 0
+        # Where the search for the end of the pending NDJSON line resumes.
+        self._scan = 0
+        self._skipping = False
+        self._mode = None
+        self._expect_value = True
+        self._first = True
+        self._done = False
+
+    def feed(self, data: bytes) -> list:
+        """Add the next piece of the body; return the items it completes."""
+        return self._drain(self._decoder.decode(data), final=False)
+
+    def close(self) -> list:
+        """Finish the body; return the remaining items and any error."""
+        return self._drain(self._decoder.decode(b"", final=True), final=True)
+
+    def _skip_whitespace(self) -> bool:
+        """Advance past whitespace; return False if the buffer is exhausted."""
+        while self._pos < len(self._text) and self._text[self._pos] in _WHITESPACE:
+            self._pos += 1
+        return self._pos < len(self._text)
+
+    def _drain(self, decoded: str, final: bool) -> list:
+        items: list = []
+        if self._done:
+            return items
+        # Only the pending item is kept, and it is at most ``max_item_size`` long.
+        self._text = self._text[self._pos:] + decoded
+        self._scan = max(self._scan - self._pos, 0)
+        self._pos = 0
+
+        if self._mode is None:
+            if not self._skip_whitespace():
+                return items
+            self._mode = "array" if self._text[self._pos] == "[" else "lines"
+            if self._mode == "array":
+                self._pos += 1
+
+        if self._mode == "lines":
+            self._drain_lines(items, final)
+        else:
+            self._drain_array(items, final)
+        return items
+
+    def _too_long(self) -> ValueError:
+        return ValueError(f"Item is longer than {self._max_item_size} characters.")
+
+    def _drain_lines(self, items: list, final: bool) -> None:
+        while True:
+            newline = self._text.find("\n", max(self._pos, self._scan))
+            if newline != -1:
+                line = self._text[self._pos:newline]
+                self._pos = self._scan = newline + 1
+            elif final and self._pos < len(self._text):
+                line = self._text[self._pos:]
+                self._pos = self._scan = len(self._text)
+            else:
+                if len(self._text) - self._pos > self._max_item_size:
+                    # Drop the line as it arrives and report it once.
+                    if not self._skipping:
+                        items.append(self._too_long())
+                    self._skipping = True
+                    self._pos = len(self._text)
+                self._scan = len(self._text)
+                return
+            if self._skipping:
+                self._skipping = False
+                continue
+            if len(line) > self._max_item_size:
+                items.append(self._too_long())
+                continue
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError as exc:
+                items.append(ValueError(f"Invalid JSON: {exc.msg}."))
+
+    def _drain_array(self, items: list, final: bool) -> None:
+        while True:
+            if not self._skip_whitespace():
+                if final:
+                    self._fail(items, "Invalid JSON: unterminated array.")
+                return
+
+            char = self._text[self._pos]
+            if char == "]" and (self._first or not self._expect_value):
+                self._done = True
+                return
+            if not self._expect_value:
+                if char != ",":
+                    self._fail(items, "Invalid JSON: expected ',' or ']'.")
+                    return
+                self._pos += 1
+                self._expect_value = True
+                continue
+
+            try:
+                value, end = self._json.raw_decode(self._text, self._pos)
+            except json.JSONDecodeError as exc:
+                if len(self._text) - self._pos > self._max_item_size:
+                    self._fail(items, str(self._too_long()))
+                elif final:
+                    self._fail(items, f"Invalid JSON: {exc.msg}.")
+                return
+            if end - self._pos > self._max_item_size:
+                self._fail(items, str(self._too_long()))
+                return
+            if not final and isinstance(value, (int, float)) and not self._text[end:].strip(_NUMBER_CHARS):
+                # A number at the end of the buffer ("23" or "23.") may continue in the next piece.
+                return
+            items.append(value)
+            self._pos = end
+            self._expect_value = False
+            self._first = False
+
+    def _fail(self, items: list, message: str) -> None:
+        items.append(ValueError(message))
+        self._done = True
+
+
+def calculate_batch(
+    items: Iterable, max_items: int | None = None, chunk_size: int = BATCH_CHUNK_SIZE
+) -> Iterator[dict]:
+    """Calculate each batch item, reporting per-item errors inline.
+
+    Items are buffered in chunks of ``chunk_size`` and computed with the
+    vectorised engine, so memory stays bounded by the chunk size.
+
+    Args:
+        items (Iterable): Decoded batch items (see ``normalize_item``).
+        max_items (int | None): Stop after this many items.
+        chunk_size (int): Number of items computed together.
+
+    Yields:
+        dict: One result per item, keyed by its zero-based ``index``.
+    """
+    chunk = []
+    for index, item in enumerate(items):
+        if max_items is not None and index >= max_items:
+            yield from _calculate_chunk(chunk)
+            yield {"index": index, "error": f"Batch limit of {max_items} items exceeded."}
+            return
+        chunk.append((index, item))
+        if len(chunk) >= chunk_size:
+            yield from _calculate_chunk(chunk)
+            chunk = []
+    yield from _calculate_chunk(chunk)
+
+
+def _calculate_chunk(chunk: list[tuple[int, object]]) -> list[dict]:
+    """Calculate one chunk of ``(index, item)`` pairs in input order."""
+    results: list[dict | None] = [None] * len(chunk)
+    rows: dict[int, list[tuple[int, int, str, str]]] = {4: [], 6: []}
+
+    for position, (index, item) in enumerate(chunk):
+        try:
+            if isinstance(item, ValueError):
+                raise item
+            ip_address, network_input = normalize_item(item)
+            ip_address = validate_raw_input(ip_address, "IP address")
+            network_input = validate_raw_input(network_input, "Network input", allow_slash=True)
+        except ValueError as exc:
+            results[position] = {"index": index, "error": str(exc)}
+            continue
+        version = 6 if ":" in ip_address else 4
+        rows[version].append((position, index, ip_address, network_input))
+
+    for version, version_rows in rows.items():
+        if not version_rows:
+            continue
+        engine = calculate_ipv4_columns if version == 4 else calculate_ipv6_columns
+        columns = engine([row[2] for row in version_rows], [row[3] for row in version_rows])
+        for row_number, (position, index, ip_address, network_input) in enumerate(version_rows):
+            if columns.valid[row_number]:
+                results[position] = {
+                    "index": index,
+                    "ip": columns.ip_result(row_number),
+                    "network": columns.network_result(row_number),
+                }
+                continue
+            # The engine only accepts well-formed rows; the scalar path
+            # produces the exact error message for the rest.
+            try:
+                results[position] = {"index": index, **calculate_entry(ip_address, network_input)}
+            except ValueError as exc:
+                results[position] = {"index": index, "error": str(exc)}
+
+    return results
+
+
+def lookup_batch(
+    index, items: Iterable, max_items: int | None = None, chunk_size: int = BATCH_CHUNK_SIZE
+) -> Iterator[dict]:
+    """Classify batch addresses against a ``PrefixIndex``.
+
+    Items may be address strings or objects with an ``ip`` key.
+
+    Yields:
+        dict: ``{"index", "ip", "match"}`` per item, or ``{"index", "error"}``.
+    """
+    chunk: list[tuple[int, str]] = []
+
+    def flush() -> Iterator[dict]:
+        matches = index.lookup_many([address for _, address in chunk])
+        for (item_index, address), match in zip(chunk, matches):
+            if isinstance(match, ValueError):
+                yield {"index": item_index, "error": str(match)}
+            else:
+                yield {"index": item_index, "ip": address, "match": match}
+        chunk.clear()
+
+    for item_index, item in enumerate(items):
+        if max_items is not None and item_index >= max_items:
+            yield from flush()
+            yield {"index": item_index, "error": f"Batch limit of {max_items} items exceeded."}
+            return
+        try:
+            if isinstance(item, ValueError):
+                raise item
+            address = item.get("ip") if isinstance(item, dict) else item
+            if not isinstance(address, (str, type(None))):
+                raise ValueError("IP address must be a string.")
+            address = validate_raw_input(address, "IP address")
+        except ValueError as exc:
+            yield from flush()
+            yield {"index": item_index, "error": str(exc)}
+            continue
+        chunk.append((item_index, address))
+        if len(chunk) >= chunk_size:
+            yield from flush()
+    yield from flush()
+
+
+def iter_ndjson(results: Iterable[dict]) -> Iterator[str]:
+    """Serialise results as newline-delimited JSON."""
+    for result in results:
+        yield json.dumps(result, separators=(",", ":")) + "\n"
@@ -0,0 +1,172 @@
+"""Memoised calculation results keyed by normalised addresses and networks.
+
+Addresses are cached by ``(version, integer)`` and networks by
+``(version, network integer, prefix length)``, so ``10.0.0.5/24`` and
+``10.0.0.9/255.255.255.0`` share one network entry and ``2001:DB8::1`` and
+``2001:db8:0::1`` share one address entry. Entries are the ``AddressResult``
+and ``NetworkResult`` objects from ``results.py``; their lazily computed
+fields and regex are shared by every request that hits the entry. Inputs
+that cannot be parsed are passed straight to the underlying function.
+
+Dictionary results are ``FrozenDict`` instances shared between callers;
+take a ``dict(result)`` copy before modifying one.
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+from .calculations import (
+    calculate_ipv4,
+    calculate_ipv6,
+    calculate_ipv4_network_and_subnet,
+    calculate_ipv6_network_and_subnet,
+)
+from .ip_to_regex import ip_to_regex
+from .results import AddressResult, Calculation, FrozenDict, NetworkResult, parse_input
+from .validation import parse_ip_address, parse_prefix
+
+DEFAULT_CACHE_SIZE = 4096
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU cache with hit/miss/eviction counters."""
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], object]):
+        """Return the cached value for ``key``, computing and storing it on a miss.
+
+        Dictionaries are stored as ``FrozenDict``; other values should be immutable.
+        """
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        value = compute()
+        if isinstance(value, dict):
+            value = FrozenDict(value)
+        if self.maxsize <= 0:
+            return value
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CalculationCache:
+    """Caches for address and network results."""
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.addresses = LRUCache(maxsize)
+        self.networks = LRUCache(maxsize)
+
+    def address(self, ip) -> AddressResult:
+        """Return the shared ``AddressResult`` for a parsed address."""
+        if getattr(ip, "scope_id", None):
+            # The scope ID is part of the output but not of the integer key.
+            return AddressResult(ip)
+        return self.addresses.get_or_compute((ip.version, int(ip)), lambda: AddressResult(ip))
+
+    def network(self, version: int, address: int, prefixlen: int) -> NetworkResult:
+        """Return the shared ``NetworkResult`` containing ``address``."""
+        network = NetworkResult.from_address(version, address, prefixlen)
+        return self.networks.get_or_compute(network.key, lambda: network)
+
+    def parse(self, ip_address: str | None, network_input: str | None) -> Calculation:
+        """Like ``results.parse_calculation``, reusing cached results.
+
+        Raises:
+            ValueError: If the input is invalid.
+        """
+        return self.calculation(*parse_input(ip_address, network_input))
+
+    def calculation(self, ip, prefixlen: int) -> Calculation:
+        """Return a ``Calculation`` for an address parsed by ``results.parse_input``."""
+        return Calculation(self.address(ip), self.network(ip.version, int(ip), prefixlen))
+
+    def _parse_address(self, ip_address: str, version: int):
+        try:
+            ip = parse_ip_address(ip_address)
+        except ValueError:
+            return None
+        return ip if ip.version == version else None
+
+    def calculate_ipv4(self, ip_address: str) -> dict:
+        ip = self._parse_address(ip_address, 4)
+        if ip is None:
+            return calculate_ipv4(ip_address)
+        return self.address(ip).as_dict()
+
+    def calculate_ipv6(self, ip_address: str) -> dict:
+        ip = self._parse_address(ip_address, 6)
+        if ip is None:
+            return calculate_ipv6(ip_address)
+        return self.address(ip).as_dict()
+
+    def _network_dict(self, ip_address: str, network_input: str, version: int, fallback) -> dict:
+        ip = self._parse_address(ip_address, version)
+        try:
+            prefixlen = parse_prefix(network_input, version) if ip is not None else None
+        except ValueError:
+            prefixlen = None
+        if prefixlen is None:
+            return fallback(ip_address, network_input)
+        return self.network(version, int(ip), prefixlen).as_dict()
+
+    def calculate_ipv4_network_and_subnet(self, ip_address: str, network_input: str) -> dict:
+        return self._network_dict(ip_address, network_input, 4, calculate_ipv4_network_and_subnet)
+
+    def calculate_ipv6_network_and_subnet(self, ip_address: str, network_input: str) -> dict:
+        return self._network_dict(ip_address, network_input, 6, calculate_ipv6_network_and_subnet)
+
+    def ip_to_regex(self, ip_cidr: str) -> str:
+        address_text, _, prefix_text = ip_cidr.partition("/")
+        try:
+            ip = parse_ip_address(address_text)
+            prefixlen = parse_prefix(prefix_text, ip.version)
+        except ValueError:
+            return ip_to_regex(ip_cidr)
+        return self.network(ip.version, int(ip), prefixlen).regex
+
+    def clear(self) -> None:
+        for cache in (self.addresses, self.networks):
+            cache.clear()
+
+    def stats(self) -> dict:
+        return {
+            "addresses": self.addresses.stats(),
+            "networks": self.networks.stats(),
+        }
@@ -1,7 +1,117 @@
-"""IP calculation utilities for IPv4 and IPv6."""
+"""IP calculation utilities for IPv4 and IPv6.
+
+The network functions answer canonical input from tables built at import
+time: there are only 33 IPv4 and 129 IPv6 prefix lengths, so every mask,
+wildcard, mask string and host count is looked up rather than computed.
+Dotted-quad and hextet strings are parsed straight to integers with
+``inet_pton`` and the results formatted from them (``inet_ntoa``, and a
+format string per pattern of zero hextets), without building ``ipaddress``
+objects.
+Anything the fast path does not recognise exactly (netmasks with leading
+zeros, embedded IPv4, scope IDs, errors, ...) is handed to the
+``ipaddress`` implementation, so results and error messages are identical.
+"""
 
 import ipaddress
 import re
+import socket
+import struct
+from itertools import product
+
+_IPV4_ALL_ONES = 0xFFFF_FFFF
+_IPV6_ALL_ONES = (1 << 128) - 1
+_IPV6_CHARACTERS = frozenset("0123456789abcdefABCDEF:")
+_IPV6_HEXTETS = struct.Struct(">8H").unpack
+_IPV6_UNCOMPRESSED = ":".join(["%x"] * 8)
+_IPV4_PACK = struct.Struct(">I").pack
+
+
+def _ipv6_format(nonzero: tuple[bool, ...]) -> tuple[str, int, int]:
+    """Return the format string and the ``[start, end)`` hextets it drops for one zero pattern.
+
+    The leftmost of the longest runs of two or more zero hextets becomes ``::``.
+    """
+    start, end = 0, 0
+    for first in range(8):
+        last = first
+        while last < 8 and not nonzero[last]:
+            last += 1
+        if last - first >= 2 and last - first > end - start:
+            start, end = first, last
+    if start == end:
+        return _IPV6_UNCOMPRESSED, 8, 8
+    return ":".join(["%x"] * start) + "::" + ":".join(["%x"] * (8 - end)), start, end
+
+
+# Indexed by which of the eight hextets are non-zero.
+_IPV6_FORMATS = {nonzero: _ipv6_format(nonzero) for nonzero in product((False, True), repeat=8)}
+
+
+def format_ipv4(value: int) -> str:
+    """Format an integer as a dotted-quad string."""
+    return socket.inet_ntoa(_IPV4_PACK(value))
+
+
+def format_ipv6(value: int) -> str:
+    """Format an integer as a compressed IPv6 string, like ``ipaddress``."""
+    if value >> 32 == 0xFFFF:
+        # IPv4-mapped formatting differs between Python versions.
+        return str(ipaddress.IPv6Address(value))
+    hextets = _IPV6_HEXTETS(value.to_bytes(16, "big"))
+    if hextets.count(0) < 2:
+        return _IPV6_UNCOMPRESSED % hextets
+    template, start, end = _IPV6_FORMATS[tuple(map(bool, hextets))]
+    return template % (hextets[:start] + hextets[end:])
+
+
+#: Address width in bits and integer formatter of each IP version.
+ADDRESS_BITS = {4: 32, 6: 128}
+FORMATTERS = {4: format_ipv4, 6: format_ipv6}
+
+
+IPV4_NETMASKS = tuple((_IPV4_ALL_ONES << (32 - prefix)) & _IPV4_ALL_ONES for prefix in range(33))
+IPV4_HOSTMASKS = tuple(mask ^ _IPV4_ALL_ONES for mask in IPV4_NETMASKS)
+IPV6_NETMASKS = tuple((_IPV6_ALL_ONES << (128 - prefix)) & _IPV6_ALL_ONES for prefix in range(129))
+IPV6_HOSTMASKS = tuple(mask ^ _IPV6_ALL_ONES for mask in IPV6_NETMASKS)
+IPV4_NETMASK_STRINGS = tuple(format_ipv4(mask) for mask in IPV4_NETMASKS)
+IPV4_WILDCARD_STRINGS = tuple(format_ipv4(mask) for mask in IPV4_HOSTMASKS)
+IPV6_NETMASK_STRINGS = tuple(format_ipv6(mask) for mask in IPV6_NETMASKS)
+IPV4_TOTAL_HOSTS = tuple(1 if prefix == 32 else 2 if prefix == 31 else (1 << (32 - prefix)) - 2 for prefix in range(33))
+IPV6_TOTAL_HOSTS = tuple(1 if prefix == 128 else 2 if prefix == 127 else 1 << (128 - prefix) for prefix in range(129))
+# Hostmasks first: ipaddress tries the netmask reading first, so it wins for 0.0.0.0 and 255.255.255.255.
+IPV4_MASK_PREFIXES = {
+    **{mask: prefix for prefix, mask in enumerate(IPV4_WILDCARD_STRINGS)},
+    **{mask: prefix for prefix, mask in enumerate(IPV4_NETMASK_STRINGS)},
+}
+_IPV4_NETWORK_INPUTS = {**IPV4_MASK_PREFIXES, **{str(prefix): prefix for prefix in range(33)}}
+_IPV6_NETWORK_INPUTS = {str(prefix): prefix for prefix in range(129)}
+
+
+def parse_ipv4_int(text: str) -> int | None:
+    """Return a canonical dotted-quad string as an integer, or ``None``.
+
+    Like ``ipaddress``, ``inet_pton`` rejects leading zeros, signs, spaces
+    and shortened forms.
+    """
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET, text), "big")
+    except (OSError, ValueError):
+        return None
+
+
+def parse_ipv6_int(text: str) -> int | None:
+    """Return an IPv6 string of hextets (with at most one ``::``) as an integer, or ``None``.
+
+    Embedded IPv4 and scope IDs are not handled and give ``None``. For
+    hextet-only strings ``inet_pton`` accepts exactly what ``ipaddress``
+    does; the agreement tests check this on each platform.
+    """
+    if not _IPV6_CHARACTERS.issuperset(text):
+        return None
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET6, text), "big")
+    except OSError:
+        return None
 
 
 def calculate_ipv4(ip_address: str) -> dict:
@@ -60,6 +170,32 @@ def calculate_ipv4_network_and_subnet(ip_address: str, network_input: str) -> di
     Returns:
         dict: Dictionary containing network and subnet details or error message.
     """
+    prefixlen = _IPV4_NETWORK_INPUTS.get(network_input)
+    address = parse_ipv4_int(ip_address) if prefixlen is not None else None
+    if address is None:
+        return _ipv4_network_and_subnet(ip_address, network_input)
+
+    network = address & IPV4_NETMASKS[prefixlen]
+    broadcast = network | IPV4_HOSTMASKS[prefixlen]
+    network_string, broadcast_string = format_ipv4(network), format_ipv4(broadcast)
+    if prefixlen >= 31:
+        host_min, host_max = network_string, broadcast_string
+    else:
+        host_min, host_max = format_ipv4(network + 1), format_ipv4(broadcast - 1)
+    return {
+        "Network Address": network_string,
+        "Broadcast Address": broadcast_string,
+        "CIDR": str(prefixlen),
+        "Netmask": IPV4_NETMASK_STRINGS[prefixlen],
+        "Wildcard": IPV4_WILDCARD_STRINGS[prefixlen],
+        "HostMin": host_min,
+        "HostMax": host_max,
+        "Total Hosts": IPV4_TOTAL_HOSTS[prefixlen],
+    }
+
+
+def _ipv4_network_and_subnet(ip_address: str, network_input: str) -> dict:
+    """``calculate_ipv4_network_and_subnet`` through ``ipaddress``, for input the fast path does not handle."""
     try:
         if re.match(r"^\d{1,2}$", network_input) and 0 <= int(network_input) <= 32:
             network = ipaddress.IPv4Network(f"{ip_address}/{network_input}", strict=False)
@@ -108,6 +244,31 @@ def calculate_ipv6_network_and_subnet(ip_address: str, network_input: str) -> di
     Returns:
         dict: Dictionary containing network and subnet details or error message.
     """
+    prefixlen = _IPV6_NETWORK_INPUTS.get(network_input)
+    address = parse_ipv6_int(ip_address) if prefixlen is not None else None
+    if address is None:
+        return _ipv6_network_and_subnet(ip_address, network_input)
+
+    network = address & IPV6_NETMASKS[prefixlen]
+    broadcast = network | IPV6_HOSTMASKS[prefixlen]
+    network_string, broadcast_string = format_ipv6(network), format_ipv6(broadcast)
+    if prefixlen >= 127:
+        host_min, host_max = network_string, broadcast_string
+    else:
+        host_min, host_max = format_ipv6(network + 1), format_ipv6(broadcast - 1)
+    return {
+        "Network Address": network_string,
+        "Broadcast Address": broadcast_string,
+        "CIDR": network_input,
+        "Netmask": IPV6_NETMASK_STRINGS[prefixlen],
+        "HostMin": host_min,
+        "HostMax": host_max,
+        "Total Hosts": IPV6_TOTAL_HOSTS[prefixlen],
+    }
+
+
+def _ipv6_network_and_subnet(ip_address: str, network_input: str) -> dict:
+    """``calculate_ipv6_network_and_subnet`` through ``ipaddress``, for input the fast path does not handle."""
     try:
         if re.match(r"^\d{1,3}$", network_input) and 0 <= int(network_input) <= 128:
             network = ipaddress.IPv6Network(f"{ip_address}/{network_input}", strict=False)
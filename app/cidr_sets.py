@@ -0,0 +1,315 @@
+"""Set operations over large CIDR lists.
+
+Each address family is held as sorted, disjoint, non-adjacent half-open
+intervals in two NumPy arrays (``starts``, ``stops``): ``uint64`` for IPv4
+and Python-int ``object`` arrays for IPv6, so the same vectorised code
+handles both. Normalising is a sort plus a running maximum, and union,
+intersection, difference and symmetric difference are one sweep over the
+sorted boundaries of both operands, so every operation is O(n log n).
+Results convert back to the minimal list of CIDR blocks.
+"""
+
+import ipaddress
+from collections.abc import Iterable, Iterator
+
+import numpy as np
+
+from .calculations import ADDRESS_BITS, FORMATTERS
+from .vectorized import parse_ipv4_column
+
+_DTYPES = {4: np.uint64, 6: object}
+_OBJECT_BIT_LENGTH = np.frompyfunc(int.bit_length, 1, 1)
+_OBJECT_POW2 = np.frompyfunc(lambda exponent: 1 << exponent, 1, 1)
+DEFAULT_CHUNK_SIZE = 65536
+_MAX_PENDING_CHUNKS = 16
+
+
+def _empty(version: int) -> tuple[np.ndarray, np.ndarray]:
+    return np.zeros(0, dtype=_DTYPES[version]), np.zeros(0, dtype=_DTYPES[version])
+
+
+def _normalize(starts: np.ndarray, stops: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Sort intervals and merge overlapping or adjacent ones."""
+    if not len(starts):
+        return starts, stops
+    order = np.argsort(starts, kind="stable")
+    starts = starts[order]
+    reach = np.maximum.accumulate(stops[order])
+    new_group = np.ones(len(starts), dtype=bool)
+    new_group[1:] = starts[1:] > reach[:-1]
+    first = np.flatnonzero(new_group)
+    last = np.append(first[1:] - 1, len(starts) - 1)
+    return starts[first], reach[last]
+
+
+def _combine(left, right, keep) -> tuple[np.ndarray, np.ndarray]:
+    """Sweep the boundaries of two normalised interval sets.
+
+    ``keep(in_left, in_right)`` selects which elementary regions survive.
+    """
+    coords = np.concatenate([left[0], left[1], right[0], right[1]])
+    if not len(coords):
+        return left
+    n_left, n_right = len(left[0]), len(right[0])
+    ones_left, ones_right = np.ones(n_left, dtype=np.int8), np.ones(n_right, dtype=np.int8)
+    zeros_left, zeros_right = np.zeros(2 * n_left, dtype=np.int8), np.zeros(2 * n_right, dtype=np.int8)
+    delta_left = np.concatenate([ones_left, -ones_left, zeros_right])
+    delta_right = np.concatenate([zeros_left, ones_right, -ones_right])
+
+    order = np.argsort(coords, kind="stable")
+    coords = coords[order]
+    in_left = np.cumsum(delta_left[order]) > 0
+    in_right = np.cumsum(delta_right[order]) > 0
+    # The state after the last event at a coordinate covers [coord, next coord).
+    last_event = np.append(coords[1:] != coords[:-1], True)
+    coords = coords[last_event]
+    selected = keep(in_left[last_event], in_right[last_event])[:-1]
+    return _normalize(coords[:-1][selected], coords[1:][selected])
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    if values.dtype == object:
+        return _OBJECT_BIT_LENGTH(values).astype(np.int64)
+    # IPv4 values stay below 2**53, so the float exponent is exact.
+    return np.frexp(values.astype(np.float64))[1].astype(np.int64)
+
+
+def _pow2(exponents: np.ndarray, dtype) -> np.ndarray:
+    if dtype == object:
+        return _OBJECT_POW2(exponents.astype(object))
+    return np.left_shift(np.uint64(1), exponents.astype(np.uint64))
+
+
+def _to_blocks(starts: np.ndarray, stops: np.ndarray, bits: int) -> tuple[np.ndarray, np.ndarray]:
+    """Split intervals into minimal aligned blocks; return ``(starts, prefixlens)``."""
+    block_starts, block_prefixes = [], []
+    while len(starts):
+        if starts.dtype == object:
+            alignment = starts & -starts
+        else:
+            alignment = starts & (~starts + np.uint64(1))
+        alignment_bits = np.where(starts == 0, bits, _bit_length(alignment) - 1)
+        size_bits = np.minimum(alignment_bits, _bit_length(stops - starts) - 1)
+        block_starts.append(starts)
+        block_prefixes.append(bits - size_bits)
+        starts = starts + _pow2(size_bits, starts.dtype)
+        remaining = starts < stops
+        starts, stops = starts[remaining], stops[remaining]
+    if not block_starts:
+        return starts, np.zeros(0, dtype=np.int64)
+    block_starts = np.concatenate(block_starts)
+    block_prefixes = np.concatenate(block_prefixes)
+    order = np.argsort(block_starts, kind="stable")
+    return block_starts[order], block_prefixes[order]
+
+
+def _parse_network(token: str) -> tuple[int, int, int]:
+    """Return ``(version, start, stop)`` for a CIDR, address or ``start-end`` range."""
+    if "-" in token:
+        first, _, last = token.partition("-")
+        try:
+            first_ip = ipaddress.ip_address(first.strip())
+            last_ip = ipaddress.ip_address(last.strip())
+        except ValueError as exc:
+            raise ValueError(f"Invalid range: {token!r}") from exc
+        if first_ip.version != last_ip.version or first_ip > last_ip:
+            raise ValueError(f"Invalid range: {token!r}")
+        return first_ip.version, int(first_ip), int(last_ip) + 1
+    try:
+        network = ipaddress.ip_network(token, strict=False)
+    except ValueError as exc:
+        raise ValueError(f"Invalid network: {token!r}") from exc
+    return network.version, int(network.network_address), int(network.broadcast_address) + 1
+
+
+def _parse_chunk(tokens: list[str]) -> dict[int, tuple[np.ndarray, np.ndarray]]:
+    """Parse one chunk of tokens into normalised intervals per family."""
+    fast_addresses, fast_prefixes = [], []
+    slow: dict[int, tuple[list[int], list[int]]] = {4: ([], []), 6: ([], [])}
+    for token in tokens:
+        address, slash, prefix = token.partition("/")
+        short_prefix = prefix.isascii() and prefix.isdigit() and len(prefix) <= 2
+        if ":" in token or "-" in token or (slash and not short_prefix):
+            version, start, stop = _parse_network(token)
+            slow[version][0].append(start)
+            slow[version][1].append(stop)
+            continue
+        fast_addresses.append(address)
+        fast_prefixes.append(int(prefix) if prefix else 32)
+
+    intervals = {}
+    if fast_addresses:
+        values, valid = parse_ipv4_column(fast_addresses)
+        prefixes = np.array(fast_prefixes, dtype=np.uint64)
+        valid &= prefixes <= 32
+        for row in np.flatnonzero(~valid):
+            # Leading zeros and other unusual spellings get ipaddress semantics.
+            _, start, stop = _parse_network(f"{fast_addresses[row]}/{fast_prefixes[row]}")
+            values[row], prefixes[row] = start, 32 - (stop - start - 1).bit_length()
+        sizes = np.left_shift(np.uint64(1), np.uint64(32) - prefixes)
+        starts = values.astype(np.uint64) & ~(sizes - np.uint64(1))
+        intervals[4] = (starts, starts + sizes)
+    for version, (starts, stops) in slow.items():
+        if not starts:
+            continue
+        extra = (np.array(starts, dtype=_DTYPES[version]), np.array(stops, dtype=_DTYPES[version]))
+        if version in intervals:
+            known = intervals[version]
+            extra = (np.concatenate([known[0], extra[0]]), np.concatenate([known[1], extra[1]]))
+        intervals[version] = extra
+    return {version: _normalize(*pair) for version, pair in intervals.items()}
+
+
+def iter_tokens(lines: Iterable[str]) -> Iterator[str]:
+    """Yield the first field of each non-blank, non-comment line."""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        line = line.split("#", 1)[0].replace(",", " ").strip()
+        if line:
+            yield line.split(None, 1)[0]
+
+
+class CIDRSet:
+    """An immutable set of IPv4 and IPv6 addresses stored as intervals."""
+
+    __slots__ = ("_intervals",)
+
+    def __init__(self, intervals: dict[int, tuple[np.ndarray, np.ndarray]] | None = None):
+        self._intervals = {version: _empty(version) for version in ADDRESS_BITS}
+        self._intervals.update(intervals or {})
+
+    @classmethod
+    def from_iterable(cls, lines: Iterable[str], chunk_size: int = DEFAULT_CHUNK_SIZE) -> "CIDRSet":
+        """Build a set from CIDRs, addresses or ``start-end`` ranges, one per line.
+
+        Lines are consumed in chunks, so files and streams of any size can be
+        passed directly. Text after ``#``, ``,`` or whitespace is ignored.
+
+        Raises:
+            ValueError: If a line is not a valid network, address or range.
+        """
+        pending: dict[int, list[tuple[np.ndarray, np.ndarray]]] = {
+            version: [] for version in ADDRESS_BITS
+        }
+        chunk: list[str] = []
+
+        def flush() -> None:
+            for version, pair in _parse_chunk(chunk).items():
+                pending[version].append(pair)
+                if len(pending[version]) > _MAX_PENDING_CHUNKS:
+                    pending[version] = [_concat_normalize(pending[version])]
+            chunk.clear()
+
+        for token in iter_tokens(lines):
+            chunk.append(token)
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+        return cls({version: _concat_normalize(pairs) for version, pairs in pending.items() if pairs})
+
+    @classmethod
+    def from_ranges(cls, ranges: Iterable[tuple[str, str]]) -> "CIDRSet":
+        """Build a set from inclusive ``(start, end)`` address pairs."""
+        return cls.from_iterable(f"{start}-{end}" for start, end in ranges)
+
+    def _apply(self, other: "CIDRSet", keep) -> "CIDRSet":
+        if not isinstance(other, CIDRSet):
+            return NotImplemented
+        return CIDRSet({
+            version: _combine(self._intervals[version], other._intervals[version], keep)
+            for version in ADDRESS_BITS
+        })
+
+    def __or__(self, other: "CIDRSet") -> "CIDRSet":
+        return self._apply(other, np.logical_or)
+
+    def __and__(self, other: "CIDRSet") -> "CIDRSet":
+        return self._apply(other, np.logical_and)
+
+    def __sub__(self, other: "CIDRSet") -> "CIDRSet":
+        return self._apply(other, lambda left, right: left & ~right)
+
+    def __xor__(self, other: "CIDRSet") -> "CIDRSet":
+        return self._apply(other, np.logical_xor)
+
+    union = __or__
+    intersection = __and__
+    difference = __sub__
+    symmetric_difference = __xor__
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CIDRSet):
+            return NotImplemented
+        return all(
+            np.array_equal(self._intervals[version][0], other._intervals[version][0])
+            and np.array_equal(self._intervals[version][1], other._intervals[version][1])
+            for version in ADDRESS_BITS
+        )
+
+    __hash__ = None
+
+    def __bool__(self) -> bool:
+        return any(len(starts) for starts, _ in self._intervals.values())
+
+    def __contains__(self, address: str) -> bool:
+        ip = ipaddress.ip_address(address)
+        starts, stops = self._intervals[ip.version]
+        value = int(ip)
+        position = int(np.searchsorted(starts, value, side="right")) - 1
+        return position >= 0 and value < stops[position]
+
+    def __repr__(self) -> str:
+        preview = list(self.cidrs())
+        if len(preview) > 4:
+            preview = preview[:4] + ["..."]
+        return f"CIDRSet({preview!r})"
+
+    @property
+    def num_addresses(self) -> int:
+        return sum(int((stops - starts).sum()) for starts, stops in self._intervals.values())
+
+    def intervals(self, version: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return the ``(starts, stops)`` arrays of one family (stops are exclusive)."""
+        return self._intervals[version]
+
+    def ranges(self) -> Iterator[tuple[str, str]]:
+        """Yield inclusive ``(first, last)`` address pairs, IPv4 first."""
+        for version, (starts, stops) in self._intervals.items():
+            formatter = FORMATTERS[version]
+            for start, stop in zip(starts.tolist(), stops.tolist()):
+                yield formatter(start), formatter(stop - 1)
+
+    def cidrs(self) -> Iterator[str]:
+        """Yield the minimal list of CIDR blocks covering the set, IPv4 first."""
+        for version, (starts, stops) in self._intervals.items():
+            formatter = FORMATTERS[version]
+            block_starts, prefixes = _to_blocks(starts, stops, ADDRESS_BITS[version])
+            for start, prefix in zip(block_starts.tolist(), prefixes.tolist()):
+                yield f"{formatter(start)}/{prefix}"
+
+
+def _concat_normalize(pairs: list[tuple[np.ndarray, np.ndarray]]) -> tuple[np.ndarray, np.ndarray]:
+    if len(pairs) == 1:
+        return pairs[0]
+    starts = np.concatenate([pair[0] for pair in pairs])
+    return _normalize(starts, np.concatenate([pair[1] for pair in pairs]))
+
+
+def aggregate(lines: Iterable[str]) -> list[str]:
+    """Return the minimal CIDR list covering every network in ``lines``."""
+    return list(CIDRSet.from_iterable(lines).cidrs())
+
+
+def range_to_cidrs(start: str, end: str) -> list[str]:
+    """Return the minimal CIDR blocks covering the inclusive range ``start``..``end``.
+
+    Raises:
+        ValueError: If the addresses are invalid, of different versions, or reversed.
+    """
+    return list(CIDRSet.from_iterable([f"{start}-{end}"]).cidrs())
+
+
+def diff(old: CIDRSet, new: CIDRSet) -> tuple[CIDRSet, CIDRSet]:
+    """Return ``(added, removed)`` address space between two sets."""
+    return new - old, old - new
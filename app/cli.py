@@ -0,0 +1,260 @@
+"""Command-line bulk calculator.
+
+Reads ``ip/network`` lines (or a JSON array / NDJSON stream) from files or
+stdin and streams one result per input as CSV, JSON or NDJSON::
+
+    python -m app.cli addresses.txt --format csv > results.csv
+    zcat huge.txt.gz | python -m app.cli --workers 8 --network 24
+    python -m app.cli conflicts planned.txt > findings.ndjson
+    python -m app.cli reverse-zone 10.1.0.0/16 -t 'host-{dashed}.example.com.' -o 1.10.zone
+    python -m app.cli acl edge.acl -a flows.txt --field 2 -f csv > decisions.csv
+    python -m app.cli utilization flows.txt --field 2 -o seen.npz --level 24 --emptiest
+
+Input is processed in chunks through the same engine as the batch API.
+With ``--workers`` greater than one, chunks are sharded across a process
+pool; at most a few chunks per worker are in flight and results are written
+in input order.
+
+The subcommands hand their arguments to the ``main`` of another module:
+``conflicts`` to the subnet conflict detector in ``app.conflicts``,
+``reverse-zone`` to the zone writer in ``app.reverse_zones``, ``acl`` to the
+ACL evaluator in ``app.acl`` and ``utilization`` to the prefix aggregator in
+``app.utilization``. Those modules and the batch engine pull in NumPy, so
+they are imported only when a command needs them; Flask is never imported,
+and ``--help`` or a usage error returns without loading either.
+"""
+
+import argparse
+import csv
+import importlib
+import io
+import json
+import sys
+from collections import deque
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from typing import BinaryIO, TextIO
+
+FORMATS = ("ndjson", "json", "csv")
+DEFAULT_CHUNK_SIZE = 4096
+IP_FIELDS = ("IP Address", "Version", "Type", "Binary", "Decimal", "Reverse Pointer")
+NETWORK_FIELDS = (
+    "Network Address",
+    "Broadcast Address",
+    "CIDR",
+    "Netmask",
+    "Wildcard",
+    "HostMin",
+    "HostMax",
+    "Total Hosts",
+)
+CSV_FIELDS = ("index", "input", "error") + IP_FIELDS + NETWORK_FIELDS
+_PENDING_CHUNKS_PER_WORKER = 2
+SUBCOMMANDS = {
+    "acl": "acl",
+    "conflicts": "conflicts",
+    "reverse-zone": "reverse_zones",
+    "utilization": "utilization",
+}
+
+
+def parse_line(line: str, default_network: str | None = None) -> list | str:
+    """Return an ``[ip, network]`` pair for one text input line.
+
+    Lines may be ``ip/network``, ``ip network`` or ``ip,network``; a bare
+    address uses ``default_network``.
+    """
+    line = line.strip()
+    for separator in ("/", ",", None):
+        if separator is None or separator in line:
+            parts = line.split(separator, 1)
+            if len(parts) == 2:
+                return [parts[0].strip(), parts[1].strip()]
+    return [line, default_network]
+
+
+def iter_text_items(stream: BinaryIO, default_network: str | None = None) -> Iterator:
+    """Yield items from a text stream, skipping blank lines and ``#`` comments."""
+    for raw in stream:
+        line = raw.decode("utf-8", errors="replace").strip()
+        if line and not line.startswith("#"):
+            yield parse_line(line, default_network)
+
+
+def _describe_input(item) -> str:
+    if isinstance(item, (list, tuple)) and len(item) == 2 and item[1] is not None:
+        return f"{item[0]}/{item[1]}"
+    if isinstance(item, (list, tuple)) and len(item) == 2:
+        return str(item[0])
+    if isinstance(item, ValueError):
+        return ""
+    return item if isinstance(item, str) else json.dumps(item, separators=(",", ":"))
+
+
+def format_results(results: Iterable[dict], items: list, start: int, output_format: str) -> str:
+    """Serialise one chunk of results; ``items`` are the matching inputs."""
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        for result in results:
+            ip_result = result.get("ip", {})
+            network_result = result.get("network", {})
+            writer.writerow(
+                [start + result["index"], _describe_input(items[result["index"]]), result.get("error", "")]
+                + [ip_result.get(field, "") for field in IP_FIELDS]
+                + [network_result.get(field, "") for field in NETWORK_FIELDS]
+            )
+        return buffer.getvalue()
+
+    lines = []
+    for result in results:
+        result["index"] += start
+        lines.append(json.dumps(result, separators=(",", ":")))
+    if output_format == "json":
+        return ",\n".join(lines)
+    return "".join(line + "\n" for line in lines)
+
+
+def process_chunk(task: tuple[int, list, str]) -> tuple[str, int]:
+    """Calculate and serialise one chunk.
+
+    Args:
+        task (tuple): ``(start_index, items, output_format)``.
+
+    Returns:
+        tuple: ``(text, error_count)``.
+    """
+    from .batch import calculate_batch
+
+    start, items, output_format = task
+    results = list(calculate_batch(items, chunk_size=len(items) or 1))
+    errors = sum("error" in result for result in results)
+    return format_results(results, items, start, output_format), errors
+
+
+def _iter_tasks(items: Iterable, chunk_size: int, output_format: str) -> Iterator[tuple[int, list, str]]:
+    iterator = iter(items)
+    start = 0
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield start, chunk, output_format
+        start += len(chunk)
+
+
+def iter_output(
+    items: Iterable, output_format: str = "ndjson", workers: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[tuple[str, int]]:
+    """Yield ``(text, error_count)`` per chunk, in input order.
+
+    With ``workers > 1`` chunks are computed in a process pool while the
+    input is read ahead by at most ``workers * 2`` chunks.
+    """
+    tasks = _iter_tasks(items, chunk_size, output_format)
+    if workers <= 1:
+        yield from map(process_chunk, tasks)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(process_chunk, task))
+            if len(pending) >= workers * _PENDING_CHUNKS_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_output(chunks: Iterable[tuple[str, int]], output: TextIO, output_format: str) -> int:
+    """Write serialised chunks to ``output`` and return the number of errors."""
+    errors = 0
+    first = True
+    if output_format == "csv":
+        csv.writer(output, lineterminator="\n").writerow(CSV_FIELDS)
+    elif output_format == "json":
+        output.write("[")
+    for text, chunk_errors in chunks:
+        errors += chunk_errors
+        if output_format == "json" and text:
+            output.write("\n" if first else ",\n")
+            first = False
+        output.write(text)
+    if output_format == "json":
+        output.write("]\n" if first else "\n]\n")
+    output.flush()
+    return errors
+
+
+def _iter_inputs(paths: list[str], input_format: str, default_network: str | None) -> Iterator:
+    from .batch import iter_json_items
+
+    for path in paths or ["-"]:
+        if path == "-":
+            handle, close = sys.stdin.buffer, False
+        else:
+            handle, close = open(path, "rb"), True
+        try:
+            if input_format == "json":
+                yield from iter_json_items(handle)
+            else:
+                yield from iter_text_items(handle, default_network)
+        finally:
+            if close:
+                handle.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli",
+        description="Calculate IP and network details for many addresses.",
+        epilog=(
+            "Run 'python -m app.cli conflicts --help' to check networks for overlaps, "
+            "'python -m app.cli reverse-zone --help' to write reverse DNS zones, "
+            "'python -m app.cli acl --help' to evaluate ACLs, or "
+            "'python -m app.cli utilization --help' to measure address-space utilization, instead."
+        ),
+    )
+    parser.add_argument("paths", nargs="*", metavar="FILE", help="input files ('-' or none for stdin)")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="ndjson", help="output format")
+    parser.add_argument(
+        "--input-format",
+        choices=("lines", "json"),
+        default="lines",
+        help="'lines' of ip/network text, or 'json' for a JSON array or NDJSON",
+    )
+    parser.add_argument("-n", "--network", help="network for lines that contain only an address")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="worker processes (default: 1)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="items per chunk")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the CLI; return 1 if any item failed, else 0."""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in SUBCOMMANDS:
+        return importlib.import_module(f".{SUBCOMMANDS[argv[0]]}", __package__).main(argv[1:])
+    args = build_parser().parse_args(argv)
+    if args.workers < 1 or args.chunk_size < 1:
+        build_parser().error("--workers and --chunk-size must be positive.")
+
+    items = _iter_inputs(args.paths, args.input_format, args.network)
+    chunks = iter_output(items, args.format, workers=args.workers, chunk_size=args.chunk_size)
+    try:
+        if args.output:
+            with open(args.output, "w", encoding="utf-8", newline="") as output:
+                errors = write_output(chunks, output, args.format)
+        else:
+            errors = write_output(chunks, sys.stdout, args.format)
+    except BrokenPipeError:
+        # Output was piped into something like ``head``; stop quietly.
+        sys.stderr.close()
+        return 0
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
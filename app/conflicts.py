@@ -0,0 +1,334 @@
+"""Overlap and conflict detection for subnet inventories.
+
+``find_conflicts`` checks a list of planned networks (IPv4 and IPv6 CIDRs,
+single addresses or ``first-last`` ranges, each with an optional declared
+parent) in one sweep over the entries sorted by first address, widest
+first. A stack holds the earlier entries that still contain the current
+one's first address; each of them either contains the current entry or
+overlaps it, so the sweep is O(n log n) for the sort plus the size of the
+report. Findings are yielded as dicts while the sweep runs, in address
+order:
+
+- ``duplicate``: the same addresses as an earlier entry (``first_index``).
+- ``overlap``: shares addresses with an entry (``with``) without either
+  containing the other; only ranges can do this.
+- ``contained``: nested inside other entries; ``chain`` lists them from the
+  outermost in, including containers that overlap each other. ``declared``
+  is true when the innermost one is the entry's declared parent, i.e. the
+  nesting was intended.
+- ``outside_parent``: not inside its declared parent.
+- ``gap``: addresses of an entry or declared parent that nothing nested in
+  it or overlapping it covers, as ``first``, ``last`` and the minimal
+  ``cidrs``.
+
+Declared parents that are not entries themselves take part in the sweep
+with ``index`` ``None``. Invalid items are reported as ``{"index", "error"}``
+before the sweep and otherwise skipped. The same check runs as
+``POST /api/v1/conflicts`` and ``python -m app.cli conflicts``, whose exit
+status is 1 when ``is_conflict`` holds for any finding.
+"""
+
+import argparse
+import ipaddress
+import json
+import sys
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from typing import TextIO
+
+from .batch import iter_json_items
+from .calculations import ADDRESS_BITS, FORMATTERS
+from .cidr_sets import range_to_cidrs
+
+_ADDRESS_TYPES = {4: ipaddress.IPv4Address, 6: ipaddress.IPv6Address}
+FINDING_KINDS = ("duplicate", "overlap", "contained", "outside_parent", "gap")
+
+
+class _Entry:
+    """One network of the sweep; ``index`` is ``None`` for an undeclared parent."""
+
+    __slots__ = ("index", "version", "first", "last", "network", "parent", "cursor", "covered_from", "has_children")
+
+    def __init__(self, index: int | None, version: int, first: int, last: int, network: str, parent=None):
+        self.index = index
+        self.version = version
+        self.first = first
+        self.last = last
+        self.network = network
+        self.parent = parent
+        # Next address not yet covered by a nested entry, for gap reports.
+        self.cursor = first
+        # Start of the tail covered by entries overlapping the end.
+        self.covered_from = last + 1
+        self.has_children = False
+
+    @property
+    def key(self) -> tuple[int, int, int]:
+        return self.version, self.first, self.last
+
+    def describe(self) -> dict:
+        return {"index": self.index, "network": self.network}
+
+
+def _format(version: int, value: int) -> str:
+    return FORMATTERS[version](value)
+
+
+def parse_network(value: str) -> tuple[int, int, int, str]:
+    """Return ``(version, first, last, canonical)`` for a CIDR, address or ``first-last`` range.
+
+    Raises:
+        ValueError: If the value is not a network or range.
+    """
+    if not isinstance(value, str):
+        raise ValueError("Network must be a string.")
+    value = value.strip()
+    if "-" in value:
+        start, _, end = value.partition("-")
+        try:
+            first, last = ipaddress.ip_address(start.strip()), ipaddress.ip_address(end.strip())
+        except ValueError as exc:
+            raise ValueError(f"Invalid range: {value!r}") from exc
+        if first.version != last.version or first > last:
+            raise ValueError(f"Invalid range: {value!r}")
+        return first.version, int(first), int(last), f"{first}-{last}"
+    address, _, prefix = value.partition("/")
+    version = 6 if ":" in address else 4
+    bits = ADDRESS_BITS[version]
+    if prefix.isascii() and prefix.isdigit() and int(prefix) <= bits:
+        # ``address/length``, the usual form, without building a network object.
+        try:
+            start = int(_ADDRESS_TYPES[version](address))
+        except ValueError as exc:
+            raise ValueError(f"Invalid network: {value!r}") from exc
+        hostmask = (1 << (bits - int(prefix))) - 1
+        first = start & ~hostmask
+        return version, first, first | hostmask, f"{_format(version, first)}/{int(prefix)}"
+    try:
+        network = ipaddress.ip_network(value, strict=False)
+    except ValueError as exc:
+        raise ValueError(f"Invalid network: {value!r}") from exc
+    return network.version, int(network.network_address), int(network.broadcast_address), str(network)
+
+
+def normalize_item(item) -> tuple[str, str | None]:
+    """Return ``(network, parent)`` for one input item.
+
+    Items are ``"network"`` or ``"network,parent"`` strings,
+    ``[network, parent]`` pairs or ``{"network": ..., "parent": ...}`` objects.
+
+    Raises:
+        ValueError: If the item has none of these shapes.
+    """
+    if isinstance(item, ValueError):
+        raise item
+    if isinstance(item, str):
+        network, _, parent = item.partition(",")
+        return network, parent.strip() or None
+    if isinstance(item, dict):
+        network, parent = item.get("network"), item.get("parent")
+    elif isinstance(item, (list, tuple)) and len(item) in (1, 2):
+        network, parent = item[0], item[1] if len(item) == 2 else None
+    else:
+        raise ValueError("Each item must be a 'network[,parent]' string, a [network, parent] pair or an object.")
+    if not isinstance(network, str) or not isinstance(parent, (str, type(None))):
+        raise ValueError("Network and parent must be strings.")
+    return network, parent or None
+
+
+def iter_text_items(lines: Iterable) -> Iterator[str]:
+    """Yield ``network[,parent]`` items from text lines, skipping blanks and ``#`` comments.
+
+    The parent may follow a comma or whitespace.
+    """
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        fields = line.split("#", 1)[0].replace(",", " ").split()
+        if fields:
+            yield ",".join(fields[:2])
+
+
+def _gap(container: _Entry, first: int, last: int) -> dict:
+    first_text, last_text = _format(container.version, first), _format(container.version, last)
+    return {
+        "kind": "gap",
+        "parent": container.describe(),
+        "first": first_text,
+        "last": last_text,
+        "cidrs": range_to_cidrs(first_text, last_text),
+    }
+
+
+def _cover(container: _Entry, first: int, last: int) -> Iterator[dict]:
+    """Mark ``first..last`` of ``container`` as used, reporting the gap before it."""
+    container.has_children = True
+    end = min(first, container.covered_from) - 1
+    if end >= container.cursor:
+        yield _gap(container, container.cursor, end)
+    container.cursor = max(container.cursor, last + 1)
+
+
+def _close(container: _Entry) -> Iterator[dict]:
+    end = min(container.last, container.covered_from - 1)
+    if container.has_children and container.cursor <= end:
+        yield _gap(container, container.cursor, end)
+
+
+def find_conflicts(items: Iterable, max_items: int | None = None) -> Iterator[dict]:
+    """Yield the findings for planned networks, as described in the module docstring.
+
+    Args:
+        items (Iterable): Items accepted by ``normalize_item``.
+        max_items (int | None): Report an error and ignore items past this many.
+    """
+    entries: list[_Entry] = []
+    parents: dict[tuple[int, int, int], _Entry] = {}
+    # Many entries name the same parent; parse each spelling once.
+    parsed_parents: dict[str, _Entry] = {}
+    for index, item in enumerate(items):
+        if max_items is not None and index >= max_items:
+            yield {"index": index, "error": f"Batch limit of {max_items} items exceeded."}
+            break
+        try:
+            network, parent = normalize_item(item)
+            entry = _Entry(index, *parse_network(network))
+            if parent is not None:
+                entry.parent = parsed_parents.get(parent)
+                if entry.parent is None:
+                    declared = _Entry(None, *parse_network(parent))
+                    entry.parent = parents.setdefault(declared.key, declared)
+                    parsed_parents[parent] = entry.parent
+        except ValueError as exc:
+            yield {"index": index, "error": str(exc)}
+            continue
+        entries.append(entry)
+
+    listed = {entry.key for entry in entries}
+    entries.extend(parent for key, parent in parents.items() if key not in listed)
+    # Widest first at equal starts, so containers come before what they contain;
+    # listed entries sort before undeclared parents and then by input order.
+    entries.sort(key=lambda entry: (entry.version, entry.first, -entry.last, entry.index is None, entry.index))
+
+    stack: list[_Entry] = []
+    seen: dict[tuple[int, int, int], _Entry] = {}
+    for entry in entries:
+        while stack and (stack[-1].version != entry.version or stack[-1].last < entry.first):
+            yield from _close(stack.pop())
+
+        parent = entry.parent
+        first_seen = seen.setdefault(entry.key, entry)
+        if first_seen is not entry:
+            yield {"kind": "duplicate", **entry.describe(), "first_index": first_seen.index}
+        if parent is not None and not (
+            parent.version == entry.version and parent.first <= entry.first and entry.last <= parent.last
+        ):
+            yield {"kind": "outside_parent", **entry.describe(), "parent": parent.network}
+        if first_seen is not entry:
+            continue
+
+        # Entries overlapped by an earlier one stay on the stack under it, so
+        # drop the ones that ended before this entry and split the rest.
+        containers = []
+        for other in stack:
+            if other.last < entry.first:
+                yield from _close(other)
+            elif other.last < entry.last:
+                yield {"kind": "overlap", **entry.describe(), "with": other.describe()}
+                # Each covers the other's part of the shared addresses.
+                other.covered_from = min(other.covered_from, entry.first)
+                entry.cursor = max(entry.cursor, other.last + 1)
+            else:
+                containers.append(other)
+        if len(containers) < len(stack):
+            stack = [other for other in stack if other.last >= entry.first]
+
+        if containers:
+            # A container is filled directly unless a later, narrower container lies inside it.
+            direct, inner_last = [], None
+            for container in reversed(containers):
+                if inner_last is None or container.last < inner_last:
+                    direct.append(container)
+                    inner_last = container.last
+            for container in reversed(direct):
+                yield from _cover(container, entry.first, entry.last)
+            if entry.index is not None:
+                declared = parent is not None and parent.key == containers[-1].key
+                chain = [outer.describe() for outer in containers]
+                yield {"kind": "contained", **entry.describe(), "chain": chain, "declared": declared}
+        stack.append(entry)
+
+    while stack:
+        yield from _close(stack.pop())
+
+
+def is_conflict(finding: dict) -> bool:
+    """Return True for errors, duplicates, overlaps, entries outside their parent and undeclared nesting."""
+    kind = finding.get("kind")
+    if "error" in finding or kind in ("duplicate", "overlap", "outside_parent"):
+        return True
+    return kind == "contained" and not finding["declared"]
+
+
+def write_findings(findings: Iterable[dict], output: TextIO, output_format: str = "ndjson") -> Counter:
+    """Write findings as NDJSON or a JSON array and return the count of each kind."""
+    counts: Counter = Counter()
+    if output_format == "json":
+        output.write("[")
+    for number, finding in enumerate(findings):
+        counts[finding.get("kind", "error")] += 1
+        counts["conflicts"] += is_conflict(finding)
+        line = json.dumps(finding, separators=(",", ":"))
+        if output_format == "json":
+            output.write(("\n" if number == 0 else ",\n") + line)
+        else:
+            output.write(line + "\n")
+    if output_format == "json":
+        output.write("\n]\n" if counts else "]\n")
+    output.flush()
+    return counts
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli conflicts",
+        description="Report overlaps, duplicates, nesting and gaps in a list of networks.",
+    )
+    parser.add_argument("paths", nargs="*", metavar="FILE", help="input files ('-' or none for stdin)")
+    parser.add_argument(
+        "--input-format",
+        choices=("lines", "json"),
+        default="lines",
+        help="'lines' of 'network [parent]' text, or 'json' for a JSON array or NDJSON",
+    )
+    parser.add_argument("-f", "--format", choices=("ndjson", "json"), default="ndjson", help="output format")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    return parser
+
+
+def _iter_inputs(paths: list[str], input_format: str) -> Iterator:
+    for path in paths or ["-"]:
+        handle = sys.stdin.buffer if path == "-" else open(path, "rb")
+        try:
+            yield from iter_json_items(handle) if input_format == "json" else iter_text_items(handle)
+        finally:
+            if handle is not sys.stdin.buffer:
+                handle.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the ``conflicts`` subcommand; return 1 if any finding is a conflict."""
+    args = build_parser().parse_args(argv)
+    findings = find_conflicts(_iter_inputs(args.paths, args.input_format))
+    try:
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as output:
+                counts = write_findings(findings, output, args.format)
+        else:
+            counts = write_findings(findings, sys.stdout, args.format)
+    except BrokenPipeError:
+        sys.stderr.close()
+        return 0
+    summary = ", ".join(f"{counts[kind]} {kind}" for kind in ("error",) + FINDING_KINDS if counts[kind])
+    print(f"{summary or 'no findings'}; {counts['conflicts']} conflicts", file=sys.stderr)
+    return 1 if counts["conflicts"] else 0
@@ -0,0 +1,227 @@
+"""Lazy enumeration of the hosts, subnets and supernets of a network.
+
+The sequences hold a few integers taken from ``results.NetworkResult``, and
+item ``i`` is computed from ``i`` with shifts and adds. Indexing is O(1),
+and paging or iterating costs time proportional to the items produced,
+never to the size of the parent network. Items are strings: addresses for
+``Hosts``, CIDRs for ``Subnets`` and ``Supernets``. ``index(item)`` maps an
+item back to its position, which is how API cursors are resolved.
+
+Python limits ``len()`` to ``sys.maxsize``; ``count`` holds the exact
+size, which can be as large as 2**128 for IPv6.
+"""
+
+from abc import abstractmethod
+from collections.abc import Iterator, Sequence
+
+from .calculations import ADDRESS_BITS, FORMATTERS
+from .results import NetworkResult
+from .validation import parse_ip_address, parse_prefix, validate_raw_input
+
+KINDS = ("hosts", "subnets", "supernets")
+DOWNLOAD_FORMATS = ("csv", "ndjson")
+_DOWNLOAD_BATCH = 1024
+
+
+def parse_network(value: str | None, strict: bool = False) -> NetworkResult:
+    """Parse ``address/prefix`` (prefix length or netmask).
+
+    Args:
+        value (str | None): Network to parse.
+        strict (bool): Reject addresses with host bits set instead of clearing them.
+
+    Raises:
+        ValueError: If the network is invalid.
+    """
+    value = validate_raw_input(value, "Network", allow_slash=True)
+    address, separator, prefix = value.partition("/")
+    if not separator:
+        raise ValueError("Network must be in address/prefix form.")
+    ip = parse_ip_address(address)
+    network = NetworkResult.from_address(ip.version, int(ip), parse_prefix(prefix, ip.version))
+    if strict and network.first != int(ip):
+        raise ValueError(f"{value} has host bits set.")
+    return network
+
+
+class _Enumeration(Sequence):
+    """Base for lazy sequences of ``count`` items."""
+
+    column = "network"
+    network: NetworkResult
+    version: int
+    count: int
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __bool__(self) -> bool:
+        return self.count > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._item(position) for position in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("Enumeration index out of range.")
+        return self._item(index)
+
+    def __iter__(self) -> Iterator[str]:
+        return self.iter_from(0)
+
+    def __contains__(self, value) -> bool:
+        try:
+            self.index(value)
+        except ValueError:
+            return False
+        return True
+
+    def iter_from(self, start: int, stop: int | None = None) -> Iterator[str]:
+        """Yield the items from index ``start`` up to ``stop`` (default: the end)."""
+        stop = self.count if stop is None else min(stop, self.count)
+        for position in range(start, stop):
+            yield self._item(position)
+
+    @abstractmethod
+    def _item(self, index: int) -> str:
+        """Return the item at ``index``, which is in range."""
+
+    @abstractmethod
+    def index(self, value: str) -> int:
+        """Return the index of ``value``; raise ``ValueError`` when it is not an item."""
+
+
+class Hosts(_Enumeration):
+    """Usable hosts of a network, from ``HostMin`` to ``HostMax``."""
+
+    column = "address"
+
+    def __init__(self, network: NetworkResult):
+        self.network = network
+        self.version = network.version
+        self.first, last = network.host_range
+        self.count = last - self.first + 1
+
+    def _item(self, index: int) -> str:
+        return FORMATTERS[self.version](self.first + index)
+
+    def index(self, value: str) -> int:
+        """Return the position of a host address.
+
+        Raises:
+            ValueError: If ``value`` is not a host of the network.
+        """
+        ip = parse_ip_address(value)
+        position = int(ip) - self.first
+        if ip.version != self.version or not 0 <= position < self.count:
+            raise ValueError(f"{value} is not a host of this network.")
+        return position
+
+
+class Subnets(_Enumeration):
+    """Child subnets of a network at a longer prefix length."""
+
+    def __init__(self, network: NetworkResult, prefixlen: int):
+        bits = ADDRESS_BITS[network.version]
+        if not network.prefixlen <= prefixlen <= bits:
+            raise ValueError(f"Subnet prefix length must be between {network.prefixlen} and {bits}.")
+        self.network = network
+        self.version = network.version
+        self.first = network.first
+        self.prefixlen = prefixlen
+        self.shift = bits - prefixlen
+        self.count = 1 << (prefixlen - network.prefixlen)
+
+    def _item(self, index: int) -> str:
+        return f"{FORMATTERS[self.version](self.first + (index << self.shift))}/{self.prefixlen}"
+
+    def index(self, value: str) -> int:
+        """Return the position of a subnet given as a CIDR.
+
+        Raises:
+            ValueError: If ``value`` is not one of the subnets.
+        """
+        subnet = parse_network(value, strict=True)
+        position = (subnet.first - self.first) >> self.shift
+        if subnet.key != (self.version, self.first + (position << self.shift), self.prefixlen) or not (
+            0 <= position < self.count
+        ):
+            raise ValueError(f"{value} is not a /{self.prefixlen} subnet of this network.")
+        return position
+
+
+class Supernets(_Enumeration):
+    """Networks containing a network, from the next shorter prefix up to ``prefixlen``."""
+
+    def __init__(self, network: NetworkResult, prefixlen: int = 0):
+        if not 0 <= prefixlen <= network.prefixlen:
+            raise ValueError(f"Supernet prefix length must be between 0 and {network.prefixlen}.")
+        self.network = network
+        self.version = network.version
+        self.count = network.prefixlen - prefixlen
+
+    def _item(self, index: int) -> str:
+        return NetworkResult.from_address(self.version, self.network.first, self.network.prefixlen - 1 - index).cidr
+
+    def index(self, value: str) -> int:
+        """Return the position of a supernet given as a CIDR.
+
+        Raises:
+            ValueError: If ``value`` is not one of the supernets.
+        """
+        supernet = parse_network(value, strict=True)
+        position = self.network.prefixlen - 1 - supernet.prefixlen
+        if not 0 <= position < self.count or supernet.cidr != self._item(position):
+            raise ValueError(f"{value} is not a supernet of this network.")
+        return position
+
+
+def enumerate_network(kind: str, network: str | None, prefixlen: str | int | None = None) -> _Enumeration:
+    """Return the lazy ``kind`` sequence of ``network``.
+
+    Args:
+        kind (str): ``"hosts"``, ``"subnets"`` or ``"supernets"``.
+        network (str | None): Parent network as ``address/prefix``.
+        prefixlen (str | int | None): Subnet prefix length (required for
+            subnets) or the shortest supernet prefix length (default ``0``).
+
+    Raises:
+        ValueError: If an argument is invalid.
+    """
+    parent = parse_network(network)
+    if kind == "hosts":
+        return Hosts(parent)
+    if kind not in KINDS:
+        raise ValueError(f"Unknown enumeration {kind!r}.")
+    if prefixlen is None or prefixlen == "":
+        if kind == "subnets":
+            raise ValueError("A subnet prefix length is required.")
+        prefixlen = 0
+    prefixlen = str(prefixlen).lstrip("/")
+    if not prefixlen.isascii() or not prefixlen.isdigit():
+        raise ValueError("Prefix length must be a number.")
+    if kind == "subnets":
+        return Subnets(parent, int(prefixlen))
+    return Supernets(parent, int(prefixlen))
+
+
+def iter_download(sequence: _Enumeration, start: int, stop: int, output_format: str) -> Iterator[str]:
+    """Yield items ``start`` to ``stop`` as CSV or NDJSON text, in batches of lines.
+
+    Rows are ``index`` plus ``address`` (hosts) or ``network``. Items contain
+    only address characters, so rows are formatted without escaping.
+    """
+    column = sequence.column
+    if output_format == "csv":
+        yield f"index,{column}\n"
+        row = "{},{}\n"
+    else:
+        row = '{{"index":{},"%s":"{}"}}\n' % column
+    stop = min(stop, sequence.count)
+    for batch_start in range(start, stop, _DOWNLOAD_BATCH):
+        batch_stop = min(batch_start + _DOWNLOAD_BATCH, stop)
+        yield "".join(
+            row.format(index, item)
+            for index, item in zip(range(batch_start, batch_stop), sequence.iter_from(batch_start, batch_stop))
+        )
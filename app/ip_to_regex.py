@@ -1,52 +1,338 @@
-import re
+"""Regex generation for IPv4 and IPv6 address ranges.
+
+Ranges are split into products of per-octet (IPv4) or per-hextet (IPv6)
+numeric ranges, each numeric range is turned into a digit-by-digit
+alternation, and all products are merged through a shared-prefix trie so
+common leading octets are matched once. Sibling branches with identical
+tails are folded into a single numeric set.
+
+Numbers are matched without leading zeros. IPv6 patterns match lowercase
+hextets, in full form or with ``::`` replacing any run of two or more zero
+hextets; fully wildcarded hextets accept any 1-4 digit spelling.
+"""
+
+import functools
 import ipaddress
+import re
+from collections.abc import Iterable
+
+REGEX_CACHE_SIZE = 256
+
+_DIGITS = "0123456789abcdef"
+_ANY_DIGIT = {10: "[0-9]", 16: "[0-9a-f]"}
+_FORMATS = {
+    # version: (slots, bits per slot, radix, separator)
+    4: (4, 8, 10, r"\."),
+    6: (8, 16, 16, ":"),
+}
+_TOKEN_BOUNDARIES = {
+    4: (r"(?<![0-9.])", r"(?!\.?[0-9])"),
+    6: (r"(?<![0-9a-fA-F:])", r"(?![0-9a-fA-F:])"),
+}
+_COMPRESSED = "::"
+
+
+def _group(alternatives: list[str]) -> str:
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return "(?:" + "|".join(alternatives) + ")"
+
+
+def _repeat(atom: str, count: int) -> str:
+    if count == 0:
+        return ""
+    if count == 1:
+        return atom
+    return f"{atom}{{{count}}}"
+
+
+def _digit_class(low: int, high: int, radix: int) -> str:
+    """Return a character class for the digits ``low``..``high``."""
+    if low == high:
+        return _DIGITS[low]
+    if low == 0 and high == radix - 1:
+        return _ANY_DIGIT[radix]
+    chars = _DIGITS[low:high + 1]
+    parts = []
+    for run in (chars[: max(0, 10 - low)], chars[max(0, 10 - low):]):
+        if len(run) > 2:
+            parts.append(f"{run[0]}-{run[-1]}")
+        else:
+            parts.append(run)
+    return "[" + "".join(parts) + "]"
+
+
+def _same_length(low: str, high: str, radix: int) -> list[str]:
+    """Return alternatives for numbers between two equal-length strings."""
+    if low == high:
+        return [low]
+    if len(low) == 1:
+        return [_digit_class(int(low, radix), int(high, radix), radix)]
+    if low[0] == high[0]:
+        return [low[0] + _group(_same_length(low[1:], high[1:], radix))]
+
+    rest = len(low) - 1
+    top = _DIGITS[radix - 1]
+    first, last = int(low[0], radix), int(high[0], radix)
+    alternatives = []
+    if low[1:] != "0" * rest:
+        alternatives.append(low[0] + _group(_same_length(low[1:], top * rest, radix)))
+        first += 1
+    tail = None
+    if high[1:] != top * rest:
+        tail = high[0] + _group(_same_length("0" * rest, high[1:], radix))
+        last -= 1
+    if first <= last:
+        alternatives.append(_digit_class(first, last, radix) + _repeat(_ANY_DIGIT[radix], rest))
+    if tail:
+        alternatives.append(tail)
+    return alternatives
+
+
+def _to_digits(value: int, radix: int) -> str:
+    return str(value) if radix == 10 else f"{value:x}"
+
+
+def _number_alternatives(low: int, high: int, radix: int) -> list[str]:
+    """Return alternatives matching the integers ``low``..``high``."""
+    alternatives = []
+    if low == 0:
+        width = 1
+        while radix ** (width + 1) - 1 <= high:
+            width += 1
+        if width > 1:
+            if radix == 16:
+                alternatives.append(f"{_ANY_DIGIT[16]}{{1,{width}}}")
+            elif width == 2:
+                alternatives.append("[1-9]?[0-9]")
+            else:
+                alternatives.append(f"(?:0|[1-9][0-9]{{0,{width - 1}}})")
+            low = radix ** width
+            if low > high:
+                return alternatives
+
+    for length in range(len(_to_digits(low, radix)), len(_to_digits(high, radix)) + 1):
+        start = max(low, radix ** (length - 1) if length > 1 else 0)
+        end = min(high, radix ** length - 1)
+        alternatives.extend(_same_length(_to_digits(start, radix), _to_digits(end, radix), radix))
+    return alternatives
+
+
+def _number_set(intervals: list[tuple[int, int]], radix: int) -> str:
+    """Return a regex matching the union of integer intervals."""
+    merged: list[list[int]] = []
+    for low, high in sorted(intervals):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], high)
+        else:
+            merged.append([low, high])
+    if merged[-1][1] < radix and len(merged) > 1:
+        digits = "".join(_DIGITS[low:high + 1] for low, high in merged)
+        return "[" + digits + "]"
+    alternatives = []
+    for low, high in merged:
+        alternatives.extend(_number_alternatives(low, high, radix))
+    return _group(alternatives)
+
+
+def _split_range(low: list[int], high: list[int], base: int) -> list[list[tuple[int, int]]]:
+    """Split a range of slot vectors into products of per-slot intervals."""
+    if len(low) == 1:
+        return [[(low[0], high[0])]]
+    if low[0] == high[0]:
+        return [[(low[0], low[0])] + rest for rest in _split_range(low[1:], high[1:], base)]
+
+    rest = len(low) - 1
+    first, last = low[0], high[0]
+    products = []
+    if any(low[1:]):
+        products += [[(first, first)] + tail for tail in _split_range(low[1:], [base - 1] * rest, base)]
+        first += 1
+    upper = []
+    if any(digit != base - 1 for digit in high[1:]):
+        upper = [[(last, last)] + tail for tail in _split_range([0] * rest, high[1:], base)]
+        last -= 1
+    if first <= last:
+        products.append([(first, last)] + [(0, base - 1)] * rest)
+    return products + upper
+
+
+class _TrieNode:
+    __slots__ = ("children", "terminal")
+
+    def __init__(self):
+        self.children: dict = {}
+        self.terminal = False
+
+    def insert(self, tokens: list) -> None:
+        node = self
+        for token in tokens:
+            node = node.children.setdefault(token, _TrieNode())
+        node.terminal = True
+
+    def render(self, radix: int) -> str:
+        alternatives = []
+        by_tail: dict[str, list[tuple[int, int]]] = {}
+        for token, child in self.children.items():
+            tail = child.render(radix)
+            if isinstance(token, str):
+                alternatives.append(token + tail)
+            else:
+                by_tail.setdefault(tail, []).append(token)
+        for tail, intervals in by_tail.items():
+            alternatives.append(_number_set(intervals, radix) + tail)
+        if self.terminal and alternatives:
+            alternatives.append("")
+        return _group(alternatives) if alternatives else ""
+
+
+def _token_sequences(version: int, product: list[tuple[int, int]]) -> Iterable[list]:
+    """Yield the textual token sequences for one product of slot intervals."""
+    _, _, _, separator = _FORMATS[version]
 
-def ip_to_regex(ip_cidr):
+    def joined(slots: list[tuple[int, int]]) -> list:
+        tokens: list = []
+        for slot in slots:
+            if tokens:
+                tokens.append(separator)
+            tokens.append(slot)
+        return tokens
+
+    yield joined(product)
+    if version == 4:
+        return
+    for start in range(len(product)):
+        if product[start][0] != 0:
+            continue
+        for end in range(start + 1, len(product)):
+            if product[end][0] != 0:
+                break
+            yield joined(product[:start]) + [_COMPRESSED] + joined(product[end + 1:])
+
+
+def _family_body(version: int, ranges: list[tuple[int, int]]) -> str:
+    slots, bits, radix, _ = _FORMATS[version]
+    base = 1 << bits
+    mask = base - 1
+    root = _TrieNode()
+    for first, last in ranges:
+        low = [(first >> (bits * shift)) & mask for shift in range(slots - 1, -1, -1)]
+        high = [(last >> (bits * shift)) & mask for shift in range(slots - 1, -1, -1)]
+        for product in _split_range(low, high, base):
+            for tokens in _token_sequences(version, product):
+                root.insert(tokens)
+    return root.render(radix)
+
+
+def _merge_ranges(ranges: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+    merged: list[list[int]] = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return [(first, last) for first, last in merged]
+
+
+def _ranges_to_regex(ranges: dict[int, list[tuple[int, int]]], anchor: str | None) -> str:
+    if anchor not in ("line", "token", None):
+        raise ValueError("anchor must be 'line', 'token' or None.")
+    bodies = []
+    for version in (4, 6):
+        if not ranges[version]:
+            continue
+        body = _family_body(version, _merge_ranges(ranges[version]))
+        if anchor == "token":
+            before, after = _TOKEN_BOUNDARIES[version]
+            body = before + body + after
+        bodies.append(body)
+    if not bodies:
+        raise ValueError("At least one network is required.")
+    pattern = _group(bodies)
+    if anchor == "line":
+        return f"^{pattern}$"
+    return pattern
+
+
+def range_to_regex(start: str, end: str, anchor: str | None = "line") -> str:
+    """Convert an inclusive IP address range to a regular expression.
+
+    Args:
+        start (str): First address of the range.
+        end (str): Last address of the range, same version as ``start``.
+        anchor (str | None): ``"line"`` wraps the pattern in ``^...$``,
+            ``"token"`` uses lookarounds so it can find addresses inside
+            log lines, and ``None`` returns the bare pattern.
+
+    Returns:
+        str: Regex matching exactly the addresses in the range.
     """
-    Convert IP address and subnet mask (CIDR) to a regular expression (regex).
+    first = ipaddress.ip_address(start)
+    last = ipaddress.ip_address(end)
+    if first.version != last.version:
+        raise ValueError("Range start and end must be the same IP version.")
+    if first > last:
+        raise ValueError("Range start must not be greater than range end.")
+    return int_range_to_regex(first.version, int(first), int(last), anchor=anchor)
+
+
+def int_range_to_regex(version: int, first: int, last: int, anchor: str | None = "line") -> str:
+    """Convert an inclusive range of integer addresses to a regular expression.
+
+    Used by callers that already hold parsed addresses, so nothing is reparsed.
 
     Args:
-        ip_cidr (str): IP address with subnet mask, e.g., "172.30.151.224/27" or "2001:0db8:85a3::/64".
+        version (int): 4 or 6.
+        first (int): First address of the range.
+        last (int): Last address of the range.
+        anchor (str | None): See ``range_to_regex``.
 
     Returns:
-        str: Regex matching the IP range.
+        str: Regex matching exactly the addresses in the range.
     """
-    network = ipaddress.ip_network(ip_cidr, strict=False)
-    first_ip = int(network.network_address)
-    last_ip = int(network.broadcast_address)
+    ranges: dict[int, list[tuple[int, int]]] = {4: [], 6: []}
+    ranges[version].append((first, last))
+    return _ranges_to_regex(ranges, anchor)
 
-    def ipv4_to_octets(ip):
-        return [(ip >> 24) & 0xFF, (ip >> 16) & 0xFF, (ip >> 8) & 0xFF, ip & 0xFF]
 
-    def ipv6_to_hextets(ip):
-        return [(ip >> (16 * i)) & 0xFFFF for i in range(7, -1, -1)]
+def cidrs_to_regex(cidrs: Iterable[str], anchor: str | None = "line") -> str:
+    """Merge many IPv4/IPv6 networks into one optimised regular expression.
 
-    if network.version == 4:
-        start_octets = ipv4_to_octets(first_ip)
-        end_octets = ipv4_to_octets(last_ip)
+    Args:
+        cidrs (Iterable[str]): Networks such as ``"10.0.0.0/8"``; host bits are ignored.
+        anchor (str | None): See ``range_to_regex``.
 
-        regex_parts = []
-        for i in range(4):
-            if start_octets[i] == end_octets[i]:
-                regex_parts.append(f"{start_octets[i]}")
-            else:
-                regex_parts.append(f"({start_octets[i]}-{end_octets[i]})")
+    Returns:
+        str: Regex matching any address in any of the networks.
+    """
+    ranges: dict[int, list[tuple[int, int]]] = {4: [], 6: []}
+    for cidr in cidrs:
+        network = ipaddress.ip_network(cidr, strict=False)
+        ranges[network.version].append(
+            (int(network.network_address), int(network.broadcast_address))
+        )
+    return _ranges_to_regex(ranges, anchor)
 
-        regex_str = "^" + r"\.".join(regex_parts) + "$"
-    else:
-        start_hextets = ipv6_to_hextets(first_ip)
-        end_hextets = ipv6_to_hextets(last_ip)
 
-        regex_parts = []
-        for i in range(8):
-            if start_hextets[i] == end_hextets[i]:
-                regex_parts.append(f"{start_hextets[i]:x}")
-            else:
-                regex_parts.append(f"({start_hextets[i]:x}-{end_hextets[i]:x})")
+def ip_to_regex(ip_cidr, anchor: str | None = "line"):
+    """
+    Convert IP address and subnet mask (CIDR) to a regular expression (regex).
+
+    Args:
+        ip_cidr (str): IP address with subnet mask, e.g., "172.30.151.224/27" or "2001:0db8:85a3::/64".
+        anchor (str | None): See ``range_to_regex``.
+
+    Returns:
+        str: Regex matching the IP range.
+    """
+    return cidrs_to_regex([ip_cidr], anchor=anchor)
+
 
-        regex_str = "^" + ":".join(regex_parts) + "$"
+@functools.lru_cache(maxsize=REGEX_CACHE_SIZE)
+def compile_regex(pattern: str, flags: int = 0) -> re.Pattern:
+    """Compile a regex, reusing recently compiled patterns."""
+    return re.compile(pattern, flags)
 
-    return regex_str
 
 def validate_regex(pattern, text):
     """
@@ -60,8 +346,8 @@ def validate_regex(pattern, text):
         dict: Validation result, including matched strings or error message.
     """
     try:
-        regex = re.compile(pattern)
+        regex = compile_regex(pattern)
         matches = regex.findall(text)
         return {"matches": matches}
     except re.error:
-        return {"error": "Invalid regex pattern"}
\ No newline at end of file
+        return {"error": "Invalid regex pattern"}
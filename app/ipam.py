@@ -0,0 +1,334 @@
+"""SQLite-backed address pools with buddy allocation.
+
+A pool is one network. Its unallocated space is held as a free-block index
+keyed by ``(pool, prefix length, start)``: every free block is an aligned
+CIDR, and two free buddies (the halves of the same parent block) are
+always merged. Allocating a ``/n`` takes the lowest free block of the
+longest prefix length ``<= n``, splits it down to ``/n`` and puts the
+unused halves back as free blocks. Releasing merges the block with its
+buddy for as long as the buddy is free. Each step is one primary-key
+seek, so both operations cost O(bits · log n) whatever the size of the
+pool. Allocation counts per prefix length are kept alongside,
+so utilisation is O(bits) as well.
+
+Addresses are stored as 16-byte big-endian blobs, which SQLite orders
+like the numbers they encode, for IPv4 and IPv6 alike. Every change runs
+in a ``BEGIN IMMEDIATE`` transaction on a WAL database, so concurrent
+requests from all gunicorn workers are serialised by SQLite's own file
+lock. Connections are opened per process and thread, on first use.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from .calculations import ADDRESS_BITS, FORMATTERS
+from .enumeration import parse_network
+from .validation import parse_prefix
+
+_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]{0,63}")
+BUSY_TIMEOUT_SECONDS = 10.0
+ALLOCATION_PAGE_SIZE = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pools (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    version INTEGER NOT NULL,
+    start BLOB NOT NULL,
+    prefixlen INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS free_blocks (
+    pool_id INTEGER NOT NULL REFERENCES pools (id) ON DELETE CASCADE,
+    prefixlen INTEGER NOT NULL,
+    start BLOB NOT NULL,
+    PRIMARY KEY (pool_id, prefixlen, start)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS allocations (
+    pool_id INTEGER NOT NULL REFERENCES pools (id) ON DELETE CASCADE,
+    start BLOB NOT NULL,
+    prefixlen INTEGER NOT NULL,
+    label TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL,
+    PRIMARY KEY (pool_id, start)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS allocation_counts (
+    pool_id INTEGER NOT NULL REFERENCES pools (id) ON DELETE CASCADE,
+    prefixlen INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (pool_id, prefixlen)
+) WITHOUT ROWID;
+"""
+
+
+class PoolNotFoundError(LookupError):
+    """No pool, or no allocation, with the given name."""
+
+
+class PoolConflictError(ValueError):
+    """The pool name is taken, the pool is exhausted or still has allocations."""
+
+
+def _key(value: int) -> bytes:
+    return value.to_bytes(16, "big")
+
+
+def _value(key: bytes) -> int:
+    return int.from_bytes(key, "big")
+
+
+class _Pool:
+    __slots__ = ("id", "name", "version", "start", "prefixlen", "created")
+
+    def __init__(self, row):
+        self.id, self.name, self.version, start, self.prefixlen, self.created = row
+        self.start = _value(start)
+
+    @property
+    def bits(self) -> int:
+        return ADDRESS_BITS[self.version]
+
+    def cidr(self, start: int, prefixlen: int) -> str:
+        return f"{FORMATTERS[self.version](start)}/{prefixlen}"
+
+
+class PoolStore:
+    """Address pools kept in the SQLite database at ``path``."""
+
+    def __init__(self, path: str, timeout: float = BUSY_TIMEOUT_SECONDS):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        # Create the schema on a connection of its own, so a preloading
+        # gunicorn master never hands an open connection to its workers.
+        connection = self._connect()
+        try:
+            connection.executescript(_SCHEMA)
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # An allocation returned to a client must survive a power loss.
+        connection.execute("PRAGMA synchronous=FULL")
+        connection.execute("PRAGMA foreign_keys=ON")
+        return connection
+
+    def _connection(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.connection = self._connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    @contextmanager
+    def _transaction(self, write: bool = True):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _pool(self, connection: sqlite3.Connection, name: str) -> _Pool:
+        row = connection.execute(
+            "SELECT id, name, version, start, prefixlen, created FROM pools WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            raise PoolNotFoundError(f"No pool named {name!r}.")
+        return _Pool(row)
+
+    def create_pool(self, name: str | None, network: str | None) -> dict:
+        """Create a pool covering ``network`` (host bits are cleared).
+
+        Raises:
+            ValueError: If the name or network is invalid.
+            PoolConflictError: If a pool with that name exists.
+        """
+        if not isinstance(name, str) or not _NAME.fullmatch(name):
+            raise ValueError("Pool name must be 1-64 letters, digits, '.', '_' or '-'.")
+        parsed = parse_network(network)
+        with self._transaction() as connection:
+            try:
+                cursor = connection.execute(
+                    "INSERT INTO pools (name, version, start, prefixlen, created) VALUES (?, ?, ?, ?, ?)",
+                    (name, parsed.version, _key(parsed.first), parsed.prefixlen, time.time()),
+                )
+            except sqlite3.IntegrityError as exc:
+                raise PoolConflictError(f"A pool named {name!r} already exists.") from exc
+            connection.execute(
+                "INSERT INTO free_blocks (pool_id, prefixlen, start) VALUES (?, ?, ?)",
+                (cursor.lastrowid, parsed.prefixlen, _key(parsed.first)),
+            )
+            return self._usage(connection, self._pool(connection, name))
+
+    def delete_pool(self, name: str) -> None:
+        """Delete an empty pool.
+
+        Raises:
+            PoolNotFoundError: If there is no such pool.
+            PoolConflictError: If the pool still has allocations.
+        """
+        with self._transaction() as connection:
+            pool = self._pool(connection, name)
+            if connection.execute("SELECT 1 FROM allocations WHERE pool_id = ? LIMIT 1", (pool.id,)).fetchone():
+                raise PoolConflictError(f"Pool {name!r} still has allocations.")
+            connection.execute("DELETE FROM pools WHERE id = ?", (pool.id,))
+
+    def allocate(self, name: str, prefix, label: str | None = None) -> dict:
+        """Allocate the lowest free block of length ``prefix`` from pool ``name``.
+
+        Args:
+            name (str): Pool name.
+            prefix (str | int): Prefix length (``26``, ``"/26"``) or IPv4 netmask.
+            label (str | None): Free-form note stored with the allocation.
+
+        Raises:
+            PoolNotFoundError: If there is no such pool.
+            PoolConflictError: If no free block is large enough.
+            ValueError: If the prefix length is invalid for the pool.
+        """
+        if label is not None and not isinstance(label, str):
+            raise ValueError("Label must be a string.")
+        with self._transaction() as connection:
+            pool = self._pool(connection, name)
+            prefixlen = parse_prefix(str(prefix).lstrip("/"), pool.version)
+            if prefixlen < pool.prefixlen:
+                raise ValueError(f"Prefix length must be between {pool.prefixlen} and {pool.bits}.")
+            # The smallest free block that fits, at its lowest address.
+            for length in range(prefixlen, pool.prefixlen - 1, -1):
+                row = connection.execute(
+                    "SELECT start FROM free_blocks WHERE pool_id = ? AND prefixlen = ? ORDER BY start LIMIT 1",
+                    (pool.id, length),
+                ).fetchone()
+                if row is not None:
+                    break
+            else:
+                raise PoolConflictError(f"Pool {name!r} has no free /{prefixlen}.")
+
+            start = _value(row[0])
+            connection.execute(
+                "DELETE FROM free_blocks WHERE pool_id = ? AND prefixlen = ? AND start = ?",
+                (pool.id, length, row[0]),
+            )
+            # Split down to the requested size, freeing the upper half each time.
+            while length < prefixlen:
+                length += 1
+                connection.execute(
+                    "INSERT INTO free_blocks (pool_id, prefixlen, start) VALUES (?, ?, ?)",
+                    (pool.id, length, _key(start + (1 << (pool.bits - length)))),
+                )
+            created = time.time()
+            connection.execute(
+                "INSERT INTO allocations (pool_id, start, prefixlen, label, created) VALUES (?, ?, ?, ?, ?)",
+                (pool.id, _key(start), prefixlen, label or "", created),
+            )
+            connection.execute(
+                "INSERT INTO allocation_counts (pool_id, prefixlen, count) VALUES (?, ?, 1) "
+                "ON CONFLICT (pool_id, prefixlen) DO UPDATE SET count = count + 1",
+                (pool.id, prefixlen),
+            )
+        return {"pool": name, "network": pool.cidr(start, prefixlen), "label": label or "", "created": created}
+
+    def release(self, name: str, network: str | None) -> None:
+        """Return an allocated network to pool ``name``, merging free buddies.
+
+        Raises:
+            PoolNotFoundError: If there is no such pool or allocation.
+            ValueError: If ``network`` is invalid.
+        """
+        parsed = parse_network(network, strict=True)
+        with self._transaction() as connection:
+            pool = self._pool(connection, name)
+            start, length = parsed.first, parsed.prefixlen
+            deleted = parsed.version == pool.version and connection.execute(
+                "DELETE FROM allocations WHERE pool_id = ? AND start = ? AND prefixlen = ?",
+                (pool.id, _key(start), length),
+            ).rowcount
+            if not deleted:
+                raise PoolNotFoundError(f"{parsed.cidr} is not allocated from pool {name!r}.")
+            connection.execute(
+                "UPDATE allocation_counts SET count = count - 1 WHERE pool_id = ? AND prefixlen = ?",
+                (pool.id, length),
+            )
+            while length > pool.prefixlen:
+                size = 1 << (pool.bits - length)
+                merged = connection.execute(
+                    "DELETE FROM free_blocks WHERE pool_id = ? AND prefixlen = ? AND start = ?",
+                    (pool.id, length, _key(start ^ size)),
+                ).rowcount
+                if not merged:
+                    break
+                start &= ~size
+                length -= 1
+            connection.execute(
+                "INSERT INTO free_blocks (pool_id, prefixlen, start) VALUES (?, ?, ?)",
+                (pool.id, length, _key(start)),
+            )
+
+    def _usage(self, connection: sqlite3.Connection, pool: _Pool) -> dict:
+        rows = connection.execute(
+            "SELECT prefixlen, count FROM allocation_counts WHERE pool_id = ? AND count > 0", (pool.id,)
+        ).fetchall()
+        total = 1 << (pool.bits - pool.prefixlen)
+        allocated = sum(count << (pool.bits - length) for length, count in rows)
+        largest = None
+        for length in range(pool.prefixlen, pool.bits + 1):
+            if connection.execute(
+                "SELECT 1 FROM free_blocks WHERE pool_id = ? AND prefixlen = ? LIMIT 1", (pool.id, length)
+            ).fetchone():
+                largest = length
+                break
+        return {
+            "name": pool.name,
+            "network": pool.cidr(pool.start, pool.prefixlen),
+            "allocations": sum(count for _, count in rows),
+            "allocated_addresses": allocated,
+            "total_addresses": total,
+            "utilization": allocated / total,
+            "largest_free_prefix": largest,
+        }
+
+    def pool(self, name: str) -> dict:
+        """Return the network and utilisation of pool ``name``.
+
+        Raises:
+            PoolNotFoundError: If there is no such pool.
+        """
+        with self._transaction(write=False) as connection:
+            return self._usage(connection, self._pool(connection, name))
+
+    def pools(self) -> list[dict]:
+        """Return every pool with its utilisation, by name."""
+        with self._transaction(write=False) as connection:
+            rows = connection.execute(
+                "SELECT id, name, version, start, prefixlen, created FROM pools ORDER BY name"
+            ).fetchall()
+            return [self._usage(connection, _Pool(row)) for row in rows]
+
+    def allocations(self, name: str, after: str | None = None, limit: int = ALLOCATION_PAGE_SIZE) -> list[dict]:
+        """Return up to ``limit`` allocations of pool ``name`` by address, starting after network ``after``.
+
+        Raises:
+            PoolNotFoundError: If there is no such pool.
+            ValueError: If ``after`` is invalid.
+        """
+        after_key = _key(parse_network(after).first) if after else b""
+        with self._transaction(write=False) as connection:
+            pool = self._pool(connection, name)
+            rows = connection.execute(
+                "SELECT start, prefixlen, label, created FROM allocations "
+                "WHERE pool_id = ? AND start > ? ORDER BY start LIMIT ?",
+                (pool.id, after_key, limit),
+            ).fetchall()
+        return [
+            {"pool": name, "network": pool.cidr(_value(start), length), "label": label, "created": created}
+            for start, length, label, created in rows
+        ]
@@ -0,0 +1,232 @@
+"""Scan log files for addresses inside a set of networks.
+
+Files are memory-mapped and read in chunks of whole lines, so files larger
+than RAM are scanned with bounded memory; pages already scanned are released
+with ``madvise`` where the platform supports it. Each chunk is searched with
+one byte regex per family to extract IPv4 and IPv6 candidates, which are
+parsed in bulk by the column parsers in ``vectorized.py`` and classified with
+one ``searchsorted`` per family against a ``PrefixIndex``. The work per chunk
+does not depend on how many networks are searched for.
+
+Each address is attributed to the most specific network containing it.
+"""
+
+import mmap
+import os
+import re
+from collections.abc import Iterable, Iterator
+
+import numpy as np
+
+from .prefix_index import NO_MATCH, PrefixIndex
+from .vectorized import parse_ipv4_column, parse_ipv6_column
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+# Candidates are found from their first separator, which lets ``re`` skip
+# ahead with a literal search, then extended back over the leading digits or
+# hex group. Boundaries are checked in ``_tokens`` and the address syntax by
+# the column parsers.
+_IPV4_TAIL = re.compile(rb"\.\d{1,3}\.\d{1,3}\.\d{1,3}")
+_IPV6_TAIL = re.compile(rb":[0-9A-Fa-f]*:[0-9A-Fa-f:.]*")
+_HEX = frozenset(b"0123456789ABCDEFabcdef")
+_WORD = frozenset(b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_")
+_DIGITS = frozenset(b"0123456789")
+
+
+def _chunks(view: mmap.mmap, size: int, chunk_size: int) -> Iterator[tuple[int, int]]:
+    """Yield ``(start, end)`` ranges of whole lines of about ``chunk_size`` bytes."""
+    start = 0
+    while start < size:
+        end = min(start + chunk_size, size)
+        if end < size:
+            newline = view.rfind(b"\n", start, end)
+            if newline == -1:
+                newline = view.find(b"\n", end)
+            end = size if newline == -1 else newline + 1
+        yield start, end
+        start = end
+
+
+def _extend_back(data: bytes, start: int, chars: frozenset, limit: int) -> int:
+    floor = max(start - limit, 0)
+    while start > floor and data[start - 1] in chars:
+        start -= 1
+    return start
+
+
+def _tokens(data: bytes) -> list[tuple[int, int, bytes]]:
+    """Return ``(offset, version, text)`` for address candidates not embedded in longer tokens."""
+    tokens = []
+    size = len(data)
+    mixed = []
+    for match in _IPV6_TAIL.finditer(data):
+        start, end = _extend_back(data, match.start(), _HEX, 4), match.end()
+        before = data[start - 1] if start else 0
+        if before in _WORD or before in b".:" or (end < size and data[end] in _WORD):
+            continue
+        text = data[start:end].rstrip(b".")
+        if b"." in text:
+            mixed.append((start, end))
+        tokens.append((start, 6, text))
+
+    for match in _IPV4_TAIL.finditer(data):
+        start, end = _extend_back(data, match.start(), _DIGITS, 3), match.end()
+        if start == match.start():
+            continue
+        before = data[start - 1] if start else 0
+        after = data[end] if end < size else 0
+        if before in _WORD or before == 0x2E or after in _WORD:
+            continue
+        if after == 0x2E and end + 1 < size and data[end + 1] in _DIGITS:
+            continue
+        # Skip the IPv4 tail of an address like ``::ffff:192.0.2.1``.
+        if mixed and any(low <= start < high for low, high in mixed):
+            continue
+        tokens.append((start, 4, data[start:end]))
+    return tokens
+
+
+def _release(view: mmap.mmap, start: int, end: int) -> None:
+    if not hasattr(view, "madvise") or not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    start -= start % mmap.PAGESIZE
+    end -= end % mmap.PAGESIZE
+    if end > start:
+        view.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+
+class _Descriptions(dict):
+    """``{"prefix", "label"}`` of table entries, formatted on first use."""
+
+    def __init__(self, table):
+        super().__init__()
+        self.table = table
+
+    def __missing__(self, entry: int) -> dict:
+        self[entry] = self.table.match(entry)
+        return self[entry]
+
+
+class _Hits:
+    """Per-entry hit counters for both address families."""
+
+    def __init__(self, index: PrefixIndex):
+        self.counts = {4: np.zeros(len(index.ipv4), dtype=np.int64), 6: np.zeros(len(index.ipv6), dtype=np.int64)}
+        self.descriptions = {4: _Descriptions(index.ipv4), 6: _Descriptions(index.ipv6)}
+
+    def add(self, version: int, entries: np.ndarray) -> None:
+        matched = entries[entries != NO_MATCH]
+        if len(matched):
+            self.counts[version] += np.bincount(matched, minlength=len(self.counts[version]))
+
+    def summary(self) -> list[dict]:
+        hits = []
+        for version in (4, 6):
+            for entry in np.flatnonzero(self.counts[version]):
+                hits.append({**self.descriptions[version][int(entry)], "count": int(self.counts[version][entry])})
+        return sorted(hits, key=lambda hit: -hit["count"])
+
+
+def _classify(index: PrefixIndex, tokens: list[tuple[int, int, bytes]]) -> dict[int, tuple[list, np.ndarray]]:
+    """Return ``{version: (tokens, entries)}`` for the valid candidates of one chunk."""
+    classified = {}
+    for version, parse, lookup in (
+        (4, parse_ipv4_column, index.lookup_ipv4_array),
+        (6, parse_ipv6_column, index.lookup_ipv6_array),
+    ):
+        family = [token for token in tokens if token[1] == version]
+        if not family:
+            continue
+        addresses, valid = parse([text.decode("ascii") for _, _, text in family])
+        entries = np.where(valid, lookup(addresses), NO_MATCH)
+        classified[version] = ([token for token, ok in zip(family, valid) if ok], entries[valid])
+    return classified
+
+
+def scan_log(
+    path: str,
+    index: PrefixIndex,
+    emit_lines: bool = True,
+    max_lines: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[dict]:
+    """Scan a log file for addresses inside the networks of ``index``.
+
+    Args:
+        path (str): Log file to scan.
+        index (PrefixIndex): Networks to match against.
+        emit_lines (bool): Yield a record for every line with a matching address.
+        max_lines (int | None): Stop yielding line records after this many; counting continues.
+        chunk_size (int): Approximate number of bytes scanned at a time.
+
+    Yields:
+        dict: ``{"line", "text", "matches"}`` for each matching line, in file
+        order, followed by one ``{"summary": ...}`` record with totals and
+        per-network hit counts sorted by count.
+    """
+    hits = _Hits(index)
+    totals = {"bytes": 0, "lines": 0, "addresses": 0, "matched_addresses": 0, "matched_lines": 0}
+    emitted = 0
+
+    with open(path, "rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        view = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        try:
+            if view is not None and hasattr(view, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                view.madvise(mmap.MADV_SEQUENTIAL)
+            for start, end in _chunks(view, size, chunk_size) if view is not None else ():
+                data = view[start:end]
+                newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 0x0A)
+                first_line = totals["lines"]
+                totals["lines"] += len(newlines) + (not data.endswith(b"\n"))
+                totals["bytes"] += len(data)
+
+                classified = _classify(index, _tokens(data))
+                line_matches: dict[int, list[tuple[int, dict]]] = {}
+                for version, (valid_tokens, entries) in classified.items():
+                    totals["addresses"] += len(entries)
+                    hits.add(version, entries)
+                    descriptions = hits.descriptions[version]
+                    matched = np.flatnonzero(entries != NO_MATCH)
+                    totals["matched_addresses"] += len(matched)
+                    if not len(matched):
+                        continue
+                    positions = np.array([valid_tokens[row][0] for row in matched], dtype=np.int64)
+                    for row, line in zip(matched, np.searchsorted(newlines, positions)):
+                        match = {"ip": valid_tokens[row][2].decode("ascii"), **descriptions[int(entries[row])]}
+                        line_matches.setdefault(int(line), []).append((valid_tokens[row][0], match))
+
+                totals["matched_lines"] += len(line_matches)
+                if emit_lines:
+                    for line in sorted(line_matches):
+                        if max_lines is not None and emitted >= max_lines:
+                            break
+                        line_start = int(newlines[line - 1]) + 1 if line else 0
+                        line_end = int(newlines[line]) if line < len(newlines) else len(data)
+                        emitted += 1
+                        yield {
+                            "line": first_line + line + 1,
+                            "text": data[line_start:line_end].decode("utf-8", "replace").rstrip("\r"),
+                            "matches": [match for _, match in sorted(line_matches[line], key=lambda item: item[0])],
+                        }
+                _release(view, start, end)
+        finally:
+            if view is not None:
+                view.close()
+
+    yield {
+        "summary": {
+            **totals,
+            "truncated": emit_lines and max_lines is not None and emitted < totals["matched_lines"],
+            "hits": hits.summary(),
+        }
+    }
+
+
+def scan_log_for_networks(path: str, networks: Iterable[str], **options) -> Iterator[dict]:
+    """Like ``scan_log`` with an index built from ``cidr[,label]`` lines.
+
+    Raises:
+        ValueError: If a network is invalid.
+    """
+    return scan_log(path, PrefixIndex.from_lines(networks), **options)
@@ -0,0 +1,326 @@
+"""Request timing: ``Server-Timing`` headers and Prometheus metrics.
+
+When ``METRICS_ENABLED`` is set, ``init_metrics`` registers request hooks
+and the ``/metrics`` endpoint. Routes call ``request_timer().mark(stage)``
+after each stage; the hooks add a ``Server-Timing`` header with the stage
+durations and record them, the request total and a request counter in a
+metric store. When metrics are off no hooks are registered and
+``request_timer()`` returns a shared timer whose ``mark`` does nothing.
+
+``MemoryMetricStore`` keeps series in a per-process dictionary.
+``SharedMetricStore`` gives every process its own fixed-size table in a
+memory-mapped file in ``METRICS_DIR`` (for example under ``/dev/shm``), so
+workers never contend with each other, and ``/metrics`` sums the tables of
+all workers. When a worker exits, ``retire_process`` (called from the
+gunicorn ``child_exit`` hook) adds its table to one retired table and
+deletes its file, so counters keep their totals while the number of files
+stays bounded by the number of live workers. Histogram buckets are stored
+non-cumulatively (one increment per observation) and accumulated when
+rendered.
+"""
+
+import glob
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+
+from flask import Blueprint, Response, current_app, g, request
+
+DEFAULT_MAX_SERIES = 4096
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+PROMETHEUS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+# series key, value
+_SLOT = struct.Struct("=120sd")
+_KEY_SIZE = 120
+RETIRED_FILE = "metrics-retired.db"
+_HELP = {
+    "ipcal_requests_total": ("counter", "Requests handled, by endpoint, method and status."),
+    "ipcal_request_duration_seconds": ("histogram", "Time spent handling a request until the response is returned."),
+    "ipcal_stage_duration_seconds": ("histogram", "Time spent in each stage of a request."),
+}
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+class RequestTimer:
+    """Durations of the sequential stages of one request."""
+
+    __slots__ = ("start", "last", "stages")
+
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.stages: list[tuple[str, float]] = []
+
+    def mark(self, stage: str) -> None:
+        """Record the time since the previous mark as ``stage``."""
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+
+    def server_timing(self, total: float) -> str:
+        """Return the ``Server-Timing`` header value in milliseconds."""
+        entries = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.stages]
+        entries.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(entries)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def mark(self, stage: str) -> None:
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+def request_timer():
+    """Return the current request's timer, or a no-op timer when metrics are off."""
+    return g.get("request_timer", NULL_TIMER)
+
+
+def _bucket(seconds: float) -> str:
+    for bound in BUCKETS:
+        if seconds <= bound:
+            return repr(bound)
+    return "+Inf"
+
+
+def _labels(**labels) -> str:
+    escaped = {name: str(value).replace("\\", "\\\\").replace('"', '\\"') for name, value in labels.items()}
+    return ",".join(f'{name}="{value}"' for name, value in escaped.items())
+
+
+def _observations(name: str, labels: str, seconds: float) -> list[tuple[str, float]]:
+    return [
+        (f"{name}\t{labels}\t{_bucket(seconds)}", 1.0),
+        (f"{name}_sum\t{labels}\t", seconds),
+        (f"{name}_count\t{labels}\t", 1.0),
+    ]
+
+
+class MemoryMetricStore:
+    """Per-process metric series."""
+
+    def __init__(self):
+        self._values: dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def add_many(self, increments: list[tuple[str, float]]) -> None:
+        with self._lock:
+            for key, amount in increments:
+                self._values[key] += amount
+
+    def collect(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class SharedMetricStore:
+    """Per-process tables of series in memory-mapped files, merged on collection.
+
+    Each process writes only to ``metrics-<pid>.db`` in ``directory``; the
+    file is opened lazily so processes forked after the app is created get
+    their own. Tables of exited workers are folded into ``RETIRED_FILE`` by
+    ``retire_process``, so counters keep their totals across worker
+    restarts. Series past ``max_series`` are dropped.
+    """
+
+    def __init__(self, directory: str, max_series: int = DEFAULT_MAX_SERIES):
+        self.directory = directory
+        self.max_series = max_series
+        self.dropped = 0
+        self._pid = None
+        self._map = None
+        self._index: dict[str, int] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self) -> None:
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.db")
+        size = _SLOT.size * self.max_series
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        # A reused PID continues the series already in its file.
+        self._index = {}
+        for slot, (key, _) in enumerate(_SLOT.iter_unpack(self._map)):
+            if key[0]:
+                self._index[key.rstrip(b"\0").decode()] = slot * _SLOT.size
+        self._pid = os.getpid()
+
+    def add_many(self, increments: list[tuple[str, float]]) -> None:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            for key, amount in increments:
+                offset = self._index.get(key)
+                if offset is None:
+                    offset = self._allocate(key)
+                    if offset is None:
+                        continue
+                value = struct.unpack_from("=d", self._map, offset + _KEY_SIZE)[0]
+                struct.pack_into("=d", self._map, offset + _KEY_SIZE, value + amount)
+
+    def _allocate(self, key: str) -> int | None:
+        encoded = key.encode()
+        offset = len(self._index) * _SLOT.size
+        if len(encoded) > _KEY_SIZE or len(self._index) >= self.max_series:
+            self.dropped += 1
+            return None
+        # Write the value before the key so readers never see a key with a stale value.
+        struct.pack_into("=d", self._map, offset + _KEY_SIZE, 0.0)
+        self._map[offset:offset + _KEY_SIZE] = encoded.ljust(_KEY_SIZE, b"\0")
+        self._index[key] = offset
+        return offset
+
+    def collect(self) -> dict[str, float]:
+        values: dict[str, float] = defaultdict(float)
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.db")):
+            for key, value in _read_table(path).items():
+                values[key] += value
+        return dict(values)
+
+
+def _read_table(path: str) -> dict[str, float]:
+    """Return the series in one table file, or nothing if it has gone."""
+    try:
+        with open(path, "rb") as handle:
+            data = handle.read()
+    except OSError:
+        return {}
+    return {
+        key.rstrip(b"\0").decode(): value
+        for key, value in _SLOT.iter_unpack(data[: len(data) - len(data) % _SLOT.size])
+        if key[0]
+    }
+
+
+def retire_process(directory: str, pid: int) -> bool:
+    """Add the table of exited process ``pid`` to the retired table and delete its file.
+
+    Must not run concurrently for the same ``directory``; the gunicorn master
+    calls it for one worker at a time. The retired table is replaced
+    atomically, so readers see either the old or the new totals, but a
+    ``/metrics`` request racing with the replacement can briefly count the
+    worker twice or not at all.
+
+    Returns:
+        bool: False if the process left no file.
+    """
+    path = os.path.join(directory, f"metrics-{pid}.db")
+    table = _read_table(path)
+    if not table and not os.path.exists(path):
+        return False
+    retired_path = os.path.join(directory, RETIRED_FILE)
+    totals = _read_table(retired_path)
+    for key, value in table.items():
+        totals[key] = totals.get(key, 0.0) + value
+    temporary = f"{retired_path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as handle:
+        for key, value in totals.items():
+            handle.write(_SLOT.pack(key.encode(), value))
+    os.replace(temporary, retired_path)
+    os.unlink(path)
+    return True
+
+
+def retire_exited(directory: str) -> int:
+    """Retire the tables of processes that are no longer running; return how many."""
+    retired = 0
+    for path in glob.glob(os.path.join(directory, "metrics-*.db")):
+        pid = os.path.basename(path)[len("metrics-"):-len(".db")]
+        if not pid.isdigit():
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            retired += retire_process(directory, int(pid))
+        except PermissionError:
+            pass
+    return retired
+
+
+def create_metric_store(directory: str | None = None, max_series: int = DEFAULT_MAX_SERIES):
+    """Return a shared store when ``directory`` is set, else an in-memory one."""
+    if directory:
+        return SharedMetricStore(directory, max_series=max_series)
+    return MemoryMetricStore()
+
+
+def record_request(store, endpoint: str, method: str, status: int, total: float, stages) -> None:
+    """Record one request's counter, total duration and stage durations in ``store``."""
+    increments = [(f"ipcal_requests_total\t{_labels(endpoint=endpoint, method=method, status=status)}\t", 1.0)]
+    increments += _observations("ipcal_request_duration_seconds", _labels(endpoint=endpoint), total)
+    for stage, seconds in stages:
+        increments += _observations(
+            "ipcal_stage_duration_seconds", _labels(endpoint=endpoint, stage=stage), seconds
+        )
+    store.add_many(increments)
+
+
+def render_prometheus(values: dict[str, float]) -> str:
+    """Render collected series in the Prometheus text exposition format."""
+    series: dict[str, dict[str, dict[str, float]]] = defaultdict(lambda: defaultdict(dict))
+    for key, value in values.items():
+        name, labels, bucket = key.split("\t")
+        series[name][labels][bucket] = value
+
+    lines = []
+    for family, (kind, description) in _HELP.items():
+        lines += [f"# HELP {family} {description}", f"# TYPE {family} {kind}"]
+        if kind == "counter":
+            for labels, value in sorted(series[family].items()):
+                lines.append(f"{family}{{{labels}}} {value['']:g}")
+            continue
+        for labels, buckets in sorted(series[family].items()):
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0.0
+            for bound in [repr(bound) for bound in BUCKETS] + ["+Inf"]:
+                cumulative += buckets.get(bound, 0.0)
+                lines.append(f'{family}_bucket{{{prefix}le="{bound}"}} {cumulative:g}')
+            lines.append(f"{family}_sum{{{labels}}} {series[f'{family}_sum'][labels].get('', 0.0)!r}")
+            lines.append(f"{family}_count{{{labels}}} {series[f'{family}_count'][labels].get('', 0.0):g}")
+    return "\n".join(lines) + "\n"
+
+
+def _start_timer():
+    g.request_timer = RequestTimer()
+
+
+def _finish_timer(response):
+    timer = g.pop("request_timer", None)
+    if timer is None:
+        return response
+    total = time.perf_counter() - timer.start
+    response.headers["Server-Timing"] = timer.server_timing(total)
+    record_request(
+        current_app.extensions["metrics"],
+        request.endpoint or "unmatched",
+        request.method,
+        response.status_code,
+        total,
+        timer.stages,
+    )
+    return response
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """Expose request metrics from every worker in Prometheus format."""
+    return Response(render_prometheus(current_app.extensions["metrics"].collect()), mimetype=PROMETHEUS_MIMETYPE)
+
+
+def init_metrics(app) -> None:
+    """Register the timing hooks, metric store and ``/metrics`` endpoint on ``app``."""
+    app.extensions["metrics"] = create_metric_store(app.config.get("METRICS_DIR"))
+    app.before_request(_start_timer)
+    app.after_request(_finish_timer)
+    app.register_blueprint(metrics_bp)
@@ -0,0 +1,207 @@
+"""Cacheable GET pages for addresses and networks.
+
+Every result has one canonical URL:
+
+- ``/ip/<address>``: details of one address.
+- ``/ip/<address>/<prefix>``: an address and its network, as ``POST /calculate`` shows them.
+- ``/net/<address>/<prefix>``: a network, named by its network address.
+
+Other spellings of the same result (uppercase or expanded IPv6, netmasks
+instead of prefix lengths, host bits in a ``/net`` address) are redirected
+permanently to the canonical URL, so caches hold one copy per result.
+Responses are HTML or JSON, chosen by ``?format=`` or the ``Accept`` header.
+They carry a strong ETag built from the canonical path, the format, the
+content version and the digests of the range database (see ``range_db``)
+and the utilization snapshot, and are public for ``PERMALINK_MAX_AGE``
+seconds. With either data source configured they are ``no-cache`` instead,
+so caches revalidate the ETag on every request and a reloaded database
+shows up at once. A matching ``If-None-Match`` gets ``304`` before
+anything is rendered. The pages never
+touch the session, so a proxy or CDN can store them.
+"""
+
+import hashlib
+from urllib.parse import unquote
+
+from flask import Blueprint, current_app, jsonify, redirect, render_template, request, url_for
+
+from .routes import address_annotation, check_rate_limit, network_utilization
+from .validation import parse_ip_address, parse_prefix, validate_raw_input
+
+permalink_bp = Blueprint("permalink", __name__)
+# Bump when result fields change so cached responses get new ETags; template
+# changes are picked up from the template sources.
+RESULT_FORMAT_VERSION = 1
+PERMALINK_TEMPLATES = ("permalink.html", "_result.html")
+ERROR_MAX_AGE = 60
+_FORMATS = {"text/html": "html", "application/json": "json"}
+
+
+def _negotiate_format() -> str:
+    """Return ``"json"`` or ``"html"`` from ``?format=`` or the ``Accept`` header."""
+    requested = request.args.get("format")
+    if requested in _FORMATS.values():
+        return requested
+    accept = request.accept_mimetypes
+    # Rank by quality, then by being named explicitly, so that
+    # "application/json, */*" gets JSON and "*/*" gets HTML.
+    ranks = {mimetype: (accept[mimetype], mimetype in accept.values()) for mimetype in _FORMATS}
+    return "json" if ranks["application/json"] > ranks["text/html"] else "html"
+
+
+def _cacheable(response, max_age: int | None = None):
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["PERMALINK_MAX_AGE"] if max_age is None else max_age
+    response.vary.add("Accept")
+    return response
+
+
+def _revalidated(response):
+    """Make caches check the ETag on every request when the page shows reloadable data."""
+    extensions = current_app.extensions
+    if extensions.get("range_db") is not None or extensions.get("utilization") is not None:
+        response.cache_control.max_age = None
+        response.cache_control.no_cache = True
+    return response
+
+
+def _error(fmt: str, message: str, status: int, **context):
+    if fmt == "json":
+        response = jsonify(error=message)
+    else:
+        response = current_app.make_response(
+            render_template("permalink.html", title="Error", error=message, **context)
+        )
+    response.status_code = status
+    return _cacheable(response, ERROR_MAX_AGE)
+
+
+def _etag(fmt: str) -> str:
+    version = current_app.extensions["permalink_version"]
+    range_db = current_app.extensions.get("range_db")
+    if range_db is not None:
+        version = f"{version}:{range_db.digest}"
+    utilization = current_app.extensions.get("utilization")
+    if utilization is not None:
+        version = f"{version}:{utilization.digest}"
+    return hashlib.blake2b(f"{version}\n{fmt}\n{request.path}".encode(), digest_size=16).hexdigest()
+
+
+def _parse(address: str, prefix: str | None):
+    """Return the parsed address and prefix length (``None`` without a prefix).
+
+    Raises:
+        ValueError: If either value is invalid.
+    """
+    ip = parse_ip_address(validate_raw_input(address, "IP address"))
+    if prefix is None:
+        return ip, None
+    return ip, parse_prefix(validate_raw_input(prefix, "Network input"), ip.version)
+
+
+def _respond(endpoint: str, address: str, prefix: str | None = None):
+    """Answer one permalink request for ``endpoint``."""
+    fmt = _negotiate_format()
+    if check_rate_limit():
+        response = _error(fmt, "Too many requests. Please try again later.", 429)
+        response.cache_control.no_store = True
+        response.cache_control.public = False
+        response.cache_control.max_age = None
+        return response
+
+    try:
+        ip, prefixlen = _parse(address, prefix)
+    except ValueError as exc:
+        return _error(fmt, str(exc), 404, query_address=address, query_network=prefix or "")
+
+    cache = current_app.extensions["calculation_cache"]
+    address_result = network_result = None
+    annotation, utilization = {}, None
+    if endpoint != "permalink.network":
+        address_result = cache.address(ip)
+        annotation = address_annotation(ip)
+    if prefixlen is not None:
+        network_result = cache.network(ip.version, int(ip), prefixlen)
+        utilization = network_utilization(network_result)
+
+    if endpoint == "permalink.network":
+        canonical = {"address": network_result.as_dict()["Network Address"], "prefix": prefixlen}
+    else:
+        canonical = {"address": str(ip), "prefix": prefixlen}
+    path = url_for(endpoint, **canonical)
+    if unquote(path) != request.script_root + request.path:
+        target = url_for(endpoint, format=request.args.get("format"), **canonical)
+        return _cacheable(redirect(target, code=301))
+
+    etag = _etag(fmt)
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    elif fmt == "json":
+        payload = {}
+        if address_result is not None:
+            payload["ip"] = {**address_result.as_dict(), **annotation}
+        if network_result is not None:
+            payload["network"] = network_result.as_dict()
+            payload["regex"] = network_result.regex
+            if utilization is not None:
+                payload["utilization"] = utilization
+        response = jsonify(payload)
+    else:
+        title = canonical["address"] if prefixlen is None else f"{canonical['address']}/{prefixlen}"
+        response = current_app.make_response(
+            render_template(
+                "permalink.html",
+                title=title,
+                address=address_result,
+                annotation=annotation,
+                network=network_result,
+                utilization=utilization,
+                query_address=canonical["address"],
+                query_network=prefixlen if prefixlen is not None else "",
+            )
+        )
+    response.set_etag(etag)
+    return _revalidated(_cacheable(response))
+
+
+@permalink_bp.route('/ip')
+def lookup():
+    """Redirect the GET form on permalink pages to the canonical URL."""
+    fmt = _negotiate_format()
+    address = request.args.get("ip-address")
+    prefix = request.args.get("network") or None
+    try:
+        ip, prefixlen = _parse(address, prefix)
+    except ValueError as exc:
+        return _error(fmt, str(exc), 400, query_address=address or "", query_network=prefix or "")
+    if prefixlen is None:
+        return _cacheable(redirect(url_for("permalink.address", address=str(ip))))
+    return _cacheable(redirect(url_for("permalink.calculation", address=str(ip), prefix=prefixlen)))
+
+
+@permalink_bp.route('/ip/<address>')
+def address(address):
+    """Show the details of one address."""
+    return _respond("permalink.address", address)
+
+
+@permalink_bp.route('/ip/<address>/<prefix>')
+def calculation(address, prefix):
+    """Show an address and the network of ``prefix`` containing it."""
+    return _respond("permalink.calculation", address, prefix)
+
+
+@permalink_bp.route('/net/<address>/<prefix>')
+def network(address, prefix):
+    """Show the network of ``prefix`` containing ``address``."""
+    return _respond("permalink.network", address, prefix)
+
+
+def init_permalinks(app) -> None:
+    """Register the permalink routes and compute the content version used in their ETags."""
+    digest = hashlib.blake2b(str(RESULT_FORMAT_VERSION).encode(), digest_size=8)
+    for name in PERMALINK_TEMPLATES:
+        source, _, _ = app.jinja_loader.get_source(app.jinja_env, name)
+        digest.update(source.encode())
+    app.extensions["permalink_version"] = digest.hexdigest()
+    app.register_blueprint(permalink_bp)
@@ -0,0 +1,243 @@
+"""Longest-prefix-match index for classifying addresses against CIDR tables.
+
+Nested prefixes are flattened into a sorted table of non-overlapping
+intervals, each owned by its most specific prefix. A lookup is a single
+binary search over that table, and bulk lookups are one ``np.searchsorted``
+call. IPv6 boundaries are stored as 16-byte big-endian keys so they sort and
+search like 128-bit integers.
+"""
+
+import ipaddress
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+
+from .calculations import ADDRESS_BITS, format_ipv4, format_ipv6
+from .vectorized import parse_address_columns
+
+NO_MATCH = -1
+_TABLE_FIELDS = ("starts", "owners", "networks", "prefixlens", "labels")
+
+
+def ipv6_keys(addresses: np.ndarray) -> np.ndarray:
+    """Return ``(n, 2)`` ``uint64`` halves as sortable 16-byte keys."""
+    return np.ascontiguousarray(addresses, dtype=">u8").view("S16").reshape(-1)
+
+
+def _ipv6_halves(values: Sequence[int]) -> np.ndarray:
+    return np.array(
+        [[value >> 64, value & 0xFFFF_FFFF_FFFF_FFFF] for value in values], dtype=np.uint64
+    ).reshape(-1, 2)
+
+
+class PrefixTable:
+    """Flattened interval table for a single address family."""
+
+    def __init__(
+        self,
+        version: int,
+        starts: np.ndarray,
+        owners: np.ndarray,
+        networks: np.ndarray,
+        prefixlens: np.ndarray,
+        labels: np.ndarray,
+    ):
+        self.version = version
+        self.starts = starts
+        self.owners = owners
+        self.networks = networks
+        self.prefixlens = prefixlens
+        self.labels = labels
+
+    def __len__(self) -> int:
+        return len(self.prefixlens)
+
+    @classmethod
+    def build(cls, version: int, entries: Iterable[tuple[int, int, str]]) -> "PrefixTable":
+        """Build a table from ``(network, prefixlen, label)`` integer entries.
+
+        Duplicate prefixes keep the first label seen.
+        """
+        bits = ADDRESS_BITS[version]
+        unique: dict[tuple[int, int], str] = {}
+        for network, prefixlen, label in entries:
+            unique.setdefault((network, prefixlen), label)
+        prefixes = sorted(unique)
+
+        starts = [0]
+        owners = [NO_MATCH]
+
+        def emit(start: int, owner: int) -> None:
+            if starts[-1] == start:
+                owners[-1] = owner
+                if len(owners) > 1 and owners[-2] == owner:
+                    starts.pop()
+                    owners.pop()
+            elif owners[-1] != owner:
+                starts.append(start)
+                owners.append(owner)
+
+        stack: list[tuple[int, int]] = []
+        for entry, (network, prefixlen) in enumerate(prefixes):
+            while stack and stack[-1][0] < network:
+                end, _ = stack.pop()
+                emit(end + 1, stack[-1][1] if stack else NO_MATCH)
+            emit(network, entry)
+            stack.append((network | ((1 << (bits - prefixlen)) - 1), entry))
+        while stack:
+            end, _ = stack.pop()
+            if end + 1 < 1 << bits:
+                emit(end + 1, stack[-1][1] if stack else NO_MATCH)
+
+        if version == 4:
+            start_keys = np.array(starts, dtype=np.uint32)
+            networks = np.array([network for network, _ in prefixes], dtype=np.uint32)
+        else:
+            start_keys = ipv6_keys(_ipv6_halves(starts))
+            networks = _ipv6_halves([network for network, _ in prefixes])
+        return cls(
+            version,
+            start_keys,
+            np.array(owners, dtype=np.int32),
+            networks,
+            np.array([prefixlen for _, prefixlen in prefixes], dtype=np.uint8),
+            np.array([unique[prefix] for prefix in prefixes], dtype=str),
+        )
+
+    def lookup_keys(self, keys: np.ndarray) -> np.ndarray:
+        """Return the owning entry of each key, or ``NO_MATCH``."""
+        positions = np.searchsorted(self.starts, keys, side="right") - 1
+        return self.owners[positions]
+
+    def prefix(self, entry: int) -> str:
+        """Return the CIDR string of an entry."""
+        if self.version == 4:
+            network = format_ipv4(int(self.networks[entry]))
+        else:
+            high, low = self.networks[entry]
+            network = format_ipv6((int(high) << 64) | int(low))
+        return f"{network}/{int(self.prefixlens[entry])}"
+
+    def match(self, entry: int) -> dict | None:
+        """Return the ``{"prefix", "label"}`` description of an entry."""
+        if entry == NO_MATCH:
+            return None
+        return {"prefix": self.prefix(entry), "label": str(self.labels[entry]) or None}
+
+
+class PrefixIndex:
+    """Longest-prefix-match index over IPv4 and IPv6 prefixes."""
+
+    def __init__(self, ipv4: PrefixTable, ipv6: PrefixTable):
+        self.ipv4 = ipv4
+        self.ipv6 = ipv6
+
+    def __len__(self) -> int:
+        return len(self.ipv4) + len(self.ipv6)
+
+    @classmethod
+    def build(cls, prefixes: Iterable[str | tuple[str, str]]) -> "PrefixIndex":
+        """Build an index from CIDR strings or ``(cidr, label)`` pairs.
+
+        Raises:
+            ValueError: If a prefix is not a valid network.
+        """
+        entries: dict[int, list[tuple[int, int, str]]] = {4: [], 6: []}
+        for item in prefixes:
+            cidr, label = (item, "") if isinstance(item, str) else item
+            try:
+                network = ipaddress.ip_network(cidr.strip(), strict=False)
+            except ValueError as exc:
+                raise ValueError(f"Invalid prefix: {cidr!r}") from exc
+            entries[network.version].append(
+                (int(network.network_address), network.prefixlen, label or "")
+            )
+        return cls(PrefixTable.build(4, entries[4]), PrefixTable.build(6, entries[6]))
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str]) -> "PrefixIndex":
+        """Build an index from ``cidr[,label]`` lines; blank lines and ``#`` comments are skipped."""
+        return cls.build(_iter_prefix_lines(lines))
+
+    @classmethod
+    def from_file(cls, path: str) -> "PrefixIndex":
+        """Build an index from a text file of ``cidr[,label]`` lines."""
+        with open(path, encoding="utf-8") as handle:
+            return cls.from_lines(handle)
+
+    def save(self, path: str) -> None:
+        """Serialise the index to an uncompressed ``.npz`` file."""
+        arrays = {}
+        for table in (self.ipv4, self.ipv6):
+            for name in _TABLE_FIELDS:
+                arrays[f"ipv{table.version}_{name}"] = getattr(table, name)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "PrefixIndex":
+        """Load an index written by ``save``."""
+        with np.load(path, allow_pickle=False) as data:
+            tables = [
+                PrefixTable(version, *(data[f"ipv{version}_{name}"] for name in _TABLE_FIELDS))
+                for version in (4, 6)
+            ]
+        return cls(*tables)
+
+    def lookup_ipv4_array(self, addresses: np.ndarray) -> np.ndarray:
+        """Return IPv4 entry ids for a ``uint32`` address array."""
+        return self.ipv4.lookup_keys(np.asarray(addresses, dtype=np.uint32))
+
+    def lookup_ipv6_array(self, addresses: np.ndarray) -> np.ndarray:
+        """Return IPv6 entry ids for an ``(n, 2)`` ``uint64`` address array."""
+        return self.ipv6.lookup_keys(ipv6_keys(addresses))
+
+    def lookup(self, address: str) -> dict | None:
+        """Return the most specific prefix containing ``address``.
+
+        Raises:
+            ValueError: If the address is invalid.
+        """
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError as exc:
+            raise ValueError("Invalid IP address format.") from exc
+        if ip.version == 4:
+            entry = self.ipv4.lookup_keys(np.array([int(ip)], dtype=np.uint32))[0]
+            return self.ipv4.match(int(entry))
+        entry = self.ipv6.lookup_keys(ipv6_keys(_ipv6_halves([int(ip)])))[0]
+        return self.ipv6.match(int(entry))
+
+    def lookup_many(self, addresses: Sequence[str]) -> list[dict | None | ValueError]:
+        """Look up many address strings at once.
+
+        Invalid addresses are returned as ``ValueError`` instances in place.
+        """
+        results: list = [None] * len(addresses)
+        for version, rows, parsed, valid in parse_address_columns(addresses):
+            table = self.ipv4 if version == 4 else self.ipv6
+            entries = table.lookup_keys(parsed if version == 4 else ipv6_keys(parsed))
+            for position, is_valid, entry in zip(rows.tolist(), valid.tolist(), entries.tolist()):
+                if is_valid:
+                    results[position] = table.match(entry)
+                    continue
+                try:
+                    results[position] = self.lookup(addresses[position])
+                except ValueError as exc:
+                    results[position] = exc
+        return results
+
+
+def _iter_prefix_lines(lines: Iterable[str]) -> Iterable[tuple[str, str]]:
+    for line in lines:
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        cidr, _, label = line.replace(",", " ", 1).partition(" ")
+        yield cidr, label.strip()
+
+
+def load_prefix_index(path: str) -> PrefixIndex:
+    """Load a saved ``.npz`` index or build one from a CIDR text file."""
+    if path.endswith(".npz"):
+        return PrefixIndex.load(path)
+    return PrefixIndex.from_file(path)
@@ -0,0 +1,494 @@
+"""Memory-mapped range database for annotating addresses from an inventory.
+
+``compile_csv`` turns CSV inventories (a ``network`` column holding a CIDR,
+an address or a ``first-last`` range, or ``start`` and ``end`` columns, plus
+any number of field columns such as ``owner``, ``site``, ``vlan`` and
+``asn``) into one binary file. Nested ranges are flattened like
+``PrefixTable``: every address is owned by the innermost range containing
+it, and identical ranges keep the later row. Partially overlapping ranges
+are rejected.
+
+The file is a fixed header followed by little-endian arrays:
+
+- IPv4 interval starts (``uint32``) and owning record ids (``int32``, ``-1`` for gaps),
+  plus a 65537-entry bucket table: entry ``b`` is the interval holding
+  address ``b << 16``.
+- IPv6 interval starts as 16-byte big-endian keys for ``np.searchsorted``,
+  the same starts as ``uint64`` high and low halves for ``bisect``, record
+  ids, and a bucket table over the high halves: the span from the first to
+  the last non-zero start is cut into 65536 slices of ``2**shift``, with
+  the base and shift stored in the header.
+- Records as one string id per field, deduplicated.
+- A string pool: ``uint64`` offsets and UTF-8 data; string 0 is empty and
+  the first strings are the field names.
+
+``RangeDatabase`` maps the file read-only and reads it in place. Every
+process that opens it shares the same page-cache pages, including workers
+forked from a preloading master. A single lookup reads two bucket entries
+and bisects only the intervals of that bucket through a ``memoryview``,
+so nothing is copied into the process. Arrays go through one
+``np.searchsorted``.
+``ReloadingRangeDatabase`` checks the file at most every few seconds and
+maps the new file when it is replaced. ``compile_csv`` writes a temporary
+file and renames it over the old one, so readers never see a partial file.
+Readers already using the old mapping keep it until they finish.
+"""
+
+import argparse
+import bisect
+import csv
+import hashlib
+import ipaddress
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Iterable, Sequence
+from functools import lru_cache
+
+import numpy as np
+
+from .prefix_index import NO_MATCH, ipv6_keys
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"IPCALRDB"
+FORMAT_VERSION = 1
+DEFAULT_RELOAD_INTERVAL = 5.0
+RANGE_COLUMNS = ("network", "start", "end")
+# Display names for well-known fields; other fields are shown as written in the CSV header.
+FIELD_LABELS = {"owner": "Owner", "site": "Site", "vlan": "VLAN", "asn": "ASN"}
+# magic, format version, field count, IPv6 bucket shift, IPv4 intervals,
+# IPv6 intervals, records, strings, string bytes, IPv6 bucket base, digest
+# of everything after the header.
+_HEADER = struct.Struct("<8sIIIQQQQQQ16s")
+_U64_MASK = (1 << 64) - 1
+_BUCKET_SHIFT = 16
+_BUCKETS = (1 << (32 - _BUCKET_SHIFT)) + 1
+_SECTIONS = (
+    ("ipv4_starts", "<u4", "ipv4"),
+    ("ipv4_owners", "<i4", "ipv4"),
+    ("ipv4_buckets", "<u4", "buckets"),
+    ("ipv6_keys", "S16", "ipv6"),
+    ("ipv6_high", "<u8", "ipv6"),
+    ("ipv6_low", "<u8", "ipv6"),
+    ("ipv6_owners", "<i4", "ipv6"),
+    ("ipv6_buckets", "<u4", "buckets"),
+    ("records", "<u4", "record_cells"),
+    ("string_offsets", "<u8", "string_offsets"),
+    ("string_data", "u1", "string_bytes"),
+)
+
+
+def _layout(counts: dict[str, int]) -> tuple[dict[str, tuple[int, str, int]], int]:
+    """Return ``{section: (offset, dtype, count)}`` and the file size for the given counts."""
+    layout = {}
+    offset = _HEADER.size
+    for name, dtype, count_name in _SECTIONS:
+        offset = (offset + 7) // 8 * 8
+        count = counts[count_name]
+        layout[name] = (offset, dtype, count)
+        offset += np.dtype(dtype).itemsize * count
+    return layout, offset
+
+
+def _counts(
+    fields: int, ipv4: int, ipv6: int, records: int, strings: int, string_bytes: int
+) -> dict[str, int]:
+    return {
+        "ipv4": ipv4,
+        "buckets": _BUCKETS,
+        "ipv6": ipv6,
+        "record_cells": records * fields,
+        "string_offsets": strings + 1,
+        "string_bytes": string_bytes,
+    }
+
+
+def _parse_range(row: dict) -> tuple[int, int, int]:
+    """Return ``(version, first, last)`` for one inventory row.
+
+    Raises:
+        ValueError: If the row has no valid network or range.
+    """
+    text = (row.get("network") or "").strip()
+    try:
+        if not text and row.get("start") and row.get("end"):
+            first = ipaddress.ip_address(row["start"].strip())
+            last = ipaddress.ip_address(row["end"].strip())
+        elif "-" in text:
+            start, _, end = text.partition("-")
+            first, last = ipaddress.ip_address(start.strip()), ipaddress.ip_address(end.strip())
+        else:
+            network = ipaddress.ip_network(text, strict=False)
+            first, last = network.network_address, network.broadcast_address
+    except ValueError as exc:
+        raise ValueError(f"Invalid network or range: {text or row.get('start')!r}") from exc
+    if first.version != last.version or first > last:
+        raise ValueError(f"Invalid range: {first}-{last}")
+    return first.version, int(first), int(last)
+
+
+def _flatten(ranges: list[tuple[int, int, int]], bits: int) -> tuple[list[int], list[int]]:
+    """Flatten ``(first, last, record)`` ranges into interval starts and owners."""
+    starts = [0]
+    owners = [NO_MATCH]
+
+    def emit(start: int, owner: int) -> None:
+        if starts[-1] == start:
+            owners[-1] = owner
+            if len(owners) > 1 and owners[-2] == owner:
+                starts.pop()
+                owners.pop()
+        elif owners[-1] != owner:
+            starts.append(start)
+            owners.append(owner)
+
+    stack: list[tuple[int, int]] = []
+    # Sorting by first address, widest first, visits parents before children;
+    # the stable sort keeps identical ranges in row order so the later one wins.
+    for first, last, record in sorted(ranges, key=lambda item: (item[0], -item[1])):
+        while stack and stack[-1][0] < first:
+            end, _ = stack.pop()
+            emit(end + 1, stack[-1][1] if stack else NO_MATCH)
+        if stack and last > stack[-1][0]:
+            raise ValueError("Ranges overlap without one containing the other.")
+        emit(first, record)
+        stack.append((last, record))
+    while stack:
+        end, _ = stack.pop()
+        if end + 1 < 1 << bits:
+            emit(end + 1, stack[-1][1] if stack else NO_MATCH)
+    return starts, owners
+
+
+def _ipv6_buckets(keys: np.ndarray, high: np.ndarray) -> tuple[np.ndarray, int, int]:
+    """Return the IPv6 bucket table, base and shift for sorted interval starts."""
+    base = int(high[1]) if len(high) > 1 else 0
+    shift = max(0, (int(high[-1]) - base).bit_length() - _BUCKET_SHIFT)
+    bucket_high = [base + (bucket << shift) for bucket in range(_BUCKETS)]
+    inside = [value for value in bucket_high if value <= _U64_MASK]
+    bucket_keys = ipv6_keys(np.array([[value, 0] for value in inside], dtype=np.uint64).reshape(-1, 2))
+    # Buckets starting past the address space end after the last start.
+    past_end = np.full(_BUCKETS - len(inside), len(keys) - 1, dtype=np.int64)
+    inside_buckets = np.searchsorted(keys, bucket_keys, side="right") - 1
+    return np.concatenate([inside_buckets, past_end]), base, shift
+
+
+def build_range_db(rows: Iterable[dict], fields: Sequence[str], path: str) -> dict:
+    """Compile inventory rows into a range database at ``path``, replacing it atomically.
+
+    Args:
+        rows (Iterable[dict]): Rows with a range (see ``RANGE_COLUMNS``) and field values.
+        fields (Sequence[str]): Field names to store, in display order.
+        path (str): Output file.
+
+    Returns:
+        dict: Counts of ``rows``, ``records``, ``ipv4_intervals`` and ``ipv6_intervals``.
+
+    Raises:
+        ValueError: If a row is invalid or ranges partially overlap.
+    """
+    strings: dict[str, int] = {"": 0}
+    for name in fields:
+        strings.setdefault(name, len(strings))
+    records: dict[tuple[int, ...], int] = {}
+    ranges: dict[int, list[tuple[int, int, int]]] = {4: [], 6: []}
+    row_count = 0
+    for row_count, row in enumerate(rows, 1):
+        version, first, last = _parse_range(row)
+        texts = ((row.get(name) or "").strip() for name in fields)
+        values = tuple(strings.setdefault(value, len(strings)) for value in texts)
+        record = records.setdefault(values, len(records))
+        ranges[version].append((first, last, record))
+
+    ipv4_starts, ipv4_owners = _flatten(ranges[4], 32)
+    ipv6_starts, ipv6_owners = _flatten(ranges[6], 128)
+    encoded = [value.encode("utf-8") for value in strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(value) for value in encoded], out=string_offsets[1:])
+    high = np.array([start >> 64 for start in ipv6_starts], dtype="<u8")
+    low = np.array([start & _U64_MASK for start in ipv6_starts], dtype="<u8")
+    keys = ipv6_keys(np.stack([high, low], axis=1))
+    ipv6_bucket_table, ipv6_base, ipv6_shift = _ipv6_buckets(keys, high)
+    ipv4_array = np.array(ipv4_starts, dtype="<u4")
+    bucket_starts = np.arange(_BUCKETS, dtype=np.uint64) << _BUCKET_SHIFT
+    buckets = np.searchsorted(ipv4_array, bucket_starts, side="right") - 1
+    # The last entry bounds the last bucket: it is the final interval.
+    buckets[-1] = len(ipv4_starts) - 1
+    arrays = {
+        "ipv4_starts": ipv4_array,
+        "ipv4_buckets": buckets,
+        "ipv4_owners": np.array(ipv4_owners, dtype="<i4"),
+        "ipv6_keys": keys,
+        "ipv6_high": high,
+        "ipv6_low": low,
+        "ipv6_owners": np.array(ipv6_owners, dtype="<i4"),
+        "ipv6_buckets": ipv6_bucket_table,
+        "records": np.array(list(records), dtype="<u4").reshape(-1),
+        "string_offsets": string_offsets,
+        "string_data": np.frombuffer(b"".join(encoded), dtype="u1"),
+    }
+    counts = _counts(
+        len(fields), len(ipv4_starts), len(ipv6_starts), len(records), len(encoded),
+        int(string_offsets[-1]),
+    )
+    layout, size = _layout(counts)
+    body = bytearray(size - _HEADER.size)
+    for name, (offset, dtype, count) in layout.items():
+        data = arrays[name].astype(dtype, copy=False).tobytes()
+        body[offset - _HEADER.size : offset - _HEADER.size + len(data)] = data
+    digest = hashlib.blake2b(body, digest_size=16).digest()
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(fields), ipv6_shift, len(ipv4_starts), len(ipv6_starts),
+        len(records), len(encoded), int(string_offsets[-1]), ipv6_base, digest,
+    )
+
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=".range-db-", delete=False) as handle:
+        try:
+            handle.write(header)
+            handle.write(body)
+            handle.flush()
+            os.fsync(handle.fileno())
+        except BaseException:
+            handle.close()
+            os.unlink(handle.name)
+            raise
+    os.chmod(handle.name, 0o644)
+    os.replace(handle.name, path)
+    return {
+        "rows": row_count,
+        "records": len(records),
+        "ipv4_intervals": len(ipv4_starts),
+        "ipv6_intervals": len(ipv6_starts),
+    }
+
+
+def compile_csv(paths: Sequence[str], output: str) -> dict:
+    """Compile CSV inventories with a shared header layout into ``output``.
+
+    Every column other than ``network``, ``start`` and ``end`` is stored as
+    a field, in the order of the first file's header.
+
+    Raises:
+        ValueError: If a file has no range column or a row is invalid.
+    """
+    fields: list[str] = []
+
+    def rows():
+        for path in paths:
+            with open(path, newline="", encoding="utf-8-sig") as handle:
+                for row in csv.DictReader(handle):
+                    yield {(key or "").strip().lower(): value for key, value in row.items()}
+
+    for path in paths:
+        with open(path, newline="", encoding="utf-8-sig") as handle:
+            header = [column.strip().lower() for column in next(csv.reader(handle), [])]
+        if "network" not in header and not {"start", "end"} <= set(header):
+            raise ValueError(f"{path}: needs a 'network' column or 'start' and 'end' columns.")
+        fields.extend(
+            column for column in header if column not in RANGE_COLUMNS and column not in fields
+        )
+    return build_range_db(rows(), fields, output)
+
+
+class RangeDatabase:
+    """A range database file mapped read-only."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as handle:
+            self.stat = os.fstat(handle.fileno())
+            if self.stat.st_size < _HEADER.size:
+                raise ValueError(f"{path} is not a range database.")
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic, version, fields, ipv6_shift, ipv4, ipv6, records, strings, string_bytes, ipv6_base,
+            digest,
+        ) = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} range database.")
+        layout, size = _layout(_counts(fields, ipv4, ipv6, records, strings, string_bytes))
+        if size != self.stat.st_size:
+            raise ValueError(f"{path} is truncated or corrupt.")
+        self.digest = digest.hex()
+        self.field_count = fields
+        self._ipv6_base = ipv6_base
+        self._ipv6_shift = ipv6_shift
+
+        arrays = {
+            name: np.frombuffer(self._map, dtype=dtype, count=count, offset=offset)
+            for name, (offset, dtype, count) in layout.items()
+        }
+        self.arrays = arrays
+        view = memoryview(self._map)
+
+        def scalar_view(name: str, code: str) -> memoryview:
+            offset, dtype, count = layout[name]
+            return view[offset : offset + np.dtype(dtype).itemsize * count].cast(code)
+
+        # Native-order views for ``bisect``; the file is little-endian.
+        self._ipv4_starts = scalar_view("ipv4_starts", "I")
+        self._ipv4_owners = scalar_view("ipv4_owners", "i")
+        self._ipv4_buckets = scalar_view("ipv4_buckets", "I")
+        self._ipv6_high = scalar_view("ipv6_high", "Q")
+        self._ipv6_low = scalar_view("ipv6_low", "Q")
+        self._ipv6_owners = scalar_view("ipv6_owners", "i")
+        self._ipv6_buckets = scalar_view("ipv6_buckets", "I")
+        self._records = scalar_view("records", "I")
+        self._string_offsets = scalar_view("string_offsets", "Q")
+        self._string_data = scalar_view("string_data", "B")
+        self.fields = [self._string(index) for index in range(1, fields + 1)]
+        self.labels = [FIELD_LABELS.get(name, name) for name in self.fields]
+        self.record = lru_cache(maxsize=4096)(self._record)
+
+    def __len__(self) -> int:
+        """Number of distinct records."""
+        return len(self._records) // self.field_count if self.field_count else 0
+
+    def _string(self, index: int) -> str:
+        start, end = self._string_offsets[index], self._string_offsets[index + 1]
+        return bytes(self._string_data[start:end]).decode("utf-8")
+
+    def _record(self, record: int) -> dict:
+        cells = self._records[record * self.field_count : (record + 1) * self.field_count]
+        return {label: self._string(cell) for label, cell in zip(self.labels, cells) if cell}
+
+    def lookup_ipv4(self, address: int) -> int:
+        """Return the record id owning an IPv4 address integer, or ``NO_MATCH``."""
+        bucket = address >> _BUCKET_SHIFT
+        buckets = self._ipv4_buckets
+        # starts[buckets[bucket]] <= address, so the answer is never left of it.
+        position = bisect.bisect_right(
+            self._ipv4_starts, address, buckets[bucket] + 1, buckets[bucket + 1] + 1
+        )
+        return self._ipv4_owners[position - 1]
+
+    def lookup_ipv6(self, address: int) -> int:
+        """Return the record id owning an IPv6 address integer, or ``NO_MATCH``."""
+        high_half = address >> 64
+        offset = high_half - self._ipv6_base
+        buckets = self._ipv6_buckets
+        if offset < 0:
+            low, high = 0, buckets[0] + 1
+        else:
+            bucket = offset >> self._ipv6_shift
+            if bucket < _BUCKETS - 1:
+                low, high = buckets[bucket], buckets[bucket + 1] + 1
+            else:
+                low, high = buckets[_BUCKETS - 1], len(self._ipv6_high)
+        # The last start <= address within the bucket, compared as (high, low) halves.
+        starts_high = self._ipv6_high
+        position = bisect.bisect_right(starts_high, high_half, low, high)
+        first = position - 1
+        if starts_high[first] == high_half:
+            # Runs of starts sharing a high half are usually one entry long,
+            # and then one comparison of the low halves settles it.
+            if first > low and starts_high[first - 1] == high_half:
+                first = bisect.bisect_left(starts_high, high_half, low, first)
+                position = bisect.bisect_right(self._ipv6_low, address & _U64_MASK, first, position)
+            elif self._ipv6_low[first] > address & _U64_MASK:
+                position = first
+        return self._ipv6_owners[position - 1]
+
+    def lookup_ipv4_array(self, addresses: np.ndarray) -> np.ndarray:
+        """Return record ids for a ``uint32`` address array."""
+        addresses = np.asarray(addresses, dtype=np.uint32)
+        positions = np.searchsorted(self.arrays["ipv4_starts"], addresses, side="right")
+        return self.arrays["ipv4_owners"][positions - 1]
+
+    def lookup_ipv6_array(self, addresses: np.ndarray) -> np.ndarray:
+        """Return record ids for an ``(n, 2)`` ``uint64`` address array."""
+        positions = np.searchsorted(self.arrays["ipv6_keys"], ipv6_keys(addresses), side="right")
+        return self.arrays["ipv6_owners"][positions - 1]
+
+    def annotate(self, ip: ipaddress.IPv4Address | ipaddress.IPv6Address) -> dict:
+        """Return the display fields of the record owning ``ip`` (empty if none)."""
+        record = self.lookup_ipv4(int(ip)) if ip.version == 4 else self.lookup_ipv6(int(ip))
+        return {} if record == NO_MATCH else self.record(record)
+
+
+class ReloadingRangeDatabase:
+    """A ``RangeDatabase`` that maps the file again after it is replaced.
+
+    The file is checked at most every ``interval`` seconds, on use. A file
+    that fails to load is logged and the previous mapping is kept.
+    """
+
+    def __init__(self, path: str, interval: float = DEFAULT_RELOAD_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._database = RangeDatabase(path)
+        self._checked = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def database(self) -> RangeDatabase:
+        """The current mapping, reloaded first if the check interval has passed."""
+        now = time.monotonic()
+        if now - self._checked >= self.interval:
+            self._checked = now
+            self.reload_if_changed()
+        return self._database
+
+    def reload_if_changed(self) -> bool:
+        """Map the file again if it was replaced; return True if it was."""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except OSError as exc:
+                logger.warning("Range database %s is unavailable: %s", self.path, exc)
+                return False
+            current = self._database.stat
+            if (stat.st_ino, stat.st_dev, stat.st_size, stat.st_mtime_ns) == (
+                current.st_ino, current.st_dev, current.st_size, current.st_mtime_ns
+            ):
+                return False
+            try:
+                database = RangeDatabase(self.path)
+            except (OSError, ValueError) as exc:
+                logger.warning(
+                    "Keeping the previous range database; %s failed to load: %s", self.path, exc
+                )
+                return False
+            # Readers holding the old instance keep a valid mapping until they drop it.
+            self._database = database
+            logger.info("Reloaded range database %s (%s)", self.path, database.digest)
+            return True
+
+    @property
+    def digest(self) -> str:
+        return self.database.digest
+
+    def annotate(self, ip: ipaddress.IPv4Address | ipaddress.IPv6Address) -> dict:
+        return self.database.annotate(ip)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.range_db", description="Compile CSV inventories into a range database."
+    )
+    parser.add_argument("paths", nargs="+", metavar="CSV", help="inventory files")
+    parser.add_argument(
+        "-o", "--output", required=True, help="database file to write (replaced atomically)"
+    )
+    args = parser.parse_args(argv)
+    try:
+        stats = compile_csv(args.paths, args.output)
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    print(
+        f"{args.output}: {stats['rows']} rows, {stats['records']} records, "
+        f"{stats['ipv4_intervals']} IPv4 and {stats['ipv6_intervals']} IPv6 intervals"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
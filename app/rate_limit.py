@@ -0,0 +1,203 @@
+"""Sliding-window rate limiting with bounded, optionally shared, state.
+
+Each client is tracked with a fixed-size sliding-window counter: the count
+for the current window, the count for the previous one and the window index.
+The estimated rate is the previous count weighted by how much of it still
+overlaps the sliding window, plus the current count.
+
+``MemoryRateLimiter`` keeps counters in a per-process LRU dictionary.
+``SharedRateLimiter`` keeps them in a fixed-size hash table in a memory-mapped
+file (for example under ``/dev/shm``) guarded by ``flock``, so every gunicorn
+worker on the host enforces the same limit.
+"""
+
+import hashlib
+import ipaddress
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_CLIENTS = 65536
+_PROBE_LIMIT = 8
+# key digest, window index, current count, previous count, last seen
+_SLOT = struct.Struct("=16sqIId")
+_EMPTY_KEY = bytes(16)
+
+
+def _sliding_window(
+    state: tuple[int, int, int] | None, now: float, window: float, limit: int
+) -> tuple[bool, tuple[int, int, int]]:
+    """Apply one hit to ``(window_index, current, previous)``.
+
+    Returns:
+        tuple: ``(limited, new_state)``. Limited hits are not counted.
+    """
+    window_index = int(now // window)
+    current = previous = 0
+    if state is not None:
+        state_window, state_current, state_previous = state
+        if state_window == window_index:
+            current, previous = state_current, state_previous
+        elif state_window == window_index - 1:
+            previous = state_current
+
+    elapsed = (now - window_index * window) / window
+    if previous * (1.0 - elapsed) + current >= limit:
+        return True, (window_index, current, previous)
+    return False, (window_index, current + 1, previous)
+
+
+class MemoryRateLimiter:
+    """Per-process limiter with LRU eviction and a hard cap on clients."""
+
+    def __init__(self, window: float = 60, max_clients: int = DEFAULT_MAX_CLIENTS):
+        self.window = window
+        self.max_clients = max_clients
+        self._clients: OrderedDict[str, tuple[float, tuple[int, int, int]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def hit(self, key: str, limit: int, now: float | None = None) -> bool:
+        """Record a request for ``key``; return True if it is over the limit."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._clients.pop(key, None)
+            limited, state = _sliding_window(entry[1] if entry else None, now, self.window, limit)
+            self._clients[key] = (now, state)
+            self._evict(now)
+        return limited
+
+    def _evict(self, now: float) -> None:
+        # Entries idle for two windows carry no state; the oldest sit at the front.
+        while self._clients:
+            last_seen, _ = next(iter(self._clients.values()))
+            if len(self._clients) <= self.max_clients and now - last_seen < 2 * self.window:
+                break
+            self._clients.popitem(last=False)
+
+
+class SharedRateLimiter:
+    """Limiter backed by a fixed-size hash table in a shared memory-mapped file.
+
+    Keys are hashed into ``max_clients`` slots with short linear probing.
+    When every probed slot is taken, the least recently seen one is reused,
+    so memory never grows past ``max_clients`` entries.
+    """
+
+    def __init__(self, path: str, window: float = 60, max_clients: int = DEFAULT_MAX_CLIENTS):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.path = path
+        self.window = window
+        self.max_clients = max_clients
+        size = _SLOT.size * max_clients
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._pid = os.getpid()
+        self._lock_file(fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size != size:
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+        finally:
+            self._lock_file(fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, size)
+        self._thread_lock = threading.Lock()
+
+    def _lock_file(self, operation: int) -> None:
+        if self._pid != os.getpid():
+            # flock locks belong to the open file, which forked workers would
+            # share with the master (gunicorn --preload); give each its own.
+            self._fd = os.open(self.path, os.O_RDWR)
+            self._pid = os.getpid()
+        self._fcntl.flock(self._fd, operation)
+
+    def __len__(self) -> int:
+        now = time.time()
+        count = 0
+        for slot in range(self.max_clients):
+            key, _, _, _, last_seen = _SLOT.unpack_from(self._map, slot * _SLOT.size)
+            count += key != _EMPTY_KEY and now - last_seen < 2 * self.window
+        return count
+
+    def hit(self, key: str, limit: int, now: float | None = None) -> bool:
+        """Record a request for ``key``; return True if it is over the limit."""
+        now = time.time() if now is None else now
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        start = int.from_bytes(digest[:8], "little") % self.max_clients
+
+        with self._thread_lock:
+            self._lock_file(self._fcntl.LOCK_EX)
+            try:
+                target, state = self._find_slot(digest, start, now)
+                limited, state = _sliding_window(state, now, self.window, limit)
+                _SLOT.pack_into(self._map, target * _SLOT.size, digest, *state, now)
+            finally:
+                self._lock_file(self._fcntl.LOCK_UN)
+        return limited
+
+    def _find_slot(
+        self, digest: bytes, start: int, now: float
+    ) -> tuple[int, tuple[int, int, int] | None]:
+        free = None
+        oldest, oldest_seen = start, float("inf")
+        for probe in range(min(_PROBE_LIMIT, self.max_clients)):
+            slot = (start + probe) % self.max_clients
+            key, window_index, current, previous, last_seen = _SLOT.unpack_from(
+                self._map, slot * _SLOT.size
+            )
+            if key == digest:
+                return slot, (window_index, current, previous)
+            stale = key == _EMPTY_KEY or now - last_seen >= 2 * self.window
+            if stale and free is None:
+                free = slot
+            if last_seen < oldest_seen:
+                oldest, oldest_seen = slot, last_seen
+        return (free if free is not None else oldest), None
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+
+def create_rate_limiter(
+    window: float, max_clients: int = DEFAULT_MAX_CLIENTS, shared_path: str | None = None
+):
+    """Return a shared limiter when ``shared_path`` is set, else an in-memory one."""
+    if shared_path:
+        return SharedRateLimiter(shared_path, window=window, max_clients=max_clients)
+    return MemoryRateLimiter(window=window, max_clients=max_clients)
+
+
+def client_key(forwarded_for: str | None, remote_addr: str | None, trusted_proxies: int = 0) -> str:
+    """Return the rate-limit key for a request.
+
+    ``X-Forwarded-For`` is only trusted for the last ``trusted_proxies`` hops:
+    with one proxy (nginx appending ``$remote_addr``) the rightmost entry is
+    the client. With none, the header is ignored, since any client can set
+    it. IPv6 clients are keyed by their /64, since a single host usually
+    controls the whole subnet.
+    """
+    candidate = remote_addr
+    if forwarded_for and trusted_proxies > 0:
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        if hops:
+            candidate = hops[-min(trusted_proxies, len(hops))]
+
+    try:
+        ip = ipaddress.ip_address(candidate or "")
+    except ValueError:
+        try:
+            ip = ipaddress.ip_address(remote_addr or "")
+        except ValueError:
+            return "unknown"
+    if ip.version == 6:
+        if ip.ipv4_mapped is not None:
+            return str(ip.ipv4_mapped)
+        return str(ipaddress.IPv6Network((int(ip) >> 64 << 64, 64)))
+    return str(ip)
@@ -0,0 +1,214 @@
+"""Typed calculation results built from a single parse of the input.
+
+``parse_calculation`` validates the raw form values, parses the address once
+and resolves the prefix length, then returns a ``Calculation`` holding an
+``AddressResult`` and a ``NetworkResult``. Both keep only integers and the
+parsed address; display strings, the detail dictionaries and the regex are
+computed on first use. The dictionaries match ``calculations.py`` exactly.
+"""
+
+import ipaddress
+
+from .calculations import (
+    ADDRESS_BITS,
+    FORMATTERS,
+    IPV4_NETMASK_STRINGS,
+    IPV4_WILDCARD_STRINGS,
+    IPV6_NETMASK_STRINGS,
+)
+from .ip_to_regex import int_range_to_regex
+from .validation import parse_ip_address, parse_prefix, validate_raw_input
+
+_NETMASK_STRINGS = {4: IPV4_NETMASK_STRINGS, 6: IPV6_NETMASK_STRINGS}
+
+
+class FrozenDict(dict):
+    """A ``dict`` that rejects modification, used for shared cached results."""
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Cached results are read-only; copy them with dict(result) first.")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def copy(self) -> dict:
+        return dict(self)
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+class AddressResult:
+    """Details of a single IP address."""
+
+    __slots__ = ("ip", "_details")
+
+    def __init__(self, ip: ipaddress.IPv4Address | ipaddress.IPv6Address):
+        self.ip = ip
+        self._details = None
+
+    @property
+    def version(self) -> int:
+        return self.ip.version
+
+    @property
+    def address_type(self) -> str:
+        if self.ip.is_private:
+            return "Private"
+        return "Public" if self.ip.version == 4 else "Global"
+
+    @property
+    def binary(self) -> str:
+        return format(int(self.ip), "032b" if self.ip.version == 4 else "0128b")
+
+    def as_dict(self) -> FrozenDict:
+        """Return the ``calculate_ipv4``/``calculate_ipv6`` dictionary."""
+        if self._details is None:
+            self._details = FrozenDict({
+                "IP Address": str(self.ip),
+                "Version": f"IPv{self.ip.version}",
+                "Type": self.address_type,
+                "Binary": self.binary,
+                "Decimal": int(self.ip),
+                "Reverse Pointer": self.ip.reverse_pointer,
+            })
+        return self._details
+
+    def fields(self):
+        """Return ``(label, value)`` pairs for display."""
+        return self.as_dict().items()
+
+
+class NetworkResult:
+    """Details of a network, held as its version, first address and prefix length."""
+
+    __slots__ = ("version", "first", "prefixlen", "_details", "_regex")
+
+    def __init__(self, version: int, first: int, prefixlen: int):
+        self.version = version
+        self.first = first
+        self.prefixlen = prefixlen
+        self._details = None
+        self._regex = None
+
+    @classmethod
+    def from_address(cls, version: int, address: int, prefixlen: int) -> "NetworkResult":
+        """Return the network of ``prefixlen`` containing ``address``."""
+        host_bits = ADDRESS_BITS[version] - prefixlen
+        return cls(version, address >> host_bits << host_bits, prefixlen)
+
+    @property
+    def key(self) -> tuple[int, int, int]:
+        return self.version, self.first, self.prefixlen
+
+    @property
+    def num_addresses(self) -> int:
+        return 1 << (ADDRESS_BITS[self.version] - self.prefixlen)
+
+    @property
+    def last(self) -> int:
+        return self.first + self.num_addresses - 1
+
+    @property
+    def hostmask(self) -> int:
+        return self.num_addresses - 1
+
+    @property
+    def netmask(self) -> int:
+        return ((1 << ADDRESS_BITS[self.version]) - 1) ^ self.hostmask
+
+    @property
+    def host_range(self) -> tuple[int, int]:
+        """Return the first and last usable host addresses."""
+        if self.prefixlen >= ADDRESS_BITS[self.version] - 1:
+            return self.first, self.last
+        return self.first + 1, self.last - 1
+
+    @property
+    def total_hosts(self) -> int:
+        bits = ADDRESS_BITS[self.version]
+        if self.prefixlen == bits:
+            return 1
+        if self.prefixlen == bits - 1:
+            return 2
+        return self.num_addresses - 2 if self.version == 4 else self.num_addresses
+
+    @property
+    def cidr(self) -> str:
+        return f"{FORMATTERS[self.version](self.first)}/{self.prefixlen}"
+
+    @property
+    def regex(self) -> str:
+        """Anchored regex matching every address in the network."""
+        if self._regex is None:
+            self._regex = int_range_to_regex(self.version, self.first, self.last)
+        return self._regex
+
+    def as_dict(self) -> FrozenDict:
+        """Return the ``calculate_*_network_and_subnet`` dictionary."""
+        if self._details is None:
+            formatter = FORMATTERS[self.version]
+            host_min, host_max = self.host_range
+            details = {
+                "Network Address": formatter(self.first),
+                "Broadcast Address": formatter(self.last),
+                "CIDR": str(self.prefixlen),
+                "Netmask": _NETMASK_STRINGS[self.version][self.prefixlen],
+            }
+            if self.version == 4:
+                details["Wildcard"] = IPV4_WILDCARD_STRINGS[self.prefixlen]
+            details.update({
+                "HostMin": formatter(host_min),
+                "HostMax": formatter(host_max),
+                "Total Hosts": self.total_hosts,
+            })
+            self._details = FrozenDict(details)
+        return self._details
+
+    def fields(self):
+        """Return ``(label, value)`` pairs for display."""
+        return self.as_dict().items()
+
+
+class Calculation:
+    """The result of one IP address and network calculation."""
+
+    __slots__ = ("address", "network")
+
+    def __init__(self, address: AddressResult, network: NetworkResult):
+        self.address = address
+        self.network = network
+
+    @property
+    def regex(self) -> str:
+        return self.network.regex
+
+    def as_dict(self) -> dict:
+        """Return ``{"ip": ..., "network": ...}`` as produced by ``calculate_entry``."""
+        return {"ip": self.address.as_dict(), "network": self.network.as_dict()}
+
+
+def parse_input(
+    ip_address: str | None, network_input: str | None
+) -> tuple[ipaddress.IPv4Address | ipaddress.IPv6Address, int]:
+    """Validate raw input once and return the parsed address and prefix length.
+
+    Raises:
+        ValueError: If the input is invalid.
+    """
+    ip_address = validate_raw_input(ip_address, "IP address")
+    network_input = validate_raw_input(network_input, "Network input", allow_slash=True)
+    ip = parse_ip_address(ip_address)
+    return ip, parse_prefix(network_input, ip.version)
+
+
+def parse_calculation(ip_address: str | None, network_input: str | None) -> Calculation:
+    """Validate and parse one IP/network pair into a ``Calculation``.
+
+    Raises:
+        ValueError: If the input is invalid.
+    """
+    ip, prefixlen = parse_input(ip_address, network_input)
+    return Calculation(AddressResult(ip), NetworkResult.from_address(ip.version, int(ip), prefixlen))
@@ -0,0 +1,370 @@
+"""Streaming BIND reverse zones for whole prefixes.
+
+``iter_reverse_zone`` yields a zone file for a network as text chunks: a
+``$TTL`` line, an optional SOA and NS records, then one PTR record per
+address, grouped under ``$ORIGIN`` lines at octet (IPv4) or nibble (IPv6)
+boundaries. Owner names, origins and the fields of the naming template
+come from shifts and masks of the address integer; no ``ipaddress``
+object is built per record. Records are formatted one ``$ORIGIN`` block
+at a time, so the output can be written straight to a file or an HTTP
+response.
+
+The zone apex is the reverse name of the longest octet or nibble boundary
+containing the network. An IPv4 network longer than /24 gets an RFC 2317
+classless zone named ``<first>/<prefixlen>.<c>.<b>.<a>.in-addr.arpa.``;
+``iter_classless_delegation`` writes the NS and CNAME records that the
+parent /24 zone needs to point at it. Zones are also served as
+``GET /api/v1/reverse-zone`` and written by ``python -m app.cli reverse-zone``.
+
+Naming templates use ``str.format`` fields:
+
+- ``{a}``, ``{b}``, ``{c}``, ``{d}``: the octets of an IPv4 address.
+- ``{dashed}``: the address with ``-`` between octets, or between the
+  hexadecimal groups of an IPv6 address without zero compression
+  (``2001-db8-0-0-0-0-0-1``).
+- ``{hex}``: the address as 8 or 32 hexadecimal digits.
+- ``{index}``: the position of the address in the populated range.
+"""
+
+import argparse
+import string
+import sys
+import time
+from collections.abc import Iterator
+
+from .calculations import ADDRESS_BITS
+from .enumeration import parse_network
+from .results import NetworkResult
+
+TEMPLATE_FIELDS = {4: ("a", "b", "c", "d", "dashed", "hex", "index"), 6: ("dashed", "hex", "index")}
+DEFAULT_TTL = 3600
+# Address bits below each $ORIGIN: one octet (IPv4) or four nibbles (IPv6).
+DEFAULT_ORIGIN_BITS = {4: 8, 6: 16}
+MAX_ORIGIN_BITS = 16
+_STEP = {4: 8, 6: 4}
+_SOA_TIMERS = "3600 900 1209600 3600"
+_OCTETS = {"a": 24, "b": 16, "c": 8, "d": 0}
+
+
+def _template_fields(template: str, version: int) -> set[str]:
+    """Return the fields used by ``template``.
+
+    Raises:
+        ValueError: If the template uses unknown fields, format specs or braces.
+    """
+    if not isinstance(template, str) or not template.strip():
+        raise ValueError("A naming template is required.")
+    fields = set()
+    try:
+        parsed = list(string.Formatter().parse(template))
+    except ValueError as exc:
+        raise ValueError(f"Invalid naming template: {exc}.") from exc
+    for literal, field, spec, conversion in parsed:
+        if "{" in literal or "}" in literal or any(char.isspace() for char in literal):
+            raise ValueError("Naming templates cannot contain braces or whitespace.")
+        if field is None:
+            continue
+        if field not in TEMPLATE_FIELDS[version] or spec or conversion:
+            allowed = ", ".join("{%s}" % name for name in TEMPLATE_FIELDS[version])
+            raise ValueError(f"Unknown template field {{{field}}}; use {allowed}.")
+        fields.add(field)
+    return fields
+
+
+def reverse_name(version: int, value: int, prefixlen: int) -> str:
+    """Return the reverse DNS name of the ``prefixlen`` boundary holding ``value``.
+
+    ``prefixlen`` must be a multiple of 8 (IPv4) or 4 (IPv6).
+    """
+    bits, step = ADDRESS_BITS[version], _STEP[version]
+    labels = [(value >> shift) & ((1 << step) - 1) for shift in range(bits - prefixlen, bits, step)]
+    if version == 4:
+        return "".join(f"{label}." for label in labels) + "in-addr.arpa."
+    return "".join(f"{label:x}." for label in labels) + "ip6.arpa."
+
+
+def zone_origin(network: NetworkResult) -> str:
+    """Return the apex of the reverse zone for ``network``.
+
+    IPv4 networks longer than /24 get an RFC 2317 ``<first>/<prefixlen>`` label.
+    """
+    step = _STEP[network.version]
+    if network.version == 4 and network.prefixlen > 24:
+        return f"{network.first & 0xFF}/{network.prefixlen}.{reverse_name(4, network.first, 24)}"
+    return reverse_name(network.version, network.first, network.prefixlen // step * step)
+
+
+class _Renderer:
+    """Formats the PTR lines of one ``$ORIGIN`` block at a time.
+
+    Inside a block each template field is a prefix fixed by the block plus a
+    fragment that depends only on the low ``origin_bits`` bits of the
+    address. The fragments and owner names are rendered once per zone, so a
+    block costs one ``str.format`` of the template and one per line. They
+    cover only ``lows``, the low bits used by the populated range. With
+    ``at_apex`` the single record is owned by the ``$ORIGIN`` itself (``@``).
+    """
+
+    def __init__(
+        self, version: int, origin_bits: int, template: str, fields: set[str], lows: range, at_apex: bool = False
+    ):
+        self.version = version
+        self.origin_bits = origin_bits
+        self.template = template
+        self.fields = sorted(fields - {"index"})
+        self.index = "index" in fields
+        self.offset = lows.start
+        step = _STEP[version]
+        label = "{}" if version == 4 else "{:x}"
+        self.owners = ["@"] * len(lows) if at_apex else [
+            ".".join(label.format((low >> shift) & ((1 << step) - 1)) for shift in range(0, origin_bits, step))
+            for low in lows
+        ]
+        self.tables = {field: self._table(field, lows) for field in self.fields}
+
+    def _table(self, field: str, lows: range):
+        origin_bits = self.origin_bits
+        if field == "hex":
+            return [f"{low:0{origin_bits // 4}x}" for low in lows]
+        if field in _OCTETS:
+            shift = _OCTETS[field]
+            return [str((low >> shift) & 0xFF) for low in lows] if shift < origin_bits else None
+        if self.version == 4:
+            return ["-".join(str((low >> shift) & 0xFF) for shift in range(origin_bits - 8, -1, -8)) for low in lows]
+        whole, split = divmod(origin_bits, 16)
+        groups = [
+            "".join(f"-{(low >> shift) & 0xFFFF:x}" for shift in range(whole * 16 - 16, -1, -16)) for low in lows
+        ]
+        if not split:
+            return [tail[1:] for tail in groups]
+        # The group holding the block boundary drops its leading zeros only
+        # when the block's own digits of that group are all zero.
+        parts = [(low >> whole * 16) & ((1 << split) - 1) for low in lows]
+        padded = [f"{part:0{split // 4}x}{tail}" for part, tail in zip(parts, groups)]
+        bare = [f"{part:x}{tail}" for part, tail in zip(parts, groups)]
+        return padded, bare
+
+    def _prefix(self, field: str, block: int):
+        """Return ``(prefix, fragments)`` of ``field`` for the block starting at ``block``."""
+        origin_bits, table = self.origin_bits, self.tables[field]
+        if field == "hex":
+            return f"{block >> origin_bits:0{(ADDRESS_BITS[self.version] - origin_bits) // 4}x}", table
+        if field in _OCTETS:
+            return ("", table) if table is not None else (str((block >> _OCTETS[field]) & 0xFF), None)
+        if self.version == 4:
+            return "".join(f"{(block >> shift) & 0xFF}-" for shift in range(24, origin_bits - 1, -8)), table
+        prefix = "".join(f"{(block >> shift) & 0xFFFF:x}-" for shift in range(112, origin_bits - 1, -16))
+        if isinstance(table, tuple):
+            high = (block >> origin_bits) & ((1 << (16 - origin_bits % 16)) - 1)
+            return (f"{prefix}{high:x}", table[0]) if high else (prefix, table[1])
+        return prefix, table
+
+    def render(self, block: int, first: int, last: int, index: int) -> str:
+        """Return the PTR lines for ``first..last``, ``index`` being the position of ``first``."""
+        low, high = first - block - self.offset, last - block - self.offset + 1
+        columns: list = [self.owners[low:high]]
+        values = {}
+        for field in self.fields:
+            prefix, table = self._prefix(field, block)
+            if table is None:
+                values[field] = prefix
+            else:
+                values[field] = f"{prefix}{{{len(columns)}}}"
+                columns.append(table[low:high])
+        if self.index:
+            values["index"] = f"{{{len(columns)}}}"
+            columns.append(range(index, index + high - low))
+        line = "{0}\tPTR\t" + self.template.format_map(values) + "\n"
+        return "".join(map(line.format, *columns))
+
+
+def _check_serial(serial: int | None) -> int:
+    if serial is None:
+        return int(time.strftime("%Y%m%d01"))
+    if not isinstance(serial, int) or not 0 <= serial < 2**32:
+        raise ValueError("SOA serial must be an integer between 0 and 4294967295.")
+    return serial
+
+
+def _header(origin: str, ttl: int, nameservers: list[str], hostmaster: str | None, serial: int) -> str:
+    lines = [f"$TTL {ttl}", f"$ORIGIN {origin}"]
+    if nameservers:
+        if hostmaster is None:
+            domain = nameservers[0].split(".", 1)[1] if "." in nameservers[0].rstrip(".") else nameservers[0]
+            hostmaster = f"hostmaster.{domain}"
+        lines.append(f"@\tIN\tSOA\t{nameservers[0]} {hostmaster} ({serial} {_SOA_TIMERS})")
+        lines.extend(f"@\tIN\tNS\t{nameserver}" for nameserver in nameservers)
+    return "\n".join(lines) + "\n"
+
+
+def _check_names(names: list[str] | None, kind: str) -> list[str]:
+    names = list(names or [])
+    for name in names:
+        if not isinstance(name, str) or not name or any(char.isspace() or char in "{}();" for char in name):
+            raise ValueError(f"Invalid {kind} name: {name!r}")
+    return names
+
+
+def _populated(network: str, populate: str | None) -> tuple[NetworkResult, NetworkResult]:
+    zone = parse_network(network)
+    if not populate:
+        return zone, zone
+    hosts = parse_network(populate)
+    if hosts.version != zone.version or not (zone.first <= hosts.first and hosts.last <= zone.last):
+        raise ValueError(f"{hosts.cidr} is not inside {zone.cidr}.")
+    return zone, hosts
+
+
+def iter_reverse_zone(
+    network: str,
+    template: str,
+    *,
+    populate: str | None = None,
+    ttl: int = DEFAULT_TTL,
+    nameservers: list[str] | None = None,
+    hostmaster: str | None = None,
+    serial: int | None = None,
+    origin_bits: int | None = None,
+    max_records: int | None = None,
+) -> Iterator[str]:
+    """Yield a BIND reverse zone for ``network`` as text chunks.
+
+    Args:
+        network (str): The delegated network, e.g. ``"10.1.0.0/16"``.
+        template (str): PTR target template, e.g. ``"host-{dashed}.example.com."``.
+        populate (str | None): Sub-network to write records for (default: all of ``network``).
+        ttl (int): ``$TTL`` of the zone.
+        nameservers (list[str] | None): NS names; the first one is the SOA primary.
+            Without them the file has no SOA and suits ``$INCLUDE``.
+        hostmaster (str | None): SOA contact (default ``hostmaster.`` plus the first
+            name server's domain).
+        serial (int | None): SOA serial (default ``YYYYMMDD01`` for today).
+        origin_bits (int | None): Address bits below each ``$ORIGIN``, a multiple of
+            8 (IPv4) or 4 (IPv6) up to 16; default 8 or 16.
+        max_records (int | None): Refuse zones with more PTR records than this.
+
+    Raises:
+        ValueError: If an argument is invalid or the zone is too large. Raised
+            before the first chunk is yielded.
+    """
+    zone, hosts = _populated(network, populate)
+    version, bits, step = zone.version, ADDRESS_BITS[zone.version], _STEP[zone.version]
+    fields = _template_fields(template, version)
+    nameservers = _check_names(nameservers, "name server")
+    if hostmaster is not None:
+        hostmaster = _check_names([hostmaster], "hostmaster")[0]
+    if not isinstance(ttl, int) or not 0 <= ttl < 2**31:
+        raise ValueError("TTL must be an integer between 0 and 2147483647.")
+    count = hosts.last - hosts.first + 1
+    if max_records is not None and count > max_records:
+        raise ValueError(f"The zone would have {count} records; the limit is {max_records}.")
+
+    apex = zone_origin(zone)
+    at_apex = False
+    if version == 4 and zone.prefixlen > 24:
+        origin_bits, origin = 8, apex
+    elif zone.prefixlen == bits:
+        # An IPv6 /128 zone is the single address's own name: one record at "@",
+        # with the fields of a one-nibble block.
+        origin_bits, origin, at_apex = step, apex, True
+    else:
+        apex_bits = bits - zone.prefixlen // step * step
+        origin_bits = min(DEFAULT_ORIGIN_BITS[version] if origin_bits is None else origin_bits, apex_bits)
+        if not 0 < origin_bits <= MAX_ORIGIN_BITS or origin_bits % step:
+            raise ValueError(f"Origin blocks must cover a multiple of {step} bits up to {MAX_ORIGIN_BITS}.")
+        origin = None
+    header = _header(apex, ttl, nameservers, hostmaster, _check_serial(serial))
+    low_mask = (1 << origin_bits) - 1
+    if hosts.last - hosts.first < low_mask:
+        # Smaller than one block, so within a single one.
+        lows = range(hosts.first & low_mask, (hosts.last & low_mask) + 1)
+    else:
+        lows = range(low_mask + 1)
+    renderer = _Renderer(version, origin_bits, template, fields, lows, at_apex)
+    return _iter_records(header, origin, hosts, renderer)
+
+
+def _iter_records(header: str, apex: str | None, hosts: NetworkResult, renderer: "_Renderer") -> Iterator[str]:
+    yield header
+    version, origin_bits = hosts.version, renderer.origin_bits
+    block_size = 1 << origin_bits
+    block = hosts.first & ~(block_size - 1)
+    while block <= hosts.last:
+        first, last = max(block, hosts.first), min(block + block_size - 1, hosts.last)
+        origin = apex or reverse_name(version, block, ADDRESS_BITS[version] - origin_bits)
+        yield f"$ORIGIN {origin}\n" + renderer.render(block, first, last, first - hosts.first)
+        block += block_size
+
+
+def iter_classless_delegation(network: str, nameservers: list[str]) -> Iterator[str]:
+    """Yield the RFC 2317 records delegating an IPv4 network longer than /24.
+
+    The records belong in the parent /24 zone: NS records for the classless
+    child zone and one CNAME per address pointing into it.
+
+    Raises:
+        ValueError: If the network is not IPv4 longer than /24 or no name server is given.
+    """
+    zone = parse_network(network)
+    if zone.version != 4 or zone.prefixlen <= 24:
+        raise ValueError("Classless delegation needs an IPv4 network longer than /24.")
+    nameservers = _check_names(nameservers, "name server")
+    if not nameservers:
+        raise ValueError("Classless delegation needs at least one name server.")
+    child = f"{zone.first & 0xFF}/{zone.prefixlen}"
+    lines = [f"$ORIGIN {reverse_name(4, zone.first, 24)}\n"]
+    lines.extend(f"{child}\tNS\t{nameserver}\n" for nameserver in nameservers)
+    lines.extend(f"{value & 0xFF}\tCNAME\t{value & 0xFF}.{child}\n" for value in range(zone.first, zone.last + 1))
+    return iter(["".join(lines)])
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli reverse-zone",
+        description="Write a BIND reverse zone with one PTR record per address of a network.",
+    )
+    parser.add_argument("network", help="delegated network, e.g. 10.1.0.0/16 or 2001:db8::/48")
+    parser.add_argument("-t", "--template", help="PTR target template, e.g. 'host-{dashed}.example.com.'")
+    parser.add_argument("--populate", help="sub-network to write records for (default: the whole network)")
+    parser.add_argument("--ttl", type=int, default=DEFAULT_TTL, help="zone $TTL (default: %(default)s)")
+    parser.add_argument("--ns", action="append", default=[], metavar="NAME", help="name server; repeat for more")
+    parser.add_argument("--hostmaster", help="SOA contact (default: hostmaster. plus the first name server's domain)")
+    parser.add_argument("--serial", type=int, help="SOA serial (default: YYYYMMDD01 for today)")
+    parser.add_argument("--origin-bits", type=int, help="address bits below each $ORIGIN (default: 8 or 16)")
+    parser.add_argument(
+        "--delegation", action="store_true", help="write the RFC 2317 records for the parent /24 zone instead"
+    )
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the ``reverse-zone`` subcommand; invalid arguments exit with status 2."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        if args.delegation:
+            chunks = iter_classless_delegation(args.network, args.ns)
+        else:
+            chunks = iter_reverse_zone(
+                args.network,
+                args.template,
+                populate=args.populate,
+                ttl=args.ttl,
+                nameservers=args.ns,
+                hostmaster=args.hostmaster,
+                serial=args.serial,
+                origin_bits=args.origin_bits,
+            )
+    except ValueError as exc:
+        parser.error(str(exc))
+    try:
+        if args.output:
+            with open(args.output, "w", encoding="ascii", newline="") as output:
+                output.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
+            sys.stdout.flush()
+    except BrokenPipeError:
+        sys.stderr.close()
+    return 0
@@ -0,0 +1,493 @@
+"""Address-space utilization of observed addresses, aggregated by prefix.
+
+Addresses seen in traffic are counted into one sorted array of leaf
+prefixes per address family, with the number of observations of each. The
+leaves are /32s for IPv4 and /64s for IPv6, so the utilization of a /24 is
+the share of its 256 addresses that were seen and the utilization of an
+IPv6 /48 is the share of its 65,536 /64s that were seen. Any coarser level
+is derived on demand by shifting the leaf keys and summing runs, so one
+array answers every level from /8 to /32 (or /32 to /64).
+
+Addresses are buffered and folded into the leaf array a chunk at a time.
+Memory is bounded by ``max_prefixes`` leaves per family: when a fold would
+exceed it, the leaves are coarsened one bit at a time (/32 to /31 and so
+on), down to /8 or /32. Counts at and above the resulting ``resolution``
+stay exact; utilization is then measured in leaves of that size. Partial
+results from parallel workers are combined with ``merge``, and snapshots
+are saved and loaded as ``.npz`` files.
+
+Set ``UTILIZATION_PATH`` to a snapshot to show the utilization of the
+network being calculated next to its host count. ``python -m app.cli
+utilization`` builds snapshots from address logs and reports the busiest
+and emptiest prefixes.
+"""
+
+import argparse
+import hashlib
+import ipaddress
+import json
+import sys
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from .batch import iter_fields
+from .calculations import ADDRESS_BITS, FORMATTERS
+from .enumeration import parse_network
+from .vectorized import parse_address_columns
+
+#: ``(coarsest, finest)`` prefix length tracked for each address family.
+LEVELS = {4: (8, 32), 6: (32, 64)}
+DEFAULT_MAX_PREFIXES = 1 << 22
+DEFAULT_CHUNK_SIZE = 1 << 20
+_EMPTY = np.zeros(0, dtype=np.uint64)
+_STATE = ("version", "_resolution", "max_prefixes", "chunk_size", "_keys", "_hits")
+
+
+def _combine(keys: np.ndarray, hits: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Sum ``hits`` over runs of equal values in sorted ``keys``."""
+    if not len(keys):
+        return _EMPTY, _EMPTY
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[starts], np.add.reduceat(hits, starts)
+
+
+def _merge_sorted(
+    keys: np.ndarray, hits: np.ndarray, other_keys: np.ndarray, other_hits: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Add one set of sorted unique ``(keys, hits)`` to another without re-sorting."""
+    if not len(keys):
+        return other_keys, other_hits
+    positions = np.searchsorted(keys, other_keys)
+    found = positions < len(keys)
+    found[found] = keys[positions[found]] == other_keys[found]
+    hits = hits.copy()
+    hits[positions[found]] += other_hits[found]
+    missing = ~found
+    return (
+        np.insert(keys, positions[missing], other_keys[missing]),
+        np.insert(hits, positions[missing], other_hits[missing]),
+    )
+
+
+class PrefixCounts:
+    """Observation counts of one address family, held as sorted leaf prefixes.
+
+    Args:
+        version (int): 4 or 6.
+        max_prefixes (int): Leaves kept before the resolution is coarsened.
+        resolution (int | None): Leaf prefix length; defaults to the finest
+            level of ``LEVELS``.
+        chunk_size (int): Addresses buffered before they are folded in.
+
+    Raises:
+        ValueError: If ``resolution`` is outside ``LEVELS`` or
+            ``max_prefixes`` is not positive.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        max_prefixes: int = DEFAULT_MAX_PREFIXES,
+        resolution: int | None = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        coarsest, finest = LEVELS[version]
+        resolution = finest if resolution is None else resolution
+        if not coarsest <= resolution <= finest:
+            raise ValueError(f"IPv{version} resolution must be between /{coarsest} and /{finest}.")
+        if max_prefixes < 1:
+            raise ValueError("max_prefixes must be positive.")
+        self.version = version
+        self._resolution = resolution
+        self.max_prefixes = max_prefixes
+        self.chunk_size = chunk_size
+        self._keys = _EMPTY
+        self._hits = _EMPTY
+        self._pending: list[np.ndarray] = []
+        self._pending_size = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def resolution(self) -> int:
+        """Leaf prefix length, once buffered leaves are folded in (which can coarsen it)."""
+        self.flush()
+        return self._resolution
+
+    @property
+    def keys(self) -> np.ndarray:
+        """Sorted leaf prefix numbers."""
+        self.flush()
+        return self._keys
+
+    @property
+    def hits(self) -> np.ndarray:
+        """Observations of each leaf in ``keys``."""
+        self.flush()
+        return self._hits
+
+    def __getstate__(self) -> dict:
+        self.flush()
+        return {name: getattr(self, name) for name in _STATE}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._pending, self._pending_size = [], 0
+
+    @property
+    def observations(self) -> int:
+        return int(self.hits.sum())
+
+    def add_leaves(self, leaves: np.ndarray) -> None:
+        """Count leaves given at the finest level (IPv4 addresses, IPv6 /64s)."""
+        leaves = np.asarray(leaves, dtype=np.uint64) >> np.uint64(LEVELS[self.version][1] - self._resolution)
+        self._pending.append(leaves)
+        self._pending_size += len(leaves)
+        if self._pending_size >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Fold buffered leaves into the counts."""
+        if not self._pending:
+            return
+        keys, hits = np.unique(np.concatenate(self._pending), return_counts=True)
+        self._pending, self._pending_size = [], 0
+        self._keys, self._hits = _merge_sorted(self._keys, self._hits, keys, hits.astype(np.uint64))
+        self._bound()
+
+    def _bound(self) -> None:
+        coarsest = LEVELS[self.version][0]
+        while len(self._keys) > self.max_prefixes and self._resolution > coarsest:
+            self.coarsen(self._resolution - 1)
+
+    def coarsen(self, resolution: int) -> None:
+        """Lower the leaf prefix length to ``resolution``, summing the merged leaves."""
+        self.flush()
+        if resolution > self._resolution or resolution < LEVELS[self.version][0]:
+            raise ValueError(f"Cannot coarsen /{self._resolution} leaves to /{resolution}.")
+        self._keys, self._hits = _combine(self._keys >> np.uint64(self._resolution - resolution), self._hits)
+        self._resolution = resolution
+
+    def merge(self, other: "PrefixCounts") -> "PrefixCounts":
+        """Add the counts of ``other``, coarsening both to the lower resolution."""
+        if other.version != self.version:
+            raise ValueError("Cannot merge counts of different address families.")
+        self.flush()
+        other.flush()
+        keys, hits = other._keys, other._hits
+        if other.resolution > self._resolution:
+            keys, hits = _combine(keys >> np.uint64(other.resolution - self._resolution), hits)
+        elif other.resolution < self._resolution:
+            self.coarsen(other.resolution)
+        self._keys, self._hits = _merge_sorted(self._keys, self._hits, keys, hits)
+        self._bound()
+        return self
+
+    def _check_level(self, prefixlen: int) -> None:
+        if not 0 <= prefixlen <= self._resolution:
+            raise ValueError(f"IPv{self.version} utilization is only known down to /{self._resolution}.")
+
+    def level(self, prefixlen: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return ``(prefixes, hits, used)`` for every observed prefix of length ``prefixlen``.
+
+        ``prefixes`` are prefix numbers (the network address shifted right by
+        the host bits) and ``used`` counts the observed leaves in each.
+
+        Raises:
+            ValueError: If ``prefixlen`` is finer than the resolution.
+        """
+        self.flush()
+        self._check_level(prefixlen)
+        if not len(self._keys):
+            return _EMPTY, _EMPTY, _EMPTY
+        shifted = self._keys >> np.uint64(self._resolution - prefixlen)
+        starts = np.flatnonzero(np.concatenate(([True], shifted[1:] != shifted[:-1])))
+        used = np.diff(np.append(starts, len(shifted))).astype(np.uint64)
+        return shifted[starts], np.add.reduceat(self._hits, starts), used
+
+    def _describe(self, number: int, prefixlen: int, hits: int, used: int) -> dict:
+        size = 1 << (self._resolution - prefixlen)
+        first = number << (ADDRESS_BITS[self.version] - prefixlen)
+        return {
+            "prefix": f"{FORMATTERS[self.version](first)}/{prefixlen}",
+            "hits": hits,
+            "used": used,
+            "size": size,
+            "utilization": used / size,
+        }
+
+    def usage(self, first: int, prefixlen: int) -> dict | None:
+        """Describe the network at integer address ``first``, or ``None`` if it is finer than a leaf."""
+        self.flush()
+        if prefixlen > self._resolution:
+            return None
+        shift = ADDRESS_BITS[self.version] - self._resolution
+        low = first >> shift
+        high = low + (1 << (self._resolution - prefixlen)) - 1
+        start = int(np.searchsorted(self._keys, np.uint64(low), side="left"))
+        end = int(np.searchsorted(self._keys, np.uint64(high), side="right"))
+        description = self._describe(first >> (ADDRESS_BITS[self.version] - prefixlen), prefixlen,
+                                     int(self._hits[start:end].sum()), end - start)
+        description["resolution"] = self._resolution
+        return description
+
+    def top(
+        self, prefixlen: int, count: int = 10, emptiest: bool = False, within: tuple[int, int] | None = None
+    ) -> list[dict]:
+        """Return the ``count`` busiest (or emptiest) prefixes of length ``prefixlen``.
+
+        Prefixes are ranked by observed leaves, then by observations. The
+        emptiest prefixes start with those never observed, in address order.
+
+        Args:
+            prefixlen (int): Level to rank.
+            count (int): Number of prefixes to return.
+            emptiest (bool): Rank from the least used instead.
+            within (tuple[int, int] | None): ``(first, prefixlen)`` of a network
+                to restrict the ranking to.
+
+        Raises:
+            ValueError: If ``prefixlen`` is finer than the resolution.
+        """
+        numbers, hits, used = self.level(prefixlen)
+        low, high = 0, (1 << prefixlen) - 1
+        if within is not None:
+            first, scope = within
+            host_bits = ADDRESS_BITS[self.version] - prefixlen
+            low = first >> host_bits
+            high = max(low, (first + (1 << (ADDRESS_BITS[self.version] - scope)) - 1) >> host_bits)
+            start = np.searchsorted(numbers, np.uint64(low), side="left")
+            end = np.searchsorted(numbers, np.uint64(high), side="right")
+            numbers, hits, used = numbers[start:end], hits[start:end], used[start:end]
+
+        results = []
+        if emptiest:
+            for number in islice(_unobserved(numbers, low, high), count):
+                results.append(self._describe(number, prefixlen, 0, 0))
+            order = np.lexsort((numbers, hits, used))
+        else:
+            order = np.lexsort((numbers, -hits.astype(np.float64), -used.astype(np.float64)))
+        for position in order[: count - len(results)].tolist():
+            results.append(self._describe(int(numbers[position]), prefixlen, int(hits[position]), int(used[position])))
+        return results
+
+
+def _unobserved(numbers: np.ndarray, low: int, high: int) -> Iterator[int]:
+    """Yield the prefix numbers in ``[low, high]`` missing from sorted ``numbers``."""
+    if not len(numbers):
+        yield from range(low, high + 1)
+        return
+    yield from range(low, int(numbers[0]))
+    gaps = np.flatnonzero(numbers[1:] - numbers[:-1] > 1)
+    for position in gaps.tolist():
+        yield from range(int(numbers[position]) + 1, int(numbers[position + 1]))
+    yield from range(int(numbers[-1]) + 1, high + 1)
+
+
+class Utilization:
+    """Observed-address counts for IPv4 and IPv6.
+
+    Args:
+        max_prefixes (int): Leaves kept per family before coarsening.
+        chunk_size (int): Addresses buffered per family before they are folded in.
+    """
+
+    def __init__(self, max_prefixes: int = DEFAULT_MAX_PREFIXES, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.ipv4 = PrefixCounts(4, max_prefixes, chunk_size=chunk_size)
+        self.ipv6 = PrefixCounts(6, max_prefixes, chunk_size=chunk_size)
+        self.digest = ""
+
+    def family(self, version: int) -> PrefixCounts:
+        return self.ipv4 if version == 4 else self.ipv6
+
+    def add_ipv4_array(self, addresses: np.ndarray) -> None:
+        """Count a ``uint32`` address array."""
+        self.ipv4.add_leaves(addresses)
+
+    def add_ipv6_array(self, addresses: np.ndarray) -> None:
+        """Count an ``(n, 2)`` ``uint64`` address array."""
+        self.ipv6.add_leaves(np.asarray(addresses, dtype=np.uint64).reshape(-1, 2)[:, 0])
+
+    def add(self, addresses: Sequence[str]) -> int:
+        """Count address strings and return how many were invalid."""
+        invalid = []
+        for version, rows, parsed, valid in parse_address_columns(addresses):
+            self.family(version).add_leaves(parsed[valid] if version == 4 else parsed[valid, 0])
+            invalid.extend(rows[~valid].tolist())
+
+        rejected = 0
+        for position in invalid:
+            try:
+                ip = ipaddress.ip_address(addresses[position].strip())
+            except ValueError:
+                rejected += 1
+                continue
+            value = int(ip)
+            self.family(ip.version).add_leaves(np.array([value if ip.version == 4 else value >> 64], dtype=np.uint64))
+        return rejected
+
+    def merge(self, other: "Utilization") -> "Utilization":
+        """Add the counts of ``other`` (for example from another worker)."""
+        self.ipv4.merge(other.ipv4)
+        self.ipv6.merge(other.ipv6)
+        return self
+
+    def usage(self, network) -> dict | None:
+        """Describe a network with ``version``, ``first`` and ``prefixlen`` attributes.
+
+        Returns ``None`` when the network is smaller than a leaf.
+        """
+        return self.family(network.version).usage(network.first, network.prefixlen)
+
+    def top(self, network: str, prefixlen: int, count: int = 10, emptiest: bool = False) -> list[dict]:
+        """Rank the prefixes of length ``prefixlen`` inside the CIDR ``network``.
+
+        Raises:
+            ValueError: If the network or level is invalid.
+        """
+        scope = parse_network(network)
+        return self.family(scope.version).top(prefixlen, count, emptiest, within=(scope.first, scope.prefixlen))
+
+    def save(self, path: str) -> None:
+        """Serialise the counts to an uncompressed ``.npz`` file."""
+        arrays = {}
+        for counts in (self.ipv4, self.ipv6):
+            counts.flush()
+            arrays[f"ipv{counts.version}_keys"] = counts._keys
+            arrays[f"ipv{counts.version}_hits"] = counts._hits
+            arrays[f"ipv{counts.version}_limits"] = np.array([counts.resolution, counts.max_prefixes])
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "Utilization":
+        """Load counts written by ``save``; ``digest`` identifies the file contents."""
+        utilization = cls()
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as handle:
+            for block in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(block)
+        with np.load(path, allow_pickle=False) as data:
+            for counts in (utilization.ipv4, utilization.ipv6):
+                resolution, max_prefixes = data[f"ipv{counts.version}_limits"].tolist()
+                counts._resolution, counts.max_prefixes = int(resolution), int(max_prefixes)
+                counts._keys = data[f"ipv{counts.version}_keys"]
+                counts._hits = data[f"ipv{counts.version}_hits"]
+        utilization.digest = digest.hexdigest()
+        return utilization
+
+
+def _iter_chunks(addresses: Iterable[str], size: int) -> Iterator[list[str]]:
+    """Yield lists of up to ``size`` addresses."""
+    iterator = iter(addresses)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _count_chunk(chunk: list[str], max_prefixes: int) -> tuple[Utilization, int]:
+    utilization = Utilization(max_prefixes)
+    invalid = utilization.add(chunk)
+    return utilization, invalid
+
+
+def aggregate(
+    chunks: Iterable[list[str]], max_prefixes: int = DEFAULT_MAX_PREFIXES, workers: int = 1
+) -> tuple[Utilization, int]:
+    """Count chunks of address strings, in a process pool when ``workers > 1``.
+
+    Returns:
+        tuple: ``(utilization, invalid)``.
+    """
+    total, invalid = Utilization(max_prefixes), 0
+    if workers <= 1:
+        for chunk in chunks:
+            invalid += total.add(chunk)
+        return total, invalid
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = iter(chunks)
+        while True:
+            # Only a couple of chunks per worker are read ahead.
+            batch = list(islice(chunks, workers * 2))
+            if not batch:
+                break
+            for partial, rejected in executor.map(_count_chunk, batch, [max_prefixes] * len(batch)):
+                total.merge(partial)
+                invalid += rejected
+    return total, invalid
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli utilization",
+        description="Aggregate observed addresses by prefix and report the busiest or emptiest prefixes.",
+    )
+    parser.add_argument("inputs", nargs="*", metavar="FILE", help="address files ('-' for stdin)")
+    parser.add_argument("--field", type=int, default=0, help="0-based field holding the address (default: 0)")
+    parser.add_argument("-m", "--merge", action="append", default=[], metavar="SNAPSHOT",
+                        help="add the counts of a saved snapshot; repeatable")
+    parser.add_argument("-o", "--output", help="save the combined counts to this .npz snapshot")
+    parser.add_argument("-l", "--level", type=int, action="append", metavar="PREFIXLEN",
+                        help="prefix length to rank; repeatable (default: every 8 bits for IPv4, 16 for IPv6)")
+    parser.add_argument("-n", "--top", type=int, default=10, help="prefixes to report per level (default: 10)")
+    parser.add_argument("--emptiest", action="store_true", help="rank the least used prefixes first")
+    parser.add_argument("--within", action="append", metavar="CIDR",
+                        help="rank only inside this network; repeatable (default: 0.0.0.0/0 and ::/0)")
+    parser.add_argument("--max-prefixes", type=int, default=DEFAULT_MAX_PREFIXES,
+                        help=f"leaves kept per family before coarsening (default: {DEFAULT_MAX_PREFIXES})")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="worker processes (default: 1)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE // 16,
+                        help="addresses per worker chunk (default: %(default)s)")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the ``utilization`` subcommand.
+
+    Rankings are written to stdout as NDJSON, one row per prefix. The exit
+    status is 1 if any address is invalid.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.merge:
+        parser.error("give address files or --merge snapshots")
+    if args.max_prefixes < 1 or args.chunk_size < 1:
+        parser.error("--max-prefixes and --chunk-size must be positive")
+    try:
+        utilization, invalid = aggregate(
+            _iter_chunks(iter_fields(args.inputs, args.field), args.chunk_size), args.max_prefixes, args.workers
+        )
+        for path in args.merge:
+            utilization.merge(Utilization.load(path))
+        if args.output:
+            utilization.save(args.output)
+        scopes = [parse_network(cidr) for cidr in args.within or ("0.0.0.0/0", "::/0")]
+    except (OSError, ValueError, KeyError) as exc:
+        parser.error(str(exc))
+
+    try:
+        for scope in scopes:
+            counts = utilization.family(scope.version)
+            if not args.within and not len(counts):
+                continue
+            default_levels = range(LEVELS[scope.version][0], counts.resolution + 1, 8 if scope.version == 4 else 16)
+            for prefixlen in args.level or default_levels:
+                if not scope.prefixlen <= prefixlen <= counts.resolution:
+                    continue
+                rows = counts.top(prefixlen, args.top, args.emptiest, within=(scope.first, scope.prefixlen))
+                for rank, row in enumerate(rows, 1):
+                    print(json.dumps({"level": prefixlen, "rank": rank, **row}, separators=(",", ":")))
+        sys.stdout.flush()
+    except BrokenPipeError:
+        sys.stderr.close()
+        return 0
+
+    print(
+        f"{utilization.ipv4.observations} IPv4 and {utilization.ipv6.observations} IPv6 observations, "
+        f"{invalid} invalid; {len(utilization.ipv4)} /{utilization.ipv4.resolution} and "
+        f"{len(utilization.ipv6)} /{utilization.ipv6.resolution} prefixes",
+        file=sys.stderr,
+    )
+    return 1 if invalid else 0
@@ -0,0 +1,123 @@
+"""Input validation helpers shared by the web routes and batch paths."""
+
+import ipaddress
+import logging
+import re
+
+from .calculations import ADDRESS_BITS, IPV4_MASK_PREFIXES
+
+logger = logging.getLogger(__name__)
+
+_INVALID_CHARS = re.compile(r"[^0-9a-fA-F:./]")
+_INVALID_CHARS_NO_SLASH = re.compile(r"[^0-9a-fA-F:.]")
+_IPV4_CIDR = re.compile(r"^\d{1,2}$")
+_IPV6_CIDR = re.compile(r"^\d{1,3}$")
+_IPV4_NETMASK = re.compile(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$")
+_PREFIX_DIGITS = {4: 2, 6: 3}
+
+
+def filter_ip_input(ip_input: str, allow_slash: bool = True) -> str:
+    """Remove invalid characters from the IP input."""
+    pattern = _INVALID_CHARS if allow_slash else _INVALID_CHARS_NO_SLASH
+    filtered_ip = pattern.sub("", ip_input)
+    logger.debug("Filtered IP input: %s", filtered_ip)
+    return filtered_ip
+
+
+def is_valid_cidr_or_netmask(network_input, ip_version="ipv4"):
+    """Check if the network input is a valid CIDR or Netmask."""
+    try:
+        if ip_version == "ipv4":
+            if _IPV4_CIDR.match(network_input) and 0 <= int(network_input) <= 32:
+                logger.debug("Valid CIDR prefix length: %s", network_input)
+                return True
+            if _IPV4_NETMASK.match(network_input):
+                ipaddress.IPv4Network(f"0.0.0.0/{network_input}", strict=False)
+                logger.debug("Valid Netmask: %s", network_input)
+                return True
+        else:
+            if _IPV6_CIDR.match(network_input) and 0 <= int(network_input) <= 128:
+                logger.debug("Valid CIDR prefix length: %s", network_input)
+                return True
+            if ":" in network_input:
+                ipaddress.IPv6Network(f"::/{network_input}", strict=False)
+                logger.debug("Valid Netmask: %s", network_input)
+                return True
+    except ValueError:
+        logger.debug("Invalid CIDR or Netmask: %s", network_input)
+
+    return False
+
+
+def validate_raw_input(value: str | None, field_name: str, allow_slash: bool = False) -> str:
+    """Validate raw input for required fields and invalid characters."""
+    if value is None or not value.strip():
+        raise ValueError(f"{field_name} is required.")
+    value = value.strip()
+    filtered_value = filter_ip_input(value, allow_slash=allow_slash)
+    if filtered_value != value:
+        raise ValueError(f"{field_name} contains invalid characters.")
+    return value
+
+
+def validate_network_input(network_input: str, ip_version: int) -> None:
+    """Validate network input based on IP version."""
+    if ip_version == 4:
+        if _IPV4_CIDR.match(network_input):
+            cidr = int(network_input)
+            if not 0 <= cidr <= 32:
+                raise ValueError("CIDR prefix length must be between 0 and 32.")
+            return
+        if _IPV4_NETMASK.match(network_input):
+            octets = network_input.split(".")
+            if any(int(octet) > 255 for octet in octets):
+                raise ValueError("Netmask must contain octets between 0 and 255.")
+            try:
+                ipaddress.IPv4Network(f"0.0.0.0/{network_input}", strict=False)
+            except ValueError as exc:
+                raise ValueError("Invalid IPv4 netmask format.") from exc
+            return
+        raise ValueError("Invalid network input. Please enter a valid CIDR or Netmask.")
+
+    if _IPV6_CIDR.match(network_input):
+        cidr = int(network_input)
+        if not 0 <= cidr <= 128:
+            raise ValueError("CIDR prefix length must be between 0 and 128.")
+        return
+    if ":" in network_input:
+        try:
+            ipaddress.IPv6Network(f"::/{network_input}", strict=False)
+        except ValueError as exc:
+            raise ValueError("Invalid IPv6 netmask format.") from exc
+        return
+
+    raise ValueError("Invalid network input. Please enter a valid CIDR or Netmask.")
+
+
+def parse_ip_address(ip_address: str) -> ipaddress.IPv4Address | ipaddress.IPv6Address:
+    """Parse an already sanitised IP address string."""
+    try:
+        if ":" in ip_address:
+            return ipaddress.IPv6Address(ip_address)
+        return ipaddress.IPv4Address(ip_address)
+    except ValueError as exc:
+        raise ValueError("Invalid IP address format.") from exc
+
+
+def parse_prefix(network_input: str, ip_version: int) -> int:
+    """Validate network input and return its prefix length.
+
+    Prefix lengths and canonical IPv4 netmasks/hostmasks are resolved with a
+    table lookup; anything else goes through ``validate_network_input`` so
+    errors keep the same messages.
+    """
+    if network_input.isascii() and network_input.isdigit() and len(network_input) <= _PREFIX_DIGITS[ip_version]:
+        prefix = int(network_input)
+        if prefix <= ADDRESS_BITS[ip_version]:
+            return prefix
+    elif ip_version == 4 and network_input in IPV4_MASK_PREFIXES:
+        return IPV4_MASK_PREFIXES[network_input]
+
+    validate_network_input(network_input, ip_version)
+    base = "0.0.0.0" if ip_version == 4 else "::"
+    return ipaddress.ip_network(f"{base}/{network_input}", strict=False).prefixlen
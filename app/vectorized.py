@@ -0,0 +1,416 @@
+"""Vectorised subnet calculations over NumPy address columns.
+
+Addresses are parsed into ``uint32`` arrays (IPv6 into ``(n, 2)`` arrays of
+``uint64`` high/low halves) and every derived field is computed for the whole
+column at once. Rows are only turned into the string dictionaries produced by
+``app.calculations`` when they are read.
+
+Rows the engine does not accept are marked invalid and delegated to the
+per-address functions on read, so the output is identical to theirs,
+including error messages.
+"""
+
+import ipaddress
+import socket
+from abc import ABC, abstractmethod
+from collections.abc import Iterator, Sequence
+
+import numpy as np
+
+from .calculations import (
+    calculate_ipv4,
+    calculate_ipv6,
+    calculate_ipv4_network_and_subnet,
+    calculate_ipv6_network_and_subnet,
+    IPV4_NETMASK_STRINGS,
+    IPV4_WILDCARD_STRINGS,
+    IPV6_NETMASK_STRINGS,
+    format_ipv4,
+    format_ipv6,
+)
+
+_UINT64_ONES = 0xFFFF_FFFF_FFFF_FFFF
+_IPV6_ZERO = bytes(16)
+
+IPV4_NETMASKS = np.array(
+    [(0xFFFF_FFFF << (32 - prefix)) & 0xFFFF_FFFF for prefix in range(33)], dtype=np.uint32
+)
+IPV4_HOSTMASKS = ~IPV4_NETMASKS
+IPV6_NETMASKS = np.array(
+    [
+        [(mask >> 64) & _UINT64_ONES, mask & _UINT64_ONES]
+        for mask in ((((1 << 128) - 1) << (128 - prefix)) & ((1 << 128) - 1) for prefix in range(129))
+    ],
+    dtype=np.uint64,
+)
+
+# Hostmasks sorted ascending, so prefix = 32 - searchsorted position.
+_IPV4_HOSTMASKS_ASCENDING = IPV4_HOSTMASKS[::-1].copy()
+
+
+def _private_table(address_class) -> tuple[list, list] | None:
+    """Return ``(networks, exceptions)`` as integer pairs, or None if unknown.
+
+    The table is read from ``ipaddress`` itself so the vectorised ``Type``
+    column follows whatever the running Python considers private.
+    """
+    constants = getattr(address_class, "_constants", None)
+    networks = getattr(constants, "_private_networks", None)
+    if networks is None:
+        return None
+    exceptions = getattr(constants, "_private_networks_exceptions", ())
+    return (
+        [(int(net.network_address), int(net.netmask)) for net in networks],
+        [(int(net.network_address), int(net.netmask)) for net in exceptions],
+    )
+
+
+_IPV4_PRIVATE = _private_table(ipaddress.IPv4Address)
+_IPV6_PRIVATE = _private_table(ipaddress.IPv6Address)
+
+
+def _as_strings(values: Sequence) -> np.ndarray:
+    return np.asarray(values, dtype=str).reshape(-1)
+
+
+def _char_matrix(strings: np.ndarray, width: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return strings as an ``(n, width + 1)`` matrix of code points.
+
+    The extra column is always zero for rows that fit, so every row has a
+    terminator. Rows longer than ``width`` are flagged.
+    """
+    matrix = strings.astype(f"U{width + 1}").view(np.uint32).reshape(len(strings), width + 1)
+    return matrix, matrix[:, width] == 0
+
+
+def _parse_decimal(matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Parse rows of ASCII digits; leading zeros are accepted."""
+    count = len(matrix)
+    values = np.zeros(count, dtype=np.uint32)
+    digits = np.zeros(count, dtype=np.uint8)
+    valid = np.ones(count, dtype=bool)
+    ended = np.zeros(count, dtype=bool)
+    for column in matrix.T:
+        is_digit = (column >= 0x30) & (column <= 0x39)
+        is_end = column == 0
+        valid &= (is_digit & ~ended) | is_end
+        values = np.where(is_digit, values * 10 + (column - 0x30), values)
+        digits += is_digit
+        ended |= is_end
+    return values, valid & (digits >= 1)
+
+
+def parse_ipv4_column(values: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Parse dotted-quad strings into a ``uint32`` array.
+
+    Parsing is done column by column over a code point matrix, following the same
+    rules as ``ipaddress``: four decimal octets, no leading zeros.
+
+    Args:
+        values (Sequence[str]): IPv4 address strings.
+
+    Returns:
+        tuple: ``(addresses, valid)`` where invalid rows hold ``0``.
+    """
+    matrix, valid = _char_matrix(_as_strings(values), 15)
+    count = len(matrix)
+    rows = np.arange(count)
+    addresses = np.zeros(count, dtype=np.uint32)
+    current = np.zeros(count, dtype=np.uint32)
+    digits = np.zeros(count, dtype=np.uint8)
+    field = np.zeros(count, dtype=np.uint8)
+    ended = np.zeros(count, dtype=bool)
+
+    for column in matrix.T:
+        is_digit = (column >= 0x30) & (column <= 0x39)
+        is_dot = column == 0x2E
+        is_end = column == 0
+        valid &= ((is_digit | is_dot) & ~ended) | is_end
+        valid &= ~(is_digit & (digits >= 1) & (current == 0))
+        current = np.where(is_digit, current * 10 + (column - 0x30), current)
+        digits += is_digit
+
+        closing = is_dot | (is_end & ~ended)
+        valid &= ~(closing & ((digits == 0) | (digits > 3) | (current > 255)))
+        valid &= ~(is_dot & (field >= 3))
+        shift = (np.uint32(3) - np.minimum(field, 3)) * np.uint32(8)
+        addresses = np.where(closing, addresses | (current << shift), addresses)
+        field += is_dot
+        current[closing] = 0
+        digits[closing] = 0
+        ended |= is_end
+
+    valid &= field == 3
+    addresses[~valid] = 0
+    return addresses, valid
+
+
+def parse_ipv6_column(values: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Parse IPv6 strings into an ``(n, 2)`` array of ``uint64`` halves.
+
+    Args:
+        values (Sequence[str]): IPv6 address strings.
+
+    Returns:
+        tuple: ``(addresses, valid)`` where invalid rows hold zeros.
+    """
+    packed = []
+    valid = np.ones(len(values), dtype=bool)
+    for index, value in enumerate(values):
+        try:
+            packed.append(socket.inet_pton(socket.AF_INET6, value))
+        except (OSError, TypeError, ValueError):
+            packed.append(_IPV6_ZERO)
+            valid[index] = False
+    addresses = np.frombuffer(b"".join(packed), dtype=">u8").astype(np.uint64).reshape(-1, 2)
+    return addresses, valid
+
+
+def parse_address_columns(
+    values: Sequence[str],
+) -> Iterator[tuple[int, np.ndarray, np.ndarray, np.ndarray]]:
+    """Split address strings by version and parse each group as one column.
+
+    Rows the column parsers reject are not necessarily invalid: ``ipaddress``
+    accepts spellings they do not, so callers should retry those rows one at
+    a time to keep its semantics.
+
+    Yields:
+        tuple: ``(version, positions, addresses, valid)`` for each version
+        present, where ``positions`` are the rows of ``values`` in the
+        group and ``addresses`` and ``valid`` are as returned by
+        ``parse_ipv4_column`` or ``parse_ipv6_column``.
+    """
+    positions = {4: [], 6: []}
+    for position, value in enumerate(values):
+        positions[6 if ":" in value else 4].append(position)
+    for version, parse in ((4, parse_ipv4_column), (6, parse_ipv6_column)):
+        if positions[version]:
+            addresses, valid = parse([values[position] for position in positions[version]])
+            yield version, np.array(positions[version], dtype=np.intp), addresses, valid
+
+
+def parse_ipv4_prefix_column(values: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Convert CIDR lengths, netmasks or hostmasks into IPv4 prefix lengths."""
+    strings = _as_strings(values)
+    prefixes = np.zeros(len(strings), dtype=np.uint8)
+
+    matrix, fits = _char_matrix(strings, 2)
+    cidr_values, is_cidr = _parse_decimal(matrix)
+    is_cidr &= fits & (cidr_values <= 32)
+    prefixes[is_cidr] = cidr_values[is_cidr]
+
+    masks, is_mask = parse_ipv4_column(strings)
+    is_mask &= ~is_cidr
+    netmask_pos = np.searchsorted(IPV4_NETMASKS, masks)
+    is_netmask = is_mask & (IPV4_NETMASKS[np.minimum(netmask_pos, 32)] == masks)
+    hostmask_pos = np.searchsorted(_IPV4_HOSTMASKS_ASCENDING, masks)
+    is_hostmask = (
+        is_mask & ~is_netmask & (_IPV4_HOSTMASKS_ASCENDING[np.minimum(hostmask_pos, 32)] == masks)
+    )
+    prefixes[is_netmask] = netmask_pos[is_netmask]
+    prefixes[is_hostmask] = 32 - hostmask_pos[is_hostmask]
+
+    return prefixes, is_cidr | is_netmask | is_hostmask
+
+
+def parse_ipv6_prefix_column(values: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Convert CIDR prefix lengths into IPv6 prefix lengths."""
+    matrix, fits = _char_matrix(_as_strings(values), 3)
+    prefix_values, valid = _parse_decimal(matrix)
+    valid &= fits & (prefix_values <= 128)
+    return np.where(valid, prefix_values, 0).astype(np.uint8), valid
+
+
+def _private_mask(addresses: np.ndarray, table: tuple[list, list]) -> np.ndarray:
+    networks, exceptions = table
+    private = np.zeros(len(addresses), dtype=bool)
+    for network, mask in networks:
+        private |= (addresses & addresses.dtype.type(mask)) == network
+    for network, mask in exceptions:
+        private &= (addresses & addresses.dtype.type(mask)) != network
+    return private
+
+
+def _private_mask_v6(addresses: np.ndarray, table: tuple[list, list]) -> np.ndarray:
+    networks, exceptions = table
+    high, low = addresses[:, 0], addresses[:, 1]
+
+    def contains(network: int, mask: int) -> np.ndarray:
+        return (
+            ((high & np.uint64(mask >> 64)) == np.uint64(network >> 64))
+            & ((low & np.uint64(mask & _UINT64_ONES)) == np.uint64(network & _UINT64_ONES))
+        )
+
+    private = np.zeros(len(addresses), dtype=bool)
+    for network, mask in networks:
+        private |= contains(network, mask)
+    for network, mask in exceptions:
+        private &= ~contains(network, mask)
+    return private
+
+
+class _NetworkColumns(ABC):
+    """Columnar network results shared by the IPv4 and IPv6 engines."""
+
+    version = 0
+
+    def __init__(self, addresses: Sequence[str], networks: Sequence[str]):
+        self.addresses = list(addresses)
+        self.networks = list(networks)
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    @abstractmethod
+    def network_result(self, index: int) -> dict:
+        """Return the ``calculate_*_network_and_subnet`` result for one row."""
+
+    @abstractmethod
+    def ip_result(self, index: int) -> dict:
+        """Return the ``calculate_ipv4``/``calculate_ipv6`` result for one row."""
+
+    def iter_network_results(self) -> Iterator[dict]:
+        for index in range(len(self)):
+            yield self.network_result(index)
+
+
+class IPv4NetworkColumns(_NetworkColumns):
+    """Vectorised IPv4 network calculations."""
+
+    version = 4
+
+    def __init__(self, addresses: Sequence[str], networks: Sequence[str]):
+        super().__init__(addresses, networks)
+        self.address, address_ok = parse_ipv4_column(self.addresses)
+        self.prefix, prefix_ok = parse_ipv4_prefix_column(self.networks)
+        self.address_valid = address_ok
+        self.valid = address_ok & prefix_ok
+
+        masks = IPV4_NETMASKS[self.prefix]
+        self.network = self.address & masks
+        self.broadcast = self.network | ~masks
+        self.netmask = masks
+        self.wildcard = ~masks
+        self.host_min = np.where(self.prefix >= 31, self.network, self.network + np.uint32(1))
+        self.host_max = np.where(
+            self.prefix == 32,
+            self.network,
+            np.where(self.prefix == 31, self.broadcast, self.broadcast - np.uint32(1)),
+        )
+        host_bits = 32 - self.prefix.astype(np.int64)
+        self.total_hosts = np.where(
+            self.prefix == 32, 1, np.where(self.prefix == 31, 2, (np.int64(1) << host_bits) - 2)
+        )
+        self.private = _private_mask(self.address, _IPV4_PRIVATE) if _IPV4_PRIVATE else None
+
+    def network_result(self, index: int) -> dict:
+        if not self.valid[index]:
+            return calculate_ipv4_network_and_subnet(self.addresses[index], self.networks[index])
+        prefix = int(self.prefix[index])
+        return {
+            "Network Address": format_ipv4(int(self.network[index])),
+            "Broadcast Address": format_ipv4(int(self.broadcast[index])),
+            "CIDR": str(prefix),
+            "Netmask": IPV4_NETMASK_STRINGS[prefix],
+            "Wildcard": IPV4_WILDCARD_STRINGS[prefix],
+            "HostMin": format_ipv4(int(self.host_min[index])),
+            "HostMax": format_ipv4(int(self.host_max[index])),
+            "Total Hosts": int(self.total_hosts[index]),
+        }
+
+    def ip_result(self, index: int) -> dict:
+        if not self.address_valid[index]:
+            return calculate_ipv4(self.addresses[index])
+        value = int(self.address[index])
+        if self.private is not None:
+            private = bool(self.private[index])
+        else:
+            private = ipaddress.IPv4Address(value).is_private
+        return {
+            "IP Address": format_ipv4(value),
+            "Version": "IPv4",
+            "Type": "Private" if private else "Public",
+            "Binary": format(value, "032b"),
+            "Decimal": value,
+            "Reverse Pointer": (
+                f"{value & 0xFF}.{(value >> 8) & 0xFF}.{(value >> 16) & 0xFF}.{value >> 24}.in-addr.arpa"
+            ),
+        }
+
+
+class IPv6NetworkColumns(_NetworkColumns):
+    """Vectorised IPv6 network calculations."""
+
+    version = 6
+
+    def __init__(self, addresses: Sequence[str], networks: Sequence[str]):
+        super().__init__(addresses, networks)
+        self.address, address_ok = parse_ipv6_column(self.addresses)
+        self.prefix, prefix_ok = parse_ipv6_prefix_column(self.networks)
+        self.address_valid = address_ok
+        self.valid = address_ok & prefix_ok
+
+        masks = IPV6_NETMASKS[self.prefix]
+        self.network = self.address & masks
+        self.broadcast = self.network | ~masks
+        # Prefixes up to /126 leave the two low bits free, so +/-1 never carries.
+        offset = np.where(self.prefix >= 127, np.uint64(0), np.uint64(1))
+        self.host_min = self.network.copy()
+        self.host_min[:, 1] += offset
+        self.host_max = np.where((self.prefix == 128)[:, None], self.network, self.broadcast)
+        self.host_max[:, 1] -= offset
+
+        mapped = (self.address[:, 0] == 0) & ((self.address[:, 1] >> np.uint64(32)) == 0xFFFF)
+        self.private = _private_mask_v6(self.address, _IPV6_PRIVATE) if _IPV6_PRIVATE else None
+        self._scalar_private = mapped if self.private is not None else np.ones(len(self), dtype=bool)
+
+    def _int(self, column: np.ndarray, index: int) -> int:
+        return (int(column[index, 0]) << 64) | int(column[index, 1])
+
+    def network_result(self, index: int) -> dict:
+        if not self.valid[index]:
+            return calculate_ipv6_network_and_subnet(self.addresses[index], self.networks[index])
+        prefix = int(self.prefix[index])
+        if prefix == 128:
+            total_hosts = 1
+        elif prefix == 127:
+            total_hosts = 2
+        else:
+            total_hosts = 1 << (128 - prefix)
+        return {
+            "Network Address": format_ipv6(self._int(self.network, index)),
+            "Broadcast Address": format_ipv6(self._int(self.broadcast, index)),
+            "CIDR": str(prefix),
+            "Netmask": IPV6_NETMASK_STRINGS[prefix],
+            "HostMin": format_ipv6(self._int(self.host_min, index)),
+            "HostMax": format_ipv6(self._int(self.host_max, index)),
+            "Total Hosts": total_hosts,
+        }
+
+    def ip_result(self, index: int) -> dict:
+        if not self.address_valid[index]:
+            return calculate_ipv6(self.addresses[index])
+        value = self._int(self.address, index)
+        if self._scalar_private[index]:
+            private = ipaddress.IPv6Address(value).is_private
+        else:
+            private = bool(self.private[index])
+        return {
+            "IP Address": format_ipv6(value),
+            "Version": "IPv6",
+            "Type": "Private" if private else "Global",
+            "Binary": format(value, "0128b"),
+            "Decimal": value,
+            "Reverse Pointer": ".".join(reversed(f"{value:032x}")) + ".ip6.arpa",
+        }
+
+
+def calculate_ipv4_columns(addresses: Sequence[str], networks: Sequence[str]) -> IPv4NetworkColumns:
+    """Calculate IPv4 network details for whole columns of inputs."""
+    return IPv4NetworkColumns(addresses, networks)
+
+
+def calculate_ipv6_columns(addresses: Sequence[str], networks: Sequence[str]) -> IPv6NetworkColumns:
+    """Calculate IPv6 network details for whole columns of inputs."""
+    return IPv6NetworkColumns(addresses, networks)
@@ -0,0 +1,248 @@
+"""VLSM planning: allocate aligned child subnets from a parent block.
+
+Requirements are sized to the smallest prefix that fits (host counts use the
+same usable-host rules as ``calculations.py``) and allocated largest first.
+Free space is kept as aligned blocks in one min-heap of start addresses per
+prefix length. Each allocation takes the smallest free block that fits,
+lowest address first, and splits it buddy-style, pushing the unused halves
+back. With no reserved ranges this packs every plan that fits into a
+contiguous run from the start of the parent, so the only waste is the
+rounding of each requirement to a power of two.
+"""
+
+import heapq
+import ipaddress
+import re
+from collections.abc import Iterable
+
+from .calculations import ADDRESS_BITS, FORMATTERS
+
+_NAMED_REQUIREMENT = re.compile(r"^(?P<name>[^\s:=]+)\s*[:=\s]\s*(?P<size>/?\d+)$")
+
+
+def usable_hosts(prefix: int, version: int) -> int:
+    """Return usable hosts for a prefix, matching ``calculations.py``."""
+    bits = ADDRESS_BITS[version]
+    if prefix == bits:
+        return 1
+    if prefix == bits - 1:
+        return 2
+    size = 1 << (bits - prefix)
+    return size - 2 if version == 4 else size
+
+
+def hosts_to_prefix(hosts: int, version: int) -> int:
+    """Return the longest prefix with at least ``hosts`` usable hosts.
+
+    Raises:
+        ValueError: If ``hosts`` is not positive or cannot fit any prefix.
+    """
+    bits = ADDRESS_BITS[version]
+    if hosts < 1:
+        raise ValueError("Host counts must be positive.")
+    if hosts <= 2:
+        return bits - hosts + 1
+    needed = hosts + 2 if version == 4 else hosts
+    prefix = bits - (needed - 1).bit_length()
+    if prefix < 0:
+        raise ValueError(f"{hosts} hosts do not fit in any IPv{version} network.")
+    return prefix
+
+
+def parse_requirement(item, version: int) -> tuple[str | None, int | None, int]:
+    """Return ``(name, hosts, prefix)`` for one requirement.
+
+    Requirements may be host counts (``50`` or ``"50"``), prefix lengths
+    (``"/26"``), ``"name:50"`` / ``"name /26"`` strings, or objects with
+    ``name`` and either ``hosts`` or ``prefix``.
+    """
+    name = None
+    if isinstance(item, dict):
+        name = item.get("name")
+        if item.get("prefix") is not None:
+            item = f"/{item['prefix']}"
+        else:
+            item = item.get("hosts")
+    elif isinstance(item, str):
+        item = item.strip()
+        match = _NAMED_REQUIREMENT.match(item)
+        if match:
+            name, item = match.group("name"), match.group("size")
+
+    if isinstance(item, str) and re.fullmatch(r"/\d{1,3}", item):
+        prefix = int(item[1:])
+        if prefix > ADDRESS_BITS[version]:
+            raise ValueError(f"Prefix length /{prefix} is too long for IPv{version}.")
+        return name, None, prefix
+    if isinstance(item, str) and item.isdigit():
+        item = int(item)
+    if isinstance(item, int) and not isinstance(item, bool):
+        return name, item, hosts_to_prefix(item, version)
+    raise ValueError("Each requirement must be a host count or a /prefix length.")
+
+
+def parse_requirements_text(text: str) -> list[str]:
+    """Split form input into requirements, one per line or comma."""
+    return [part.strip() for part in re.split(r"[,\n]", text or "") if part.strip()]
+
+
+def range_blocks(first: int, last: int, bits: int) -> Iterable[tuple[int, int]]:
+    """Yield the aligned ``(start, prefix)`` blocks exactly covering ``first..last``."""
+    while first <= last:
+        size_bits = (first & -first).bit_length() - 1 if first else bits
+        while first + (1 << size_bits) - 1 > last:
+            size_bits -= 1
+        yield first, bits - size_bits
+        first += 1 << size_bits
+
+
+class FreeBlocks:
+    """Free aligned blocks, one min-heap of start addresses per prefix length."""
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        self._heaps: list[list[int]] = [[] for _ in range(bits + 1)]
+
+    def add(self, start: int, prefix: int) -> None:
+        heapq.heappush(self._heaps[prefix], start)
+
+    def add_range(self, first: int, last: int) -> None:
+        for start, prefix in range_blocks(first, last, self.bits):
+            self.add(start, prefix)
+
+    def allocate(self, prefix: int) -> int | None:
+        """Take a ``/prefix`` block from the smallest free block that fits."""
+        for candidate in range(prefix, -1, -1):
+            if self._heaps[candidate]:
+                break
+        else:
+            return None
+        start = heapq.heappop(self._heaps[candidate])
+        while candidate < prefix:
+            candidate += 1
+            self.add(start + (1 << (self.bits - candidate)), candidate)
+        return start
+
+    def blocks(self) -> list[tuple[int, int]]:
+        """Return all free blocks sorted by address."""
+        return sorted((start, prefix) for prefix, heap in enumerate(self._heaps) for start in heap)
+
+
+def plan_subnets(
+    parent: str,
+    requirements: Iterable,
+    exclude: Iterable[str] = (),
+    max_subnets: int | None = None,
+) -> dict:
+    """Allocate non-overlapping child subnets from ``parent``.
+
+    Args:
+        parent (str): Parent network, e.g. ``"10.0.0.0/16"``.
+        requirements (Iterable): Host counts or prefix lengths (see ``parse_requirement``).
+        exclude (Iterable[str]): Networks inside the parent that are already in use.
+        max_subnets (int | None): Reject plans with more requirements than this.
+
+    Returns:
+        dict: The plan; ``subnets`` are listed in requirement order and
+        ``free`` lists the remaining space as CIDR blocks.
+
+    Raises:
+        ValueError: If the input is invalid or the plan does not fit.
+    """
+    try:
+        network = ipaddress.ip_network(parent.strip(), strict=False)
+    except (AttributeError, ValueError) as exc:
+        raise ValueError("Invalid parent network.") from exc
+    version = network.version
+    bits = ADDRESS_BITS[version]
+    first = int(network.network_address)
+    last = int(network.broadcast_address)
+
+    parsed = []
+    for position, item in enumerate(requirements):
+        if max_subnets is not None and position >= max_subnets:
+            raise ValueError(f"Plans are limited to {max_subnets} subnets.")
+        name, hosts, prefix = parse_requirement(item, version)
+        if prefix < network.prefixlen:
+            raise ValueError(f"/{prefix} does not fit in {network}.")
+        parsed.append((prefix, position, name, hosts))
+    if not parsed:
+        raise ValueError("At least one subnet is required.")
+
+    reserved = []
+    for cidr in exclude:
+        try:
+            excluded = ipaddress.ip_network(cidr.strip(), strict=False)
+        except (AttributeError, ValueError) as exc:
+            raise ValueError(f"Invalid excluded network: {cidr!r}") from exc
+        if excluded.version == version and excluded.overlaps(network):
+            low, high = int(excluded.network_address), int(excluded.broadcast_address)
+            reserved.append((max(first, low), min(last, high)))
+
+    free = FreeBlocks(bits)
+    cursor = first
+    for reserved_first, reserved_last in sorted(reserved):
+        if reserved_first > cursor:
+            free.add_range(cursor, reserved_first - 1)
+        cursor = max(cursor, reserved_last + 1)
+    if cursor <= last:
+        free.add_range(cursor, last)
+
+    needed = sum(1 << (bits - prefix) for prefix, _, _, _ in parsed)
+    available = (last - first + 1) - sum(end - start + 1 for start, end in _merge(reserved))
+    if needed > available:
+        raise ValueError(
+            f"The plan needs {needed} addresses but only {available} are free in {network}."
+        )
+
+    formatter = FORMATTERS[version]
+    subnets: list[dict | None] = [None] * len(parsed)
+    for prefix, position, name, hosts in sorted(parsed):
+        start = free.allocate(prefix)
+        if start is None:
+            label = name or f"subnet {position + 1}"
+            raise ValueError(f"No free /{prefix} block is left in {network} for {label}.")
+        subnets[position] = _describe(start, prefix, version, formatter, name, hosts)
+
+    return {
+        "parent": str(network),
+        "version": version,
+        "total_addresses": last - first + 1,
+        "allocated_addresses": needed,
+        "free_addresses": available - needed,
+        "utilization": needed / (last - first + 1),
+        "subnets": subnets,
+        "free": [f"{formatter(start)}/{prefix}" for start, prefix in free.blocks()],
+    }
+
+
+def _merge(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    merged: list[list[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def _describe(
+    start: int, prefix: int, version: int, formatter, name: str | None, hosts: int | None
+) -> dict:
+    bits = ADDRESS_BITS[version]
+    end = start + (1 << (bits - prefix)) - 1
+    if prefix >= bits - 1:
+        host_min, host_max = start, end
+    else:
+        host_min, host_max = start + 1, end - 1
+    return {
+        "name": name,
+        "hosts": hosts,
+        "subnet": f"{formatter(start)}/{prefix}",
+        "network": formatter(start),
+        "broadcast": formatter(end),
+        "prefix": prefix,
+        "host_min": formatter(host_min),
+        "host_max": formatter(host_max),
+        "usable_hosts": usable_hosts(prefix, version),
+    }
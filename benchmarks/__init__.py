@@ -0,0 +1 @@
+"""Benchmarks for the calculation paths; ``python -m benchmarks`` runs the gated suite."""
@@ -0,0 +1,75 @@
+"""Compare single network lookups through ``ipaddress`` with the table-driven fast path.
+
+Run with ``python -m benchmarks.fast_path``. Each case is one call of
+``calculate_ipv4_network_and_subnet`` or ``calculate_ipv6_network_and_subnet``;
+"ipaddress" is the implementation they fall back to for input the fast path
+does not handle. The run fails with exit status 1 when a case stays below
+``--min-speedup`` (default ``SPEEDUP_TARGET``) after ``--retries``
+re-measurements, which rule out noise.
+"""
+
+import argparse
+import timeit
+
+from app.calculations import (
+    _ipv4_network_and_subnet,
+    _ipv6_network_and_subnet,
+    calculate_ipv4_network_and_subnet,
+    calculate_ipv6_network_and_subnet,
+)
+
+CASES = [
+    ("192.168.10.77", "255.255.255.0"),
+    ("10.20.30.40", "19"),
+    ("2001:db8:85a3::8a2e:370:7334", "64"),
+    ("2001:db8:85a3::8a2e:370:7334", "127"),
+]
+SPEEDUP_TARGET = 5.0
+
+
+def measure(function, ip_address: str, network_input: str, number: int) -> float:
+    """Return the best time of one call in microseconds."""
+    seconds = min(timeit.repeat(lambda: function(ip_address, network_input), number=number, repeat=7))
+    return seconds / number * 1e6
+
+
+def compare(ip_address: str, network_input: str, number: int) -> tuple[float, float]:
+    """Return the ``ipaddress`` and fast-path times of one case in microseconds."""
+    if ":" in ip_address:
+        fast, reference = calculate_ipv6_network_and_subnet, _ipv6_network_and_subnet
+    else:
+        fast, reference = calculate_ipv4_network_and_subnet, _ipv4_network_and_subnet
+    if fast(ip_address, network_input) != reference(ip_address, network_input):
+        raise AssertionError(f"results differ for {ip_address}/{network_input}")
+    return measure(reference, ip_address, network_input, max(number // 5, 1)), measure(
+        fast, ip_address, network_input, number
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--number", type=int, default=20000, help="calls per repeat")
+    parser.add_argument(
+        "--min-speedup", type=float, default=SPEEDUP_TARGET, help="fail when a case is slower than this (0: never)"
+    )
+    parser.add_argument("--retries", type=int, default=2, help="re-measure slow cases this many times")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for ip_address, network_input in CASES:
+        before, after = compare(ip_address, network_input, args.number)
+        for _ in range(args.retries):
+            if before / after >= args.min_speedup:
+                break
+            retry_before, retry_after = compare(ip_address, network_input, args.number)
+            before, after = min(before, retry_before), min(after, retry_after)
+        speedup = before / after
+        status = "ok" if speedup >= args.min_speedup else "below target"
+        failed = failed or status != "ok"
+        case = f"{ip_address}/{network_input}"
+        print(f"{case:<36} ipaddress {before:7.2f} us  fast path {after:6.2f} us  {speedup:5.1f}x  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
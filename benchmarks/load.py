@@ -0,0 +1,380 @@
+"""Load test the app under gunicorn and report latency percentiles.
+
+Run with ``python -m benchmarks.load``. For every configuration (the
+product of ``--workers``, ``--worker-class`` and ``--threads``) gunicorn is
+started with ``gunicorn.conf.py``, serving ``create_app`` (or the ASGI app
+from ``app.asgi`` for ``--worker-class asgi``, when uvicorn is installed).
+``--connections`` simulated users then send a weighted mix of requests
+for ``--duration`` seconds after a ``--warmup``:
+
+- ``form``: load the page, take its CSRF token and session cookie, and post
+  the ``/calculate`` form with them.
+- ``permalink``: ``GET /ip/<address>/<prefix>``.
+- ``api-calculate``: ``POST /api/v1/calculate`` with a JSON batch.
+- ``api-hosts``: a page of ``GET /api/v1/hosts``.
+
+Each user keeps its connection alive when the server allows it. The report
+gives requests per second and p50/p95/p99 latency per endpoint and a
+comparison of the configurations; with ``--slo-ms`` it names the fastest
+configuration whose p99 stays within it, which is the data to size
+``GUNICORN_WORKERS`` from. ``--url`` measures a running deployment, for
+example nginx in front of gunicorn, instead of starting servers.
+
+The load generator runs in this process and competes with the server for
+CPU on the same machine, so absolute numbers are a lower bound; run it from
+another host with ``--url`` for capacity planning.
+"""
+
+import argparse
+import http.client
+import importlib.util
+import itertools
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from .startup import ROOT, child_pids, free_port
+
+SCENARIOS = ("form", "permalink", "api-calculate", "api-hosts")
+DEFAULT_MIX = "form=5,permalink=2,api-calculate=2,api-hosts=1"
+ASGI_APP = "app.asgi:create_asgi_app()"
+API_BATCH_SIZE = 20
+_CSRF_PATTERN = re.compile(rb'name="csrf_token" value="([^"]+)"')
+# Form errors, including a rejected CSRF token, are flashed on a 200 page.
+_FORM_RESULT = b"<strong>CIDR:</strong>"
+_TIMEOUT = 30
+
+# One sample: (endpoint, status or None for a failed request, started, seconds).
+Sample = tuple[str, int | None, float, float]
+
+
+def _random_address(rng: random.Random) -> tuple[str, str]:
+    if rng.random() < 0.7:
+        return ".".join(str(rng.randrange(1, 255)) for _ in range(4)), str(rng.randint(8, 30))
+    groups = ":".join(f"{rng.getrandbits(16):x}" for _ in range(4))
+    return f"2001:db8:{groups}::{rng.getrandbits(16):x}", str(rng.choice((48, 56, 64)))
+
+
+class Client:
+    """One simulated user with a keep-alive connection and a cookie jar."""
+
+    def __init__(self, host: str, port: int, rng: random.Random):
+        self.host = host
+        self.port = port
+        self.rng = rng
+        self.cookies: dict[str, str] = {}
+        self.samples: list[Sample] = []
+        self._connection: http.client.HTTPConnection | None = None
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _send(self, method: str, path: str, body: bytes | None, headers: dict) -> tuple[int, bytes]:
+        reused = self._connection is not None
+        if self._connection is None:
+            self._connection = http.client.HTTPConnection(self.host, self.port, timeout=_TIMEOUT)
+        try:
+            self._connection.request(method, path, body=body, headers=headers)
+            response = self._connection.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            self.close()
+            if not reused:
+                raise
+            # The server closed an idle keep-alive connection; retry once on a new one.
+            return self._send(method, path, body, headers)
+        for header in response.headers.get_all("Set-Cookie") or []:
+            name, _, value = header.split(";", 1)[0].partition("=")
+            self.cookies[name.strip()] = value.strip()
+        if response.will_close:
+            self.close()
+        return response.status, data
+
+    def request(
+        self, endpoint: str, method: str, path: str, body: bytes | None = None, content_type=None, expect=None
+    ) -> bytes:
+        """Send one request, record its latency under ``endpoint`` and return the body.
+
+        A response body without ``expect`` is recorded as failed.
+        """
+        headers = {}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in self.cookies.items())
+        if content_type:
+            headers["Content-Type"] = content_type
+        started = time.perf_counter()
+        try:
+            status, data = self._send(method, path, body, headers)
+        except (http.client.HTTPException, OSError):
+            self.samples.append((endpoint, None, started, time.perf_counter() - started))
+            return b""
+        if expect is not None and expect not in data:
+            status = None
+        self.samples.append((endpoint, status, started, time.perf_counter() - started))
+        return data
+
+    def form(self) -> None:
+        match = _CSRF_PATTERN.search(self.request("GET /", "GET", "/"))
+        if match is None:
+            return
+        address, prefix = _random_address(self.rng)
+        fields = {"ip-address": address, "network": prefix, "csrf_token": match.group(1).decode()}
+        body = urllib.parse.urlencode(fields).encode()
+        self.request("POST /calculate", "POST", "/calculate", body, "application/x-www-form-urlencoded", _FORM_RESULT)
+
+    def permalink(self) -> None:
+        address, prefix = _random_address(self.rng)
+        self.request("GET /ip/<address>/<prefix>", "GET", f"/ip/{address}/{prefix}")
+
+    def api_calculate(self) -> None:
+        items = [list(_random_address(self.rng)) for _ in range(API_BATCH_SIZE)]
+        body = json.dumps(items).encode()
+        self.request("POST /api/v1/calculate", "POST", "/api/v1/calculate", body, "application/json")
+
+    def api_hosts(self) -> None:
+        network = f"10.{self.rng.randrange(256)}.0.0/16"
+        query = urllib.parse.urlencode({"network": network, "offset": self.rng.randrange(65000), "limit": 100})
+        self.request("GET /api/v1/hosts", "GET", f"/api/v1/hosts?{query}")
+
+
+def parse_mix(text: str) -> dict[str, int]:
+    """Return scenario weights from ``name=weight,...``.
+
+    Raises:
+        ValueError: If a scenario is unknown or a weight is not a non-negative integer.
+    """
+    mix = {}
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS or not weight.isdigit():
+            raise ValueError(f"Invalid mix entry {part!r}; use name=weight with names from {', '.join(SCENARIOS)}.")
+        mix[name] = int(weight)
+    if not any(mix.values()):
+        raise ValueError("The mix needs at least one scenario with a positive weight.")
+    return mix
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of sorted ``values``."""
+    if not values:
+        return float("nan")
+    return values[min(max(math.ceil(fraction * len(values)), 1), len(values)) - 1]
+
+
+def summarize(samples: list[Sample], seconds: float) -> dict:
+    """Return request rate, error count and latency percentiles (ms) per endpoint and in total."""
+    grouped: dict[str, list[Sample]] = defaultdict(list)
+    for sample in samples:
+        grouped[sample[0]].append(sample)
+    grouped["total"] = samples
+
+    report = {}
+    for endpoint, group in grouped.items():
+        latencies = sorted(sample[3] * 1000 for sample in group)
+        report[endpoint] = {
+            "requests": len(group),
+            "errors": sum(sample[1] is None or sample[1] >= 400 for sample in group),
+            "rps": len(group) / seconds if seconds else 0.0,
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "max_ms": latencies[-1] if latencies else float("nan"),
+        }
+    return report
+
+
+def run_load(url: str, mix: dict[str, int], connections: int, duration: float, warmup: float = 0, seed: int = 0):
+    """Drive ``url`` with ``connections`` users for ``warmup + duration`` seconds.
+
+    Returns:
+        dict: ``summarize`` of the samples started after the warm-up.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    names = [name for name, weight in mix.items() if weight]
+    weights = [mix[name] for name in names]
+    clients = [
+        Client(parsed.hostname, parsed.port or 80, random.Random(seed * 7919 + number))
+        for number in range(connections)
+    ]
+    started = time.perf_counter()
+    measure_from, stop_at = started + warmup, started + warmup + duration
+
+    def drive(client: Client) -> None:
+        scenarios: dict[str, Callable[[], None]] = {
+            "form": client.form,
+            "permalink": client.permalink,
+            "api-calculate": client.api_calculate,
+            "api-hosts": client.api_hosts,
+        }
+        try:
+            while time.perf_counter() < stop_at:
+                scenarios[client.rng.choices(names, weights)[0]]()
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=drive, args=(client,), daemon=True) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    samples = [sample for client in clients for sample in client.samples if measure_from <= sample[2] < stop_at]
+    return summarize(samples, duration)
+
+
+def configurations(workers: list[int], worker_classes: list[str], threads: list[int]) -> Iterator[dict]:
+    """Yield one configuration per combination; ``threads`` only varies for ``gthread``."""
+    for worker_class, count in itertools.product(worker_classes, workers):
+        for thread_count in threads if worker_class == "gthread" else [1]:
+            yield {"workers": count, "worker_class": worker_class, "threads": thread_count}
+
+
+def describe(config: dict) -> str:
+    if "url" in config:
+        return config["url"]
+    text = f"workers={config['workers']} class={config['worker_class']}"
+    return text + (f" threads={config['threads']}" if config["worker_class"] == "gthread" else "")
+
+
+@contextmanager
+def gunicorn(config: dict, timeout: float = 30) -> Iterator[str]:
+    """Run gunicorn with ``config`` and yield its base URL."""
+    port = free_port()
+    asgi = config["worker_class"] == "asgi"
+    env = dict(
+        os.environ,
+        SECRET_KEY="benchmark",
+        FLASK_DEBUG="false",
+        # Every simulated user comes from 127.0.0.1.
+        RATE_LIMIT_PER_MINUTE=str(10**9),
+        GUNICORN_WORKERS=str(config["workers"]),
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_WORKER_CLASS="uvicorn.workers.UvicornWorker" if asgi else config["worker_class"],
+        GUNICORN_APP=ASGI_APP if asgi else "app:create_app()",
+    )
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--threads", str(config["threads"])]
+    started = time.perf_counter()
+    master = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            if master.poll() is not None or time.perf_counter() - started > timeout:
+                raise RuntimeError(f"gunicorn did not start ({describe(config)})")
+            try:
+                urllib.request.urlopen(url + "/", timeout=1).read()
+                # Without /proc, the first answer has to do.
+                procfs = os.path.exists(f"/proc/{master.pid}")
+                if not procfs or len(child_pids(master.pid)) >= config["workers"]:
+                    break
+            except OSError:
+                time.sleep(0.05)
+        yield url
+    finally:
+        master.terminate()
+        master.wait(timeout)
+
+
+def _print_report(title: str, report: dict) -> None:
+    total = report["total"]
+    print(f"{title}: {total['requests']} requests, {total['rps']:.1f} req/s, {total['errors']} errors")
+    print(f"  {'endpoint':<30} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for endpoint, row in sorted(report.items(), key=lambda item: (item[0] == "total", item[0])):
+        print(
+            f"  {endpoint:<30} {row['rps']:8.1f} {row['p50_ms']:8.2f} {row['p95_ms']:8.2f} {row['p99_ms']:8.2f}"
+            f" {row['errors']:7d}"
+        )
+
+
+def best_configuration(results: list[dict], slo_ms: float | None) -> dict | None:
+    """Return the result with the highest throughput, among those meeting ``slo_ms`` at p99 if given."""
+    eligible = [
+        result
+        for result in results
+        if not result["report"]["total"]["errors"] and (slo_ms is None or result["report"]["total"]["p99_ms"] <= slo_ms)
+    ]
+    return max(eligible, key=lambda result: result["report"]["total"]["rps"], default=None)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="measure this running server instead of starting gunicorn")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="gunicorn worker counts")
+    parser.add_argument(
+        "--worker-class", nargs="+", default=["sync"], help="sync, gthread, asgi or any gunicorn worker class"
+    )
+    parser.add_argument("--threads", type=int, nargs="+", default=[4], help="threads per gthread worker")
+    parser.add_argument("--connections", type=int, default=16, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=10, help="measured seconds per configuration")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds before each run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario weights (default: %(default)s)")
+    parser.add_argument("--slo-ms", type=float, help="p99 latency target used to pick a configuration")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the request mix")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if args.connections < 1 or args.duration <= 0 or args.warmup < 0:
+        parser.error("--connections and --duration must be positive and --warmup not negative.")
+
+    def run(url: str) -> dict:
+        return run_load(url, mix, args.connections, args.duration, args.warmup, args.seed)
+
+    results = []
+    if args.url:
+        results.append({"config": {"url": args.url}, "report": run(args.url)})
+        _print_report(args.url, results[-1]["report"])
+    else:
+        for config in configurations(args.workers, args.worker_class, args.threads):
+            if config["worker_class"] == "asgi" and importlib.util.find_spec("uvicorn") is None:
+                print(f"Skipping {describe(config)}: uvicorn is not installed.")
+                continue
+            with gunicorn(config) as url:
+                report = run(url)
+            results.append({"config": config, "report": report})
+            _print_report(describe(config), report)
+            print()
+
+    if len(results) > 1:
+        print(f"{'configuration':<36} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for result in results:
+            total = result["report"]["total"]
+            print(
+                f"{describe(result['config']):<36} {total['rps']:8.1f} {total['p50_ms']:8.2f} {total['p95_ms']:8.2f}"
+                f" {total['p99_ms']:8.2f} {total['errors']:7d}"
+            )
+        best = best_configuration(results, args.slo_ms)
+        target = f" with p99 <= {args.slo_ms:g} ms" if args.slo_ms is not None else ""
+        if best is None:
+            print(f"No configuration ran without errors{target}.")
+        else:
+            print(f"Highest throughput{target}: {describe(best['config'])}")
+
+    if args.json:
+        with args.json.open("w", encoding="utf-8") as handle:
+            json.dump({"connections": args.connections, "mix": mix, "results": results}, handle, indent=2)
+            handle.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
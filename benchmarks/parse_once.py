@@ -0,0 +1,103 @@
+"""Compare the old multi-parse ``/calculate`` path with the parse-once pipeline.
+
+Run with ``python -m benchmarks.parse_once``. "details" validates the form
+values and computes the address and network details; "details + regex" also
+generates the regex, which is the full work of one ``/calculate`` request.
+"""
+
+import argparse
+import timeit
+import tracemalloc
+
+from app.cache import CalculationCache
+from app.calculations import (
+    calculate_ipv4,
+    calculate_ipv6,
+    calculate_ipv4_network_and_subnet,
+    calculate_ipv6_network_and_subnet,
+)
+from app.ip_to_regex import ip_to_regex
+from app.results import parse_calculation
+from app.validation import parse_ip_address, validate_network_input, validate_raw_input
+
+CASES = [
+    ("192.168.10.77", "255.255.255.0"),
+    ("10.20.30.40", "19"),
+    ("2001:db8:85a3::8a2e:370:7334", "64"),
+]
+
+
+def multi_parse(ip_address: str, network_input: str, with_regex: bool) -> dict:
+    """The request path before the parse-once pipeline."""
+    ip_address = validate_raw_input(ip_address, "IP address")
+    network_input = validate_raw_input(network_input, "Network input", allow_slash=True)
+    ip = parse_ip_address(ip_address)
+    validate_network_input(network_input, ip.version)
+    if ip.version == 4:
+        result = {
+            "ip": calculate_ipv4(ip_address),
+            "network": calculate_ipv4_network_and_subnet(ip_address, network_input),
+        }
+    else:
+        result = {
+            "ip": calculate_ipv6(ip_address),
+            "network": calculate_ipv6_network_and_subnet(ip_address, network_input),
+        }
+    if with_regex:
+        network = result["network"]
+        result["regex"] = {"pattern": ip_to_regex(f"{network['Network Address']}/{network['CIDR']}")}
+    return result
+
+
+def _render(calculation, with_regex: bool):
+    fields = list(calculation.address.fields()) + list(calculation.network.fields())
+    return fields, calculation.regex if with_regex else None
+
+
+def parse_once(ip_address: str, network_input: str, with_regex: bool):
+    return _render(parse_calculation(ip_address, network_input), with_regex)
+
+
+def make_cached():
+    cache = CalculationCache()
+
+    def cached(ip_address: str, network_input: str, with_regex: bool):
+        return _render(cache.parse(ip_address, network_input), with_regex)
+
+    return cached
+
+
+def measure(function, with_regex: bool, number: int) -> tuple[float, int]:
+    """Return microseconds per request and peak traced bytes for one pass over the cases."""
+    def run():
+        for ip_address, network_input in CASES:
+            function(ip_address, network_input, with_regex)
+
+    seconds = min(timeit.repeat(run, number=number, repeat=5))
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds / (number * len(CASES)) * 1e6, peak
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--number", type=int, default=1000, help="iterations per repeat")
+    args = parser.parse_args(argv)
+
+    paths = (
+        ("multi-parse", multi_parse), ("parse-once", parse_once), ("parse-once cached", make_cached())
+    )
+    for label, with_regex in (("details", False), ("details + regex", True)):
+        print(label)
+        baseline = None
+        for name, function in paths:
+            per_request, peak = measure(function, with_regex, args.number)
+            baseline = baseline or per_request
+            speedup, kib = baseline / per_request, peak / 1024
+            print(f"  {name:<20} {per_request:8.1f} us/request  {speedup:5.1f}x  peak {kib:6.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Measure cold-start time and per-worker memory under gunicorn.
+
+Run with ``python -m benchmarks.startup``. Cold start runs a fresh
+interpreter several times and reports the median time to import ``app``,
+build it with ``create_app`` and serve the first request. The memory part
+(Linux only) starts gunicorn with ``gunicorn.conf.py`` with and without
+``--preload``, sends a few requests to warm the workers and reports RSS,
+PSS (RSS with shared pages split between the processes sharing them) and
+USS (pages private to the process) for the master and each worker.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+_COLD_START = """
+import time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app(debug_mode=False, secret_key="benchmark", load_env=False)
+created = time.perf_counter()
+flask_app.test_client().get("/")
+served = time.perf_counter()
+print(imported - started, created - imported, served - created)
+"""
+
+
+def cold_start(runs: int) -> dict:
+    """Return median seconds for import, ``create_app`` and the first request."""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _COLD_START], cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout
+        samples.append([float(value) for value in output.split()])
+    return {
+        name: statistics.median(sample[position] for sample in samples)
+        for position, name in enumerate(("import", "create_app", "first_request"))
+    }
+
+
+def _memory(pid: int) -> dict:
+    """Return RSS, PSS and USS in KiB from ``/proc``."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as handle:
+        for line in handle:
+            name, _, rest = line.partition(":")
+            if rest.strip().endswith("kB"):
+                values[name] = int(rest.split()[0])
+    return {
+        "rss_kib": values.get("Rss", 0),
+        "pss_kib": values.get("Pss", 0),
+        "uss_kib": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+def child_pids(pid: int) -> list[int]:
+    """Return the process ids of the children of ``pid`` (Linux only)."""
+    with open(f"/proc/{pid}/task/{pid}/children", encoding="ascii") as handle:
+        return [int(child) for child in handle.read().split()]
+
+
+def free_port() -> int:
+    """Return a TCP port on 127.0.0.1 that is free right now."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def worker_memory(workers: int, preload: bool, requests: int, timeout: float = 30) -> dict:
+    """Start gunicorn, warm it with ``requests`` requests and measure its processes."""
+    port = free_port()
+    env = dict(
+        os.environ,
+        SECRET_KEY="benchmark",
+        GUNICORN_WORKERS=str(workers),
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_PRELOAD="true" if preload else "false",
+    )
+    started = time.perf_counter()
+    master = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}/"
+        while True:
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("gunicorn did not start in time")
+            try:
+                urllib.request.urlopen(url, timeout=1).read()
+                if len(child_pids(master.pid)) >= workers:
+                    break
+            except OSError:
+                time.sleep(0.05)
+        ready = time.perf_counter() - started
+        for _ in range(requests):
+            urllib.request.urlopen(url, timeout=5).read()
+
+        worker_stats = [_memory(pid) for pid in child_pids(master.pid)]
+        return {
+            "preload": preload,
+            "ready_seconds": ready,
+            "master": _memory(master.pid),
+            "workers": worker_stats,
+            "total_pss_kib": _memory(master.pid)["pss_kib"] + sum(stat["pss_kib"] for stat in worker_stats),
+        }
+    finally:
+        master.terminate()
+        master.wait(timeout)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="cold-start runs (median is reported)")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers")
+    parser.add_argument("--requests", type=int, default=50, help="warm-up requests before measuring memory")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {"cold_start": cold_start(args.runs)}
+    print("cold start (median of %d runs)" % args.runs)
+    for name, seconds in results["cold_start"].items():
+        print(f"  {name:<14} {seconds * 1000:8.1f} ms")
+
+    if os.path.exists("/proc/self/smaps_rollup"):
+        results["gunicorn"] = []
+        for preload in (True, False):
+            stats = worker_memory(args.workers, preload, args.requests)
+            results["gunicorn"].append(stats)
+            workers = stats["workers"]
+            print(f"gunicorn --workers {args.workers} preload={preload}: ready in {stats['ready_seconds']:.2f}s")
+            print(f"  master       rss {stats['master']['rss_kib'] / 1024:6.1f} MiB")
+            print(
+                f"  per worker   rss {statistics.mean(w['rss_kib'] for w in workers) / 1024:6.1f} MiB"
+                f"  pss {statistics.mean(w['pss_kib'] for w in workers) / 1024:6.1f} MiB"
+                f"  uss {statistics.mean(w['uss_kib'] for w in workers) / 1024:6.1f} MiB"
+            )
+            print(f"  total pss    {stats['total_pss_kib'] / 1024:6.1f} MiB")
+    else:
+        print("Skipping gunicorn memory: /proc/<pid>/smaps_rollup is not available.")
+
+    if args.json:
+        with args.json.open("w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+            handle.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
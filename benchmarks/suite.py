@@ -0,0 +1,282 @@
+"""Micro-benchmark suite with a stored JSON baseline and regression gating.
+
+Run with ``python -m benchmarks`` (or ``python -m benchmarks.suite``). Every
+benchmark is timed with ``timeit``: the loop count is calibrated so one
+repeat takes at least ``--min-time`` seconds, and the fastest of
+``--repeat`` repeats is reported in nanoseconds per call. Results are
+compared with the baseline file; any benchmark more than ``--threshold``
+slower than its baseline is re-measured ``--retries`` times to rule out
+noise, and fails the run with exit status 1 if it stays slow. ``--save``
+records the current results as the new baseline, and a missing baseline is
+created on the first run. Baselines are only comparable on the machine and
+Python version that produced them, which are stored alongside the results.
+"""
+
+import argparse
+import ipaddress
+import json
+import platform
+import re
+import os
+import sys
+import tempfile
+import timeit
+from collections.abc import Callable
+from pathlib import Path
+
+from app import create_app
+from app.cache import CalculationCache
+from app.calculations import (
+    calculate_ipv4,
+    calculate_ipv6,
+    calculate_ipv4_network_and_subnet,
+    calculate_ipv6_network_and_subnet,
+)
+from app.enumeration import enumerate_network
+from app.ip_to_regex import ip_to_regex
+from app.range_db import RangeDatabase, build_range_db
+from app.reverse_zones import iter_reverse_zone
+from app.validation import filter_ip_input, parse_prefix, validate_network_input, validate_raw_input
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+DEFAULT_THRESHOLD = 0.25
+IPV4_ADDRESS = "192.168.10.77"
+IPV6_ADDRESS = "2001:db8:85a3::8a2e:370:7334"
+
+
+def _all_prefixes(address: str, bits: int) -> Callable[[], None]:
+    cidrs = [f"{address}/{prefix}" for prefix in range(bits + 1)]
+
+    def run():
+        for cidr in cidrs:
+            ip_to_regex(cidr)
+
+    return run
+
+
+def _request_benchmarks() -> dict[str, Callable[[], object]]:
+    flask_app = create_app(debug_mode=False, secret_key="benchmark", load_env=False)
+    flask_app.config["RATE_LIMIT_DISABLED"] = True
+    # Measure the full calculation on every request rather than cache hits.
+    flask_app.extensions["calculation_cache"] = CalculationCache(maxsize=0)
+    client = flask_app.test_client()
+    page = client.get("/").get_data(as_text=True)
+    csrf_token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+
+    def post_calculate(address: str, network: str):
+        data = {"ip-address": address, "network": network, "csrf_token": csrf_token}
+        return lambda: client.post("/calculate", data=data)
+
+    batch = json.dumps([f"10.{i // 256}.{i % 256}.1/24" for i in range(100)])
+    return {
+        "request/index": lambda: client.get("/"),
+        "request/calculate-ipv4": post_calculate(IPV4_ADDRESS, "255.255.255.0"),
+        "request/calculate-ipv6": post_calculate(IPV6_ADDRESS, "64"),
+        "request/api-batch-100-ipv4": lambda: client.post(
+            "/api/v1/calculate", data=batch, content_type="application/json"
+        ).get_data(),
+    }
+
+
+def build_benchmarks() -> dict[str, Callable[[], object]]:
+    """Return the benchmark callables keyed by name."""
+    benchmarks = {
+        "calculate/ipv4": lambda: calculate_ipv4(IPV4_ADDRESS),
+        "calculate/ipv6": lambda: calculate_ipv6(IPV6_ADDRESS),
+        "calculate/ipv4-network-cidr": lambda: calculate_ipv4_network_and_subnet(IPV4_ADDRESS, "19"),
+        "calculate/ipv4-network-netmask": lambda: calculate_ipv4_network_and_subnet(IPV4_ADDRESS, "255.255.255.0"),
+        "calculate/ipv6-network": lambda: calculate_ipv6_network_and_subnet(IPV6_ADDRESS, "64"),
+        "regex/ipv4-all-prefixes": _all_prefixes(IPV4_ADDRESS, 32),
+        "regex/ipv6-all-prefixes": _all_prefixes(IPV6_ADDRESS, 128),
+        "validation/filter-ip-input": lambda: filter_ip_input(f"{IPV6_ADDRESS}/64"),
+        "validation/raw-input-ipv4": lambda: validate_raw_input(IPV4_ADDRESS, "IP address"),
+        "validation/raw-input-ipv6": lambda: validate_raw_input(IPV6_ADDRESS, "IP address"),
+        "validation/network-ipv4-netmask": lambda: validate_network_input("255.255.240.0", 4),
+        "validation/network-ipv6-prefix": lambda: validate_network_input("64", 6),
+        "validation/parse-prefix-ipv4-netmask": lambda: parse_prefix("255.255.240.0", 4),
+        "reverse-zone/ipv4-24": lambda: "".join(iter_reverse_zone("10.1.2.0/24", "host-{dashed}.example.com.")),
+    }
+    benchmarks.update(_request_benchmarks())
+    benchmarks.update(_enumeration_benchmarks())
+    benchmarks.update(_range_db_benchmarks())
+    return benchmarks
+
+
+def _enumeration_benchmarks() -> dict[str, Callable[[], object]]:
+    """Pages of 100 items from the middle of large networks."""
+    benchmarks = {}
+    for name, kind, network, prefix in (
+        ("enumerate/ipv4-hosts-page", "hosts", "10.0.0.0/8", None),
+        ("enumerate/ipv6-subnets-page", "subnets", "2001:db8::/32", "64"),
+    ):
+        sequence = enumerate_network(kind, network, prefix)
+        middle = sequence.count // 2
+        benchmarks[name] = lambda sequence=sequence, middle=middle: sequence[middle : middle + 100]
+    return benchmarks
+
+
+def _range_db_benchmarks() -> dict[str, Callable[[], object]]:
+    """Single lookups in a range database of nested IPv4 /16s and /24s and IPv6 /64s."""
+    rows = [{"network": "10.0.0.0/8", "owner": "corp"}]
+    for second in range(64):
+        rows.append({"network": f"10.{second}.0.0/16", "owner": f"site-{second}"})
+        rows.extend({"network": f"10.{second}.{third}.0/24", "owner": f"vlan-{third}"} for third in range(64))
+    rows.extend({"network": f"2001:db8:{index:x}::/64", "owner": f"v6-{index}"} for index in range(4096))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "ranges.rdb")
+        build_range_db(rows, ["owner"], path)
+        # The mapping stays valid after the file is removed.
+        database = RangeDatabase(path)
+    ipv4 = int(ipaddress.ip_address("10.33.40.7"))
+    ipv6 = int(ipaddress.ip_address("2001:db8:7ff::1"))
+    return {
+        "range-db/ipv4-lookup": lambda: database.lookup_ipv4(ipv4),
+        "range-db/ipv6-lookup": lambda: database.lookup_ipv6(ipv6),
+    }
+
+
+def measure(function: Callable[[], object], min_time: float, repeat: int) -> dict:
+    """Time ``function`` and return nanoseconds per call (best and median of ``repeat``)."""
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            break
+        number *= 2
+    times = sorted(timer.repeat(repeat=repeat, number=number))
+    return {
+        "ns": times[0] / number * 1e9,
+        "median_ns": times[len(times) // 2] / number * 1e9,
+        "number": number,
+    }
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[dict]:
+    """Compare results with baseline results by best time.
+
+    Args:
+        results (dict): Current results keyed by benchmark name.
+        baseline (dict): Baseline results keyed by benchmark name.
+        threshold (float): Allowed slowdown, e.g. ``0.25`` for 25%.
+
+    Returns:
+        list[dict]: One row per current benchmark with ``name``, ``ns``,
+        ``baseline_ns``, ``ratio`` and ``status`` (``ok``, ``regressed``,
+        ``improved`` or ``new``).
+    """
+    rows = []
+    for name, result in results.items():
+        row = {"name": name, "ns": result["ns"], "baseline_ns": None, "ratio": None, "status": "new"}
+        previous = baseline.get(name)
+        if previous:
+            ratio = result["ns"] / previous["ns"]
+            row.update(baseline_ns=previous["ns"], ratio=ratio)
+            if ratio > 1 + threshold:
+                row["status"] = "regressed"
+            elif ratio < 1 / (1 + threshold):
+                row["status"] = "improved"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+    return rows
+
+
+def load_baseline(path: Path) -> dict | None:
+    if not path.exists():
+        return None
+    with path.open(encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def save_baseline(path: Path, results: dict, previous: dict | None = None) -> None:
+    """Write ``results`` to ``path``, keeping other benchmarks from ``previous``."""
+    merged = dict((previous or {}).get("results", {}))
+    merged.update(results)
+    with path.open("w", encoding="utf-8") as handle:
+        json.dump({"environment": environment(), "results": dict(sorted(merged.items()))}, handle, indent=2)
+        handle.write("\n")
+
+
+def _format_ns(ns: float | None) -> str:
+    if ns is None:
+        return "-"
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f} {unit}"
+    return f"{ns:.0f} ns"
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown before failing (default: 0.25)"
+    )
+    parser.add_argument("--save", action="store_true", help="record the results as the new baseline")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name matches this regex")
+    parser.add_argument("--min-time", type=float, default=0.05, help="minimum seconds per repeat")
+    parser.add_argument("--repeat", type=int, default=5, help="repeats per benchmark")
+    parser.add_argument("--retries", type=int, default=2, help="re-measure regressed benchmarks this many times")
+    parser.add_argument("--json", type=Path, help="also write the current results to this file")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    pattern = re.compile(args.filter)
+    benchmarks = {name: function for name, function in build_benchmarks().items() if pattern.search(name)}
+    if not benchmarks:
+        print(f"No benchmarks match {args.filter!r}.", file=sys.stderr)
+        return 2
+
+    results = {name: measure(function, args.min_time, args.repeat) for name, function in benchmarks.items()}
+    baseline = load_baseline(args.baseline)
+    if baseline and baseline.get("environment") != environment():
+        print(f"warning: {args.baseline} was recorded on a different environment", file=sys.stderr)
+
+    baseline_results = (baseline or {}).get("results", {})
+    rows = compare(results, baseline_results, args.threshold)
+    for _ in range(args.retries):
+        regressed = [row["name"] for row in rows if row["status"] == "regressed"]
+        if not regressed:
+            break
+        for name in regressed:
+            retry = measure(benchmarks[name], args.min_time, args.repeat)
+            if retry["ns"] < results[name]["ns"]:
+                results[name] = retry
+        rows = compare(results, baseline_results, args.threshold)
+    width = max(len(name) for name in results)
+    for row in rows:
+        ratio = f"{row['ratio']:.2f}x" if row["ratio"] is not None else "-"
+        print(
+            f"{row['name']:<{width}}  {_format_ns(row['ns']):>10}  "
+            f"{_format_ns(row['baseline_ns']):>10}  {ratio:>6}  {row['status']}"
+        )
+
+    if args.json:
+        with args.json.open("w", encoding="utf-8") as handle:
+            json.dump({"environment": environment(), "results": results}, handle, indent=2)
+            handle.write("\n")
+    if args.save or baseline is None:
+        save_baseline(args.baseline, results, baseline)
+        print(f"Baseline written to {args.baseline}.")
+        return 0
+
+    regressed = [row["name"] for row in rows if row["status"] == "regressed"]
+    if regressed:
+        print(f"{len(regressed)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Gunicorn settings, used with ``gunicorn -c gunicorn.conf.py``.
+
+The app is built once by the master through the factory (``preload_app``) and
+the workers are forked from it, so imported modules, compiled templates and
+read-only tables such as the netmask tables and the prefix index are shared
+copy-on-write instead of being rebuilt in every worker. After loading,
+``gc.freeze()`` moves those objects out of the collector's generations so
+collections in the workers do not write to, and so copy, the shared pages.
+"""
+
+import gc
+import os
+import time
+
+_started = time.perf_counter()
+
+
+def _get_bool_env(var_name: str, default: bool) -> bool:
+    value = os.getenv(var_name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"true", "1", "t", "yes", "y", "on"}
+
+
+wsgi_app = os.getenv("GUNICORN_APP", "app:create_app()")
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+preload_app = _get_bool_env("GUNICORN_PRELOAD", True)
+
+
+def when_ready(server):
+    server.log.info("Master ready in %.3fs (preload_app=%s)", time.perf_counter() - _started, preload_app)
+    if preload_app:
+        gc.collect()
+        gc.freeze()
+
+
+def on_starting(server):
+    # Fold in the metric tables of workers from earlier runs.
+    if os.getenv("METRICS_DIR") and os.path.isdir(os.environ["METRICS_DIR"]):
+        from app.metrics import retire_exited
+
+        retire_exited(os.environ["METRICS_DIR"])
+
+
+def child_exit(server, worker):
+    # Keep the exited worker's counters but not its file.
+    if os.getenv("METRICS_DIR"):
+        from app.metrics import retire_process
+
+        retire_process(os.environ["METRICS_DIR"], worker.pid)
+
+
+def post_fork(server, worker):
+    server.log.info("Worker %s forked %.3fs after master start", worker.pid, time.perf_counter() - _started)
@@ -1,8 +1,13 @@
-from app import create_app
+import os
 
+from app import create_app
 
-app = create_app()
 
 if __name__ == "__main__":
-    debug_mode = app.config.get("DEBUG", False)
-    app.run(host="0.0.0.0", port=5000, debug=debug_mode)
+    if os.getenv("SERVER_MODE", "wsgi").strip().lower() == "asgi":
+        import uvicorn
+
+        uvicorn.run("app.asgi:create_asgi_app", factory=True, host="0.0.0.0", port=5000)
+    else:
+        app = create_app()
+        app.run(host="0.0.0.0", port=5000, debug=app.config.get("DEBUG", False))
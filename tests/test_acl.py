@@ -0,0 +1,155 @@
+import io
+import ipaddress
+import json
+import os
+import random
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+
+import numpy as np
+
+from app import create_app
+from app.acl import ACL, DEFAULT, INVALID, MAX_REFERENCES
+from app.cli import main
+
+RULES = [
+    "10 deny host 10.0.0.1  # jump host",
+    "20 permit 10.0.0.0 0.0.0.255",
+    "30 deny 10.0.0.0/255.255.0.0",
+    ["permit", "any6"],
+    {"action": "PERMIT", "source": "192.0.2.0/24", "remark": "docs"},
+]
+
+
+class ACLTests(unittest.TestCase):
+    def test_first_match_and_sources(self):
+        acl = ACL.compile(RULES)
+        self.assertEqual([rule.source for rule in acl.rules], [
+            "10.0.0.1/32", "10.0.0.0/24", "10.0.0.0/16", "any6", "192.0.2.0/24"
+        ])
+        cases = {"10.0.0.1": 0, "10.0.0.2": 1, "10.0.9.9": 2, "2001:db8::1": 3, "192.0.2.7": 4, "8.8.8.8": DEFAULT}
+        for address, expected in cases.items():
+            self.assertEqual(acl.decide(address), expected, address)
+        self.assertEqual(
+            acl.result(0),
+            {"action": "deny", "rule": {"index": 0, "action": "deny", "source": "10.0.0.1/32", "seq": 10,
+                                        "remark": "jump host"}},
+        )
+        self.assertEqual(acl.result(DEFAULT), {"action": "deny", "rule": None})
+        self.assertEqual(acl.stats(), {"rules": 5, "ipv4_intervals": 8, "ipv6_intervals": 1})
+        for rules in (["allow 10.0.0.0/8"], ["permit 10.0.0.0/33"], ["permit"], [5]):
+            with self.subTest(rules=rules), self.assertRaisesRegex(ValueError, "^Rule 0: "):
+                ACL.compile(rules)
+
+    def test_agrees_with_linear_scan(self):
+        rng = random.Random(23)
+        rules = []
+        for _ in range(300):
+            if rng.random() < 0.8:
+                address, prefixlen = 0x0A000000 | rng.getrandbits(16) << 8, rng.randint(8, 32)
+            else:
+                address, prefixlen = 0x20010DB8 << 96 | rng.getrandbits(16) << 80, rng.randint(32, 64)
+            network = ipaddress.ip_network((address, prefixlen), strict=False)
+            rules.append((rng.choice(("permit", "deny")), network))
+        acl = ACL.compile([f"{action} {network}" for action, network in rules], default="permit")
+
+        addresses = [
+            network.network_address + rng.randrange(min(network.num_addresses, 2**20))
+            for _, network in rng.choices(rules, k=2000)
+        ]
+        addresses += [network.broadcast_address + 1 for _, network in rules if network.version == 4]
+        decisions = acl.evaluate_many([str(address) for address in addresses])
+        for address, decision in zip(addresses, decisions.tolist()):
+            expected = next(
+                (index for index, (_, network) in enumerate(rules) if address.version == network.version
+                 and address in network),
+                DEFAULT,
+            )
+            self.assertEqual(decision, expected, address)
+
+    def test_reports_shadowed_and_redundant_rules(self):
+        acl = ACL.compile([
+            "permit 10.0.0.0/8",
+            "deny 10.1.0.0/16",       # shadowed by 0
+            "permit 10.2.0.0/16",     # covered by 0: redundant
+            "deny 192.0.2.0/25",
+            "deny 192.0.2.0/24",      # falls through to the default deny: redundant
+            "deny 198.51.100.0/24",
+            "permit 198.51.100.0/23", # matters for 198.51.101.0/24
+        ])
+        findings = {finding["index"]: finding for finding in acl.findings}
+        self.assertEqual(sorted(findings), [1, 2, 3, 4])
+        self.assertEqual((findings[1]["kind"], findings[1]["covered"], findings[1]["by"]), ("shadowed", True, [0]))
+        self.assertEqual((findings[2]["kind"], findings[2]["covered"], findings[2]["by"]), ("redundant", True, [0]))
+        self.assertEqual((findings[3]["kind"], findings[3]["covered"], findings[3]["by"]), ("redundant", False, [4]))
+        self.assertEqual((findings[4]["kind"], findings[4]["covered"], findings[4]["by"]), ("redundant", False, [None]))
+
+        many = ACL.compile([f"deny 10.0.{index}.0/24" for index in range(16)] + ["permit 10.0.0.0/20"])
+        self.assertEqual(many.findings[-1]["by"], list(range(10)))
+        self.assertEqual(many.findings[-1]["more"], 6)
+
+    def test_many_wide_duplicate_rules(self):
+        rules = [f"permit 10.{index >> 8}.{index & 255}.0/24" for index in range(3000)]
+        rules += ["deny 10.0.0.0/8"] * 2000 + ["permit any"] * 500 + ["deny 10.0.0.0/20"]
+        acl = ACL.compile(rules)
+        findings = {finding["index"]: finding for finding in acl.findings}
+        self.assertEqual(len(findings), 2501)
+        self.assertEqual((findings[3000]["kind"], findings[3000]["by"]), ("redundant", [3001]))
+        for index, more in ((3001, 2991), (4999, 2991), (5499, 2992), (5500, 6)):
+            self.assertEqual((findings[index]["kind"], findings[index]["by"], findings[index]["more"]),
+                             ("shadowed", list(range(MAX_REFERENCES)), more))
+
+    def test_bulk_arrays_and_hit_counts(self):
+        acl = ACL.compile(RULES, default="permit")
+        ipv4 = np.array([int(ipaddress.ip_address(a)) for a in ("10.0.0.1", "10.0.0.2", "10.0.1.1", "1.1.1.1")])
+        decisions = acl.evaluate_ipv4_array(ipv4)
+        self.assertEqual(decisions.tolist(), [0, 1, 2, DEFAULT])
+        self.assertEqual(acl.permitted(decisions).tolist(), [False, True, False, True])
+        ipv6 = np.array([[0x20010DB8 << 32, 1]], dtype=np.uint64)
+        self.assertEqual(acl.evaluate_ipv6_array(ipv6).tolist(), [3])
+
+        decisions = acl.evaluate_many(["10.0.0.1", "010.0.0.1", "bogus", "::ffff:10.0.0.1", "2001:db8::5"])
+        self.assertEqual(decisions.tolist(), [0, INVALID, INVALID, 3, 3])
+        self.assertEqual(acl.hit_counts(decisions), {0: 1, 3: 2, "default": 0})
+
+
+class ACLInterfaceTests(unittest.TestCase):
+    def test_api_reports_findings_and_decisions(self):
+        app = create_app(debug_mode=False, secret_key="test-secret", load_env=False)
+        app.config["RATE_LIMIT_DISABLED"] = True
+        client = app.test_client()
+        body = {"rules": "permit 10.0.0.0/8\n# note\ndeny 10.1.0.0/16\n", "addresses": ["10.1.2.3", "11.0.0.1", "x"]}
+        payload = client.post("/api/v1/acl", json=body).get_json()
+        self.assertEqual(payload["rules"], 2)
+        self.assertEqual([finding["kind"] for finding in payload["findings"]], ["shadowed"])
+        self.assertEqual(payload["results"][0]["rule"]["index"], 0)
+        self.assertEqual(payload["results"][1], {"address": "11.0.0.1", "action": "deny", "rule": None})
+        self.assertIn("error", payload["results"][2])
+        self.assertEqual(payload["hits"], {"0": 1, "default": 1})
+
+        response = client.post("/api/v1/acl", json={"rules": ["permit 10.0.0.0/8"], "default": "allow"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cli_findings_and_evaluation(self):
+        with tempfile.TemporaryDirectory() as directory:
+            rules, flows, output = (os.path.join(directory, name) for name in ("edge.acl", "flows.txt", "out.csv"))
+            with open(rules, "w", encoding="utf-8") as handle:
+                handle.write("# edge\npermit 10.0.0.0/8\ndeny 10.1.0.0/16\n")
+            with open(flows, "w", encoding="utf-8") as handle:
+                handle.write("1700000000,10.1.2.3,443\n1700000001 8.8.8.8 53\n1700000002,nonsense,1\n")
+            stderr = io.StringIO()
+            with redirect_stderr(stderr):
+                self.assertEqual(main(["acl", rules, "-o", output]), 1)
+                with open(output, encoding="utf-8") as handle:
+                    self.assertEqual(json.loads(handle.readline())["kind"], "shadowed")
+                self.assertEqual(main(["acl", rules, "-a", flows, "--field", "1", "-f", "csv", "-o", output]), 1)
+            with open(output, encoding="utf-8") as handle:
+                rows = handle.read().splitlines()
+        self.assertEqual(rows[:3], ["address,action,rule,source", "10.1.2.3,permit,0,10.0.0.0/8", "8.8.8.8,deny,,"])
+        self.assertEqual(rows[3], "nonsense,error,,")
+        self.assertIn("1 permitted, 1 denied, 1 invalid; 1 rules unused", stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
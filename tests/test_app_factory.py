@@ -1,4 +1,6 @@
 import os
+import subprocess
+import sys
 import unittest
 from unittest.mock import patch
 
@@ -33,5 +35,17 @@ class CreateAppSecretKeyTests(unittest.TestCase):
         self.assertIn("SECRET_KEY not set", captured_logs.output[0])
 
 
+class CreateAppStartupTests(unittest.TestCase):
+    def test_importing_the_package_builds_no_app(self):
+        code = "import app, sys; print('app' in vars(sys.modules['app']))"
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+        self.assertEqual(output.strip(), "False")
+
+    def test_templates_are_compiled_by_the_factory(self):
+        app = create_app(debug_mode=False, secret_key="test-secret", load_env=False)
+        with patch.object(app.jinja_env.loader, "get_source", side_effect=AssertionError("compiled lazily")):
+            self.assertEqual(app.test_client().get("/").status_code, 200)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from app import create_app
+from app.asgi import AsgiApp, build_environ
+from app.batch import calculate_entry
+
+
+def call(asgi_app, method, path, body_parts=(b"",), headers=()):
+    """Drive ``asgi_app`` with one HTTP request and return ``(status, headers, body)``."""
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": method,
+        "path": path,
+        "root_path": "",
+        "scheme": "http",
+        "query_string": b"",
+        "headers": [(name.encode(), value.encode()) for name, value in headers],
+        "client": ("127.0.0.1", 40000),
+        "server": ("testserver", 80),
+    }
+    messages = [
+        {"type": "http.request", "body": part, "more_body": position < len(body_parts) - 1}
+        for position, part in enumerate(body_parts)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app(scope, receive, send))
+    start = sent[0]
+    return start["status"], dict(start["headers"]), b"".join(m.get("body", b"") for m in sent[1:])
+
+
+class AsgiAppTests(unittest.TestCase):
+    def setUp(self):
+        self.flask_app = create_app(debug_mode=False, secret_key="test-secret", load_env=False)
+        self.flask_app.config["RATE_LIMIT_DISABLED"] = True
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+        self.asgi_app = AsgiApp(self.flask_app, self.executor, max_pending=4, chunk_size=2)
+
+    def test_batch_streams_results_in_order_across_chunks(self):
+        items = ['{"ip": "10.0.0.%d", "network": "24"}' % i for i in range(7)] + ['"bad/1"']
+        body = ("\n".join(items) + "\n").encode()
+        status, headers, response = call(
+            self.asgi_app, "POST", "/api/v1/calculate", [body[:17], body[17:90], body[90:]]
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b"content-type"], b"application/x-ndjson")
+        lines = [json.loads(line) for line in response.decode().splitlines()]
+        self.assertEqual([line["index"] for line in lines], list(range(8)))
+        self.assertEqual(lines[3]["ip"], dict(calculate_entry("10.0.0.3", "24")["ip"]))
+        self.assertIn("error", lines[7])
+
+    def test_batch_limit_is_reported_after_earlier_results(self):
+        self.flask_app.config["BATCH_MAX_ITEMS"] = 3
+        body = json.dumps(["10.0.0.%d/24" % i for i in range(5)]).encode()
+        _, _, response = call(self.asgi_app, "POST", "/api/v1/calculate", [body])
+        lines = [json.loads(line) for line in response.decode().splitlines()]
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[-1], {"index": 3, "error": "Batch limit of 3 items exceeded."})
+
+    def test_saturated_executor_returns_503(self):
+        async def saturate_and_call():
+            for _ in range(self.asgi_app.max_pending):
+                await self.asgi_app.slots.acquire()
+            sent = []
+
+            async def receive():
+                return {"type": "http.request", "body": b"[]", "more_body": False}
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {"type": "http", "method": "POST", "path": "/api/v1/calculate", "headers": [], "client": None}
+            await self.asgi_app(scope, receive, send)
+            return sent
+
+        sent = asyncio.run(saturate_and_call())
+        self.assertEqual(sent[0]["status"], 503)
+        self.assertIn((b"retry-after", b"1"), sent[0]["headers"])
+
+    def test_other_routes_are_served_by_flask(self):
+        status, headers, body = call(self.asgi_app, "GET", "/")
+        self.assertEqual(status, 200)
+        self.assertIn(b"text/html", headers[b"content-type"])
+        self.assertIn(b"csrf_token", body)
+
+        plan = json.dumps({"network": "10.0.0.0/24", "subnets": [50]}).encode()
+        status, _, body = call(
+            self.asgi_app, "POST", "/api/v1/plan", [plan[:10], plan[10:]], [("Content-Type", "application/json")]
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["subnets"][0]["subnet"], "10.0.0.0/26")
+
+    def test_build_environ_maps_headers_and_body(self):
+        scope = {
+            "method": "POST",
+            "path": "/api/v1/plan",
+            "query_string": b"a=1",
+            "headers": [(b"content-type", b"application/json"), (b"x-forwarded-for", b"203.0.113.5")],
+            "client": ("127.0.0.1", 1234),
+        }
+        environ = build_environ(scope, b"{}")
+        self.assertEqual(environ["CONTENT_TYPE"], "application/json")
+        self.assertEqual(environ["CONTENT_LENGTH"], "2")
+        self.assertEqual(environ["HTTP_X_FORWARDED_FOR"], "203.0.113.5")
+        self.assertEqual(environ["QUERY_STRING"], "a=1")
+        self.assertEqual(environ["wsgi.input"].read(), b"{}")
+
+    def test_lifespan_shuts_down_executor(self):
+        messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        asyncio.run(self.asgi_app({"type": "lifespan"}, receive, send))
+        self.assertEqual(sent, ["lifespan.startup.complete", "lifespan.shutdown.complete"])
+        with self.assertRaises(RuntimeError):
+            self.executor.submit(int)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import io
+import json
+import os
+import unittest
+
+from app import create_app
+from app.batch import JSONItemParser, calculate_batch, iter_json_items
+
+
+class BatchParsingTests(unittest.TestCase):
+    def test_json_array_read_in_small_chunks(self):
+        body = json.dumps([{"ip": "10.0.0.5", "network": "24"}, ["2001:db8::1", "64"], "10.1.1.1/30"])
+        items = list(iter_json_items(io.BytesIO(body.encode()), chunk_size=3))
+        self.assertEqual(
+            items,
+            [{"ip": "10.0.0.5", "network": "24"}, ["2001:db8::1", "64"], "10.1.1.1/30"],
+        )
+
+    def test_ndjson_invalid_line_reported_inline(self):
+        body = b'{"ip": "10.0.0.5", "network": "24"}\nnot json\n\n["10.0.0.6", "255.255.255.0"]'
+        results = list(calculate_batch(iter_json_items(io.BytesIO(body))))
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]["network"]["Network Address"], "10.0.0.0")
+        self.assertIn("Invalid JSON", results[1]["error"])
+        self.assertEqual(results[2]["network"]["CIDR"], "24")
+
+    def test_truncated_array_reports_error(self):
+        items = list(iter_json_items(io.BytesIO(b'[["10.0.0.1", "24"], ["10.0')))
+        self.assertEqual(items[0], ["10.0.0.1", "24"])
+        self.assertIsInstance(items[-1], ValueError)
+
+    def test_oversized_items_are_rejected_without_buffering(self):
+        pending = b'"' + b"x" * 300
+        lines = list(iter_json_items(io.BytesIO(b'{"ip": "10.0.0.1"}\n' + pending + b'\n"10.0.0.2/24"\n'),
+                                     chunk_size=7, max_item_size=100))
+        self.assertEqual(lines[0], {"ip": "10.0.0.1"})
+        self.assertEqual(str(lines[1]), "Item is longer than 100 characters.")
+        self.assertEqual(lines[2:], ["10.0.0.2/24"])
+
+        parser = JSONItemParser(max_item_size=100)
+        self.assertEqual(parser.feed(b'[["10.0.0.1", "24"], "'), [["10.0.0.1", "24"]])
+        for _ in range(100):
+            items = parser.feed(b"x" * 1000)
+            self.assertLess(len(parser._text), 1100)
+            if items:
+                break
+        self.assertEqual(str(items[0]), "Item is longer than 100 characters.")
+        self.assertEqual(parser.feed(b'"]') + parser.close(), [])
+
+    def test_max_items_stops_batch(self):
+        items = [["10.0.0.1", "24"]] * 3
+        results = list(calculate_batch(items, max_items=2))
+        self.assertEqual(len(results), 3)
+        self.assertIn("Batch limit", results[-1]["error"])
+
+
+class BatchApiTests(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault('SECRET_KEY', 'test-secret')
+        self.app = create_app()
+        self.app.testing = True
+        self.app.config["RATE_LIMIT_DISABLED"] = True
+        self.client = self.app.test_client()
+
+    def test_streams_ndjson_results_with_inline_errors(self):
+        body = json.dumps([
+            {"ip": "192.168.1.10", "network": "31"},
+            {"ip": "192.168.1.1", "network": "300.0.0.0"},
+            {"ip": "2001:db8::1", "network": 128},
+        ])
+        response = self.client.post(
+            '/api/v1/calculate', data=body, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([line["index"] for line in lines], [0, 1, 2])
+        self.assertEqual(lines[0]["network"]["Total Hosts"], 2)
+        self.assertIn("octets between 0 and 255", lines[1]["error"])
+        self.assertEqual(lines[2]["ip"]["Version"], "IPv6")
+
+    def test_declared_body_over_limit_is_refused(self):
+        self.app.config["MAX_CONTENT_LENGTH"] = 64
+        response = self.client.post('/api/v1/calculate', data=b"[" + b" " * 100 + b"]",
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.get_json(), {"error": "Request body is too large."})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import io
+import json
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from werkzeug.serving import make_server
+
+from app import create_app
+from benchmarks import fast_path
+from benchmarks.load import best_configuration, configurations, parse_mix, percentile, run_load
+from benchmarks.suite import build_benchmarks, compare, load_baseline, measure, save_baseline
+
+
+class BenchmarkSuiteTests(unittest.TestCase):
+    def test_compare_flags_regressions_past_threshold(self):
+        results = {"a": {"ns": 130.0}, "b": {"ns": 110.0}, "c": {"ns": 50.0}, "d": {"ns": 1.0}}
+        baseline = {"a": {"ns": 100.0}, "b": {"ns": 100.0}, "c": {"ns": 100.0}}
+        statuses = {row["name"]: row["status"] for row in compare(results, baseline, 0.25)}
+        self.assertEqual(statuses, {"a": "regressed", "b": "ok", "c": "improved", "d": "new"})
+
+    def test_save_merges_with_previous_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "baseline.json"
+            self.assertIsNone(load_baseline(path))
+            save_baseline(path, {"a": {"ns": 1.0}})
+            save_baseline(path, {"b": {"ns": 2.0}}, load_baseline(path))
+            data = json.loads(path.read_text())
+        self.assertEqual(data["results"], {"a": {"ns": 1.0}, "b": {"ns": 2.0}})
+        self.assertIn("python", data["environment"])
+
+    def test_every_benchmark_runs(self):
+        benchmarks = build_benchmarks()
+        for prefix in ("calculate/", "regex/", "validation/", "request/"):
+            self.assertTrue(any(name.startswith(prefix) for name in benchmarks), prefix)
+        for name in ("calculate/ipv6", "request/calculate-ipv4", "request/api-batch-100-ipv4"):
+            result = measure(benchmarks[name], min_time=0, repeat=1)
+            self.assertGreater(result["ns"], 0)
+
+    def test_fast_path_benchmark_checks_results_and_target(self):
+        with redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(fast_path.main(["-n", "50", "--min-speedup", "0"]), 0)
+            self.assertEqual(fast_path.main(["-n", "50", "--min-speedup", "1000", "--retries", "0"]), 1)
+        self.assertEqual(output.getvalue().count("below target"), len(fast_path.CASES))
+
+
+class LoadHarnessTests(unittest.TestCase):
+    def test_percentiles_and_mix(self):
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual([percentile(values, q) for q in (0.5, 0.95, 0.99, 1.0)], [50.0, 95.0, 99.0, 100.0])
+        self.assertEqual(percentile([7.0], 0.99), 7.0)
+        self.assertEqual(parse_mix("form=3, api-hosts=0"), {"form": 3, "api-hosts": 0})
+        for text in ("form=x", "unknown=1", "form=0"):
+            with self.assertRaises(ValueError):
+                parse_mix(text)
+
+    def test_configurations_and_choice(self):
+        configs = list(configurations([1, 2], ["sync", "gthread"], [2, 8]))
+        self.assertEqual(len(configs), 6)
+        self.assertEqual(configs[0], {"workers": 1, "worker_class": "sync", "threads": 1})
+
+        def result(rps, p99, errors=0):
+            return {"config": {"rps": rps}, "report": {"total": {"rps": rps, "p99_ms": p99, "errors": errors}}}
+
+        results = [result(100, 20), result(300, 80), result(400, 30, errors=2)]
+        self.assertEqual(best_configuration(results, None)["config"], {"rps": 300})
+        self.assertEqual(best_configuration(results, 50)["config"], {"rps": 100})
+        self.assertIsNone(best_configuration(results, 5))
+
+    def test_run_load_against_local_server(self):
+        app = create_app(debug_mode=False, secret_key="test-secret", load_env=False)
+        app.config["RATE_LIMIT_DISABLED"] = True
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            mix = parse_mix("form=2,permalink=1,api-calculate=1,api-hosts=1")
+            report = run_load(f"http://127.0.0.1:{server.server_port}", mix, connections=3, duration=1.0, seed=1)
+        finally:
+            server.shutdown()
+            thread.join()
+        self.assertIn("POST /calculate", report)
+        self.assertEqual(report["total"]["errors"], 0)
+        endpoints = [row for name, row in report.items() if name != "total"]
+        self.assertEqual(report["total"]["requests"], sum(row["requests"] for row in endpoints))
+        self.assertLessEqual(report["total"]["p50_ms"], report["total"]["p99_ms"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import pickle
+import re
+import unittest
+
+from app import create_app
+from app.cache import CalculationCache, FrozenDict, LRUCache
+from app.calculations import calculate_ipv4_network_and_subnet, calculate_ipv6
+from app.ip_to_regex import ip_to_regex
+
+
+class LRUCacheTests(unittest.TestCase):
+    def test_counts_hits_misses_and_evictions(self):
+        cache = LRUCache(maxsize=2)
+        for key in ("a", "b", "a", "c", "b"):
+            cache.get_or_compute(key, lambda: {"key": key})
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (1, 4, 2))
+        self.assertEqual(stats["size"], 2)
+
+    def test_zero_size_disables_storage(self):
+        cache = LRUCache(maxsize=0)
+        cache.get_or_compute("a", dict)
+        cache.get_or_compute("a", dict)
+        self.assertEqual(cache.stats()["misses"], 2)
+        self.assertEqual(len(cache), 0)
+
+    def test_results_are_read_only(self):
+        result = LRUCache().get_or_compute("a", lambda: {"x": 1})
+        self.assertIsInstance(result, FrozenDict)
+        with self.assertRaises(TypeError):
+            result["x"] = 2
+        with self.assertRaises(TypeError):
+            result.update(x=2)
+        copy = dict(result)
+        copy["x"] = 2
+        self.assertEqual(result["x"], 1)
+        self.assertEqual(pickle.loads(pickle.dumps(result)), {"x": 1})
+
+
+class CalculationCacheTests(unittest.TestCase):
+    def test_equivalent_networks_share_an_entry(self):
+        cache = CalculationCache()
+        first = cache.calculate_ipv4_network_and_subnet("10.0.0.5", "24")
+        second = cache.calculate_ipv4_network_and_subnet("10.0.0.9", "255.255.255.0")
+        self.assertIs(first, second)
+        self.assertEqual(first, calculate_ipv4_network_and_subnet("10.0.0.9", "255.255.255.0"))
+        self.assertEqual(cache.networks.stats()["hits"], 1)
+
+    def test_equivalent_ipv6_spellings_share_an_entry(self):
+        cache = CalculationCache()
+        first = cache.calculate_ipv6("2001:DB8::1")
+        self.assertIs(cache.calculate_ipv6("2001:db8:0::1"), first)
+        self.assertEqual(first, calculate_ipv6("2001:DB8::1"))
+        self.assertEqual(cache.ip_to_regex("10.0.0.0/24"), ip_to_regex("10.0.0.0/24"))
+        self.assertEqual(cache.ip_to_regex("10.0.0.7/24"), ip_to_regex("10.0.0.0/24"))
+        self.assertEqual(cache.networks.stats()["hits"], 1)
+
+    def test_unnormalised_input_bypasses_the_cache(self):
+        cache = CalculationCache()
+        self.assertIn("error", cache.calculate_ipv4_network_and_subnet("10.0.0.1", "33"))
+        self.assertEqual(cache.networks.stats()["misses"], 0)
+
+
+class CacheRouteTests(unittest.TestCase):
+    def test_calculate_populates_cache_stats(self):
+        os.environ.setdefault('SECRET_KEY', 'test-secret')
+        app = create_app()
+        app.config.update(TESTING=True, RATE_LIMIT_DISABLED=True)
+        client = app.test_client()
+        token = re.search(r'name="csrf_token" value="([^"]+)"', client.get("/").get_data(as_text=True)).group(1)
+        for ip_address, network in (("10.0.0.5", "24"), ("10.0.0.9", "255.255.255.0")):
+            response = client.post(
+                "/calculate", data={'ip-address': ip_address, 'network': network, 'csrf_token': token}
+            )
+            self.assertIn(b"10.0.0.0", response.data)
+        stats = client.get("/api/v1/cache").get_json()
+        self.assertEqual(stats["networks"]["hits"], 1)
+        self.assertEqual(stats["addresses"]["misses"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,51 @@
+import ipaddress
+import random
 import unittest
+from unittest import mock
 
+from app import calculations
 from app.calculations import (
     calculate_ipv4_network_and_subnet,
     calculate_ipv6_network_and_subnet,
+    format_ipv6,
+    parse_ipv4_int,
+    parse_ipv6_int,
 )
 
+ODD_NETWORK_INPUTS = ["", " 24", "24\n", "\uff12\uff14", "05", "007", "33", "129", "-1", "+8", "1e1", "24.0", "abc",
+                      "255.255.255.000", "255.255.0.255", "0.0.0.255", "ffff::", "ffff:ffff::", "::/64", "64/64"]
+
+
+def _ipv4_spellings(rng, value):
+    octets = [(value >> shift) & 0xFF for shift in (24, 16, 8, 0)]
+    yield ".".join(map(str, octets))
+    yield ".".join(f"{octet:03d}" for octet in octets)
+    yield ".".join(map(str, octets[:3] + [octets[3] + 256]))
+    yield ".".join(map(str, octets[:3]))
+    yield ".".join(map(str, octets)) + rng.choice([" ", ".", "/", "%1", "\n"])
+    yield str(value)
+
+
+def _ipv6_spellings(rng, value):
+    hextets = [(value >> shift) & 0xFFFF for shift in range(112, -16, -16)]
+    yield str(ipaddress.IPv6Address(value))
+    yield ipaddress.IPv6Address(value).exploded.upper()
+    yield ":".join(f"{hextet:x}" for hextet in hextets)
+    start = rng.randrange(8)
+    end = rng.randrange(start, 9)
+    yield ":".join(f"{hextet:x}" for hextet in hextets[:start]) + "::" + ":".join(
+        f"{hextet:x}" for hextet in hextets[end:])
+    yield ":".join(f"{hextet:05x}" if index == start else f"{hextet:x}" for index, hextet in enumerate(hextets))
+    yield rng.choice([":", "::"]) + ":".join(f"{hextet:x}" for hextet in hextets[1:])
+    yield ":".join(f"{hextet:x}" for hextet in hextets[:6]) + f":{rng.randrange(256)}.0.0.{rng.randrange(256)}"
+    yield str(ipaddress.IPv6Address(value)) + rng.choice(["%eth0", "::", ":", " ", ":::"])
+    yield ":".join(f"{hextet:x}" for hextet in hextets[:7])
+
+
+def _sparse_ipv6(rng):
+    hextets = [rng.choice([0, 0, 0, 1, 0xFFFF, rng.getrandbits(16)]) for _ in range(8)]
+    return sum(hextet << (112 - 16 * index) for index, hextet in enumerate(hextets))
+
 
 class NetworkCalculationEdgeCaseTests(unittest.TestCase):
     def test_ipv4_31_hosts_are_usable(self):
@@ -45,5 +86,65 @@ class NetworkCalculationEdgeCaseTests(unittest.TestCase):
         self.assertEqual(result["Total Hosts"], 1)
 
 
+class FastPathAgreementTests(unittest.TestCase):
+    """The table-driven fast path must agree exactly with the ``ipaddress`` implementation."""
+
+    def test_ipv4_networks_match_ipaddress(self):
+        rng = random.Random(25)
+        network_inputs = [str(prefix) for prefix in range(34)] + list(calculations.IPV4_MASK_PREFIXES)
+        network_inputs += ODD_NETWORK_INPUTS
+        for _ in range(300):
+            value = rng.choice([0, 0xFFFFFFFF, rng.getrandbits(32), rng.getrandbits(8) << 24])
+            for address in _ipv4_spellings(rng, value):
+                for network_input in rng.sample(network_inputs, 6):
+                    self.assertEqual(
+                        calculate_ipv4_network_and_subnet(address, network_input),
+                        calculations._ipv4_network_and_subnet(address, network_input),
+                        (address, network_input),
+                    )
+
+    def test_ipv6_networks_match_ipaddress(self):
+        rng = random.Random(26)
+        network_inputs = [str(prefix) for prefix in range(130)] + ODD_NETWORK_INPUTS
+        for _ in range(300):
+            value = rng.choice([0, (1 << 128) - 1, 0xFFFF << 32 | rng.getrandbits(32), _sparse_ipv6(rng)])
+            for address in _ipv6_spellings(rng, value):
+                for network_input in rng.sample(network_inputs, 4):
+                    self.assertEqual(
+                        calculate_ipv6_network_and_subnet(address, network_input),
+                        calculations._ipv6_network_and_subnet(address, network_input),
+                        (address, network_input),
+                    )
+
+    def test_parsers_and_formatter_agree_with_ipaddress(self):
+        rng = random.Random(27)
+        for _ in range(1000):
+            value = _sparse_ipv6(rng)
+            self.assertEqual(format_ipv6(value), str(ipaddress.IPv6Address(value)))
+            for address in _ipv6_spellings(rng, value):
+                try:
+                    expected = int(ipaddress.IPv6Address(address))
+                except ValueError:
+                    expected = None
+                parsed = parse_ipv6_int(address)
+                # The fast parser may decline valid spellings, but never disagrees.
+                self.assertIn(parsed, (expected, None) if "." in address or "%" in address else (expected,), address)
+            for address in _ipv4_spellings(rng, rng.getrandbits(32)):
+                try:
+                    expected = int(ipaddress.IPv4Address(address))
+                except ValueError:
+                    expected = None
+                self.assertEqual(parse_ipv4_int(address), expected, address)
+
+    def test_canonical_input_skips_ipaddress(self):
+        with mock.patch.object(calculations, "_ipv4_network_and_subnet", side_effect=AssertionError), \
+                mock.patch.object(calculations, "_ipv6_network_and_subnet", side_effect=AssertionError), \
+                mock.patch.object(calculations.ipaddress, "IPv4Address", side_effect=AssertionError):
+            result = calculate_ipv4_network_and_subnet("10.20.30.40", "255.255.224.0")
+            self.assertEqual(result["HostMax"], "10.20.31.254")
+            self.assertEqual(calculate_ipv4_network_and_subnet("10.20.30.40", "0.0.0.255")["CIDR"], "24")
+            self.assertEqual(calculate_ipv6_network_and_subnet("2001:DB8::8a2e:370:7334", "64")["Total Hosts"], 2**64)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,64 @@
+import io
+import ipaddress
+import random
+import unittest
+
+from app.cidr_sets import CIDRSet, aggregate, diff, range_to_cidrs
+
+
+class CIDRSetTests(unittest.TestCase):
+    def test_aggregate_merges_overlapping_and_adjacent_networks(self):
+        lines = ["10.0.0.0/25", "10.0.0.128/25", "10.0.1.0/24", "10.0.0.7", "# comment", ""]
+        lines += ["2001:db8::/33", "2001:db8:8000::/33"]
+        self.assertEqual(aggregate(lines), ["10.0.0.0/23", "2001:db8::/32"])
+
+    def test_matches_ipaddress_collapse(self):
+        rng = random.Random(7)
+        lines = [
+            f"{ipaddress.IPv4Address(rng.getrandbits(32))}/{rng.randrange(8, 33)}" for _ in range(2000)
+        ]
+        networks = (ipaddress.ip_network(line, strict=False) for line in lines)
+        expected = [str(network) for network in ipaddress.collapse_addresses(networks)]
+        self.assertEqual(list(CIDRSet.from_iterable(lines, chunk_size=97).cidrs()), expected)
+
+    def test_set_operations(self):
+        left = CIDRSet.from_iterable(["10.0.0.0/16", "2001:db8::/48"])
+        right = CIDRSet.from_iterable(["10.0.128.0/17", "10.1.0.0/16", "2001:db8::/64"])
+        self.assertEqual(list((left | right).cidrs()), ["10.0.0.0/15", "2001:db8::/48"])
+        self.assertEqual(list((left & right).cidrs()), ["10.0.128.0/17", "2001:db8::/64"])
+        self.assertEqual(list((left - right).cidrs())[:1], ["10.0.0.0/17"])
+        self.assertEqual((left ^ right), (left - right) | (right - left))
+        self.assertIn("10.0.200.1", left & right)
+        self.assertNotIn("10.0.1.1", left & right)
+
+    def test_diff_reports_added_and_removed_space(self):
+        old = CIDRSet.from_iterable(io.StringIO("192.0.2.0/24\n198.51.100.0/24\n"))
+        new = CIDRSet.from_iterable(["192.0.2.0/25", "203.0.113.0/24"])
+        added, removed = diff(old, new)
+        self.assertEqual(list(added.cidrs()), ["203.0.113.0/24"])
+        self.assertEqual(list(removed.cidrs()), ["192.0.2.128/25", "198.51.100.0/24"])
+        self.assertEqual(removed.num_addresses, 384)
+
+    def test_range_to_cidrs(self):
+        self.assertEqual(
+            range_to_cidrs("10.0.0.5", "10.0.0.17"),
+            ["10.0.0.5/32", "10.0.0.6/31", "10.0.0.8/29", "10.0.0.16/31"],
+        )
+        self.assertEqual(range_to_cidrs("::", "ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff"), ["::/0"])
+        self.assertEqual(
+            CIDRSet.from_ranges([("10.0.0.0", "10.0.0.255")]), CIDRSet.from_iterable(["10.0.0.0/24"])
+        )
+        with self.assertRaises(ValueError):
+            range_to_cidrs("10.0.0.9", "10.0.0.1")
+        with self.assertRaises(ValueError):
+            aggregate(["10.0.0.0/33"])
+
+    def test_empty_or_non_ascii_prefixes_are_invalid_networks(self):
+        for token in ("10.0.0.1/", "10.0.0.1/\u00b2", "10.0.0.1/\u0662\u0664"):
+            with self.subTest(token=token), self.assertRaisesRegex(ValueError, "Invalid network"):
+                aggregate([token])
+        self.assertEqual(aggregate(["10.0.0.1", "10.0.0.0/31"]), ["10.0.0.0/31"])
+
+
+if __name__ == '__main__':
+    unittest.main()
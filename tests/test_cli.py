@@ -0,0 +1,71 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from app.cli import iter_output, main, parse_line, write_output
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ParseLineTests(unittest.TestCase):
+    def test_separators_and_default_network(self):
+        self.assertEqual(parse_line("10.0.0.5/24"), ["10.0.0.5", "24"])
+        self.assertEqual(parse_line("10.0.0.5, 255.255.255.0"), ["10.0.0.5", "255.255.255.0"])
+        self.assertEqual(parse_line("2001:db8::1 64"), ["2001:db8::1", "64"])
+        self.assertEqual(parse_line("10.0.0.5", "16"), ["10.0.0.5", "16"])
+
+
+class OutputTests(unittest.TestCase):
+    items = [["10.0.0.5", "24"], ["bad", "24"], ["2001:db8::1", "64"], ["192.168.1.1", "30"], ["10.1.1.1", "8"]]
+
+    def test_ndjson_output_keeps_input_order_across_workers(self):
+        serial = io.StringIO()
+        sharded = io.StringIO()
+        errors = write_output(iter_output(self.items, chunk_size=2), serial, "ndjson")
+        write_output(iter_output(self.items, workers=2, chunk_size=2), sharded, "ndjson")
+        self.assertEqual(serial.getvalue(), sharded.getvalue())
+        rows = [json.loads(line) for line in serial.getvalue().splitlines()]
+        self.assertEqual([row["index"] for row in rows], [0, 1, 2, 3, 4])
+        self.assertEqual(rows[3]["network"]["Network Address"], "192.168.1.0")
+        self.assertEqual(errors, 1)
+
+    def test_json_and_csv_output(self):
+        output = io.StringIO()
+        write_output(iter_output(self.items, "json", chunk_size=2), output, "json")
+        self.assertEqual(len(json.loads(output.getvalue())), 5)
+
+        output = io.StringIO()
+        write_output(iter_output(self.items[:2], "csv"), output, "csv")
+        header, first, second = output.getvalue().splitlines()
+        self.assertTrue(header.startswith("index,input,error,IP Address"))
+        self.assertTrue(first.startswith("0,10.0.0.5/24,,10.0.0.5,IPv4"))
+        self.assertTrue(second.startswith("1,bad/24,Invalid IP address format."))
+
+    def test_main_reads_files_and_writes_output(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "in.txt")
+            target = os.path.join(directory, "out.json")
+            with open(source, "w", encoding="utf-8") as handle:
+                handle.write("# comment\n10.0.0.5\n\n10.0.0.9/25\n")
+            self.assertEqual(main([source, "-n", "24", "-f", "json", "-o", target]), 0)
+            with open(target, encoding="utf-8") as handle:
+                rows = json.load(handle)
+        self.assertEqual([row["network"]["CIDR"] for row in rows], ["24", "25"])
+
+    def test_cli_does_not_import_flask(self):
+        code = "import sys, app.cli; print('flask' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), "False")
+
+    def test_cli_imports_numpy_only_when_a_command_runs(self):
+        code = "import sys, app.cli; print('numpy' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), "False")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+import io
+import ipaddress
+import json
+import os
+import random
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+
+from app import create_app
+from app.cli import main
+from app.conflicts import find_conflicts, is_conflict, iter_text_items
+
+
+def _by_kind(findings):
+    grouped = {}
+    for finding in findings:
+        grouped.setdefault(finding.get("kind", "error"), []).append(finding)
+    return grouped
+
+
+class FindConflictsTests(unittest.TestCase):
+    def test_reports_each_kind(self):
+        findings = _by_kind(
+            find_conflicts(
+                [
+                    "10.0.0.0/16",
+                    "10.0.1.0/24,10.0.0.0/16",
+                    "10.0.1.7/24",
+                    "10.0.1.128/25",
+                    "10.0.1.0/24,10.9.0.0/16",
+                    "10.1.0.0-10.1.0.200",
+                    "10.1.0.128/25",
+                    "2001:db8::/48",
+                    "2001:db8:1::/64,2001:db8::/48",
+                    "bogus",
+                ]
+            )
+        )
+        self.assertEqual(findings["error"], [{"index": 9, "error": "Invalid network: 'bogus'"}])
+        self.assertEqual([(f["index"], f["first_index"]) for f in findings["duplicate"]], [(2, 1), (4, 1)])
+        self.assertEqual(
+            [(f["index"], f["parent"]) for f in findings["outside_parent"]], [(4, "10.9.0.0/16"), (8, "2001:db8::/48")]
+        )
+        self.assertEqual([(f["index"], f["with"]["index"]) for f in findings["overlap"]], [(6, 5)])
+
+        contained = {f["index"]: f for f in findings["contained"]}
+        self.assertTrue(contained[1]["declared"])
+        self.assertFalse(contained[3]["declared"])
+        self.assertEqual([link["index"] for link in contained[3]["chain"]], [0, 1])
+
+        gaps = [(f["parent"]["index"], f["first"], f["last"]) for f in findings["gap"]]
+        self.assertEqual(
+            gaps,
+            [(0, "10.0.0.0", "10.0.0.255"), (1, "10.0.1.0", "10.0.1.127"), (0, "10.0.2.0", "10.0.255.255")],
+        )
+        self.assertEqual(findings["gap"][0]["cidrs"], ["10.0.0.0/24"])
+
+    def test_undeclared_parents_join_the_sweep(self):
+        findings = list(find_conflicts(["10.0.0.0/26,10.0.0.0/24", "10.0.0.128/26,10.0.0.0/24", "::/0,::/0"]))
+        self.assertEqual([f["declared"] for f in findings if f["kind"] == "contained"], [True, True])
+        gaps = [(f["parent"], f["cidrs"]) for f in findings if f["kind"] == "gap"]
+        self.assertEqual(
+            gaps,
+            [
+                ({"index": None, "network": "10.0.0.0/24"}, ["10.0.0.64/26"]),
+                ({"index": None, "network": "10.0.0.0/24"}, ["10.0.0.192/26"]),
+            ],
+        )
+        self.assertFalse(any(is_conflict(finding) for finding in findings))
+
+    def test_agrees_with_pairwise_checks(self):
+        rng = random.Random(19)
+        networks = []
+        for _ in range(300):
+            if rng.random() < 0.7:
+                address, prefix = 0x0A000000 | rng.getrandbits(24), rng.randint(12, 28)
+            else:
+                address, prefix = 0x20010DB8 << 96 | rng.getrandbits(24) << 80, rng.randint(36, 56)
+            networks.append(ipaddress.ip_network((address, prefix), strict=False))
+        findings = _by_kind(find_conflicts([str(network) for network in networks]))
+
+        duplicates = {(f["first_index"], f["index"]) for f in findings.get("duplicate", [])}
+        nested = {(link["index"], f["index"]) for f in findings.get("contained", []) for link in f["chain"]}
+        first_index = {}
+        for index, network in enumerate(networks):
+            first_index.setdefault(network, index)
+        expected_duplicates, expected_nested = set(), set()
+        for i, outer in enumerate(networks):
+            for j, inner in enumerate(networks):
+                if i < j and outer == inner and first_index[outer] == i:
+                    expected_duplicates.add((i, j))
+                elif outer != inner and outer.version == inner.version and inner.subnet_of(outer):
+                    if first_index[outer] == i and first_index[inner] == j:
+                        expected_nested.add((i, j))
+        self.assertEqual(duplicates, expected_duplicates)
+        self.assertEqual(nested, expected_nested)
+        self.assertNotIn("overlap", findings)
+
+    def test_partially_overlapped_containers_keep_their_children(self):
+        findings = _by_kind(find_conflicts(["10.0.0.0-10.0.0.10", "10.0.0.5-10.0.0.20", "10.0.0.8-10.0.0.9"]))
+        self.assertEqual([(f["index"], f["with"]["index"]) for f in findings["overlap"]], [(1, 0)])
+        self.assertEqual([link["index"] for link in findings["contained"][0]["chain"]], [0, 1])
+        gaps = [(f["parent"]["index"], f["first"], f["last"]) for f in findings["gap"]]
+        self.assertEqual(gaps, [(0, "10.0.0.0", "10.0.0.4"), (1, "10.0.0.11", "10.0.0.20")])
+
+    def test_ranges_agree_with_pairwise_checks(self):
+        rng = random.Random(23)
+        ranges = set()
+        while len(ranges) < 60:
+            first = rng.randrange(256)
+            ranges.add((first, min(first + rng.choice((0, 3, 15, 40, 120)) + rng.randrange(8), 255)))
+        ranges = list(ranges)
+        findings = _by_kind(find_conflicts([f"10.0.0.{first}-10.0.0.{last}" for first, last in ranges]))
+
+        def inside(inner, outer):
+            return inner != outer and outer[0] <= inner[0] and inner[1] <= outer[1]
+
+        def overlapping(a, b):
+            return a != b and a[0] <= b[1] and b[0] <= a[1] and not inside(a, b) and not inside(b, a)
+
+        order = sorted(range(len(ranges)), key=lambda i: (ranges[i][0], -ranges[i][1]))
+        expected_chains, expected_gaps = {}, set()
+        for j, inner in enumerate(ranges):
+            chain = [i for i in order if inside(inner, ranges[i])]
+            if chain:
+                expected_chains[j] = chain
+            if any(inside(other, inner) for other in ranges):
+                covered = {
+                    address
+                    for other in ranges
+                    if inside(other, inner) or overlapping(other, inner)
+                    for address in range(other[0], other[1] + 1)
+                }
+                addresses = range(inner[0], inner[1] + 1)
+                expected_gaps.update((j, address) for address in addresses if address not in covered)
+        chains = {f["index"]: [link["index"] for link in f["chain"]] for f in findings.get("contained", [])}
+        self.assertEqual(chains, expected_chains)
+        gaps = {
+            (f["parent"]["index"], address)
+            for f in findings.get("gap", [])
+            for address in range(int(f["first"].split(".")[3]), int(f["last"].split(".")[3]) + 1)
+        }
+        self.assertEqual(gaps, expected_gaps)
+        pairs = {frozenset((f["index"], f["with"]["index"])) for f in findings.get("overlap", [])}
+        expected_pairs = {
+            frozenset((i, j)) for i in range(len(ranges)) for j in range(i) if overlapping(ranges[i], ranges[j])
+        }
+        self.assertEqual(pairs, expected_pairs)
+
+
+class ConflictInterfaceTests(unittest.TestCase):
+    def test_api_streams_findings(self):
+        app = create_app(debug_mode=False, secret_key="test-secret", load_env=False)
+        app.config["RATE_LIMIT_DISABLED"] = True
+        client = app.test_client()
+        response = client.post("/api/v1/conflicts", json=["10.0.0.0/24", ["10.0.0.0/24"], {"network": 5}])
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(lines[0], {"index": 2, "error": "Network and parent must be strings."})
+        self.assertEqual(lines[1]["kind"], "duplicate")
+
+        response = client.post("/api/v1/conflicts", data="10.0.0.0/25 10.0.0.0/24\n", content_type="text/plain")
+        self.assertEqual(json.loads(response.get_data(as_text=True).splitlines()[0])["declared"], True)
+
+    def test_cli_subcommand_exit_status(self):
+        lines = [b"10.0.0.0/24  10.0.0.0/16 # core\n", b"# note\n", b"\n"]
+        self.assertEqual(list(iter_text_items(lines)), ["10.0.0.0/24,10.0.0.0/16"])
+        with tempfile.TemporaryDirectory() as directory:
+            clean, conflicting, output = (os.path.join(directory, name) for name in ("a.txt", "b.txt", "out.json"))
+            with open(clean, "w", encoding="utf-8") as handle:
+                handle.write("10.0.0.0/25 10.0.0.0/24\n10.0.0.128/25 10.0.0.0/24\n")
+            with open(conflicting, "w", encoding="utf-8") as handle:
+                handle.write("2001:db8::/64\n2001:DB8:0::/64\n")
+            stderr = io.StringIO()
+            with redirect_stderr(stderr):
+                self.assertEqual(main(["conflicts", clean, "-o", output]), 0)
+                self.assertEqual(main(["conflicts", "-f", "json", "-o", output, clean, conflicting]), 1)
+            with open(output, encoding="utf-8") as handle:
+                findings = json.load(handle)
+        self.assertEqual([finding["kind"] for finding in findings], ["contained", "contained", "duplicate"])
+        self.assertIn("1 duplicate", stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import ipaddress
+import unittest
+
+from app import create_app
+from app.enumeration import Subnets, enumerate_network, iter_download, parse_network
+
+
+class EnumerationTests(unittest.TestCase):
+    def test_hosts_match_host_min_and_max(self):
+        hosts = enumerate_network("hosts", "192.168.1.0/29")
+        self.assertEqual(list(hosts), [str(ip) for ip in ipaddress.ip_network("192.168.1.0/29").hosts()])
+        self.assertEqual(list(enumerate_network("hosts", "10.0.0.0/31")), ["10.0.0.0", "10.0.0.1"])
+        self.assertEqual(list(enumerate_network("hosts", "10.0.0.7/32")), ["10.0.0.7"])
+        self.assertEqual(list(enumerate_network("hosts", "2001:db8::/126")), ["2001:db8::1", "2001:db8::2"])
+
+    def test_subnets_match_ipaddress_and_support_random_access(self):
+        subnets = enumerate_network("subnets", "10.0.0.0/255.255.252.0", "25")
+        expected = [str(net) for net in ipaddress.ip_network("10.0.0.0/22").subnets(new_prefix=25)]
+        self.assertEqual(list(subnets), expected)
+        self.assertEqual(subnets[2:4], expected[2:4])
+        self.assertEqual(subnets[-1], expected[-1])
+
+        huge = enumerate_network("subnets", "2001:db8::/32", "/128")
+        self.assertEqual(huge.count, 2**96)
+        self.assertEqual(huge[2**95], "2001:db8:8000::/128")
+        self.assertEqual(huge.index("2001:db8:8000::/128"), 2**95)
+        with self.assertRaises(IndexError):
+            huge[2**96]
+
+    def test_supernets(self):
+        supernets = enumerate_network("supernets", "10.1.2.0/24", "20")
+        self.assertEqual(list(supernets), ["10.1.2.0/23", "10.1.0.0/22", "10.1.0.0/21", "10.1.0.0/20"])
+        self.assertEqual(supernets.index("10.1.0.0/21"), 2)
+        self.assertEqual(len(enumerate_network("supernets", "::/0")), 0)
+
+    def test_index_rejects_items_outside_the_sequence(self):
+        subnets = Subnets(parse_network("10.0.0.0/24"), 26)
+        for value in ("10.0.0.32/26", "10.0.1.0/26", "10.0.0.0/27", "2001:db8::/26"):
+            self.assertNotIn(value, subnets)
+        with self.assertRaises(ValueError):
+            enumerate_network("subnets", "10.0.0.0/24", "23")
+        with self.assertRaises(ValueError):
+            enumerate_network("hosts", "10.0.0.1")
+
+    def test_download_rows(self):
+        hosts = enumerate_network("hosts", "10.0.0.0/24")
+        csv = "".join(iter_download(hosts, 250, 300, "csv"))
+        self.assertEqual(csv, "index,address\n250,10.0.0.251\n251,10.0.0.252\n252,10.0.0.253\n253,10.0.0.254\n")
+        ndjson = "".join(iter_download(hosts, 0, 1, "ndjson"))
+        self.assertEqual(ndjson, '{"index":0,"address":"10.0.0.1"}\n')
+
+
+class EnumerationRouteTests(unittest.TestCase):
+    def setUp(self):
+        app = create_app(debug_mode=False, secret_key="test-secret", load_env=False)
+        app.config["RATE_LIMIT_DISABLED"] = True
+        self.client = app.test_client()
+
+    def test_cursor_pagination_visits_every_item_once(self):
+        url = "/api/v1/subnets?network=10.0.0.0/22&prefix=26&limit=5"
+        items = []
+        while url:
+            response = self.client.get(url)
+            page = response.get_json()
+            items.extend(page["items"])
+            self.assertEqual(page["total"], 16)
+            link = response.headers.get("Link")
+            url = link[1 : link.index(">")] if link else None
+        self.assertEqual(items, [str(net) for net in ipaddress.ip_network("10.0.0.0/22").subnets(new_prefix=26)])
+
+    def test_offset_download_and_errors(self):
+        page = self.client.get("/api/v1/hosts?network=2001:db8::/32&offset=4294967294&limit=2").get_json()
+        self.assertEqual(page["items"], ["2001:db8::ffff:ffff", "2001:db8::1:0:0"])
+        self.assertEqual(page["next_cursor"], "2001:db8::1:0:1")
+
+        response = self.client.get("/api/v1/subnets?network=10.0.0.0/16&prefix=24&format=csv&limit=2")
+        self.assertEqual(response.mimetype, "text/csv")
+        self.assertEqual(response.get_data(as_text=True), "index,network\n0,10.0.0.0/24\n1,10.0.1.0/24\n")
+        self.assertEqual(response.headers["X-Total-Count"], "256")
+
+        for url in (
+            "/api/v1/subnets?network=10.0.0.0/24",
+            "/api/v1/hosts?network=10.0.0.0/24&offset=-1",
+            "/api/v1/hosts?network=10.0.0.0/24&cursor=10.0.1.1",
+            "/api/v1/hosts?network=10.0.0.0/24&format=xml",
+        ):
+            self.assertEqual(self.client.get(url).status_code, 400, url)
+
+
+if __name__ == "__main__":
+    unittest.main()
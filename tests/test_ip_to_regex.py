@@ -0,0 +1,57 @@
+import ipaddress
+import random
+import re
+import unittest
+
+from app.ip_to_regex import (
+    cidrs_to_regex,
+    compile_regex,
+    ip_to_regex,
+    range_to_regex,
+    validate_regex,
+)
+
+
+class IpToRegexTests(unittest.TestCase):
+    def test_non_aligned_ipv4_prefix(self):
+        pattern = ip_to_regex("172.30.151.224/27")
+        self.assertEqual(pattern, r"^172\.30\.151\.2(?:2[4-9]|[34][0-9]|5[0-5])$")
+        for last_octet in range(256):
+            address = f"172.30.151.{last_octet}"
+            self.assertEqual(bool(re.match(pattern, address)), last_octet >= 224, address)
+
+    def test_ipv4_range_matches_exactly(self):
+        pattern = re.compile(range_to_regex("10.0.0.5", "10.0.3.17"))
+        first, last = int(ipaddress.IPv4Address("10.0.0.5")), int(ipaddress.IPv4Address("10.0.3.17"))
+        for value in range(first - 300, last + 300):
+            address = str(ipaddress.IPv4Address(value))
+            self.assertEqual(bool(pattern.match(address)), first <= value <= last, address)
+
+    def test_ipv6_compressed_and_full_forms(self):
+        pattern = re.compile(ip_to_regex("2001:db8:1::/48"))
+        rng = random.Random(2)
+        network = ipaddress.IPv6Network("2001:db8:1::/48")
+        for _ in range(200):
+            address = network.network_address + rng.getrandbits(rng.choice([4, 16, 80]))
+            full = ":".join(f"{int(address) >> shift & 0xFFFF:x}" for shift in range(112, -16, -16))
+            self.assertTrue(pattern.match(str(address)), str(address))
+            self.assertTrue(pattern.match(full), full)
+        for outside in ["2001:db8:2::1", "2001:db8::1", "2001:db8:10::", "::1"]:
+            self.assertIsNone(pattern.match(outside), outside)
+
+    def test_merged_cidrs_with_token_anchors(self):
+        pattern = cidrs_to_regex(["10.1.0.0/24", "10.1.1.0/24", "2001:db8::/32"], anchor="token")
+        text = "src=10.1.1.7 dst=110.1.1.7 via 10.1.2.1 peer 2001:db8::5 other 2001:db9::5"
+        self.assertEqual(re.findall(pattern, text), ["10.1.1.7", "2001:db8::5"])
+
+    def test_validate_regex_reuses_compiled_patterns(self):
+        compile_regex.cache_clear()
+        pattern = ip_to_regex("192.168.1.0/30", anchor=None)
+        self.assertEqual(validate_regex(pattern, "192.168.1.2")["matches"], ["192.168.1.2"])
+        validate_regex(pattern, "192.168.1.3")
+        self.assertEqual(compile_regex.cache_info().hits, 1)
+        self.assertEqual(validate_regex("(", "x"), {"error": "Invalid regex pattern"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import ipaddress
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+
+from app import create_app
+from app.ipam import PoolConflictError, PoolNotFoundError, PoolStore
+
+
+def _allocate_many(path, count, queue):
+    store = PoolStore(path)
+    queue.put([store.allocate("lab", 28)["network"] for _ in range(count)])
+
+
+class PoolStoreTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "ipam.db")
+        self.store = PoolStore(self.path)
+
+    def _free_blocks(self):
+        with sqlite3.connect(self.path) as connection:
+            return connection.execute("SELECT prefixlen, count(*) FROM free_blocks GROUP BY prefixlen").fetchall()
+
+    def test_allocations_split_and_releases_coalesce(self):
+        self.store.create_pool("lab", "10.0.0.7/24")
+        first = self.store.allocate("lab", 26, "web")
+        self.assertEqual(first["network"], "10.0.0.0/26")
+        self.assertEqual(self.store.allocate("lab", "/28")["network"], "10.0.0.64/28")
+        self.assertEqual(self.store.allocate("lab", "255.255.255.128")["network"], "10.0.0.128/25")
+        self.assertEqual(self.store.allocate("lab", 27)["network"], "10.0.0.96/27")
+        usage = self.store.pool("lab")
+        self.assertEqual(usage["allocations"], 4)
+        self.assertEqual(usage["allocated_addresses"], 240)
+        self.assertEqual(usage["largest_free_prefix"], 28)
+
+        for network in ("10.0.0.64/28", "10.0.0.0/26", "10.0.0.128/25", "10.0.0.96/27"):
+            self.store.release("lab", network)
+        self.assertEqual(self._free_blocks(), [(24, 1)])
+        self.assertEqual(self.store.pool("lab")["utilization"], 0)
+
+    def test_errors(self):
+        self.store.create_pool("v6", "2001:db8::/62")
+        with self.assertRaises(PoolConflictError):
+            self.store.create_pool("v6", "2001:db8:1::/48")
+        with self.assertRaises(ValueError):
+            self.store.create_pool("bad name", "10.0.0.0/8")
+        with self.assertRaises(ValueError):
+            self.store.allocate("v6", 48)
+        for _ in range(4):
+            self.store.allocate("v6", 64)
+        with self.assertRaises(PoolConflictError):
+            self.store.allocate("v6", 64)
+        with self.assertRaises(PoolNotFoundError):
+            self.store.allocate("missing", 64)
+        with self.assertRaises(PoolNotFoundError):
+            self.store.release("v6", "2001:db8:0:4::/64")
+        with self.assertRaises(PoolNotFoundError):
+            self.store.release("v6", "2001:db8::/63")
+        with self.assertRaises(PoolConflictError):
+            self.store.delete_pool("v6")
+
+    def test_random_workload_never_overlaps(self):
+        self.store.create_pool("lab", "10.0.0.0/20")
+        rng = random.Random(20)
+        allocated = set()
+        for _ in range(600):
+            if allocated and rng.random() < 0.4:
+                network = rng.choice(sorted(allocated))
+                self.store.release("lab", network)
+                allocated.remove(network)
+                continue
+            try:
+                network = self.store.allocate("lab", rng.randint(22, 30))["network"]
+            except PoolConflictError:
+                continue
+            parsed = ipaddress.ip_network(network)
+            self.assertFalse(any(parsed.overlaps(ipaddress.ip_network(other)) for other in allocated))
+            allocated.add(network)
+        expected = sum(ipaddress.ip_network(network).num_addresses for network in allocated)
+        self.assertEqual(self.store.pool("lab")["allocated_addresses"], expected)
+        listed = self.store.allocations("lab", limit=1000)
+        self.assertEqual({item["network"] for item in listed}, allocated)
+        self.assertEqual(self.store.allocations("lab", after=listed[0]["network"], limit=1)[0], listed[1])
+
+        for network in allocated:
+            self.store.release("lab", network)
+        self.assertEqual(self._free_blocks(), [(20, 1)])
+
+    def test_concurrent_processes_get_distinct_blocks(self):
+        self.store.create_pool("lab", "10.0.0.0/20")
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+        workers = [context.Process(target=_allocate_many, args=(self.path, 25, queue)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        networks = [network for _ in workers for network in queue.get(timeout=60)]
+        for worker in workers:
+            worker.join()
+        self.assertEqual(len(set(networks)), 100)
+        self.assertEqual(self.store.pool("lab")["allocations"], 100)
+
+
+class PoolRouteTests(unittest.TestCase):
+    def test_pool_endpoints(self):
+        app = create_app(debug_mode=False, secret_key="test-secret", load_env=False)
+        app.config["RATE_LIMIT_DISABLED"] = True
+        client = app.test_client()
+        self.assertEqual(client.get("/api/v1/pools").status_code, 503)
+
+        with tempfile.TemporaryDirectory() as directory:
+            app.extensions["ipam"] = PoolStore(os.path.join(directory, "ipam.db"))
+            response = client.post("/api/v1/pools", json={"name": "v6", "network": "2001:db8::/48"})
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.get_json()["total_addresses"], 2**80)
+            self.assertEqual(client.post("/api/v1/pools", json={"name": "v6", "network": "::/0"}).status_code, 409)
+
+            response = client.post("/api/v1/pools/v6/allocations", json={"prefix": 64, "label": "rack-1"})
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.get_json()["network"], "2001:db8::/64")
+            page = client.get("/api/v1/pools/v6/allocations").get_json()["allocations"]
+            self.assertEqual([(item["network"], item["label"]) for item in page], [("2001:db8::/64", "rack-1")])
+            self.assertEqual(client.get("/api/v1/pools").get_json()["pools"][0]["allocations"], 1)
+
+            self.assertEqual(client.delete("/api/v1/pools/v6/allocations/2001:db8::/64").status_code, 204)
+            self.assertEqual(client.delete("/api/v1/pools/v6/allocations/2001:db8::/64").status_code, 404)
+            self.assertEqual(client.post("/api/v1/pools/v6/allocations", json={"prefix": 12}).status_code, 400)
+            self.assertEqual(client.post("/api/v1/pools/v6/allocations", data="[]").status_code, 400)
+            self.assertEqual(client.delete("/api/v1/pools/v6").status_code, 204)
+            self.assertEqual(client.get("/api/v1/pools/v6").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from app import create_app
+from app.log_scan import scan_log, scan_log_for_networks
+from app.prefix_index import PrefixIndex
+
+NETWORKS = ["10.0.0.0/8,corp", "10.1.0.0/16,lab", "2001:db8::/32,docs"]
+LOG = (
+    "2024-01-01 12:00:01 accept 10.1.2.3 -> 8.8.8.8\n"
+    "2024-01-01 12:00:02 version 10.2.3.4.5 build a10.0.0.1\n"
+    "2024-01-01 12:00:03 GET from [2001:db8::1]:443 via 10.9.9.9.\r\n"
+    "mac aa:bb:cc:dd:ee:ff time 12:34:56 x2001:db8::2\n"
+    "last 192.168.1.1 and 10.1.200.200"
+)
+
+
+class LogScanTests(unittest.TestCase):
+    def setUp(self):
+        handle = tempfile.NamedTemporaryFile("w", suffix=".log", delete=False)
+        with handle:
+            handle.write(LOG)
+        self.path = handle.name
+        self.addCleanup(os.remove, self.path)
+
+    def test_tags_lines_with_most_specific_network(self):
+        records = list(scan_log_for_networks(self.path, NETWORKS))
+        lines = {record["line"]: record for record in records[:-1]}
+        self.assertEqual(sorted(lines), [1, 3, 5])
+        self.assertEqual(lines[1]["matches"], [{"ip": "10.1.2.3", "prefix": "10.1.0.0/16", "label": "lab"}])
+        self.assertEqual([m["ip"] for m in lines[3]["matches"]], ["2001:db8::1", "10.9.9.9"])
+        self.assertTrue(lines[3]["text"].endswith("10.9.9.9."))
+
+        summary = records[-1]["summary"]
+        self.assertEqual(summary["lines"], 5)
+        self.assertEqual(summary["addresses"], 6)
+        self.assertEqual(summary["matched_addresses"], 4)
+        self.assertEqual(
+            {hit["prefix"]: hit["count"] for hit in summary["hits"]},
+            {"10.1.0.0/16": 2, "10.0.0.0/8": 1, "2001:db8::/32": 1},
+        )
+
+    def test_small_chunks_give_the_same_result(self):
+        expected = list(scan_log_for_networks(self.path, NETWORKS))
+        self.assertEqual(list(scan_log_for_networks(self.path, NETWORKS, chunk_size=16)), expected)
+
+    def test_counts_only_and_line_limit(self):
+        index = PrefixIndex.from_lines(NETWORKS)
+        records = list(scan_log(self.path, index, emit_lines=False))
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["summary"]["matched_lines"], 3)
+
+        records = list(scan_log(self.path, index, max_lines=1))
+        self.assertEqual(len(records), 2)
+        self.assertTrue(records[-1]["summary"]["truncated"])
+
+    def test_empty_file(self):
+        with tempfile.NamedTemporaryFile(delete=False) as handle:
+            pass
+        self.addCleanup(os.remove, handle.name)
+        summary = list(scan_log_for_networks(handle.name, NETWORKS))[-1]["summary"]
+        self.assertEqual((summary["lines"], summary["hits"]), (0, []))
+
+
+class ScanRouteTests(unittest.TestCase):
+    def setUp(self):
+        app = create_app(debug_mode=False, secret_key="test-secret", load_env=False)
+        app.config["RATE_LIMIT_DISABLED"] = True
+        self.client = app.test_client()
+
+    def test_multipart_upload(self):
+        response = self.client.post(
+            "/api/v1/scan",
+            data={"networks": "\n".join(NETWORKS), "log": (io.BytesIO(LOG.encode()), "app.log")},
+            content_type="multipart/form-data",
+        )
+        self.assertEqual(response.status_code, 200)
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([record.get("line") for record in records[:-1]], [1, 3, 5])
+        self.assertEqual(records[-1]["summary"]["matched_addresses"], 4)
+
+    def test_raw_body_summary_only_and_errors(self):
+        response = self.client.post(
+            "/api/v1/scan?lines=0&networks=192.168.0.0/16", data=LOG, content_type="text/plain"
+        )
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(records, [{"summary": records[0]["summary"]}])
+        self.assertEqual(records[0]["summary"]["hits"][0]["prefix"], "192.168.0.0/16")
+
+        response = self.client.post("/api/v1/scan", data=LOG, content_type="text/plain")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/v1/scan?networks=bogus", data=LOG, content_type="text/plain")
+        self.assertEqual(response.status_code, 400)
+
+    def test_oversized_chunked_body_is_refused_and_removed(self):
+        self.client.application.config["MAX_CONTENT_LENGTH"] = 100
+        spooled = lambda: {name for name in os.listdir(tempfile.gettempdir()) if name.startswith("ipcal-scan-")}
+        before = spooled()
+        response = self.client.post(
+            "/api/v1/scan?networks=192.168.0.0/16",
+            input_stream=io.BytesIO(LOG.encode() * 10),
+            content_type="text/plain",
+            environ_overrides={"wsgi.input_terminated": True, "CONTENT_LENGTH": ""},
+        )
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(spooled(), before)
+        response = self.client.post("/api/v1/scan?networks=192.168.0.0/16", data=LOG * 10, content_type="text/plain")
+        self.assertEqual(response.status_code, 413)
+
+
+if __name__ == "__main__":
+    unittest.main()
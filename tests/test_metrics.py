@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+import re
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from app import create_app
+from app.metrics import (
+    RETIRED_FILE,
+    MemoryMetricStore,
+    SharedMetricStore,
+    record_request,
+    render_prometheus,
+    retire_exited,
+    retire_process,
+)
+
+
+def _record_in_child(directory):
+    record_request(SharedMetricStore(directory), "main.index", "GET", 200, 0.002, [])
+
+
+class MetricsRouteTests(unittest.TestCase):
+    def _create_app(self, enabled: bool):
+        with patch.dict(os.environ, {"METRICS_ENABLED": "true" if enabled else "false"}):
+            app = create_app(debug_mode=False, secret_key="test-secret", load_env=False)
+        app.config["RATE_LIMIT_DISABLED"] = True
+        return app.test_client()
+
+    def _post_calculate(self, client):
+        page = client.get("/").get_data(as_text=True)
+        csrf_token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+        return client.post(
+            "/calculate", data={"ip-address": "10.1.2.3", "network": "24", "csrf_token": csrf_token}
+        )
+
+    def test_calculate_reports_server_timing_per_stage(self):
+        response = self._post_calculate(self._create_app(enabled=True))
+        stages = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+        self.assertEqual(stages, ["rate_limit", "csrf", "validate", "calculate", "regex", "render", "total"])
+
+    def test_metrics_endpoint_exposes_histograms(self):
+        client = self._create_app(enabled=True)
+        self._post_calculate(client)
+        body = client.get("/metrics").get_data(as_text=True)
+        self.assertIn('ipcal_requests_total{endpoint="main.calculate",method="POST",status="200"} 1', body)
+        self.assertIn('ipcal_stage_duration_seconds_count{endpoint="main.calculate",stage="regex"} 1', body)
+        self.assertIn('ipcal_request_duration_seconds_bucket{endpoint="main.index",le="+Inf"} 1', body)
+
+    def test_disabled_metrics_add_no_header_or_endpoint(self):
+        client = self._create_app(enabled=False)
+        response = self._post_calculate(client)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response.headers)
+        self.assertEqual(client.get("/metrics").status_code, 404)
+
+
+class MetricStoreTests(unittest.TestCase):
+    def test_buckets_are_rendered_cumulatively(self):
+        store = MemoryMetricStore()
+        for seconds in (0.0002, 0.0002, 0.03, 10):
+            record_request(store, "main.index", "GET", 200, seconds, [])
+        body = render_prometheus(store.collect())
+        self.assertIn('ipcal_request_duration_seconds_bucket{endpoint="main.index",le="0.00025"} 2', body)
+        self.assertIn('ipcal_request_duration_seconds_bucket{endpoint="main.index",le="0.05"} 3', body)
+        self.assertIn('ipcal_request_duration_seconds_bucket{endpoint="main.index",le="+Inf"} 4', body)
+        self.assertIn('ipcal_request_duration_seconds_count{endpoint="main.index"} 4', body)
+
+    def test_shared_store_merges_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = SharedMetricStore(directory)
+            record_request(store, "main.index", "GET", 200, 0.001, [])
+            child = multiprocessing.get_context("fork").Process(target=_record_in_child, args=(directory,))
+            child.start()
+            child.join()
+            values = store.collect()
+            self.assertEqual(len(os.listdir(directory)), 2)
+
+            # A worker restarted with the same PID continues its own series.
+            record_request(SharedMetricStore(directory), "main.index", "GET", 200, 0.001, [])
+            restarted = store.collect()
+        key = 'ipcal_requests_total\tendpoint="main.index",method="GET",status="200"\t'
+        self.assertEqual(values[key], 2)
+        self.assertEqual(restarted[key], 3)
+
+    def test_exited_workers_are_folded_into_the_retired_table(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = SharedMetricStore(directory)
+            record_request(store, "main.index", "GET", 200, 0.001, [])
+            children = []
+            for _ in range(3):
+                child = multiprocessing.get_context("fork").Process(target=_record_in_child, args=(directory,))
+                child.start()
+                child.join()
+                children.append(child.pid)
+            before = store.collect()
+            self.assertTrue(retire_process(directory, children[0]))
+            self.assertFalse(retire_process(directory, children[0]))
+            self.assertEqual(store.collect(), before)
+            # Only the live process keeps its own file.
+            self.assertEqual(retire_exited(directory), 2)
+            self.assertEqual(sorted(os.listdir(directory)), sorted([RETIRED_FILE, f"metrics-{os.getpid()}.db"]))
+            self.assertEqual(store.collect(), before)
+            record_request(store, "main.index", "GET", 200, 0.001, [])
+            after = store.collect()
+        key = 'ipcal_requests_total\tendpoint="main.index",method="GET",status="200"\t'
+        self.assertEqual((before[key], after[key]), (4, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import re
+import unittest
+
+from app import create_app
+from app.calculations import calculate_ipv6, calculate_ipv4_network_and_subnet
+
+
+class PermalinkTests(unittest.TestCase):
+    def setUp(self):
+        app = create_app(debug_mode=False, secret_key="test-secret", load_env=False)
+        app.config["RATE_LIMIT_DISABLED"] = True
+        self.client = app.test_client()
+
+    def test_non_canonical_spellings_redirect_permanently(self):
+        cases = {
+            "/ip/2001:DB8:0::1": "/ip/2001:db8::1",
+            "/ip/10.0.0.1/255.255.255.0": "/ip/10.0.0.1/24",
+            "/net/10.0.0.77/24": "/net/10.0.0.0/24",
+            "/net/2001:db8::1/48?format=json": "/net/2001:db8::/48?format=json",
+        }
+        for url, canonical in cases.items():
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 301, url)
+            self.assertTrue(response.headers["Location"].endswith(canonical), url)
+            self.assertIn("max-age=", response.headers["Cache-Control"])
+
+    def test_json_by_accept_header_or_format(self):
+        response = self.client.get("/net/10.0.0.0/24", headers={"Accept": "application/json"})
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertEqual(response.get_json()["network"], calculate_ipv4_network_and_subnet("10.0.0.0", "24"))
+        self.assertIn("regex", response.get_json())
+        self.assertIn("Accept", response.headers["Vary"])
+
+        response = self.client.get("/ip/2001:db8::1?format=json")
+        self.assertEqual(response.get_json(), {"ip": calculate_ipv6("2001:db8::1")})
+        self.assertEqual(self.client.get("/ip/2001:db8::1").mimetype, "text/html")
+        headers = {"Accept": "application/json, text/plain, */*"}
+        self.assertEqual(self.client.get("/ip/2001:db8::1", headers=headers).mimetype, "application/json")
+
+    def test_etag_and_conditional_requests(self):
+        html = self.client.get("/ip/10.0.0.1/24")
+        json = self.client.get("/ip/10.0.0.1/24?format=json")
+        self.assertEqual(html.status_code, 200)
+        self.assertFalse(html.headers["ETag"].startswith("W/"))
+        self.assertNotEqual(html.headers["ETag"], json.headers["ETag"])
+        self.assertEqual(html.headers["Cache-Control"], "public, max-age=2592000")
+        self.assertNotIn("Set-Cookie", html.headers)
+
+        response = self.client.get("/ip/10.0.0.1/24", headers={"If-None-Match": html.headers["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        self.assertEqual(response.headers["ETag"], html.headers["ETag"])
+
+    def test_invalid_input_is_a_short_lived_not_found(self):
+        response = self.client.get("/ip/10.0.0.300?format=json")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json(), {"error": "Invalid IP address format."})
+        self.assertEqual(response.headers["Cache-Control"], "public, max-age=60")
+        self.assertEqual(self.client.get("/net/10.0.0.0/33").status_code, 404)
+
+    def test_get_form_and_calculate_page_link_to_permalinks(self):
+        response = self.client.get("/ip?ip-address=10.1.1.1&network=255.255.0.0")
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.headers["Location"].endswith("/ip/10.1.1.1/16"))
+        self.assertEqual(self.client.get("/ip?ip-address=bogus").status_code, 400)
+
+        page = self.client.get("/").get_data(as_text=True)
+        csrf_token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+        response = self.client.post(
+            "/calculate", data={"ip-address": "10.1.2.3", "network": "24", "csrf_token": csrf_token}
+        )
+        self.assertIn('href="/ip/10.1.2.3/24"', response.get_data(as_text=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
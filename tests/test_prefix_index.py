@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from app import create_app
+from app.prefix_index import NO_MATCH, PrefixIndex
+
+PREFIXES = [
+    ("10.0.0.0/8", "corp"),
+    ("10.1.0.0/16", "site-a"),
+    ("10.1.2.0/24", "vlan-2"),
+    ("192.168.0.0/16", "lab"),
+    ("2001:db8::/32", "v6-corp"),
+    ("2001:db8:1::/48", "v6-site"),
+]
+
+
+class PrefixIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.index = PrefixIndex.build(PREFIXES)
+
+    def test_longest_match_wins(self):
+        self.assertEqual(self.index.lookup("10.1.2.3")["prefix"], "10.1.2.0/24")
+        self.assertEqual(self.index.lookup("10.1.3.1")["label"], "site-a")
+        self.assertEqual(self.index.lookup("10.2.0.1")["label"], "corp")
+        self.assertIsNone(self.index.lookup("11.0.0.1"))
+        self.assertEqual(self.index.lookup("2001:db8:1::5")["label"], "v6-site")
+        self.assertEqual(self.index.lookup("2001:db8:2::5")["label"], "v6-corp")
+
+    def test_parent_resumes_after_nested_prefix(self):
+        self.assertEqual(self.index.lookup("10.1.1.255")["label"], "site-a")
+        self.assertEqual(self.index.lookup("10.1.3.0")["label"], "site-a")
+        self.assertEqual(self.index.lookup("10.255.255.255")["label"], "corp")
+
+    def test_bulk_lookup_arrays(self):
+        addresses = np.array([0x0A010203, 0x0B000001, 0xC0A80101], dtype=np.uint32)
+        entries = self.index.lookup_ipv4_array(addresses)
+        self.assertEqual(self.index.ipv4.prefix(entries[0]), "10.1.2.0/24")
+        self.assertEqual(entries[1], NO_MATCH)
+        results = self.index.lookup_many(["10.1.2.3", "2001:db8:1::1", "bogus"])
+        self.assertEqual(results[1]["label"], "v6-site")
+        self.assertIsInstance(results[2], ValueError)
+
+    def test_save_and_load_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "index.npz")
+            self.index.save(path)
+            loaded = PrefixIndex.load(path)
+        addresses = ["10.1.2.3", "10.9.9.9", "192.168.5.5", "2001:db8:1::1", "::1"]
+        self.assertEqual(loaded.lookup_many(addresses), self.index.lookup_many(addresses))
+
+
+class LookupApiTests(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault('SECRET_KEY', 'test-secret')
+        self.app = create_app()
+        self.app.testing = True
+        self.app.config["RATE_LIMIT_DISABLED"] = True
+        self.app.extensions["prefix_index"] = PrefixIndex.build(PREFIXES)
+        self.client = self.app.test_client()
+
+    def test_single_and_batch_lookup(self):
+        response = self.client.get('/api/v1/lookup?ip=10.1.2.3')
+        self.assertEqual(response.get_json()["match"], {"prefix": "10.1.2.0/24", "label": "vlan-2"})
+
+        response = self.client.post('/api/v1/lookup', data=json.dumps(["192.168.1.1", "nope!", "8.8.8.8"]))
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(lines[0]["match"]["label"], "lab")
+        self.assertIn("invalid characters", lines[1]["error"])
+        self.assertIsNone(lines[2]["match"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import ipaddress
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from app import create_app
+from app.prefix_index import NO_MATCH
+from app.range_db import RangeDatabase, ReloadingRangeDatabase, build_range_db, compile_csv
+
+INVENTORY = """network,owner,site,vlan,asn,notes
+10.0.0.0/8,Corp,,,AS64512,
+10.1.0.0/16,NetOps,HAN1,,AS64512,
+10.1.2.0/24,NetOps,HAN1,120,AS64512,printers
+10.1.2.64-10.1.2.95,Lab,HAN1,121,AS64512,
+2001:db8::/32,Corp,,,AS64512,
+2001:db8:1::/48,NetOps,SGN2,300,AS64513,
+"""
+
+
+def _annotate(database, address):
+    return database.annotate(ipaddress.ip_address(address))
+
+
+class RangeDatabaseTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.csv_path = os.path.join(self.directory.name, "inventory.csv")
+        self.path = os.path.join(self.directory.name, "ranges.rdb")
+        with open(self.csv_path, "w", encoding="utf-8") as handle:
+            handle.write(INVENTORY)
+        compile_csv([self.csv_path], self.path)
+
+    def test_innermost_range_wins_and_parents_resume(self):
+        database = RangeDatabase(self.path)
+        self.assertEqual(database.fields, ["owner", "site", "vlan", "asn", "notes"])
+        self.assertEqual(
+            _annotate(database, "10.1.2.70"),
+            {"Owner": "Lab", "Site": "HAN1", "VLAN": "121", "ASN": "AS64512"},
+        )
+        self.assertEqual(_annotate(database, "10.1.2.96")["notes"], "printers")
+        self.assertEqual(
+            _annotate(database, "10.1.3.1"), {"Owner": "NetOps", "Site": "HAN1", "ASN": "AS64512"}
+        )
+        self.assertEqual(_annotate(database, "10.255.255.255"), {"Owner": "Corp", "ASN": "AS64512"})
+        self.assertEqual(_annotate(database, "11.0.0.0"), {})
+        self.assertEqual(_annotate(database, "2001:db8:1:ffff::1")["Site"], "SGN2")
+        self.assertEqual(_annotate(database, "2001:db8:2::1")["Owner"], "Corp")
+        self.assertEqual(_annotate(database, "2001:db9::"), {})
+
+    def test_invalid_inventories_are_rejected(self):
+        for rows in (
+            [{"network": "10.0.0.0/24"}, {"network": "10.0.0.128-10.0.1.5"}],
+            [{"network": "10.0.0.300"}],
+            [{"start": "10.0.0.9", "end": "10.0.0.1"}],
+        ):
+            with self.assertRaises(ValueError):
+                build_range_db(rows, ["owner"], self.path)
+        # A failed build leaves the previous file in place.
+        self.assertEqual(_annotate(RangeDatabase(self.path), "10.1.2.70")["Owner"], "Lab")
+
+        with open(self.path, "r+b") as handle:
+            handle.truncate(os.path.getsize(self.path) - 1)
+        with self.assertRaises(ValueError):
+            RangeDatabase(self.path)
+
+    def test_scalar_and_array_lookups_agree_with_a_scan(self):
+        rng = random.Random(18)
+        # CIDRs either nest or are disjoint; the short prefixes make plenty of nesting.
+        networks = [
+            ipaddress.ip_network((rng.getrandbits(32) & 0x0FFFFFFF, rng.randint(4, 32)), strict=False)
+            for _ in range(400)
+        ]
+        rows = [
+            {"network": str(network), "owner": f"o{index}"} for index, network in enumerate(networks)
+        ]
+        build_range_db(rows, ["owner"], self.path)
+        database = RangeDatabase(self.path)
+
+        addresses = [rng.getrandbits(28) for _ in range(2000)] + [0xFFFFFFFF]
+        bounds = [(int(network[0]), int(network[-1])) for network in networks]
+        addresses += [first for first, _ in bounds] + [last + 1 for _, last in bounds]
+        expected = []
+        for address in addresses:
+            # The longest containing prefix, and the later row among identical ones.
+            matches = [
+                (networks[index].prefixlen, index)
+                for index, (first, last) in enumerate(bounds)
+                if first <= address <= last
+            ]
+            expected.append(f"o{max(matches)[1]}" if matches else None)
+        scalar = [database.lookup_ipv4(address) for address in addresses]
+        owners = [database.record(r)["Owner"] if r != NO_MATCH else None for r in scalar]
+        self.assertEqual(owners, expected)
+        array = np.array(addresses, dtype=np.uint32)
+        self.assertEqual(database.lookup_ipv4_array(array).tolist(), scalar)
+
+        texts = ("::", "2001:db8::", "2001:db8:1::1", "ffff::")
+        v6 = [int(ipaddress.ip_address(text)) for text in texts]
+        self.assertEqual([database.lookup_ipv6(address) for address in v6], [NO_MATCH] * 4)
+
+    def test_scalar_and_array_lookups_agree_at_the_top_of_ipv6(self):
+        rows = [
+            {"network": "0:0:0:1::/64", "owner": "low"},
+            {"start": "ffff:ffff:ffff:ffff::5", "end": "ffff:ffff:ffff:ffff::9", "owner": "top"},
+            {"network": "ffff:ffff:ffff:fff0::/60", "owner": "near"},
+        ]
+        build_range_db(rows, ["owner"], self.path)
+        database = RangeDatabase(self.path)
+        rng = random.Random(18)
+        top = 0xFFFF_FFFF_FFFF_FFFF << 64
+        addresses = [top | low for low in (0, 4, 5, 7, 9, 10, 2**64 - 1)]
+        addresses += [1 << 64, (1 << 64) + 1, 2 << 64]
+        addresses += [top - (rng.getrandbits(68) << 4) + rng.getrandbits(64) for _ in range(500)]
+        scalar = [database.lookup_ipv6(address) for address in addresses]
+        halves = np.array(
+            [[address >> 64, address & (2**64 - 1)] for address in addresses], dtype=np.uint64
+        )
+        self.assertEqual(database.lookup_ipv6_array(halves).tolist(), scalar)
+        owners = [
+            database.record(record)["Owner"] if record != NO_MATCH else None for record in scalar[:10]
+        ]
+        self.assertEqual(
+            owners, ["near", "near", "top", "top", "top", "near", "near", "low", "low", None]
+        )
+
+    def test_reload_after_atomic_replace(self):
+        database = ReloadingRangeDatabase(self.path, interval=0)
+        old = database.database
+        digest = database.digest
+        build_range_db([{"network": "10.0.0.0/8", "owner": "Replaced"}], ["owner"], self.path)
+        self.assertEqual(_annotate(database, "10.1.2.70"), {"Owner": "Replaced"})
+        self.assertNotEqual(database.digest, digest)
+        # The previous mapping stays readable for anyone still holding it.
+        self.assertEqual(_annotate(old, "10.1.2.70")["Owner"], "Lab")
+
+        with open(self.path + ".new", "wb") as handle:
+            handle.write(b"not a database")
+        os.replace(self.path + ".new", self.path)
+        with self.assertLogs("app.range_db", "WARNING"):
+            self.assertFalse(database.reload_if_changed())
+        self.assertEqual(_annotate(database, "10.1.2.70"), {"Owner": "Replaced"})
+
+
+class RangeDatabaseRouteTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        csv_path = os.path.join(directory.name, "inventory.csv")
+        with open(csv_path, "w", encoding="utf-8") as handle:
+            handle.write(INVENTORY)
+        path = os.path.join(directory.name, "ranges.rdb")
+        compile_csv([csv_path], path)
+        self.app = create_app(debug_mode=False, secret_key="test-secret", load_env=False)
+        self.app.config["RATE_LIMIT_DISABLED"] = True
+        self.app.extensions["range_db"] = ReloadingRangeDatabase(path)
+        self.client = self.app.test_client()
+
+    def test_ip_details_show_inventory_fields(self):
+        page = self.client.get("/ip/10.1.2.70/24").get_data(as_text=True)
+        self.assertIn("<strong>VLAN:</strong> 121", page)
+        self.assertIn("<strong>Owner:</strong> Lab", page)
+
+        payload = self.client.get("/ip/2001:db8:1::1?format=json").get_json()
+        self.assertEqual(payload["ip"]["Site"], "SGN2")
+        self.assertEqual(payload["ip"]["IP Address"], "2001:db8:1::1")
+        self.assertNotIn("Owner", self.client.get("/ip/192.0.2.1?format=json").get_json()["ip"])
+
+    def test_annotated_permalinks_are_revalidated(self):
+        response = self.client.get("/ip/10.1.2.70/24")
+        self.assertEqual(response.headers["Cache-Control"], "public, no-cache")
+        revalidated = self.client.get(
+            "/ip/10.1.2.70/24", headers={"If-None-Match": response.headers["ETag"]}
+        )
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.headers["Cache-Control"], "public, no-cache")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import re
+import tempfile
+import unittest
+
+from app import create_app
+from app.rate_limit import MemoryRateLimiter, SharedRateLimiter, client_key
+
+
+def _hit_in_child(limiter, results):
+    results.put((limiter.hit("10.0.0.1", 2, now=60.0), limiter._fd))
+
+
+class SlidingWindowTests(unittest.TestCase):
+    def test_limit_and_sliding_recovery(self):
+        limiter = MemoryRateLimiter(window=60)
+        results = [limiter.hit("a", 3, now=100.0) for _ in range(4)]
+        self.assertEqual(results, [False, False, False, True])
+        # Halfway through the next window the previous count is weighted by one half.
+        self.assertFalse(limiter.hit("a", 3, now=150.0))
+        self.assertFalse(limiter.hit("a", 3, now=150.0))
+        self.assertTrue(limiter.hit("a", 3, now=150.0))
+        self.assertFalse(limiter.hit("a", 3, now=300.0))
+
+    def test_memory_limiter_is_bounded(self):
+        limiter = MemoryRateLimiter(window=60, max_clients=10)
+        for client in range(100):
+            limiter.hit(f"client-{client}", 5, now=1000.0)
+        self.assertEqual(len(limiter), 10)
+        limiter.hit("late", 5, now=2000.0)
+        self.assertEqual(len(limiter), 1)
+
+    def test_shared_limiter_state_is_visible_across_instances(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rate-limit")
+            first = SharedRateLimiter(path, window=60, max_clients=64)
+            second = SharedRateLimiter(path, window=60, max_clients=64)
+            try:
+                self.assertFalse(first.hit("10.0.0.1", 2, now=60.0))
+                self.assertFalse(second.hit("10.0.0.1", 2, now=60.0))
+                self.assertTrue(first.hit("10.0.0.1", 2, now=60.0))
+                for client in range(500):
+                    second.hit(f"client-{client}", 2, now=61.0)
+                self.assertLessEqual(len(first), 64)
+            finally:
+                first.close()
+                second.close()
+
+    def test_forked_shared_limiter_uses_its_own_lock(self):
+        with tempfile.TemporaryDirectory() as directory:
+            limiter = SharedRateLimiter(os.path.join(directory, "rate-limit"), window=60, max_clients=64)
+            try:
+                self.assertFalse(limiter.hit("10.0.0.1", 2, now=60.0))
+                context = multiprocessing.get_context("fork")
+                results = context.Queue()
+                child = context.Process(target=_hit_in_child, args=(limiter, results))
+                child.start()
+                limited, child_fd = results.get(timeout=10)
+                child.join()
+                self.assertFalse(limited)
+                self.assertNotEqual(child_fd, limiter._fd)
+                self.assertTrue(limiter.hit("10.0.0.1", 2, now=60.0))
+            finally:
+                limiter.close()
+
+    def test_client_key_parses_forwarded_for(self):
+        self.assertEqual(client_key("1.1.1.1, 203.0.113.9", "127.0.0.1"), "127.0.0.1")
+        self.assertEqual(client_key("1.1.1.1, 203.0.113.9", "127.0.0.1", trusted_proxies=1), "203.0.113.9")
+        self.assertEqual(client_key("1.1.1.1, 203.0.113.9", "127.0.0.1", trusted_proxies=2), "1.1.1.1")
+        self.assertEqual(client_key("1.1.1.1", "127.0.0.1", trusted_proxies=0), "127.0.0.1")
+        self.assertEqual(client_key("garbage", "127.0.0.1", trusted_proxies=1), "127.0.0.1")
+        self.assertEqual(client_key(None, "2001:db8::1:2"), "2001:db8::/64")
+
+
+class RateLimitRouteTests(unittest.TestCase):
+    def test_calculate_is_rate_limited_per_client(self):
+        os.environ.setdefault('SECRET_KEY', 'test-secret')
+        app = create_app()
+        app.config["RATE_LIMIT_PER_MINUTE"] = 2
+        app.config["RATE_LIMIT_TRUSTED_PROXIES"] = 1
+        client = app.test_client()
+        token = re.search(r'name="csrf_token" value="([^"]+)"', client.get("/").get_data(as_text=True)).group(1)
+        data = {'ip-address': '10.0.0.1', 'network': '24', 'csrf_token': token}
+        headers = {"X-Forwarded-For": "198.51.100.7"}
+
+        for _ in range(2):
+            self.assertNotIn(b"Too many requests", client.post('/calculate', data=data, headers=headers).data)
+        self.assertIn(b"Too many requests", client.post('/calculate', data=data, headers=headers).data)
+        other = {"X-Forwarded-For": "198.51.100.8"}
+        self.assertNotIn(b"Too many requests", client.post('/calculate', data=data, headers=other).data)
+
+    def test_forwarded_for_is_ignored_by_default(self):
+        os.environ.setdefault('SECRET_KEY', 'test-secret')
+        app = create_app()
+        app.config["RATE_LIMIT_PER_MINUTE"] = 1
+        client = app.test_client()
+        token = re.search(r'name="csrf_token" value="([^"]+)"', client.get("/").get_data(as_text=True)).group(1)
+        data = {'ip-address': '10.0.0.1', 'network': '24', 'csrf_token': token}
+        self.assertEqual(app.config["RATE_LIMIT_TRUSTED_PROXIES"], 0)
+        client.post('/calculate', data=data, headers={"X-Forwarded-For": "198.51.100.7"})
+        response = client.post('/calculate', data=data, headers={"X-Forwarded-For": "198.51.100.8"})
+        self.assertIn(b"Too many requests", response.data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from app.calculations import (
+    calculate_ipv4,
+    calculate_ipv6,
+    calculate_ipv4_network_and_subnet,
+    calculate_ipv6_network_and_subnet,
+)
+from app.ip_to_regex import ip_to_regex
+from app.results import Calculation, parse_calculation
+from app.validation import parse_prefix
+
+
+class ParseOnceTests(unittest.TestCase):
+    def test_matches_calculation_functions(self):
+        cases = [
+            ("192.168.1.10", "31"), ("10.0.0.5", "32"), ("8.8.8.8", "0"),
+            ("172.16.5.4", "255.255.240.0"), ("10.0.0.1", "0.0.0.255"), ("2001:db8::1", "127"),
+            ("2001:db8::1", "064"), ("::ffff:1.2.3.4", "96"),
+        ]
+        for ip_address, network_input in cases:
+            calculation = parse_calculation(ip_address, network_input)
+            if ":" in ip_address:
+                expected_ip = calculate_ipv6(ip_address)
+                expected_network = calculate_ipv6_network_and_subnet(ip_address, network_input)
+            else:
+                expected_ip = calculate_ipv4(ip_address)
+                expected_network = calculate_ipv4_network_and_subnet(ip_address, network_input)
+            self.assertEqual(list(calculation.address.fields()), list(expected_ip.items()))
+            self.assertEqual(list(calculation.network.fields()), list(expected_network.items()))
+            cidr = f"{expected_network['Network Address']}/{expected_network['CIDR']}"
+            self.assertEqual(calculation.regex, ip_to_regex(cidr))
+
+    def test_errors_keep_validation_messages(self):
+        cases = {
+            ("192.168.1.1!", "24"): "contains invalid characters",
+            ("192.168.1.1", "300.0.0.0"): "octets between 0 and 255",
+            ("192.168.1.1", "33"): "between 0 and 32",
+            ("192.168.1.1", "255.0.255.0"): "Invalid IPv4 netmask format",
+            ("2001:db8::1", "ffff::"): "Invalid IPv6 netmask format",
+            ("1.2.3", "24"): "Invalid IP address format",
+            (None, "24"): "IP address is required",
+        }
+        for (ip_address, network_input), message in cases.items():
+            with self.assertRaisesRegex(ValueError, message):
+                parse_calculation(ip_address, network_input)
+
+    def test_parse_prefix_accepts_masks(self):
+        self.assertEqual(parse_prefix("255.255.255.0", 4), 24)
+        self.assertEqual(parse_prefix("0.0.0.255", 4), 24)
+        self.assertEqual(parse_prefix("0.0.0.0", 4), 0)
+        self.assertEqual(parse_prefix("255.255.255.255", 4), 32)
+        self.assertEqual(parse_prefix("128", 6), 128)
+
+    def test_results_are_compact_and_lazy(self):
+        calculation = parse_calculation("10.0.0.5", "24")
+        self.assertIsInstance(calculation, Calculation)
+        for value in (calculation, calculation.address, calculation.network):
+            self.assertFalse(hasattr(value, "__dict__"))
+        self.assertIsNone(calculation.network._details)
+        self.assertIs(calculation.network.as_dict(), calculation.network.as_dict())
+        with self.assertRaises(TypeError):
+            calculation.network.as_dict()["CIDR"] = "8"
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import io
+import ipaddress
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+
+from app import create_app
+from app.cli import main
+from app.reverse_zones import iter_classless_delegation, iter_reverse_zone
+
+
+def _records(text):
+    """Return ``(absolute owner, target)`` for each PTR record of a zone."""
+    origin, records = None, []
+    for line in text.splitlines():
+        if line.startswith("$ORIGIN"):
+            origin = line.split()[1]
+        elif "\tPTR\t" in line:
+            owner, _, target = line.split("\t")
+            records.append((origin if owner == "@" else f"{owner}.{origin}", target))
+    return records
+
+
+class ReverseZoneTests(unittest.TestCase):
+    def test_ipv4_zone_matches_reverse_pointers(self):
+        text = "".join(
+            iter_reverse_zone(
+                "10.1.0.0/16",
+                "host-{dashed}.example.com.",
+                populate="10.1.3.250/23",
+                nameservers=["ns1.example.com.", "ns2.example.com."],
+                serial=2024010101,
+            )
+        )
+        lines = text.splitlines()
+        self.assertEqual(lines[:2], ["$TTL 3600", "$ORIGIN 1.10.in-addr.arpa."])
+        self.assertIn("@\tIN\tSOA\tns1.example.com. hostmaster.example.com. (2024010101 ", text)
+        self.assertIn("@\tIN\tNS\tns2.example.com.", lines)
+        origins = [line for line in lines if line.startswith("$ORIGIN ")]
+        self.assertEqual(origins[1:], ["$ORIGIN 2.1.10.in-addr.arpa.", "$ORIGIN 3.1.10.in-addr.arpa."])
+        expected = [
+            (address.reverse_pointer + ".", f"host-{str(address).replace('.', '-')}.example.com.")
+            for address in ipaddress.ip_network("10.1.2.0/23")
+        ]
+        self.assertEqual(_records(text), expected)
+
+    def test_ipv6_nibble_origins_and_template_fields(self):
+        template = "{index}.h{dashed}.{hex}.example.net."
+        for origin_bits in (None, 4, 8, 12):
+            with self.subTest(origin_bits=origin_bits):
+                text = "".join(
+                    iter_reverse_zone(
+                        "2001:db8:a::/48", template, populate="2001:db8:a:0:ab::ff0/116", origin_bits=origin_bits
+                    )
+                )
+                self.assertTrue(text.startswith("$TTL 3600\n$ORIGIN a.0.0.0.8.b.d.0.1.0.0.2.ip6.arpa.\n"))
+                expected = []
+                for index, address in enumerate(ipaddress.ip_network("2001:db8:a:0:ab::/116")):
+                    dashed = "-".join(f"{int(group, 16):x}" for group in address.exploded.split(":"))
+                    target = f"{index}.h{dashed}.{int(address):032x}.example.net."
+                    expected.append((address.reverse_pointer + ".", target))
+                self.assertEqual(_records(text), expected)
+
+    def test_ipv6_single_address_zone_is_written_at_the_apex(self):
+        address = ipaddress.ip_address("2001:db8::1")
+        target = "h2001-db8-0-0-0-0-0-1.example.net."
+        for origin_bits in (None, 16):
+            with self.subTest(origin_bits=origin_bits):
+                text = "".join(iter_reverse_zone("2001:db8::1/128", "h{dashed}.example.net.", origin_bits=origin_bits))
+                self.assertEqual(
+                    text.splitlines()[-2:],
+                    [f"$ORIGIN {address.reverse_pointer}.", f"@\tPTR\t{target}"],
+                )
+                self.assertEqual(_records(text), [(address.reverse_pointer + ".", target)])
+
+    def test_classless_zone_and_delegation(self):
+        text = "".join(iter_reverse_zone("192.0.2.64/26", "{d}.pool.example.com.", ttl=300))
+        self.assertEqual(text.splitlines()[:2], ["$TTL 300", "$ORIGIN 64/26.2.0.192.in-addr.arpa."])
+        records = _records(text)
+        self.assertEqual(len(records), 64)
+        self.assertEqual(records[0], ("64.64/26.2.0.192.in-addr.arpa.", "64.pool.example.com."))
+
+        delegation = "".join(iter_classless_delegation("192.0.2.64/26", ["ns1.example.com."])).splitlines()
+        self.assertEqual(
+            delegation[:3], ["$ORIGIN 2.0.192.in-addr.arpa.", "64/26\tNS\tns1.example.com.", "64\tCNAME\t64.64/26"]
+        )
+        self.assertEqual(len(delegation), 66)
+        with self.assertRaises(ValueError):
+            iter_classless_delegation("192.0.2.0/24", ["ns1.example.com."])
+
+    def test_rejects_invalid_arguments_before_streaming(self):
+        for kwargs in (
+            {"network": "10.0.0.0/8", "template": "{name}.example.com."},
+            {"network": "10.0.0.0/8", "template": "{a} .example.com."},
+            {"network": "2001:db8::/48", "template": "{a}.example.com."},
+            {"network": "10.0.0.0/16", "template": "{d}.x.", "populate": "10.1.0.0/24"},
+            {"network": "10.0.0.0/16", "template": "{d}.x.", "origin_bits": 12},
+            {"network": "10.0.0.0/8", "template": "{d}.x.", "max_records": 65536},
+            {"network": "10.0.0.0/8", "template": "{d}.x.", "nameservers": ["ns1 example."]},
+        ):
+            with self.subTest(kwargs=kwargs), self.assertRaises(ValueError):
+                iter_reverse_zone(kwargs.pop("network"), kwargs.pop("template"), **kwargs)
+
+
+class ReverseZoneInterfaceTests(unittest.TestCase):
+    def test_api_streams_zone(self):
+        app = create_app(debug_mode=False, secret_key="test-secret", load_env=False)
+        app.config["RATE_LIMIT_DISABLED"] = True
+        app.config["REVERSE_ZONE_MAX_RECORDS"] = 1024
+        client = app.test_client()
+        query = {"network": "10.9.8.0/24", "template": "{a}-{b}-{c}-{d}.example.com.", "ns": "ns1.example.com."}
+        response = client.get("/api/v1/reverse-zone", query_string=query)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/plain")
+        self.assertIn("attachment", response.headers["Content-Disposition"])
+        self.assertEqual(len(_records(response.get_data(as_text=True))), 256)
+
+        response = client.get("/api/v1/reverse-zone", query_string={"network": "10.0.0.0/16", "template": "{d}.x."})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("limit is 1024", response.get_json()["error"])
+        response = client.get(
+            "/api/v1/reverse-zone", query_string={"network": "10.0.0.8/29", "delegation": "true", "ns": "ns.example."}
+        )
+        self.assertIn("9\tCNAME\t9.8/29", response.get_data(as_text=True))
+
+    def test_cli_subcommand_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "zone")
+            argv = ["reverse-zone", "2001:db8::/64", "-t", "h{hex}.x.", "--populate", "2001:db8::/120", "-o", output]
+            self.assertEqual(main(argv + ["--serial", "7", "--ns", "ns1.example.com."]), 0)
+            with open(output, encoding="ascii") as handle:
+                text = handle.read()
+        self.assertIn("hostmaster.example.com. (7 ", text)
+        self.assertEqual(len(_records(text)), 256)
+        with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            main(["reverse-zone", "10.0.0.0/24"])
+
+
+if __name__ == "__main__":
+    unittest.main()
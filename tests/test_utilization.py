@@ -0,0 +1,166 @@
+import io
+import ipaddress
+import json
+import os
+import random
+import tempfile
+import unittest
+from collections import Counter
+from contextlib import redirect_stderr, redirect_stdout
+
+import numpy as np
+
+from app import create_app
+from app.cli import main
+from app.enumeration import parse_network
+from app.utilization import PrefixCounts, Utilization
+
+
+def _addresses(seed=24, count=20000):
+    rng = random.Random(seed)
+    ipv4 = [f"10.{rng.randrange(4)}.{rng.randrange(256)}.{rng.randrange(256)}" for _ in range(count)]
+    ipv6 = [f"2001:db8:{rng.randrange(3):x}:{rng.randrange(40):x}::{rng.randrange(9):x}" for _ in range(count // 10)]
+    return ipv4 + ipv6
+
+
+class UtilizationTests(unittest.TestCase):
+    def test_levels_match_reference_counts(self):
+        addresses = _addresses()
+        utilization = Utilization(chunk_size=1000)
+        self.assertEqual(utilization.add(addresses + ["bogus", "010.0.0.1", "::ffff:10.0.0.1"]), 2)
+        values = [int(ipaddress.ip_address(address)) for address in addresses if "." in address]
+        for prefixlen in (8, 16, 23, 24, 32):
+            with self.subTest(prefixlen=prefixlen):
+                numbers, hits, used = utilization.ipv4.level(prefixlen)
+                self.assertEqual(dict(zip(numbers.tolist(), hits.tolist())),
+                                 Counter(value >> (32 - prefixlen) for value in values))
+                self.assertEqual(dict(zip(numbers.tolist(), used.tolist())),
+                                 Counter(value >> (32 - prefixlen) for value in set(values)))
+        self.assertEqual(utilization.ipv6.observations, 2001)
+        with self.assertRaises(ValueError):
+            utilization.ipv6.level(65)
+
+    def test_top_busiest_and_emptiest(self):
+        utilization = Utilization()
+        utilization.add(["10.0.1.1", "10.0.1.2", "10.0.1.2", "10.0.3.1", "10.0.3.1", "10.0.3.1", "10.0.9.9"])
+        busiest = utilization.top("10.0.0.0/16", 24, 2)
+        self.assertEqual([row["prefix"] for row in busiest], ["10.0.1.0/24", "10.0.3.0/24"])
+        self.assertEqual(busiest[0], {"prefix": "10.0.1.0/24", "hits": 3, "used": 2, "size": 256,
+                                      "utilization": 2 / 256})
+        emptiest = utilization.top("10.0.0.0/20", 24, 4, emptiest=True)
+        self.assertEqual([row["prefix"] for row in emptiest], ["10.0.0.0/24", "10.0.2.0/24", "10.0.4.0/24",
+                                                                "10.0.5.0/24"])
+        self.assertEqual(emptiest[0]["used"], 0)
+        self.assertEqual(utilization.top("10.0.9.0/24", 24, 5, emptiest=True)[0]["hits"], 1)
+        self.assertEqual(utilization.top("0.0.0.0/0", 8, 1), [
+            {"prefix": "10.0.0.0/8", "hits": 7, "used": 4, "size": 2**24, "utilization": 4 / 2**24}
+        ])
+
+    def test_memory_bound_coarsens_and_keeps_coarse_levels_exact(self):
+        addresses = _addresses()
+        exact = Utilization()
+        exact.add(addresses)
+        bounded = Utilization(max_prefixes=500, chunk_size=4096)
+        bounded.add(addresses)
+        self.assertLessEqual(len(bounded.ipv4), 500)
+        self.assertEqual(bounded.ipv4.resolution, 22)
+        self.assertEqual(bounded.ipv6.resolution, 64)
+        for prefixlen in (8, 16, 22):
+            for left, right in zip(bounded.ipv4.level(prefixlen)[:2], exact.ipv4.level(prefixlen)[:2]):
+                self.assertEqual(left.tolist(), right.tolist())
+        usage = bounded.usage(parse_network("10.1.0.0/16"))
+        self.assertEqual((usage["size"], usage["resolution"]), (64, 22))
+        self.assertIsNone(bounded.usage(parse_network("10.1.2.0/24")))
+        with self.assertRaises(ValueError):
+            PrefixCounts(4, resolution=33)
+
+    def test_usage_folds_pending_leaves_before_checking_the_level(self):
+        rng = random.Random(5)
+        utilization = Utilization(max_prefixes=100)
+        utilization.add([f"10.0.{rng.randrange(256)}.{rng.randrange(256)}" for _ in range(5000)])
+        self.assertIsNone(utilization.usage(parse_network("10.0.1.0/28")))
+        self.assertEqual(utilization.ipv4.resolution, 22)
+
+        pending = Utilization(max_prefixes=100)
+        pending.add([f"10.0.{rng.randrange(256)}.{rng.randrange(256)}" for _ in range(5000)])
+        self.assertEqual(pending.ipv4.resolution, 22)
+
+    def test_merge_and_snapshot_round_trip(self):
+        addresses = _addresses()
+        whole = Utilization()
+        whole.add(addresses)
+        parts = [Utilization(chunk_size=333) for _ in range(3)]
+        for offset, part in enumerate(parts):
+            part.add(addresses[offset::3])
+        parts[2].ipv4.coarsen(28)
+        merged = parts[0].merge(parts[1]).merge(parts[2])
+        self.assertEqual(merged.ipv4.resolution, 28)
+        whole.ipv4.coarsen(28)
+        for family in ("ipv4", "ipv6"):
+            self.assertEqual(getattr(merged, family).keys.tolist(), getattr(whole, family).keys.tolist())
+            self.assertEqual(getattr(merged, family).hits.tolist(), getattr(whole, family).hits.tolist())
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "seen.npz")
+            merged.save(path)
+            loaded = Utilization.load(path)
+        self.assertEqual(len(loaded.digest), 32)
+        self.assertEqual(loaded.ipv4.resolution, 28)
+        self.assertEqual(loaded.usage(parse_network("10.0.0.0/8")), merged.usage(parse_network("10.0.0.0/8")))
+        loaded.add_ipv6_array(np.array([[0x20010DB8 << 32, 1]], dtype=np.uint64))
+        self.assertEqual(loaded.ipv6.observations, merged.ipv6.observations + 1)
+
+
+class UtilizationInterfaceTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_network_details_show_utilization(self):
+        path = os.path.join(self.directory, "seen.npz")
+        utilization = Utilization()
+        utilization.add(["192.0.2.1", "192.0.2.1", "192.0.2.9", "2001:db8::1", "2001:db8:0:5::1"])
+        utilization.save(path)
+        app = create_app(debug_mode=False, secret_key="test-secret", load_env=False)
+        app.config["RATE_LIMIT_DISABLED"] = True
+        app.extensions["utilization"] = Utilization.load(path)
+        client = app.test_client()
+
+        page = " ".join(client.get("/ip/192.0.2.7/24").get_data(as_text=True).split())
+        self.assertIn("<strong>Total Hosts:</strong> 254 <span class=\"utilization\">(2 of 256 addresses seen, "
+                      "0.78% utilized)</span>", page)
+        payload = client.get("/net/2001:db8::/60?format=json").get_json()
+        self.assertEqual(payload["utilization"], {"prefix": "2001:db8::/60", "hits": 2, "used": 2, "size": 16,
+                                                  "utilization": 0.125, "resolution": 64})
+        self.assertNotIn("utilization", client.get("/ip/2001:db8::1/120?format=json").get_json())
+
+    def test_cli_aggregates_with_workers_and_merges_snapshots(self):
+        flows, snapshot = os.path.join(self.directory, "flows.txt"), os.path.join(self.directory, "seen.npz")
+        with open(flows, "w", encoding="utf-8") as handle:
+            handle.write("# ts,src\n")
+            handle.writelines(f"1700000000,{address}\n" for address in _addresses(count=3000))
+            handle.write("1700000001,nonsense\n")
+        stdout, stderr = io.StringIO(), io.StringIO()
+        argv = ["utilization", flows, "--field", "1", "-j", "2", "--chunk-size", "500", "-o", snapshot, "-l", "16"]
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            self.assertEqual(main(argv + ["-n", "2"]), 1)
+        rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([row["level"] for row in rows], [16, 16, 16])
+        self.assertGreaterEqual(rows[0]["used"], rows[1]["used"])
+        self.assertEqual(rows[2]["prefix"], "2001::/16")
+        self.assertEqual(rows[2]["hits"], 300)
+        self.assertIn("3000 IPv4 and 300 IPv6 observations, 1 invalid", stderr.getvalue())
+
+        stdout = io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(io.StringIO()):
+            argv = ["utilization", "-m", snapshot, "-m", snapshot, "--within", "10.1.0.0/16", "-l", "24", "--emptiest"]
+            self.assertEqual(main(argv + ["-n", "1"]), 0)
+        row = json.loads(stdout.getvalue())
+        self.assertEqual((row["rank"], row["level"]), (1, 24))
+        self.assertTrue(row["prefix"].startswith("10.1."))
+        self.assertEqual(row["hits"] % 2, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
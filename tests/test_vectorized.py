@@ -0,0 +1,77 @@
+import ipaddress
+import random
+import unittest
+
+from app.calculations import (
+    calculate_ipv4,
+    calculate_ipv6,
+    calculate_ipv4_network_and_subnet,
+    calculate_ipv6_network_and_subnet,
+)
+from app.vectorized import (
+    calculate_ipv4_columns,
+    calculate_ipv6_columns,
+    format_ipv6,
+    parse_address_columns,
+    parse_ipv4_column,
+)
+
+
+class VectorizedEngineTests(unittest.TestCase):
+    def test_ipv4_columns_match_scalar_results(self):
+        rng = random.Random(4)
+        addresses = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(500)]
+        networks = [str(rng.randint(0, 32)) for _ in range(250)]
+        networks += [str(ipaddress.IPv4Network(f"0.0.0.0/{rng.randint(0, 32)}").netmask) for _ in range(250)]
+        addresses += ["10.0.0.1", "010.0.0.1", "1.2.3", "10.0.0.1", "192.168.1.10"]
+        networks += ["0.0.0.255", "24", "24", "255.0.255.0", "31"]
+
+        columns = calculate_ipv4_columns(addresses, networks)
+        for index, (address, network) in enumerate(zip(addresses, networks)):
+            self.assertEqual(
+                columns.network_result(index), calculate_ipv4_network_and_subnet(address, network)
+            )
+            self.assertEqual(columns.ip_result(index), calculate_ipv4(address))
+
+    def test_ipv6_columns_match_scalar_results(self):
+        rng = random.Random(6)
+        values = [rng.getrandbits(128) for _ in range(300)]
+        values += [rng.getrandbits(20), (0xFFFF << 32) | rng.getrandbits(32), 0, 1]
+        addresses = [str(ipaddress.IPv6Address(value)) for value in values]
+        networks = [str(rng.randint(0, 128)) for _ in values]
+        addresses += ["2001:db8::1", "fe80::1%eth0", "1::2::3"]
+        networks += ["ffff::", "64", "64"]
+
+        columns = calculate_ipv6_columns(addresses, networks)
+        for index, (address, network) in enumerate(zip(addresses, networks)):
+            self.assertEqual(
+                columns.network_result(index), calculate_ipv6_network_and_subnet(address, network)
+            )
+            self.assertEqual(columns.ip_result(index), calculate_ipv6(address))
+
+    def test_parse_ipv4_column_rejects_malformed_addresses(self):
+        values = ["1.2.3.4", "01.2.3.4", "1.2.3.256", "1..2.3", "1.2.3.4.5", "", "255.255.255.255"]
+        addresses, valid = parse_ipv4_column(values)
+        self.assertEqual(valid.tolist(), [True, False, False, False, False, False, True])
+        self.assertEqual(int(addresses[0]), 0x01020304)
+        self.assertEqual(int(addresses[-1]), 0xFFFFFFFF)
+
+    def test_parse_address_columns_groups_rows_by_version(self):
+        values = ["10.0.0.1", "2001:db8::1", "bogus", "::ffff:1.2.3.4%eth0", "0.0.0.0"]
+        groups = {group[0]: group[1:] for group in parse_address_columns(values)}
+        rows, addresses, valid = groups[4]
+        self.assertEqual((rows.tolist(), valid.tolist()), ([0, 2, 4], [True, False, True]))
+        self.assertEqual(int(addresses[0]), 0x0A000001)
+        rows, addresses, valid = groups[6]
+        self.assertEqual((rows.tolist(), valid.tolist()), ([1, 3], [True, False]))
+        self.assertEqual(addresses[0].tolist(), [0x20010DB800000000, 1])
+        self.assertEqual(list(parse_address_columns(["::1"]))[0][0], 6)
+
+    def test_format_ipv6_compresses_like_ipaddress(self):
+        for text in ["::", "::1", "1::", "2001:db8:0:0:1:0:0:1", "0:0:1:0:0:0:1:0", "1:0:2:0:3:0:4:0"]:
+            value = int(ipaddress.IPv6Address(text))
+            self.assertEqual(format_ipv6(value), str(ipaddress.IPv6Address(value)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import ipaddress
+import os
+import re
+import unittest
+
+from app import create_app
+from app.calculations import calculate_ipv4_network_and_subnet
+from app.vlsm import FreeBlocks, hosts_to_prefix, parse_requirement, plan_subnets
+
+
+def _total_hosts(prefix: int) -> int:
+    return calculate_ipv4_network_and_subnet("10.0.0.0", str(prefix))["Total Hosts"]
+
+
+class PlannerTests(unittest.TestCase):
+    def test_hosts_to_prefix_matches_calculations(self):
+        for hosts in range(1, 600):
+            prefix = hosts_to_prefix(hosts, 4)
+            self.assertGreaterEqual(_total_hosts(prefix), hosts)
+            if prefix < 32:
+                self.assertLess(_total_hosts(prefix + 1), hosts)
+        self.assertEqual(hosts_to_prefix(256, 6), 120)
+
+    def test_parse_requirement_forms(self):
+        self.assertEqual(parse_requirement(50, 4), (None, 50, 26))
+        self.assertEqual(parse_requirement("/28", 4), (None, None, 28))
+        self.assertEqual(parse_requirement("lab:20", 4), ("lab", 20, 27))
+        self.assertEqual(parse_requirement({"name": "core", "prefix": 64}, 6), ("core", None, 64))
+        with self.assertRaises(ValueError):
+            parse_requirement("/33", 4)
+
+    def test_plan_is_packed_and_in_requirement_order(self):
+        plan = plan_subnets("192.168.0.0/24", [10, 100, "/30", 50])
+        self.assertEqual(
+            [subnet["subnet"] for subnet in plan["subnets"]],
+            ["192.168.0.192/28", "192.168.0.0/25", "192.168.0.208/30", "192.168.0.128/26"],
+        )
+        self.assertEqual(plan["free"], ["192.168.0.212/30", "192.168.0.216/29", "192.168.0.224/27"])
+        self.assertEqual(plan["free_addresses"], 44)
+
+    def test_large_plan_has_no_overlaps_and_respects_exclusions(self):
+        requirements = [2, 14, 30, 200, 1000] * 2000
+        plan = plan_subnets("10.0.0.0/8", requirements, exclude=["10.0.0.0/12"])
+        networks = sorted(ipaddress.ip_network(subnet["subnet"]) for subnet in plan["subnets"])
+        excluded = ipaddress.ip_network("10.0.0.0/12")
+        self.assertFalse(any(a.overlaps(b) for a, b in zip(networks, networks[1:])))
+        self.assertFalse(any(network.overlaps(excluded) for network in networks))
+
+    def test_plan_that_does_not_fit_is_rejected(self):
+        with self.assertRaisesRegex(ValueError, "only 256 are free"):
+            plan_subnets("10.0.0.0/24", [200, 100])
+        with self.assertRaises(ValueError):
+            plan_subnets("10.0.0.0/24", ["/23"])
+        blocks = FreeBlocks(32)
+        blocks.add(0, 31)
+        self.assertEqual([blocks.allocate(32), blocks.allocate(32), blocks.allocate(32)], [0, 1, None])
+
+
+class PlanRouteTests(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault('SECRET_KEY', 'test-secret')
+        self.app = create_app()
+        self.app.config.update(TESTING=True, RATE_LIMIT_DISABLED=True)
+        self.client = self.app.test_client()
+
+    def test_plan_api(self):
+        response = self.client.post(
+            "/api/v1/plan", json={"network": "2001:db8::/48", "subnets": ["/64", "/56"]}
+        )
+        self.assertEqual(response.status_code, 200)
+        subnets = [subnet["subnet"] for subnet in response.get_json()["subnets"]]
+        self.assertEqual(subnets, ["2001:db8:0:100::/64", "2001:db8::/56"])
+        response = self.client.post("/api/v1/plan", json={"network": "10.0.0.0/30", "subnets": [100]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_plan_form_renders_table(self):
+        page = self.client.get("/").get_data(as_text=True)
+        token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+        response = self.client.post(
+            "/plan", data={"parent": "10.0.0.0/24", "subnets": "lab:100\n/28", "csrf_token": token}
+        )
+        self.assertIn(b"<td>10.0.0.0/25</td>", response.data)
+        self.assertIn(b"<td>lab</td>", response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()